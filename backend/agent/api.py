@@ -13,19 +13,22 @@ import tempfile
 import os
 
 from agentpress.thread_manager import ThreadManager
+from agentpress.thread_head import invalidate_thread_head
 from services.supabase import DBConnection
 from services import redis
 from utils.auth_utils import get_current_user_id_from_jwt, get_user_id_from_stream_auth, verify_thread_access, verify_admin_api_key
 from utils.logger import logger, structlog
 from services.billing import check_billing_status, can_use_model
 from utils.config import config
-from sandbox.sandbox import create_sandbox, delete_sandbox, get_or_start_sandbox
+from sandbox.sandbox import delete_sandbox, get_or_start_sandbox
+from sandbox.pool import provision_project_sandbox
 from services.llm import make_llm_api_call
 from run_agent_background import run_agent_background, _cleanup_redis_response_list, update_agent_run_status
 from utils.constants import MODEL_NAME_ALIASES
 from flags.flags import is_enabled
 
-from .config_helper import extract_agent_config, build_unified_config
+from .config_helper import build_unified_config
+from .config_cache import get_agent_config, get_default_agent_config, invalidate_agent_config, invalidate_default_agent
 from .utils import check_agent_run_limit
 from .versioning.version_service import get_version_service
 from .versioning.api import router as version_router, initialize as initialize_versioning
@@ -372,77 +375,26 @@ async def start_agent(
     logger.debug(f"  - effective_agent_id: {effective_agent_id}")
 
     if effective_agent_id:
-        logger.debug(f"[AGENT LOAD] Querying for agent: {effective_agent_id}")
-        # Get agent
-        agent_result = await client.table('agents').select('*').eq('agent_id', effective_agent_id).eq('account_id', account_id).execute()
-        logger.debug(f"[AGENT LOAD] Query result: found {len(agent_result.data) if agent_result.data else 0} agents")
-        
-        if not agent_result.data:
+        logger.debug(f"[AGENT LOAD] Resolving agent: {effective_agent_id}")
+        agent_config = await get_agent_config(client, effective_agent_id, account_id, user_id)
+
+        if not agent_config:
             if body.agent_id:
                 raise HTTPException(status_code=404, detail="Agent not found or access denied")
             else:
                 logger.warning(f"Stored agent_id {effective_agent_id} not found, falling back to default")
                 effective_agent_id = None
         else:
-            agent_data = agent_result.data[0]
-            version_data = None
-            if agent_data.get('current_version_id'):
-                try:
-                    version_service = await _get_version_service()
-                    version_obj = await version_service.get_version(
-                        agent_id=effective_agent_id,
-                        version_id=agent_data['current_version_id'],
-                        user_id=user_id
-                    )
-                    version_data = version_obj.to_dict()
-                    logger.debug(f"[AGENT LOAD] Got version data from version manager: {version_data.get('version_name')}")
-                except Exception as e:
-                    logger.warning(f"[AGENT LOAD] Failed to get version data: {e}")
-            
-            logger.debug(f"[AGENT LOAD] About to call extract_agent_config with agent_data keys: {list(agent_data.keys())}")
-            logger.debug(f"[AGENT LOAD] version_data type: {type(version_data)}, has data: {version_data is not None}")
-            
-            agent_config = extract_agent_config(agent_data, version_data)
-            
-            if version_data:
-                logger.debug(f"Using agent {agent_config['name']} ({effective_agent_id}) version {agent_config.get('version_name', 'v1')}")
-            else:
-                logger.debug(f"Using agent {agent_config['name']} ({effective_agent_id}) - no version data")
-            source = "request" if body.agent_id else "fallback"
+            logger.debug(f"Using agent {agent_config['name']} ({effective_agent_id}) version {agent_config.get('version_name', 'v1')}")
     else:
         logger.debug(f"[AGENT LOAD] No effective_agent_id, will try default agent")
 
     if not agent_config:
-        logger.debug(f"[AGENT LOAD] No agent config yet, querying for default agent")
-        default_agent_result = await client.table('agents').select('*').eq('account_id', account_id).eq('is_default', True).execute()
-        logger.debug(f"[AGENT LOAD] Default agent query result: found {len(default_agent_result.data) if default_agent_result.data else 0} default agents")
-        
-        if default_agent_result.data:
-            agent_data = default_agent_result.data[0]
-            
-            # Use versioning system to get current version
-            version_data = None
-            if agent_data.get('current_version_id'):
-                try:
-                    version_service = await _get_version_service()
-                    version_obj = await version_service.get_version(
-                        agent_id=agent_data['agent_id'],
-                        version_id=agent_data['current_version_id'],
-                        user_id=user_id
-                    )
-                    version_data = version_obj.to_dict()
-                    logger.debug(f"[AGENT LOAD] Got default agent version from version manager: {version_data.get('version_name')}")
-                except Exception as e:
-                    logger.warning(f"[AGENT LOAD] Failed to get default agent version data: {e}")
-            
-            logger.debug(f"[AGENT LOAD] About to call extract_agent_config for DEFAULT agent with version data: {version_data is not None}")
-            
-            agent_config = extract_agent_config(agent_data, version_data)
-            
-            if version_data:
-                logger.debug(f"Using default agent: {agent_config['name']} ({agent_config['agent_id']}) version {agent_config.get('version_name', 'v1')}")
-            else:
-                logger.debug(f"Using default agent: {agent_config['name']} ({agent_config['agent_id']}) - no version data")
+        logger.debug(f"[AGENT LOAD] No agent config yet, resolving default agent")
+        agent_config = await get_default_agent_config(client, account_id, user_id)
+
+        if agent_config:
+            logger.debug(f"Using default agent: {agent_config['name']} ({agent_config['agent_id']}) version {agent_config.get('version_name', 'v1')}")
         else:
             logger.warning(f"[AGENT LOAD] No default agent found for account {account_id}")
 
@@ -1014,72 +966,19 @@ async def initiate_agent_with_files(
     logger.debug(f"  - agent_id param: {agent_id}")
     
     if agent_id:
-        logger.debug(f"[AGENT INITIATE] Querying for specific agent: {agent_id}")
-        # Get agent
-        agent_result = await client.table('agents').select('*').eq('agent_id', agent_id).eq('account_id', account_id).execute()
-        logger.debug(f"[AGENT INITIATE] Query result: found {len(agent_result.data) if agent_result.data else 0} agents")
-        
-        if not agent_result.data:
+        logger.debug(f"[AGENT INITIATE] Resolving specific agent: {agent_id}")
+        agent_config = await get_agent_config(client, agent_id, account_id, user_id)
+
+        if not agent_config:
             raise HTTPException(status_code=404, detail="Agent not found or access denied")
-        
-        agent_data = agent_result.data[0]
-        
-        # Use versioning system to get current version
-        version_data = None
-        if agent_data.get('current_version_id'):
-            try:
-                version_service = await _get_version_service()
-                version_obj = await version_service.get_version(
-                    agent_id=agent_id,
-                    version_id=agent_data['current_version_id'],
-                    user_id=user_id
-                )
-                version_data = version_obj.to_dict()
-                logger.debug(f"[AGENT INITIATE] Got version data from version manager: {version_data.get('version_name')}")
-                logger.debug(f"[AGENT INITIATE] Version data: {version_data}")
-            except Exception as e:
-                logger.warning(f"[AGENT INITIATE] Failed to get version data: {e}")
-        
-        logger.debug(f"[AGENT INITIATE] About to call extract_agent_config with version data: {version_data is not None}")
-        
-        agent_config = extract_agent_config(agent_data, version_data)
-        
-        if version_data:
-            logger.debug(f"Using custom agent: {agent_config['name']} ({agent_id}) version {agent_config.get('version_name', 'v1')}")
-        else:
-            logger.debug(f"Using custom agent: {agent_config['name']} ({agent_id}) - no version data")
+
+        logger.debug(f"Using custom agent: {agent_config['name']} ({agent_id}) version {agent_config.get('version_name', 'v1')}")
     else:
-        logger.debug(f"[AGENT INITIATE] No agent_id provided, querying for default agent")
-        # Try to get default agent for the account
-        default_agent_result = await client.table('agents').select('*').eq('account_id', account_id).eq('is_default', True).execute()
-        logger.debug(f"[AGENT INITIATE] Default agent query result: found {len(default_agent_result.data) if default_agent_result.data else 0} default agents")
-        
-        if default_agent_result.data:
-            agent_data = default_agent_result.data[0]
-            
-            # Use versioning system to get current version
-            version_data = None
-            if agent_data.get('current_version_id'):
-                try:
-                    version_service = await _get_version_service()
-                    version_obj = await version_service.get_version(
-                        agent_id=agent_data['agent_id'],
-                        version_id=agent_data['current_version_id'],
-                        user_id=user_id
-                    )
-                    version_data = version_obj.to_dict()
-                    logger.debug(f"[AGENT INITIATE] Got default agent version from version manager: {version_data.get('version_name')}")
-                except Exception as e:
-                    logger.warning(f"[AGENT INITIATE] Failed to get default agent version data: {e}")
-            
-            logger.debug(f"[AGENT INITIATE] About to call extract_agent_config for DEFAULT agent with version data: {version_data is not None}")
-            
-            agent_config = extract_agent_config(agent_data, version_data)
-            
-            if version_data:
-                logger.debug(f"Using default agent: {agent_config['name']} ({agent_config['agent_id']}) version {agent_config.get('version_name', 'v1')}")
-            else:
-                logger.debug(f"Using default agent: {agent_config['name']} ({agent_config['agent_id']}) - no version data")
+        logger.debug(f"[AGENT INITIATE] No agent_id provided, resolving default agent")
+        agent_config = await get_default_agent_config(client, account_id, user_id)
+
+        if agent_config:
+            logger.debug(f"Using default agent: {agent_config['name']} ({agent_config['agent_id']}) version {agent_config.get('version_name', 'v1')}")
         else:
             logger.warning(f"[AGENT INITIATE] No default agent found for account {account_id}")
     
@@ -1140,8 +1039,7 @@ async def initiate_agent_with_files(
         if files:
             # 3. Create Sandbox (lazy): only create now if files were uploaded and need the
             try:
-                sandbox_pass = str(uuid.uuid4())
-                sandbox = await create_sandbox(sandbox_pass, project_id)
+                sandbox, sandbox_pass = await provision_project_sandbox(project_id)
                 sandbox_id = sandbox.id
                 logger.info(f"Created new sandbox {sandbox_id} for project {project_id}")
 
@@ -1947,6 +1845,7 @@ async def create_agent(
     try:
         if agent_data.is_default:
             await client.table('agents').update({"is_default": False}).eq("account_id", user_id).eq("is_default", True).execute()
+            await invalidate_default_agent(user_id)
         
         insert_data = {
             "account_id": user_id,
@@ -2325,6 +2224,10 @@ async def update_agent(
             except Exception as e:
                 logger.error(f"Error updating agent {agent_id}: {str(e)}")
                 raise HTTPException(status_code=500, detail=f"Failed to update agent: {str(e)}")
+
+            await invalidate_agent_config(agent_id)
+            if agent_data.is_default is not None:
+                await invalidate_default_agent(user_id)
         
         updated_agent = await client.table('agents').select('*').eq("agent_id", agent_id).eq("account_id", user_id).maybe_single().execute()
         
@@ -2472,6 +2375,8 @@ async def delete_agent(agent_id: str, user_id: str = Depends(get_current_user_id
             logger.warning(f"No agent was deleted for agent_id: {agent_id}, user_id: {user_id}")
             raise HTTPException(status_code=403, detail="Unable to delete agent - permission denied or agent not found")
         
+        await invalidate_agent_config(agent_id)
+
         try:
             from utils.cache import Cache
             await Cache.invalidate(f"agent_count_limit:{user_id}")
@@ -3210,8 +3115,7 @@ async def create_thread(
         # 2. Create Sandbox
         sandbox_id = None
         try:
-            sandbox_pass = str(uuid.uuid4())
-            sandbox = await create_sandbox(sandbox_pass, project_id)
+            sandbox, sandbox_pass = await provision_project_sandbox(project_id)
             sandbox_id = sandbox.id
             logger.debug(f"Created new sandbox {sandbox_id} for project {project_id}")
             
@@ -3355,6 +3259,7 @@ async def add_message_to_thread(
               "content": message
             }
         }).execute()
+        await invalidate_thread_head(thread_id)
         return message_result.data[0]
     except Exception as e:
         logger.error(f"Error adding message to thread {thread_id}: {str(e)}")
@@ -3393,6 +3298,7 @@ async def create_message(
         if not message_result.data:
             raise HTTPException(status_code=500, detail="Failed to create message")
         
+        await invalidate_thread_head(thread_id)
         logger.debug(f"Created message: {message_result.data[0]['message_id']}")
         return message_result.data[0]
         
@@ -3416,6 +3322,7 @@ async def delete_message(
     try:
         # Don't allow users to delete the "status" messages
         await client.table('messages').delete().eq('message_id', message_id).eq('is_llm_message', True).eq('thread_id', thread_id).execute()
+        await invalidate_thread_head(thread_id)
         return {"message": "Message deleted successfully"}
     except Exception as e:
         logger.error(f"Error deleting message {message_id} from thread {thread_id}: {str(e)}")
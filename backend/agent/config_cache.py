@@ -0,0 +1,149 @@
+"""
+Redis-backed cache of resolved agent configs.
+
+Resolved configs are stored per (agent_id, current_version_id), so activating a
+new version simply misses the old entry. A small head record maps an agent to
+its current version and owner, and a default pointer maps an account to its
+default agent, which lets a warm run start skip the agents and agent_versions
+queries entirely. Entries live in Redis so API and worker processes share them.
+"""
+
+from typing import Any, Dict, Optional
+
+from utils.cache import Cache
+from utils.logger import logger
+from .config_helper import extract_agent_config
+from .versioning.version_service import get_version_service
+
+AGENT_CONFIG_TTL = 60 * 60
+
+
+def _config_key(agent_id: str, version_id: str, variant: str) -> str:
+    return f"agent_config:{variant}:{agent_id}:{version_id}"
+
+
+def _head_key(agent_id: str) -> str:
+    return f"agent_config_head:{agent_id}"
+
+
+def _default_key(account_id: str) -> str:
+    return f"default_agent:{account_id}"
+
+
+async def _safe_get(key: str) -> Any:
+    try:
+        return await Cache.get(key)
+    except Exception as e:
+        logger.warning(f"Agent config cache read failed for {key}: {e}")
+        return None
+
+
+async def _safe_set(key: str, value: Any) -> None:
+    try:
+        await Cache.set(key, value, ttl=AGENT_CONFIG_TTL)
+    except Exception as e:
+        logger.warning(f"Agent config cache write failed for {key}: {e}")
+
+
+async def _safe_invalidate(key: str) -> None:
+    try:
+        await Cache.invalidate(key)
+    except Exception as e:
+        logger.warning(f"Agent config cache invalidation failed for {key}: {e}")
+
+
+async def get_agent_head(agent_id: str) -> Optional[Dict[str, Any]]:
+    """Return the cached ``{'version_id', 'account_id'}`` head for an agent."""
+    return await _safe_get(_head_key(agent_id))
+
+
+async def set_agent_head(agent_id: str, version_id: str, account_id: Optional[str]) -> None:
+    await _safe_set(_head_key(agent_id), {'version_id': version_id, 'account_id': account_id})
+
+
+async def get_cached_config(agent_id: str, version_id: str, variant: str = "run") -> Optional[Dict[str, Any]]:
+    return await _safe_get(_config_key(agent_id, version_id, variant))
+
+
+async def set_cached_config(agent_id: str, version_id: str, config: Dict[str, Any], variant: str = "run") -> None:
+    await _safe_set(_config_key(agent_id, version_id, variant), config)
+
+
+async def _get_cached_for_account(agent_id: str, account_id: str) -> Optional[Dict[str, Any]]:
+    head = await get_agent_head(agent_id)
+    if not head or head.get('account_id') != account_id or not head.get('version_id'):
+        return None
+    return await get_cached_config(agent_id, head['version_id'])
+
+
+async def _resolve_agent_row(agent_data: Dict[str, Any], user_id: str) -> Dict[str, Any]:
+    agent_id = agent_data['agent_id']
+    version_id = agent_data.get('current_version_id')
+    version_data = None
+    if version_id:
+        try:
+            version_service = await get_version_service()
+            version_obj = await version_service.get_version(
+                agent_id=agent_id,
+                version_id=version_id,
+                user_id=user_id
+            )
+            version_data = version_obj.to_dict()
+        except Exception as e:
+            logger.warning(f"[AGENT LOAD] Failed to get version data for agent {agent_id}: {e}")
+
+    agent_config = extract_agent_config(agent_data, version_data)
+
+    # Only fully resolved configs are shared; fallbacks are recomputed next time.
+    if version_data:
+        await set_cached_config(agent_id, version_id, agent_config)
+        await set_agent_head(agent_id, version_id, agent_data.get('account_id'))
+
+    return agent_config
+
+
+async def get_agent_config(client, agent_id: str, account_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+    """Resolve the run config for an agent owned by ``account_id``.
+
+    Returns None when the agent does not exist or belongs to another account.
+    """
+    cached = await _get_cached_for_account(agent_id, account_id)
+    if cached:
+        logger.debug(f"[AGENT LOAD] Agent config cache hit for {agent_id}")
+        return cached
+
+    agent_result = await client.table('agents').select('*').eq('agent_id', agent_id).eq('account_id', account_id).execute()
+    if not agent_result.data:
+        return None
+    return await _resolve_agent_row(agent_result.data[0], user_id)
+
+
+async def get_default_agent_config(client, account_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+    """Resolve the run config for the account's default agent, if any."""
+    default_agent_id = await _safe_get(_default_key(account_id))
+    if default_agent_id:
+        cached = await _get_cached_for_account(default_agent_id, account_id)
+        if cached:
+            logger.debug(f"[AGENT LOAD] Default agent config cache hit for {default_agent_id}")
+            return cached
+
+    default_agent_result = await client.table('agents').select('*').eq('account_id', account_id).eq('is_default', True).execute()
+    if not default_agent_result.data:
+        return None
+
+    agent_data = default_agent_result.data[0]
+    await _safe_set(_default_key(account_id), agent_data['agent_id'])
+    return await _resolve_agent_row(agent_data, user_id)
+
+
+async def invalidate_agent_config(agent_id: str) -> None:
+    """Drop the cached head and current config for an agent after it changes."""
+    head = await get_agent_head(agent_id)
+    if head and head.get('version_id'):
+        for variant in ("run", "trigger"):
+            await _safe_invalidate(_config_key(agent_id, head['version_id'], variant))
+    await _safe_invalidate(_head_key(agent_id))
+
+
+async def invalidate_default_agent(account_id: str) -> None:
+    await _safe_invalidate(_default_key(account_id))
@@ -1,9 +1,10 @@
 import os
 import json
+import time
 import asyncio
 import datetime
 from typing import Optional, Dict, List, Any, AsyncGenerator
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from agent.tools.message_tool import MessageTool
 from agent.tools.sb_deploy_tool import SandboxDeployTool
@@ -14,6 +15,8 @@ from utils.config import config
 from agent.agent_builder_prompt import get_agent_builder_prompt
 from agentpress.thread_manager import ThreadManager
 from agentpress.response_processor import ProcessorConfig
+from agentpress import thread_head
+from knowledge_base import retrieval as kb_retrieval
 from agent.tools.sb_shell_tool import SandboxShellTool
 from agent.tools.sb_files_tool import SandboxFilesTool
 from agent.tools.data_providers_tool import DataProvidersTool
@@ -27,8 +30,9 @@ from agent.tools.sb_vision_tool import SandboxVisionTool
 from agent.tools.sb_image_edit_tool import SandboxImageEditTool
 from agent.tools.sb_presentation_outline_tool import SandboxPresentationOutlineTool
 from agent.tools.sb_presentation_tool_v2 import SandboxPresentationToolV2
-from services.langfuse import langfuse
-from langfuse.client import StatefulTraceClient
+from services import tracing
+from services.tracing import Trace
+from sandbox.broker import release_sandbox_brokers
 
 from agent.tools.mcp_tool_wrapper import MCPToolWrapper
 from agent.tools.task_list_tool import TaskListTool
@@ -51,7 +55,7 @@ class AgentConfig:
     reasoning_effort: Optional[str] = 'low'
     enable_context_manager: bool = True
     agent_config: Optional[dict] = None
-    trace: Optional[StatefulTraceClient] = None
+    trace: Optional[Trace] = None
     is_agent_builder: Optional[bool] = False
     target_agent_id: Optional[str] = None
 
@@ -242,11 +246,22 @@ class MCPManager:
 
 
 class PromptManager:
+    @staticmethod
+    async def fetch_knowledge_base_context(client, agent_id: str, query: Optional[str] = None) -> Optional[str]:
+        """Knowledge base chunks relevant to ``query`` (the latest user message) within the prompt budget."""
+        try:
+            logger.debug(f"Retrieving agent knowledge base context for agent {agent_id}")
+            return await kb_retrieval.fetch_knowledge_base_context(client, agent_id, query=query)
+        except Exception as e:
+            logger.error(f"Error retrieving knowledge base context for agent {agent_id}: {e}")
+            # Continue without knowledge base context rather than failing
+            return None
+
     @staticmethod
     async def build_system_prompt(model_name: str, agent_config: Optional[dict], 
                                   is_agent_builder: bool, thread_id: str, 
                                   mcp_wrapper_instance: Optional[MCPToolWrapper],
-                                  client=None) -> dict:
+                                  client=None, kb_context: Optional[str] = None) -> dict:
         
         default_system_content = get_system_prompt()
         
@@ -263,39 +278,29 @@ class PromptManager:
         else:
             system_content = default_system_content
         
-        # Add agent knowledge base context if available
-        if client and agent_config and agent_config.get('agent_id'):
-            try:
-                logger.debug(f"Retrieving agent knowledge base context for agent {agent_config['agent_id']}")
-                
-                # Use only agent-based knowledge base context
-                kb_result = await client.rpc('get_agent_knowledge_base_context', {
-                    'p_agent_id': agent_config['agent_id']
-                }).execute()
-                
-                if kb_result.data and kb_result.data.strip():
-                    logger.debug(f"Found agent knowledge base context, adding to system prompt (length: {len(kb_result.data)} chars)")
-                    # logger.debug(f"Knowledge base data object: {kb_result.data[:500]}..." if len(kb_result.data) > 500 else f"Knowledge base data object: {kb_result.data}")
-                    
-                    # Construct a well-formatted knowledge base section
-                    kb_section = f"""
+        # Add agent knowledge base context if available; the run prefetcher
+        # passes it in, otherwise it is fetched here
+        if kb_context is None and client and agent_config and agent_config.get('agent_id'):
+            kb_context = await PromptManager.fetch_knowledge_base_context(client, agent_config['agent_id'])
+
+        if kb_context and kb_context.strip():
+            logger.debug(f"Found agent knowledge base context, adding to system prompt (length: {len(kb_context)} chars)")
+            
+            # Construct a well-formatted knowledge base section
+            kb_section = f"""
 
 === AGENT KNOWLEDGE BASE ===
 NOTICE: The following is your specialized knowledge base. This information should be considered authoritative for your responses and should take precedence over general knowledge when relevant.
 
-{kb_result.data}
+{kb_context}
 
 === END AGENT KNOWLEDGE BASE ===
 
 IMPORTANT: Always reference and utilize the knowledge base information above when it's relevant to user queries. This knowledge is specific to your role and capabilities."""
-                    
-                    system_content += kb_section
-                else:
-                    logger.debug("No knowledge base context found for this agent")
-                    
-            except Exception as e:
-                logger.error(f"Error retrieving knowledge base context for agent {agent_config.get('agent_id', 'unknown')}: {e}")
-                # Continue without knowledge base context rather than failing
+            
+            system_content += kb_section
+        else:
+            logger.debug("No knowledge base context found for this agent")
         
         if agent_config and (agent_config.get('configured_mcps') or agent_config.get('custom_mcps')) and mcp_wrapper_instance and mcp_wrapper_instance._initialized:
             mcp_info = "\n\n--- MCP Tools Available ---\n"
@@ -357,19 +362,32 @@ IMPORTANT: Always reference and utilize the knowledge base information above whe
 
 
 class MessageManager:
-    def __init__(self, client, thread_id: str, model_name: str, trace: Optional[StatefulTraceClient]):
+    def __init__(self, client, thread_id: str, model_name: str, trace: Optional[Trace]):
         self.client = client
         self.thread_id = thread_id
         self.model_name = model_name
         self.trace = trace
+        self._consumed_image_context_id: Optional[str] = None
+        self._head_loaded = False
+
+    async def get_thread_head(self) -> Dict[str, Optional[dict]]:
+        """Latest browser_state, image_context and conversation message of the thread.
+
+        The first call of a run reloads from the database so messages written
+        outside this worker are seen; later calls are served from the Redis
+        head that ThreadManager.add_message keeps current.
+        """
+        head = await thread_head.get_thread_head(self.client, self.thread_id, refresh=not self._head_loaded)
+        self._head_loaded = True
+        return head
     
-    async def build_temporary_message(self) -> Optional[dict]:
+    def build_temporary_message(self, head: Dict[str, Optional[dict]]) -> Optional[dict]:
         temp_message_content_list = []
 
-        latest_browser_state_msg = await self.client.table('messages').select('*').eq('thread_id', self.thread_id).eq('type', 'browser_state').order('created_at', desc=True).limit(1).execute()
-        if latest_browser_state_msg.data and len(latest_browser_state_msg.data) > 0:
+        latest_browser_state = head.get('browser_state')
+        if latest_browser_state:
             try:
-                browser_content = latest_browser_state_msg.data[0]["content"]
+                browser_content = latest_browser_state["content"]
                 if isinstance(browser_content, str):
                     browser_content = json.loads(browser_content)
                 screenshot_base64 = browser_content.get("screenshot_base64")
@@ -378,6 +396,7 @@ class MessageManager:
                 browser_state_text = browser_content.copy()
                 browser_state_text.pop('screenshot_base64', None)
                 browser_state_text.pop('image_url', None)
+                browser_state_text.pop('image_mime_type', None)
 
                 if browser_state_text:
                     temp_message_content_list.append({
@@ -391,29 +410,37 @@ class MessageManager:
                             "type": "image_url",
                             "image_url": {
                                 "url": screenshot_url,
-                                "format": "image/png"
+                                "format": browser_content.get("image_mime_type", "image/png")
                             }
                         })
                     elif screenshot_base64:
                         temp_message_content_list.append({
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/png;base64,{screenshot_base64}",
+                                "url": f"data:{browser_content.get('image_mime_type', 'image/png')};base64,{screenshot_base64}",
                             }
                         })
 
             except Exception as e:
                 logger.error(f"Error parsing browser state: {e}")
 
-        latest_image_context_msg = await self.client.table('messages').select('*').eq('thread_id', self.thread_id).eq('type', 'image_context').order('created_at', desc=True).limit(1).execute()
-        if latest_image_context_msg.data and len(latest_image_context_msg.data) > 0:
+        latest_image_context = head.get('image_context')
+        if latest_image_context:
             try:
-                image_context_content = latest_image_context_msg.data[0]["content"] if isinstance(latest_image_context_msg.data[0]["content"], dict) else json.loads(latest_image_context_msg.data[0]["content"])
+                image_context_content = latest_image_context["content"] if isinstance(latest_image_context["content"], dict) else json.loads(latest_image_context["content"])
+                image_url = image_context_content.get("image_url")
                 base64_image = image_context_content.get("base64")
                 mime_type = image_context_content.get("mime_type")
                 file_path = image_context_content.get("file_path", "unknown file")
 
-                if base64_image and mime_type:
+                if image_url:
+                    url = image_url
+                elif base64_image and mime_type:
+                    url = f"data:{mime_type};base64,{base64_image}"
+                else:
+                    url = None
+
+                if url:
                     temp_message_content_list.append({
                         "type": "text",
                         "text": f"Here is the image you requested to see: '{file_path}'"
@@ -421,11 +448,11 @@ class MessageManager:
                     temp_message_content_list.append({
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:{mime_type};base64,{base64_image}",
+                            "url": url,
                         }
                     })
 
-                await self.client.table('messages').delete().eq('message_id', latest_image_context_msg.data[0]["message_id"]).execute()
+                self._consumed_image_context_id = latest_image_context["message_id"]
             except Exception as e:
                 logger.error(f"Error parsing image context: {e}")
 
@@ -433,14 +460,118 @@ class MessageManager:
             return {"role": "user", "content": temp_message_content_list}
         return None
 
+    async def consume_image_context(self):
+        """Delete the image_context row shown by the last temporary message."""
+        if not self._consumed_image_context_id:
+            return
+        message_id, self._consumed_image_context_id = self._consumed_image_context_id, None
+        try:
+            await self.client.table('messages').delete().eq('message_id', message_id).execute()
+        except Exception as e:
+            logger.error(f"Error deleting image context {message_id}: {e}")
+        # An older image_context may now be the latest one; reload on next read
+        await thread_head.invalidate_thread_head(self.thread_id)
+        self._head_loaded = False
+
+
+@dataclass
+class RunContext:
+    account_id: str
+    project: dict
+    latest_user_message: Optional[dict] = None
+    kb_context: str = ""
+
+
+class RunContextPrefetcher:
+    """Issues the independent run-start queries concurrently.
+
+    Each query projects only the columns the run needs; results are handed to
+    AgentRunner instead of being re-queried by the individual setup steps.
+    """
+
+    def __init__(self, client, thread_id: str, project_id: str, agent_config: Optional[dict]):
+        self.client = client
+        self.thread_id = thread_id
+        self.project_id = project_id
+        self.agent_config = agent_config
+
+    async def _fetch_project(self) -> dict:
+        project = await self.client.table('projects').select('project_id, sandbox').eq('project_id', self.project_id).execute()
+        if not project.data or len(project.data) == 0:
+            raise ValueError(f"Project {self.project_id} not found")
+        return project.data[0]
+
+    async def _fetch_latest_user_message(self) -> Optional[dict]:
+        result = await self.client.table('messages').select('content').eq('thread_id', self.thread_id).eq('type', 'user').order('created_at', desc=True).limit(1).execute()
+        if not result.data:
+            return None
+        data = result.data[0]['content']
+        if isinstance(data, str):
+            data = json.loads(data)
+        return data
+
+    async def _fetch_kb_context(self, latest_user_message: "asyncio.Future[Optional[dict]]") -> str:
+        if not self.agent_config or not self.agent_config.get('agent_id'):
+            return ""
+        query = kb_retrieval.message_query_text(await latest_user_message)
+        return await PromptManager.fetch_knowledge_base_context(self.client, self.agent_config['agent_id'], query) or ""
+
+    async def prefetch(self) -> RunContext:
+        # The knowledge base is searched with the latest user message, so that
+        # lookup is shared instead of issued twice
+        latest_user_message = asyncio.ensure_future(self._fetch_latest_user_message())
+        account_id, project, latest_user_message, kb_context = await asyncio.gather(
+            get_account_id_from_thread(self.client, self.thread_id),
+            self._fetch_project(),
+            latest_user_message,
+            self._fetch_kb_context(latest_user_message),
+        )
+        return RunContext(
+            account_id=account_id,
+            project=project,
+            latest_user_message=latest_user_message,
+            kb_context=kb_context,
+        )
+
+
+@dataclass
+class StartupTimings:
+    """Wall-clock breakdown from run start to the first streamed LLM chunk."""
+    started_at: float = field(default_factory=time.perf_counter)
+    phases: Dict[str, float] = field(default_factory=dict)
+    _last_mark: Optional[float] = None
+    reported: bool = False
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases[phase] = round((now - (self._last_mark or self.started_at)) * 1000, 1)
+        self._last_mark = now
+
+    def report(self, trace: Optional[Trace] = None):
+        if self.reported:
+            return
+        self.reported = True
+        self.mark('first_llm_chunk')
+        total_ms = round((time.perf_counter() - self.started_at) * 1000, 1)
+        breakdown = ", ".join(f"{phase}={ms}ms" for phase, ms in self.phases.items())
+        logger.info(f"Agent run startup: first LLM chunk after {total_ms}ms ({breakdown})")
+        if trace:
+            try:
+                trace.update(metadata={"startup_timings_ms": {**self.phases, "total": total_ms}})
+            except Exception as e:
+                logger.debug(f"Failed to attach startup timings to trace: {e}")
+
 
 class AgentRunner:
     def __init__(self, config: AgentConfig):
         self.config = config
+        self.timings = StartupTimings()
+        self.run_context: Optional[RunContext] = None
+        self._initial_billing_status = None
     
     async def setup(self):
         if not self.config.trace:
-            self.config.trace = langfuse.trace(name="run_agent", session_id=self.config.thread_id, metadata={"project_id": self.config.project_id})
+            self.config.trace = tracing.trace(name="run_agent", session_id=self.config.thread_id, metadata={"project_id": self.config.project_id})
         
         self.thread_manager = ThreadManager(
             trace=self.config.trace, 
@@ -450,23 +581,21 @@ class AgentRunner:
         )
         
         self.client = await self.thread_manager.db.client
-        self.account_id = await get_account_id_from_thread(self.client, self.config.thread_id)
+        self.run_context = await RunContextPrefetcher(
+            self.client, self.config.thread_id, self.config.project_id, self.config.agent_config
+        ).prefetch()
+        self.account_id = self.run_context.account_id
         if not self.account_id:
             raise ValueError("Could not determine account ID for thread")
 
-        project = await self.client.table('projects').select('*').eq('project_id', self.config.project_id).execute()
-        if not project.data or len(project.data) == 0:
-            raise ValueError(f"Project {self.config.project_id} not found")
-
-        project_data = project.data[0]
-        sandbox_info = project_data.get('sandbox', {})
+        sandbox_info = self.run_context.project.get('sandbox') or {}
         if not sandbox_info.get('id'):
             # Sandbox is created lazily by tools when required. Do not fail setup
             # if no sandbox is present — tools will call `_ensure_sandbox()`
             # which will create and persist the sandbox metadata when needed.
             logger.debug(f"No sandbox found for project {self.config.project_id}; will create lazily when needed")
     
-    async def setup_tools(self):
+    def setup_tools(self):
         tool_manager = ToolManager(self.thread_manager, self.config.project_id, self.config.thread_id)
         
         # Determine agent ID for agent builder tools
@@ -552,34 +681,50 @@ class AgentRunner:
             return 8192
         return None
     
+    async def _check_billing_status(self):
+        if self._initial_billing_status is not None:
+            billing_status, self._initial_billing_status = self._initial_billing_status, None
+            return billing_status
+        return await check_billing_status(self.client, self.account_id)
+
     async def run(self) -> AsyncGenerator[Dict[str, Any], None]:
         await self.setup()
-        await self.setup_tools()
-        mcp_wrapper_instance = await self.setup_mcp_tools()
+        self.timings.mark('prefetch')
+        self.setup_tools()
+        self.timings.mark('setup_tools')
+        # MCP registration and the first billing check both only need the account
+        mcp_wrapper_instance, self._initial_billing_status = await asyncio.gather(
+            self.setup_mcp_tools(),
+            check_billing_status(self.client, self.account_id),
+        )
+        self.timings.mark('mcp_tools_and_billing')
         
         system_message = await PromptManager.build_system_prompt(
             self.config.model_name, self.config.agent_config, 
             self.config.is_agent_builder, self.config.thread_id, 
-            mcp_wrapper_instance, self.client
+            mcp_wrapper_instance, self.client,
+            kb_context=self.run_context.kb_context
         )
+        self.timings.mark('system_prompt')
 
         iteration_count = 0
         continue_execution = True
 
-        latest_user_message = await self.client.table('messages').select('*').eq('thread_id', self.config.thread_id).eq('type', 'user').order('created_at', desc=True).limit(1).execute()
-        if latest_user_message.data and len(latest_user_message.data) > 0:
-            data = latest_user_message.data[0]['content']
-            if isinstance(data, str):
-                data = json.loads(data)
-            if self.config.trace:
-                self.config.trace.update(input=data['content'])
+        latest_user_message = self.run_context.latest_user_message
+        if latest_user_message and self.config.trace:
+            self.config.trace.update(input=latest_user_message['content'])
 
         message_manager = MessageManager(self.client, self.config.thread_id, self.config.model_name, self.config.trace)
 
         while continue_execution and iteration_count < self.config.max_iterations:
             iteration_count += 1
+            # Rows written by tools (browser state, image context) must be in the head read below
+            await self.thread_manager.flush_messages()
 
-            can_run, message, subscription = await check_billing_status(self.client, self.account_id)
+            (can_run, message, subscription), head = await asyncio.gather(
+                self._check_billing_status(),
+                message_manager.get_thread_head(),
+            )
             if not can_run:
                 error_msg = f"Billing limit reached: {message}"
                 yield {
@@ -589,14 +734,15 @@ class AgentRunner:
                 }
                 break
 
-            latest_message = await self.client.table('messages').select('*').eq('thread_id', self.config.thread_id).in_('type', ['assistant', 'tool', 'user']).order('created_at', desc=True).limit(1).execute()
-            if latest_message.data and len(latest_message.data) > 0:
-                message_type = latest_message.data[0].get('type')
-                if message_type == 'assistant':
-                    continue_execution = False
-                    break
+            latest_message = head.get('conversation')
+            if latest_message and latest_message.get('type') == 'assistant':
+                continue_execution = False
+                break
 
-            temporary_message = await message_manager.build_temporary_message()
+            temporary_message = message_manager.build_temporary_message(head)
+            await message_manager.consume_image_context()
+            if iteration_count == 1:
+                self.timings.mark('first_iteration_checks')
             max_tokens = self.get_max_tokens()
             
             generation = self.config.trace.generation(name="thread_manager.run_thread") if self.config.trace else None
@@ -639,6 +785,8 @@ class AgentRunner:
                 try:
                     if hasattr(response, '__aiter__') and not isinstance(response, dict):
                         async for chunk in response:
+                            if not self.timings.reported:
+                                self.timings.report(self.config.trace)
                             if isinstance(chunk, dict) and chunk.get('type') == 'status' and chunk.get('status') == 'error':
                                 error_detected = True
                                 yield chunk
@@ -728,7 +876,8 @@ class AgentRunner:
             if generation:
                 generation.end(output=full_response)
 
-        asyncio.create_task(asyncio.to_thread(lambda: langfuse.flush()))
+        await self.thread_manager.flush_messages()
+        asyncio.create_task(asyncio.to_thread(tracing.flush))
 
 
 async def run_agent(
@@ -743,7 +892,7 @@ async def run_agent(
     reasoning_effort: Optional[str] = 'low',
     enable_context_manager: bool = True,
     agent_config: Optional[dict] = None,    
-    trace: Optional[StatefulTraceClient] = None,
+    trace: Optional[Trace] = None,
     is_agent_builder: Optional[bool] = False,
     target_agent_id: Optional[str] = None
 ):
@@ -773,5 +922,9 @@ async def run_agent(
     )
     
     runner = AgentRunner(config)
-    async for chunk in runner.run():
-        yield chunk
\ No newline at end of file
+    try:
+        async for chunk in runner.run():
+            yield chunk
+    finally:
+        # Close what the run's sandbox tools kept open, e.g. the Stagehand connection pool
+        await release_sandbox_brokers(getattr(runner, 'thread_manager', None))
\ No newline at end of file
@@ -50,6 +50,8 @@ class WorkflowTool(AgentBuilderBaseTool):
             config['triggers'] = triggers
             
             await client.table('agent_versions').update({'config': config}).eq('version_id', current_version_id).execute()
+            from agent.config_cache import invalidate_agent_config
+            await invalidate_agent_config(self.agent_id)
             
             logger.debug(f"Synced {len(workflows)} workflows and {len(triggers)} triggers to version config for agent {self.agent_id}")
             
@@ -86,7 +88,7 @@ class WorkflowTool(AgentBuilderBaseTool):
             
             tool_mapping = {
                 'sb_shell_tool': ['execute_command'],
-                'sb_files_tool': ['create_file', 'edit_file', 'str_replace', 'full_file_rewrite', 'delete_file'],
+                'sb_files_tool': ['create_file', 'edit_file', 'str_replace', 'full_file_rewrite', 'delete_file', 'batch_file_operations'],
                 'browser_tool': ['browser_navigate_to', 'browser_screenshot'],
                 'sb_vision_tool': ['see_image'],
                 'sb_deploy_tool': ['deploy'],
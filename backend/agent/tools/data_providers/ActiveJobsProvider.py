@@ -4,6 +4,11 @@ from agent.tools.data_providers.RapidDataProviderBase import RapidDataProviderBa
 
 
 class ActiveJobsProvider(RapidDataProviderBase):
+    # Active Jobs DB plans allow about one request per second
+    requests_per_second = 1.0
+    burst = 2
+    timeout = 30.0
+
     def __init__(self):
         endpoints: Dict[str, EndpointSchema] = {
             "active_jobs": {
@@ -39,12 +44,13 @@ class ActiveJobsProvider(RapidDataProviderBase):
 
 
 if __name__ == "__main__":
+    import asyncio
     from dotenv import load_dotenv
     load_dotenv()
     tool = ActiveJobsProvider()
 
     # Example for searching active jobs
-    jobs = tool.call_endpoint(
+    jobs = asyncio.run(tool.call_endpoint(
         route="active_jobs",
         payload={
             "limit": "10",
@@ -53,5 +59,5 @@ if __name__ == "__main__":
             "location_filter": "\"United States\" OR \"United Kingdom\"",
             "description_type": "text"
         }
-    )
+    ))
     print("Active Jobs:", jobs)
\ No newline at end of file
@@ -4,6 +4,11 @@ from agent.tools.data_providers.RapidDataProviderBase import RapidDataProviderBa
 
 
 class AmazonProvider(RapidDataProviderBase):
+    # Real-Time Amazon Data scrapes live pages: slower responses, 5 requests per second
+    requests_per_second = 5.0
+    burst = 5
+    timeout = 45.0
+
     def __init__(self):
         endpoints: Dict[str, EndpointSchema] = {
             "search": {
@@ -107,12 +112,13 @@ class AmazonProvider(RapidDataProviderBase):
 
 
 if __name__ == "__main__":
+    import asyncio
     from dotenv import load_dotenv
     load_dotenv()
     tool = AmazonProvider()
 
     # Example for product search
-    search_result = tool.call_endpoint(
+    search_result = asyncio.run(tool.call_endpoint(
         route="search",
         payload={
             "query": "Phone",
@@ -123,21 +129,21 @@ if __name__ == "__main__":
             "is_prime": False,
             "deals_and_discounts": "NONE"
         }
-    )
+    ))
     print("Search Result:", search_result)
     
     # Example for product details
-    details_result = tool.call_endpoint(
+    details_result = asyncio.run(tool.call_endpoint(
         route="product-details",
         payload={
             "asin": "B07ZPKBL9V",
             "country": "US"
         }
-    )
+    ))
     print("Product Details:", details_result)
     
     # Example for products by category
-    category_result = tool.call_endpoint(
+    category_result = asyncio.run(tool.call_endpoint(
         route="products-by-category",
         payload={
             "category_id": "2478868012",
@@ -148,11 +154,11 @@ if __name__ == "__main__":
             "is_prime": False,
             "deals_and_discounts": "NONE"
         }
-    )
+    ))
     print("Category Products:", category_result)
     
     # Example for product reviews
-    reviews_result = tool.call_endpoint(
+    reviews_result = asyncio.run(tool.call_endpoint(
         route="product-reviews",
         payload={
             "asin": "B07ZPKN6YR",
@@ -164,21 +170,21 @@ if __name__ == "__main__":
             "images_or_videos_only": False,
             "current_format_only": False
         }
-    )
+    ))
     print("Product Reviews:", reviews_result)
     
     # Example for seller profile
-    seller_result = tool.call_endpoint(
+    seller_result = asyncio.run(tool.call_endpoint(
         route="seller-profile",
         payload={
             "seller_id": "A02211013Q5HP3OMSZC7W",
             "country": "US"
         }
-    )
+    ))
     print("Seller Profile:", seller_result)
     
     # Example for seller reviews
-    seller_reviews_result = tool.call_endpoint(
+    seller_reviews_result = asyncio.run(tool.call_endpoint(
         route="seller-reviews",
         payload={
             "seller_id": "A02211013Q5HP3OMSZC7W",
@@ -186,6 +192,6 @@ if __name__ == "__main__":
             "star_rating": "ALL",
             "page": 1
         }
-    )
+    ))
     print("Seller Reviews:", seller_reviews_result)
 
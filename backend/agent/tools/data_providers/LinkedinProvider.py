@@ -4,6 +4,11 @@ from agent.tools.data_providers.RapidDataProviderBase import RapidDataProviderBa
 
 
 class LinkedinProvider(RapidDataProviderBase):
+    # LinkedIn Data Scraper scrapes live profiles: slow responses, 2 requests per second
+    requests_per_second = 2.0
+    burst = 2
+    timeout = 60.0
+
     def __init__(self):
         endpoints: Dict[str, EndpointSchema] = {
             "person": {
@@ -238,13 +243,14 @@ class LinkedinProvider(RapidDataProviderBase):
 
 
 if __name__ == "__main__":
+    import asyncio
     from dotenv import load_dotenv
     load_dotenv()
     tool = LinkedinProvider()
 
-    result = tool.call_endpoint(
+    result = asyncio.run(tool.call_endpoint(
         route="comments_from_recent_activity",
         payload={"profile_url": "https://www.linkedin.com/in/adamcohenhillel/", "page": 1}
-    )
+    ))
     print(result)
 
@@ -1,7 +1,16 @@
+import asyncio
+import hashlib
+import json
 import os
-import requests
+import time
+import weakref
 from typing import Dict, Any, Optional, TypedDict, Literal
 
+import httpx
+
+from utils.cache import Cache
+from utils.logger import logger
+
 
 class EndpointSchema(TypedDict):
     route: str
@@ -11,27 +20,95 @@ class EndpointSchema(TypedDict):
     payload: Dict[str, Any]
 
 
+# One pooled client per event loop, shared by all providers
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_rapidapi_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=30.0),
+            follow_redirects=True
+        )
+        _clients[loop] = client
+    return client
+
+
+class RateLimiter:
+    """Token bucket allowing ``rate`` requests per second with bursts of up to ``burst``."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# Rate limiters per event loop and API host, shared by every provider instance (and so every run) of a worker
+_rate_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, RateLimiter]]" = weakref.WeakKeyDictionary()
+
+
+def get_rate_limiter(key: str, rate: float, burst: int) -> RateLimiter:
+    limiters = _rate_limiters.setdefault(asyncio.get_running_loop(), {})
+    limiter = limiters.get(key)
+    if limiter is None:
+        limiter = limiters[key] = RateLimiter(rate, burst)
+    return limiter
+
+
 class RapidDataProviderBase:
+    # Per-provider limits; subclasses override these with their RapidAPI plan's quota
+    requests_per_second: float = 5.0
+    burst: int = 5
+    timeout: float = 30.0
+    # Seconds GET responses are reused for identical (route, payload) calls; 0 disables caching
+    cache_ttl: int = 10 * 60
+
     def __init__(self, base_url: str, endpoints: Dict[str, EndpointSchema]):
         self.base_url = base_url
         self.endpoints = endpoints
-    
+
     def get_endpoints(self):
         return self.endpoints
-    
-    def call_endpoint(
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        # Shared by all instances for the API host, on the loop that uses it
+        return get_rate_limiter(self.base_url.split("//")[-1].split("/")[0], self.requests_per_second, self.burst)
+
+    def _cache_key(self, route: str, payload: Optional[Dict[str, Any]]) -> str:
+        digest = hashlib.sha256(json.dumps(payload or {}, sort_keys=True, default=str).encode()).hexdigest()
+        return f"rapidapi:{self.base_url}:{route}:{digest}"
+
+    async def call_endpoint(
             self,
             route: str,
             payload: Optional[Dict[str, Any]] = None
     ):
         """
         Call an API endpoint with the given parameters and data.
-        
+
+        GET responses are cached for ``cache_ttl`` seconds, keyed by route
+        and payload, and shared across runs through Redis.
+
         Args:
-            endpoint (EndpointSchema): The endpoint configuration dictionary
-            params (dict, optional): Query parameters for GET requests
-            payload (dict, optional): JSON payload for POST requests
-            
+            route (str): The key of the endpoint to call
+            payload (dict, optional): Query parameters for GET requests or JSON payload for POST requests
+
         Returns:
             dict: The JSON response from the API
         """
@@ -41,9 +118,9 @@ class RapidDataProviderBase:
         endpoint = self.endpoints.get(route)
         if not endpoint:
             raise ValueError(f"Endpoint {route} not found")
-        
+
         url = f"{self.base_url}{endpoint['route']}"
-        
+
         headers = {
             "x-rapidapi-key": os.getenv("RAPID_API_KEY"),
             "x-rapidapi-host": url.split("//")[1].split("/")[0],
@@ -51,11 +128,30 @@ class RapidDataProviderBase:
         }
 
         method = endpoint.get('method', 'GET').upper()
-        
+        if method not in ('GET', 'POST'):
+            raise ValueError(f"Unsupported HTTP method: {method}")
+
+        cache_key = self._cache_key(route, payload) if method == 'GET' and self.cache_ttl else None
+        if cache_key:
+            try:
+                cached = await Cache.get(cache_key)
+                if cached is not None:
+                    logger.debug(f"RapidAPI cache hit for {url}")
+                    return cached
+            except Exception as e:
+                logger.warning(f"RapidAPI cache read failed for {url}: {e}")
+
+        await self.rate_limiter.acquire()
+        client = get_rapidapi_client()
         if method == 'GET':
-            response = requests.get(url, params=payload, headers=headers)
-        elif method == 'POST':
-            response = requests.post(url, json=payload, headers=headers)
+            response = await client.get(url, params=payload, headers=headers, timeout=self.timeout)
         else:
-            raise ValueError(f"Unsupported HTTP method: {method}")
-        return response.json()
+            response = await client.post(url, json=payload, headers=headers, timeout=self.timeout)
+        result = response.json()
+
+        if cache_key and response.is_success:
+            try:
+                await Cache.set(cache_key, result, ttl=self.cache_ttl)
+            except Exception as e:
+                logger.warning(f"RapidAPI cache write failed for {url}: {e}")
+        return result
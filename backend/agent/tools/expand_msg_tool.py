@@ -1,4 +1,4 @@
-from agentpress.tool import Tool, ToolResult, openapi_schema, usage_example
+from agentpress.tool import Tool, ToolResult, openapi_schema, usage_example, cacheable
 from agentpress.thread_manager import ThreadManager
 import json
 
@@ -49,6 +49,7 @@ class ExpandMessageTool(Tool):
         </invoke>
         </function_calls>
         ''')
+    @cacheable(ttl=3600)
     async def expand_message(self, message_id: str) -> ToolResult:
         """Expand a message from the previous conversation with the user.
 
@@ -1,5 +1,5 @@
 from typing import List, Optional, Union
-from agentpress.tool import Tool, ToolResult, openapi_schema, usage_example
+from agentpress.tool import Tool, ToolResult, openapi_schema, usage_example, tool_resources
 from utils.logger import logger
 
 class MessageTool(Tool):
@@ -52,6 +52,7 @@ This information will help me make sure the cake meets your expectations for the
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("control", writes=["*"])
     async def ask(self, text: str, attachments: Optional[Union[str, List[str]]] = None) -> ToolResult:
         """Ask the user a question and wait for a response.
 
@@ -109,6 +110,7 @@ If you encounter any issues or need to take additional steps, please let me know
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("control", writes=["*"])
     async def web_browser_takeover(self, text: str, attachments: Optional[Union[str, List[str]]] = None) -> ToolResult:
         """Request user takeover of browser interaction.
 
@@ -239,6 +241,7 @@ All deliverables are attached for your review.</parameter>
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("control", writes=["*"])
     async def complete(self, text: Optional[str] = None, attachments: Optional[Union[str, List[str]]] = None) -> ToolResult:
         """Indicate that the agent has completed all tasks and is entering complete state.
 
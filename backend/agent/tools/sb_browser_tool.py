@@ -1,14 +1,11 @@
 import traceback
 import json
-import base64
-import io
-from PIL import Image
 
-from agentpress.tool import ToolResult, openapi_schema, usage_example
+from agentpress.tool import ToolResult, openapi_schema, usage_example, tool_resources
 from agentpress.thread_manager import ThreadManager
 from sandbox.tool_base import SandboxToolsBase
 from utils.logger import logger
-from utils.s3_upload_utils import upload_base64_image
+from utils.screenshot_pipeline import ScreenshotPipeline
 
 
 class SandboxBrowserTool(SandboxToolsBase):
@@ -17,91 +14,7 @@ class SandboxBrowserTool(SandboxToolsBase):
     def __init__(self, project_id: str, thread_id: str, thread_manager: ThreadManager):
         super().__init__(project_id, thread_manager)
         self.thread_id = thread_id
-
-    def _validate_base64_image(self, base64_string: str, max_size_mb: int = 10) -> tuple[bool, str]:
-        """
-        Comprehensive validation of base64 image data.
-        
-        Args:
-            base64_string (str): The base64 encoded image data
-            max_size_mb (int): Maximum allowed image size in megabytes
-            
-        Returns:
-            tuple[bool, str]: (is_valid, error_message)
-        """
-        try:
-            # Check if data exists and has reasonable length
-            if not base64_string or len(base64_string) < 10:
-                return False, "Base64 string is empty or too short"
-            
-            # Remove data URL prefix if present (data:image/jpeg;base64,...)
-            if base64_string.startswith('data:'):
-                try:
-                    base64_string = base64_string.split(',', 1)[1]
-                except (IndexError, ValueError):
-                    return False, "Invalid data URL format"
-            
-            # Check if string contains only valid base64 characters
-            # Base64 alphabet: A-Z, a-z, 0-9, +, /, = (padding)
-            import re
-            if not re.match(r'^[A-Za-z0-9+/]*={0,2}$', base64_string):
-                return False, "Invalid base64 characters detected"
-            
-            # Check if base64 string length is valid (must be multiple of 4)
-            if len(base64_string) % 4 != 0:
-                return False, "Invalid base64 string length"
-            
-            # Attempt to decode base64
-            try:
-                image_data = base64.b64decode(base64_string, validate=True)
-            except Exception as e:
-                return False, f"Base64 decoding failed: {str(e)}"
-            
-            # Check decoded data size
-            if len(image_data) == 0:
-                return False, "Decoded image data is empty"
-            
-            # Check if decoded data size exceeds limit
-            max_size_bytes = max_size_mb * 1024 * 1024
-            if len(image_data) > max_size_bytes:
-                return False, f"Image size ({len(image_data)} bytes) exceeds limit ({max_size_bytes} bytes)"
-            
-            # Validate that decoded data is actually a valid image using PIL
-            try:
-                image_stream = io.BytesIO(image_data)
-                with Image.open(image_stream) as img:
-                    # Verify the image by attempting to load it
-                    img.verify()
-                    
-                    # Check if image format is supported
-                    supported_formats = {'JPEG', 'PNG', 'GIF', 'BMP', 'WEBP', 'TIFF'}
-                    if img.format not in supported_formats:
-                        return False, f"Unsupported image format: {img.format}"
-                    
-                    # Re-open for dimension checks (verify() closes the image)
-                    image_stream.seek(0)
-                    with Image.open(image_stream) as img_check:
-                        width, height = img_check.size
-                        
-                        # Check reasonable dimension limits
-                        max_dimension = 8192  # 8K resolution limit
-                        if width > max_dimension or height > max_dimension:
-                            return False, f"Image dimensions ({width}x{height}) exceed limit ({max_dimension}x{max_dimension})"
-                        
-                        # Check minimum dimensions
-                        if width < 1 or height < 1:
-                            return False, f"Invalid image dimensions: {width}x{height}"
-                        
-                        logger.debug(f"Valid image detected: {img.format}, {width}x{height}, {len(image_data)} bytes")
-                        
-            except Exception as e:
-                return False, f"Invalid image data: {str(e)}"
-            
-            return True, "Valid image"
-            
-        except Exception as e:
-            logger.error(f"Unexpected error during base64 image validation: {e}")
-            return False, f"Validation error: {str(e)}"
+        self.screenshot_pipeline = ScreenshotPipeline()
 
     async def _execute_browser_action(self, endpoint: str, params: dict = None, method: str = "POST") -> ToolResult:
         """Execute a browser automation action through the API
@@ -150,22 +63,20 @@ class SandboxBrowserTool(SandboxToolsBase):
 
                     if "screenshot_base64" in result:
                         try:
-                            # Comprehensive validation of the base64 image data
-                            screenshot_data = result["screenshot_base64"]
-                            is_valid, validation_message = self._validate_base64_image(screenshot_data)
-                            
-                            if is_valid:
-                                logger.debug(f"Screenshot validation passed: {validation_message}")
-                                image_url = await upload_base64_image(screenshot_data)
-                                result["image_url"] = image_url
-                                logger.debug(f"Uploaded screenshot to {image_url}")
+                            # Decoded, deduplicated and downscaled off the event loop, then uploaded
+                            screenshot = await self.screenshot_pipeline.process(result["screenshot_base64"])
+                            result["image_mime_type"] = screenshot.mime_type
+                            if screenshot.image_url:
+                                result["image_url"] = screenshot.image_url
+                                # Remove base64 data from result to keep it clean
+                                del result["screenshot_base64"]
                             else:
-                                logger.warning(f"Screenshot validation failed: {validation_message}")
-                                result["image_validation_error"] = validation_message
-                                
-                            # Remove base64 data from result to keep it clean
+                                # The upload failed; keep the downscaled frame inline
+                                result["screenshot_base64"] = screenshot.base64_data
+                        except ValueError as e:
+                            logger.warning(f"Screenshot validation failed: {e}")
+                            result["image_validation_error"] = str(e)
                             del result["screenshot_base64"]
-                            
                         except Exception as e:
                             logger.error(f"Failed to process screenshot: {e}")
                             result["image_upload_error"] = str(e)
@@ -243,6 +154,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("browser", writes=["browser"], timeout=300)
     async def browser_navigate_to(self, url: str) -> ToolResult:
         """Navigate to a specific url
         
@@ -311,6 +223,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("browser", writes=["browser"], timeout=300)
     async def browser_go_back(self) -> ToolResult:
         """Navigate back in browser history
         
@@ -343,6 +256,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("browser", writes=["browser"], timeout=300)
     async def browser_wait(self, seconds: int = 3) -> ToolResult:
         """Wait for the specified number of seconds
         
@@ -379,6 +293,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("browser", writes=["browser"], timeout=300)
     async def browser_click_element(self, index: int) -> ToolResult:
         """Click on an element by index
         
@@ -420,6 +335,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("browser", writes=["browser"], timeout=300)
     async def browser_input_text(self, index: int, text: str) -> ToolResult:
         """Input text into an element
         
@@ -457,6 +373,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("browser", writes=["browser"], timeout=300)
     async def browser_send_keys(self, keys: str) -> ToolResult:
         """Send keyboard keys
         
@@ -493,6 +410,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("browser", writes=["browser"], timeout=300)
     async def browser_switch_tab(self, page_id: int) -> ToolResult:
         """Switch to a different browser tab
         
@@ -569,6 +487,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("browser", writes=["browser"], timeout=300)
     async def browser_close_tab(self, page_id: int) -> ToolResult:
         """Close a browser tab
         
@@ -663,6 +582,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("browser", writes=["browser"], timeout=300)
     async def browser_scroll_down(self, amount: int = None) -> ToolResult:
         """Scroll down the page
         
@@ -704,6 +624,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("browser", writes=["browser"], timeout=300)
     async def browser_scroll_up(self, amount: int = None) -> ToolResult:
         """Scroll up the page
         
@@ -746,6 +667,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("browser", writes=["browser"], timeout=300)
     async def browser_scroll_to_text(self, text: str) -> ToolResult:
         """Scroll to specific text on the page
         
@@ -782,6 +704,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("browser", writes=["browser"], timeout=300)
     async def browser_get_dropdown_options(self, index: int) -> ToolResult:
         """Get all options from a dropdown element
         
@@ -823,6 +746,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("browser", writes=["browser"], timeout=300)
     async def browser_select_dropdown_option(self, index: int, text: str) -> ToolResult:
         """Select an option from a dropdown by text
         
@@ -880,6 +804,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("browser", writes=["browser"], timeout=300)
     async def browser_drag_drop(self, element_source: str = None, element_target: str = None, 
                                coord_source_x: int = None, coord_source_y: int = None,
                                coord_target_x: int = None, coord_target_y: int = None) -> ToolResult:
@@ -942,6 +867,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("browser", writes=["browser"], timeout=300)
     async def browser_click_coordinates(self, x: int, y: int) -> ToolResult:
         """Click at specific X,Y coordinates on the page
         
@@ -1,15 +1,24 @@
-from agentpress.tool import ToolResult, openapi_schema, usage_example
-from sandbox.tool_base import SandboxToolsBase
+from agentpress.tool import ToolResult, openapi_schema, usage_example, tool_resources, invalidates
+from sandbox.tool_base import SandboxToolsBase, workspace_resource
 from utils.files_utils import should_exclude_file, clean_path
 from agentpress.thread_manager import ThreadManager
 from utils.logger import logger
 from utils.config import config
+from sandbox.remote_edit import (
+    RemoteEditConflict,
+    RemoteEditError,
+    SNIPPET_MAX_CHARS,
+    apply_remote_patch,
+    line_edits_between,
+    sha256_hex,
+)
 import os
 import json
 import litellm
 import openai
 import asyncio
-from typing import Optional
+import shlex
+from typing import Any, Dict, List, Optional
 
 class SandboxFilesTool(SandboxToolsBase):
     """Tool for executing file system operations in a Daytona sandbox. All operations are performed relative to the /workspace directory."""
@@ -18,6 +27,8 @@ class SandboxFilesTool(SandboxToolsBase):
         super().__init__(project_id, thread_manager)
         self.SNIPPET_LINES = 4  # Number of context lines to show around edits
         self.workspace_path = "/workspace"  # Ensure we're always operating in /workspace
+        # Edits to files at least this large are sent as patches instead of full uploads
+        self.REMOTE_EDIT_MIN_BYTES = 64 * 1024
 
     def clean_path(self, path: str) -> str:
         """Clean and normalize a path to be relative to /workspace"""
@@ -43,31 +54,33 @@ class SandboxFilesTool(SandboxToolsBase):
             await self._ensure_sandbox()
             
             files = await self.sandbox.fs.list_files(self.workspace_path)
+            files = [
+                file_info for file_info in files
+                if not file_info.is_dir and not self._should_exclude_file(file_info.name)
+            ]
+            contents = await self._read_files(f"{self.workspace_path}/{file_info.name}" for file_info in files)
+
             for file_info in files:
                 rel_path = file_info.name
-                
-                # Skip excluded files and directories
-                if self._should_exclude_file(rel_path) or file_info.is_dir:
+                data = contents[f"{self.workspace_path}/{rel_path}"]
+                if isinstance(data, Exception):
+                    logger.warning(f"Error reading file {rel_path}: {data}")
                     continue
 
                 try:
-                    full_path = f"{self.workspace_path}/{rel_path}"
-                    content = (await self.sandbox.fs.download_file(full_path)).decode()
                     files_state[rel_path] = {
-                        "content": content,
+                        "content": data.decode(),
                         "is_dir": file_info.is_dir,
                         "size": file_info.size,
                         "modified": file_info.mod_time
                     }
-                except Exception as e:
-                    print(f"Error reading file {rel_path}: {e}")
                 except UnicodeDecodeError:
-                    print(f"Skipping binary file: {rel_path}")
+                    logger.debug(f"Skipping binary file: {rel_path}")
 
             return files_state
         
         except Exception as e:
-            print(f"Error getting workspace state: {str(e)}")
+            logger.error(f"Error getting workspace state: {str(e)}")
             return {}
 
 
@@ -118,6 +131,8 @@ class SandboxFilesTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("fs", writes=[workspace_resource("file_path")])
+    @invalidates("workspace")
     async def create_file(self, file_path: str, file_contents: str, permissions: str = "644") -> ToolResult:
         try:
             # Ensure sandbox is initialized
@@ -138,7 +153,7 @@ class SandboxFilesTool(SandboxToolsBase):
                 file_contents = json.dumps(file_contents, indent=4)
             
             # Write the file content
-            await self.sandbox.fs.upload_file(file_contents.encode(), full_path)
+            await self._write_file(full_path, file_contents.encode())
             await self.sandbox.fs.set_file_permissions(full_path, permissions)
             
             message = f"File '{file_path}' created successfully."
@@ -146,8 +161,7 @@ class SandboxFilesTool(SandboxToolsBase):
             # Check if index.html was created and add 8080 server info (only in root workspace)
             if file_path.lower() == 'index.html':
                 try:
-                    website_link = await self.sandbox.get_preview_link(8080)
-                    website_url = website_link.url if hasattr(website_link, 'url') else str(website_link).split("url='")[1].split("'")[0]
+                    website_url = await self.sandbox_broker.get_preview_url(8080)
                     message += f"\n\n[Auto-detected index.html - HTTP server available at: {website_url}]"
                     message += "\n[Note: Use the provided HTTP server URL above instead of starting a new server]"
                 except Exception as e:
@@ -191,6 +205,8 @@ class SandboxFilesTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("fs", writes=[workspace_resource("file_path")])
+    @invalidates("workspace")
     async def str_replace(self, file_path: str, old_str: str, new_str: str) -> ToolResult:
         try:
             # Ensure sandbox is initialized
@@ -198,13 +214,27 @@ class SandboxFilesTool(SandboxToolsBase):
             
             file_path = self.clean_path(file_path)
             full_path = f"{self.workspace_path}/{file_path}"
-            if not await self._file_exists(full_path):
-                return self.fail_response(f"File '{file_path}' does not exist")
-            
-            content = (await self.sandbox.fs.download_file(full_path)).decode()
             old_str = old_str.expandtabs()
             new_str = new_str.expandtabs()
             
+            # Apply the replacement inside the sandbox so the file is never transferred
+            try:
+                regions = await self._remote_replace(full_path, old_str, new_str)
+                return self.success_response(self._edited_regions_message("Replacement successful.", regions))
+            except RemoteEditConflict as e:
+                if e.reason == "missing":
+                    return self.fail_response(f"File '{file_path}' does not exist")
+                if e.reason == "ambiguous":
+                    return self.fail_response(f"Multiple occurrences found in lines {e.lines}. Please ensure string is unique")
+                return self.fail_response(f"String '{old_str}' not found in file")
+            except RemoteEditError as e:
+                logger.warning(f"Remote replace failed for '{file_path}', falling back to full upload: {e}")
+            
+            try:
+                content = (await self._read_file(full_path)).decode()
+            except FileNotFoundError:
+                return self.fail_response(f"File '{file_path}' does not exist")
+            
             occurrences = content.count(old_str)
             if occurrences == 0:
                 return self.fail_response(f"String '{old_str}' not found in file")
@@ -214,17 +244,22 @@ class SandboxFilesTool(SandboxToolsBase):
             
             # Perform replacement
             new_content = content.replace(old_str, new_str)
-            await self.sandbox.fs.upload_file(new_content.encode(), full_path)
+            await self._write_file(full_path, new_content.encode())
             
             # Show snippet around the edit
             replacement_line = content.split(old_str)[0].count('\n')
             start_line = max(0, replacement_line - self.SNIPPET_LINES)
             end_line = replacement_line + self.SNIPPET_LINES + new_str.count('\n')
-            snippet = '\n'.join(new_content.split('\n')[start_line:end_line + 1])
+            new_lines = new_content.split('\n')
+            snippet = '\n'.join(new_lines[start_line:end_line + 1])
             
             # Get preview URL if it's an HTML file
             # preview_url = self._get_preview_url(file_path)
-            message = f"Replacement successful."
+            message = self._edited_regions_message("Replacement successful.", [{
+                "start_line": start_line + 1,
+                "end_line": min(end_line + 1, len(new_lines)),
+                "snippet": snippet
+            }])
             # if preview_url:
             #     message += f"\n\nYou can preview this HTML file at: {preview_url}"
             
@@ -233,6 +268,51 @@ class SandboxFilesTool(SandboxToolsBase):
         except Exception as e:
             return self.fail_response(f"Error replacing string: {str(e)}")
 
+    async def _remote_replace(self, full_path: str, old_str: str, new_str: str) -> List[Dict[str, Any]]:
+        """Replace a unique string inside the sandbox and return the edited regions.
+
+        When the file is cached, the expected result is computed locally: the
+        patch is checked against the cached contents' hash, and the new
+        contents are cached if the returned hash matches. A stale cache entry
+        is dropped and the patch applied without that check.
+        """
+        cached = self._peek_cached_file(full_path)
+        expected = None
+        if cached is not None:
+            try:
+                content = cached.decode()
+                if content.count(old_str) == 1:
+                    expected = content.replace(old_str, new_str).encode()
+            except UnicodeDecodeError:
+                pass
+
+        patch = {"replacements": [{"search": old_str, "replace": new_str}], "context": self.SNIPPET_LINES}
+        result = None
+        if expected is not None:
+            try:
+                result = await apply_remote_patch(self.sandbox, full_path, expected_sha256=sha256_hex(cached), **patch)
+            except RemoteEditConflict as e:
+                if e.reason != "conflict":
+                    raise
+                logger.debug(f"Cached contents of {full_path} are stale, patching without them")
+                expected = None
+        self._invalidate_file(full_path)
+        if result is None:
+            result = await apply_remote_patch(self.sandbox, full_path, **patch)
+
+        if expected is not None and result.get("sha256") == sha256_hex(expected):
+            self._update_cached_file(full_path, expected)
+        elif expected is not None:
+            logger.warning(f"Patched {full_path} does not match the expected content hash")
+        return result.get("regions", [])
+
+    @staticmethod
+    def _edited_regions_message(message: str, regions: List[Dict[str, Any]]) -> str:
+        """Append the edited regions of a file, with their line numbers, to a tool message."""
+        for region in regions:
+            message += f"\n\nLines {region['start_line']}-{region['end_line']} after the edit:\n{region['snippet']}"
+        return message
+
     @openapi_schema({
         "type": "function",
         "function": {
@@ -272,6 +352,8 @@ class SandboxFilesTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("fs", writes=[workspace_resource("file_path")])
+    @invalidates("workspace")
     async def full_file_rewrite(self, file_path: str, file_contents: str, permissions: str = "644") -> ToolResult:
         try:
             # Ensure sandbox is initialized
@@ -282,7 +364,7 @@ class SandboxFilesTool(SandboxToolsBase):
             if not await self._file_exists(full_path):
                 return self.fail_response(f"File '{file_path}' does not exist. Use create_file to create a new file.")
             
-            await self.sandbox.fs.upload_file(file_contents.encode(), full_path)
+            await self._write_file(full_path, file_contents.encode())
             await self.sandbox.fs.set_file_permissions(full_path, permissions)
             
             message = f"File '{file_path}' completely rewritten successfully."
@@ -290,8 +372,7 @@ class SandboxFilesTool(SandboxToolsBase):
             # Check if index.html was rewritten and add 8080 server info (only in root workspace)
             if file_path.lower() == 'index.html':
                 try:
-                    website_link = await self.sandbox.get_preview_link(8080)
-                    website_url = website_link.url if hasattr(website_link, 'url') else str(website_link).split("url='")[1].split("'")[0]
+                    website_url = await self.sandbox_broker.get_preview_url(8080)
                     message += f"\n\n[Auto-detected index.html - HTTP server available at: {website_url}]"
                     message += "\n[Note: Use the provided HTTP server URL above instead of starting a new server]"
                 except Exception as e:
@@ -325,6 +406,8 @@ class SandboxFilesTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("fs", writes=[workspace_resource("file_path")])
+    @invalidates("workspace")
     async def delete_file(self, file_path: str) -> ToolResult:
         try:
             # Ensure sandbox is initialized
@@ -336,10 +419,141 @@ class SandboxFilesTool(SandboxToolsBase):
                 return self.fail_response(f"File '{file_path}' does not exist")
             
             await self.sandbox.fs.delete_file(full_path)
+            self._invalidate_file(full_path)
             return self.success_response(f"File '{file_path}' deleted successfully.")
         except Exception as e:
             return self.fail_response(f"Error deleting file: {str(e)}")
 
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "batch_file_operations",
+            "description": "Create, rewrite or delete many files in a single call. Use this instead of repeated create_file/full_file_rewrite/delete_file calls when scaffolding a project or changing several files at once. All paths must be relative to /workspace. The batch is validated up front: if any file to create already exists, any file to rewrite or delete is missing, or a path appears in more than one operation, nothing is changed.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "operations": {
+                        "type": "array",
+                        "description": "List of file operations to apply",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "action": {"type": "string", "enum": ["create", "rewrite", "delete"]},
+                                "file_path": {"type": "string", "description": "Path relative to /workspace (e.g., 'src/main.py')"},
+                                "file_contents": {"type": "string", "description": "File content for create and rewrite"}
+                            },
+                            "required": ["action", "file_path"]
+                        }
+                    },
+                    "permissions": {
+                        "type": "string",
+                        "description": "File permissions in octal format applied to created and rewritten files (e.g., '644')",
+                        "default": "644"
+                    }
+                },
+                "required": ["operations"]
+            }
+        }
+    })
+    @usage_example('''
+        <function_calls>
+        <invoke name="batch_file_operations">
+        <parameter name="operations">[
+          {"action": "create", "file_path": "src/app.py", "file_contents": "print('hello')\\n"},
+          {"action": "rewrite", "file_path": "README.md", "file_contents": "# My App\\n"},
+          {"action": "delete", "file_path": "old_notes.txt"}
+        ]</parameter>
+        </invoke>
+        </function_calls>
+        ''')
+    @tool_resources("fs", writes=["fs:*"])
+    @invalidates("workspace")
+    async def batch_file_operations(self, operations: List[Dict[str, Any]], permissions: str = "644") -> ToolResult:
+        try:
+            # Ensure sandbox is initialized
+            await self._ensure_sandbox()
+            
+            if isinstance(operations, str):
+                operations = json.loads(operations)
+            if not operations:
+                return self.fail_response("No file operations provided.")
+            
+            writes: Dict[str, bytes] = {}
+            must_exist: List[str] = []
+            must_not_exist: List[str] = []
+            deletes: List[str] = []
+            seen: set = set()
+            for operation in operations:
+                action = operation.get("action")
+                file_path = self.clean_path(operation.get("file_path") or "")
+                if not file_path:
+                    return self.fail_response(f"Missing file_path in operation: {operation}")
+                full_path = f"{self.workspace_path}/{file_path}"
+                # The batch is applied as one upload followed by the deletes, so each path may only appear once
+                if full_path in seen:
+                    return self.fail_response(f"File '{file_path}' appears in more than one operation. Combine them into one.")
+                seen.add(full_path)
+                
+                if action in ("create", "rewrite"):
+                    file_contents = operation.get("file_contents", "")
+                    if isinstance(file_contents, dict):
+                        file_contents = json.dumps(file_contents, indent=4)
+                    writes[full_path] = file_contents.encode()
+                    (must_not_exist if action == "create" else must_exist).append(full_path)
+                elif action == "delete":
+                    deletes.append(full_path)
+                    must_exist.append(full_path)
+                else:
+                    return self.fail_response(f"Unknown action '{action}' for '{file_path}'. Use create, rewrite or delete.")
+            
+            # Validate every path with a single command before changing anything
+            conflicts = await self._check_batch_paths(must_exist, must_not_exist)
+            if conflicts:
+                return self.fail_response("Batch not applied:\n" + "\n".join(conflicts))
+            
+            await self._upload_files(writes, permissions)
+            if deletes:
+                for path in deletes:
+                    self._invalidate_file(path)
+                await self.sandbox.process.exec(
+                    f"/bin/sh -c {shlex.quote('rm -f -- ' + ' '.join(shlex.quote(path) for path in deletes))}",
+                    timeout=30
+                )
+            
+            created = len(must_not_exist)
+            rewritten = len(writes) - created
+            message = f"Applied {len(operations)} file operations: {created} created, {rewritten} rewritten, {len(deletes)} deleted."
+            
+            if f"{self.workspace_path}/index.html" in writes:
+                try:
+                    website_url = await self.sandbox_broker.get_preview_url(8080)
+                    message += f"\n\n[Auto-detected index.html - HTTP server available at: {website_url}]"
+                    message += "\n[Note: Use the provided HTTP server URL above instead of starting a new server]"
+                except Exception as e:
+                    logger.warning(f"Failed to get website URL for index.html: {str(e)}")
+            
+            return self.success_response(message)
+        except Exception as e:
+            return self.fail_response(f"Error applying file operations: {str(e)}")
+
+    async def _check_batch_paths(self, must_exist: List[str], must_not_exist: List[str]) -> List[str]:
+        """Return a description of every path that violates the batch's expectations."""
+        checks = [f"[ -f {shlex.quote(path)} ] || echo \"missing:{path}\"" for path in must_exist]
+        checks += [f"[ ! -e {shlex.quote(path)} ] || echo \"exists:{path}\"" for path in must_not_exist]
+        if not checks:
+            return []
+        
+        response = await self.sandbox.process.exec(f"/bin/sh -c {shlex.quote('; '.join(checks))}", timeout=30)
+        conflicts = []
+        for line in (response.result or "").splitlines():
+            status, _, path = line.partition(":")
+            rel_path = path[len(self.workspace_path) + 1:]
+            if status == "missing":
+                conflicts.append(f"File '{rel_path}' does not exist.")
+            elif status == "exists":
+                conflicts.append(f"File '{rel_path}' already exists.")
+        return conflicts
+
     async def _call_morph_api(self, file_content: str, code_edit: str, instructions: str, file_path: str) -> tuple[Optional[str], Optional[str]]:
         """
         Call Morph API to apply edits to file content.
@@ -480,6 +694,8 @@ def authenticate_user(username, password):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("fs", writes=[workspace_resource("target_file")])
+    @invalidates("workspace")
     async def edit_file(self, target_file: str, instructions: str, code_edit: str) -> ToolResult:
         """Edit a file using AI-powered intelligent editing with fallback to string replacement"""
         try:
@@ -488,11 +704,12 @@ def authenticate_user(username, password):
             
             target_file = self.clean_path(target_file)
             full_path = f"{self.workspace_path}/{target_file}"
-            if not await self._file_exists(full_path):
-                return self.fail_response(f"File '{target_file}' does not exist")
             
             # Read current content
-            original_content = (await self.sandbox.fs.download_file(full_path)).decode()
+            try:
+                original_content = (await self._read_file(full_path)).decode()
+            except FileNotFoundError:
+                return self.fail_response(f"File '{target_file}' does not exist")
             
             # Try Morph AI editing first
             logger.debug(f"Attempting AI-powered edit for file '{target_file}' with instructions: {instructions[:100]}...")
@@ -523,14 +740,23 @@ def authenticate_user(username, password):
                 }))
 
             # AI editing successful
-            await self.sandbox.fs.upload_file(new_content.encode(), full_path)
+            try:
+                edited_regions = await self._upload_edit(full_path, original_content, new_content)
+            except RemoteEditConflict:
+                return ToolResult(success=False, output=json.dumps({
+                    "message": f"File '{target_file}' was modified while the edit was being prepared. Please retry the edit.",
+                    "file_path": target_file,
+                    "original_content": original_content,
+                    "updated_content": None
+                }))
             
             # Return rich data for frontend diff view
             return ToolResult(success=True, output=json.dumps({
                 "message": f"File '{target_file}' edited successfully.",
                 "file_path": target_file,
                 "original_content": original_content,
-                "updated_content": new_content
+                "updated_content": new_content,
+                "edited_regions": edited_regions
             }))
                     
         except Exception as e:
@@ -539,8 +765,7 @@ def authenticate_user(username, password):
             original_content_on_error = None
             try:
                 full_path_on_error = f"{self.workspace_path}/{self.clean_path(target_file)}"
-                if await self._file_exists(full_path_on_error):
-                    original_content_on_error = (await self.sandbox.fs.download_file(full_path_on_error)).decode()
+                original_content_on_error = (await self._read_file(full_path_on_error)).decode()
             except:
                 pass
             
@@ -551,6 +776,59 @@ def authenticate_user(username, password):
                 "updated_content": None
             }))
 
+    async def _upload_edit(self, full_path: str, original_content: str, new_content: str) -> List[Dict[str, Any]]:
+        """Write an edited file, sending only the changed lines for large files.
+
+        Returns the edited regions of the new contents, each with its line
+        range and surrounding lines. Raises RemoteEditConflict if the file no
+        longer matches ``original_content``.
+        """
+        original_bytes = original_content.encode()
+        new_bytes = new_content.encode()
+        line_edits = line_edits_between(original_content, new_content)
+        if len(original_bytes) < self.REMOTE_EDIT_MIN_BYTES:
+            await self._write_file(full_path, new_bytes)
+            return self._regions_of(new_content, line_edits)
+
+        try:
+            result = await apply_remote_patch(
+                self.sandbox,
+                full_path,
+                line_edits=line_edits,
+                expected_sha256=sha256_hex(original_bytes),
+                context=self.SNIPPET_LINES
+            )
+        except RemoteEditError as e:
+            logger.warning(f"Remote patch failed for {full_path}, falling back to full upload: {e}")
+            await self._write_file(full_path, new_bytes)
+            return self._regions_of(new_content, line_edits)
+
+        if result.get("sha256") == sha256_hex(new_bytes):
+            self._update_cached_file(full_path, new_bytes)
+        else:
+            logger.warning(f"Patched {full_path} does not match the expected content hash")
+            self._invalidate_file(full_path)
+        return result.get("regions", [])
+
+    def _regions_of(self, new_content: str, line_edits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Edited regions of ``new_content``, shaped like those returned by a remote patch."""
+        new_lines = new_content.split('\n')
+        regions = []
+        delta = 0
+        for edit in line_edits:
+            added = len(edit['text'].splitlines(True))
+            start = edit['start'] + delta
+            end = start + max(added - 1, 0)
+            delta += added - (edit['end'] - edit['start'])
+            first = max(0, start - self.SNIPPET_LINES)
+            last = min(len(new_lines), end + self.SNIPPET_LINES + 1)
+            regions.append({
+                'start_line': first + 1,
+                'end_line': last,
+                'snippet': '\n'.join(new_lines[first:last])[:SNIPPET_MAX_CHARS]
+            })
+        return regions
+
     # @openapi_schema({
     #     "type": "function",
     #     "function": {
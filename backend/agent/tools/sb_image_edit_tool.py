@@ -7,6 +7,7 @@ from io import BytesIO
 import uuid
 from litellm import aimage_generation, aimage_edit
 import base64
+from services.image_processing import get_image_processing_service
 
 
 class SandboxImageEditTool(SandboxToolsBase):
@@ -153,7 +154,7 @@ class SandboxImageEditTool(SandboxToolsBase):
                     f"Path '{cleaned_path}' is a directory, not an image file."
                 )
 
-            return await self.sandbox.fs.download_file(full_path)
+            return await self._read_file(full_path, file_info)
 
         except Exception as e:
             return self.fail_response(
@@ -164,15 +165,15 @@ class SandboxImageEditTool(SandboxToolsBase):
         """Download generated image and save to sandbox with random name."""
         try:
             original_b64_str = response.data[0].b64_json
-            # Decode base64 image data
-            image_data = base64.b64decode(original_b64_str)
+            # Decode base64 image data off the event loop
+            image_data = await get_image_processing_service().run(base64.b64decode, original_b64_str)
 
             # Generate random filename
             random_filename = f"generated_image_{uuid.uuid4().hex[:8]}.png"
             sandbox_path = f"{self.workspace_path}/{random_filename}"
 
             # Save image to sandbox
-            await self.sandbox.fs.upload_file(image_data, sandbox_path)
+            await self._write_file(sandbox_path, image_data)
             return random_filename
 
         except Exception as e:
@@ -122,7 +122,7 @@ class SandboxPresentationToolV2(SandboxToolsBase):
             # Save the image
             image_path = f"{images_dir}/{filename}"
             full_image_path = f"{self.workspace_path}/{image_path}"
-            await self.sandbox.fs.upload_file(image_data, full_image_path)
+            await self._write_file(full_image_path, image_data)
             
             # Cache and return the relative path
             self.images_cache[image_url] = image_path
@@ -464,10 +464,7 @@ class SandboxPresentationToolV2(SandboxToolsBase):
             full_json_path = f"{self.workspace_path}/{json_path}"
             
             json_content = json.dumps(presentation_data, indent=2)
-            await self.sandbox.fs.upload_file(
-                json_content.encode('utf-8'),
-                full_json_path
-            )
+            await self._write_file(full_json_path, json_content.encode('utf-8'))
             
             # Generate HTML preview with downloaded images
             preview_html = self._generate_html_preview(presentation_data)
@@ -1341,7 +1338,7 @@ class SandboxPresentationToolV2(SandboxToolsBase):
                 try:
                     json_path_try = f"{self.presentations_dir}/{candidate}/presentation.json"
                     full_json_path_try = f"{self.workspace_path}/{json_path_try}"
-                    json_bytes = await self.sandbox.fs.download_file(full_json_path_try)
+                    json_bytes = await self._read_file(full_json_path_try)
                     resolved_name = candidate
                     json_content = json_bytes.decode('utf-8')
                     presentation_data = json.loads(json_content)
@@ -1629,7 +1626,7 @@ class SandboxPresentationToolV2(SandboxToolsBase):
                 print(f"Image file not found: {image_path}")
                 return None
             
-            image_data = await self.sandbox.fs.download_file(full_path)
+            image_data = await self._read_file(full_path, file_info)
             
             ext = image_path.split('.')[-1] if '.' in image_path else 'jpg'
             with tempfile.NamedTemporaryFile(suffix=f'.{ext}', delete=False) as tmp_img:
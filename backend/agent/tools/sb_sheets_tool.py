@@ -41,10 +41,10 @@ class SandboxSheetsTool(SandboxToolsBase):
             return False
 
     async def _download_bytes(self, full_path: str) -> bytes:
-        return await self.sandbox.fs.download_file(full_path)
+        return await self._read_file(full_path)
 
     async def _upload_bytes(self, full_path: str, data: bytes, permissions: str = "644") -> None:
-        await self.sandbox.fs.upload_file(data, full_path)
+        await self._write_file(full_path, data)
         await self.sandbox.fs.set_file_permissions(full_path, permissions)
 
     def _detect_encoding(self, data: bytes) -> str:
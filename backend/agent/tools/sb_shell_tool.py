@@ -1,11 +1,37 @@
 import asyncio
+import re
+import shlex
 from typing import Optional, Dict, Any
 import time
-import asyncio
 from uuid import uuid4
-from agentpress.tool import ToolResult, openapi_schema, usage_example
+from agentpress.tool import ToolResult, openapi_schema, usage_example, tool_resources, invalidates
 from sandbox.tool_base import SandboxToolsBase
 from agentpress.thread_manager import ThreadManager
+from utils.logger import logger
+
+# Command output is logged here inside the sandbox
+LOG_DIR = "/tmp/agent_shell"
+# Upper bound on command output returned to the agent per call
+MAX_OUTPUT_BYTES = 64 * 1024
+# Completion polling backoff for blocking commands, in seconds
+POLL_INITIAL_DELAY = 0.1
+POLL_BACKOFF = 1.5
+POLL_MAX_DELAY = 2.0
+# Pane lines returned for tmux sessions that have no output log
+FALLBACK_PANE_LINES = 200
+
+_TERMINAL_CODES = re.compile(r'\x1b\[[0-?]*[ -/]*[@-~]|\x1b\][^\x07]*\x07|\r(?!\n)')
+
+
+def _strip_terminal_codes(text: str) -> str:
+    """Remove ANSI escape sequences and bare carriage returns from raw terminal output."""
+    return _TERMINAL_CODES.sub('', text)
+
+
+def _session_resource(arguments: Dict[str, Any]) -> Optional[str]:
+    """Commands in a named session run in order; unnamed ones get a fresh session."""
+    session_name = arguments.get('session_name')
+    return f"shell:{session_name}" if session_name else None
 
 class SandboxShellTool(SandboxToolsBase):
     """Tool for executing tasks in a Daytona sandbox with browser-use capabilities. 
@@ -14,6 +40,7 @@ class SandboxShellTool(SandboxToolsBase):
     def __init__(self, project_id: str, thread_manager: ThreadManager):
         super().__init__(project_id, thread_manager)
         self._sessions: Dict[str, str] = {}  # Maps session names to session IDs
+        self._output_offsets: Dict[str, int] = {}  # Log bytes already returned per tmux session
         self.workspace_path = "/workspace"  # Ensure we're always operating in /workspace
 
     async def _ensure_session(self, session_name: str = "default") -> str:
@@ -56,7 +83,7 @@ class SandboxShellTool(SandboxToolsBase):
                     },
                     "session_name": {
                         "type": "string",
-                        "description": "Optional name of the tmux session to use. Use named sessions for related commands that need to maintain state. Defaults to a random session name.",
+                        "description": "Optional name of the tmux session to use. Use named sessions for related commands that need to maintain state. Blocking commands with a session name run in that session (created if needed) and see its environment; without one they run in a fresh shell. Defaults to a random session name for non-blocking commands.",
                     },
                     "blocking": {
                         "type": "boolean",
@@ -99,6 +126,8 @@ class SandboxShellTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("shell", writes=[_session_resource], reads=["fs:*"], timeout=1800)
+    @invalidates("workspace")
     async def execute_command(
         self, 
         command: str, 
@@ -117,67 +146,33 @@ class SandboxShellTool(SandboxToolsBase):
                 folder = folder.strip('/')
                 cwd = f"{self.workspace_path}/{folder}"
             
-            # Generate a session name if not provided
-            if not session_name:
-                session_name = f"session_{str(uuid4())[:8]}"
-            
-            # Check if tmux session already exists
-            check_session = await self._execute_raw_command(f"tmux has-session -t {session_name} 2>/dev/null || echo 'not_exists'")
-            session_exists = "not_exists" not in check_session.get("output", "")
-            
-            if not session_exists:
-                # Create a new tmux session
-                await self._execute_raw_command(f"tmux new-session -d -s {session_name}")
-                
-            # Ensure we're in the correct directory and send command to tmux
-            full_command = f"cd {cwd} && {command}"
-            wrapped_command = full_command.replace('"', '\\"')  # Escape double quotes
-            
-            if blocking:
-                # For blocking execution, use a more reliable approach
-                # Add a unique marker to detect command completion
-                marker = f"COMMAND_DONE_{str(uuid4())[:8]}"
-                completion_command = f"{command} ; echo {marker}"
-                wrapped_completion_command = completion_command.replace('"', '\\"')
-                
-                # Send the command with completion marker
-                await self._execute_raw_command(f'tmux send-keys -t {session_name} "cd {cwd} && {wrapped_completion_command}" Enter')
-                
-                start_time = time.time()
-                final_output = ""
-                
-                while (time.time() - start_time) < timeout:
-                    # Wait a shorter interval for more responsive checking
-                    await asyncio.sleep(0.5)
-                    
-                    # Check if session still exists (command might have exited)
-                    check_result = await self._execute_raw_command(f"tmux has-session -t {session_name} 2>/dev/null || echo 'ended'")
-                    if "ended" in check_result.get("output", ""):
-                        break
-                        
-                    # Get current output and check for our completion marker
-                    output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S - -E -")
-                    current_output = output_result.get("output", "")
-
-                    if self._is_command_completed(current_output, marker):
-                        final_output = current_output
-                        break
-                
-                # If we didn't get the marker, capture whatever output we have
-                if not final_output:
-                    output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S - -E -")
-                    final_output = output_result.get("output", "")
-                
-                # Kill the session after capture
-                await self._execute_raw_command(f"tmux kill-session -t {session_name}")
-                
+            if blocking and session_name:
+                # Named blocking commands run in their tmux session, keeping its state
+                await self._ensure_tmux_session(session_name)
+                result = await self._run_blocking_in_session(session_name, command, cwd, timeout)
                 return self.success_response({
-                    "output": final_output,
+                    **result,
                     "session_name": session_name,
                     "cwd": cwd,
-                    "completed": True
+                })
+            elif blocking:
+                # Anonymous blocking commands run as a single session command in a fresh shell; no tmux needed
+                result = await self._run_blocking_command(command, cwd, timeout)
+                return self.success_response({
+                    **result,
+                    "cwd": cwd,
                 })
             else:
+                # Generate a session name if not provided
+                if not session_name:
+                    session_name = f"session_{str(uuid4())[:8]}"
+
+                await self._ensure_tmux_session(session_name)
+                    
+                # Ensure we're in the correct directory and send command to tmux
+                full_command = f"cd {cwd} && {command}"
+                wrapped_command = full_command.replace('"', '\\"')  # Escape double quotes
+                
                 # Send command to tmux session for non-blocking execution
                 await self._execute_raw_command(f'tmux send-keys -t {session_name} "{wrapped_command}" Enter')
                 
@@ -191,13 +186,198 @@ class SandboxShellTool(SandboxToolsBase):
                 
         except Exception as e:
             # Attempt to clean up session in case of error
-            if session_name:
+            if session_name and not blocking:
                 try:
                     await self._execute_raw_command(f"tmux kill-session -t {session_name}")
                 except:
                     pass
             return self.fail_response(f"Error executing command: {str(e)}")
 
+    async def _ensure_tmux_session(self, session_name: str) -> None:
+        """Create a tmux session that appends everything it prints to its log file, unless it exists.
+
+        An existing session not logging yet (e.g. started by an earlier run) gets its log attached.
+        """
+        log_path = self._log_path(session_name)
+        check_session = await self._execute_raw_command(f"tmux has-session -t {session_name} 2>/dev/null || echo 'not_exists'")
+        if "not_exists" in check_session.get("output", ""):
+            await self._execute_raw_command(
+                f"mkdir -p {LOG_DIR} && : > {log_path} && tmux new-session -d -s {session_name} && "
+                f"tmux pipe-pane -o -t {session_name} 'cat >> {log_path}'"
+            )
+            self._output_offsets[session_name] = 0
+        elif session_name not in self._output_offsets:
+            # Without -o, which would close a pipe that is already open
+            result = await self._execute_raw_command(
+                f"mkdir -p {LOG_DIR} && tmux pipe-pane -t {session_name} 'cat >> {log_path}' && "
+                f"stat -c %s {log_path} 2>/dev/null || echo 0"
+            )
+            try:
+                self._output_offsets[session_name] = int((result.get("output") or "0").split()[-1])
+            except ValueError:
+                self._output_offsets[session_name] = 0
+
+    async def _run_blocking_in_session(self, session_name: str, command: str, cwd: str, timeout: int) -> Dict[str, Any]:
+        """Run a command to completion in a named tmux session.
+
+        The command is typed into the session, so it shares the session's
+        environment, followed by an echo of a unique marker with its exit code.
+        Completion is detected by polling the session's log for the marker with
+        exponential backoff; the output is what the session logged meanwhile.
+        A command still running at the timeout is left in the session, for
+        check_command_output or terminate_command.
+        """
+        log_path = shlex.quote(self._log_path(session_name))
+        offset = self._output_offsets.get(session_name, 0)
+        marker = f"__command_done_{uuid4().hex[:12]}"
+        keys = f"cd {shlex.quote(cwd)} && {command}; echo \"{marker}:$?\""
+        await self._execute_raw_command(
+            f"tmux send-keys -t {session_name} -l {shlex.quote(keys)} && tmux send-keys -t {session_name} Enter"
+        )
+
+        # The typed line shows "<marker>:$?"; only the echoed one has digits
+        poll = f"tail -c +{offset + 1} {log_path} 2>/dev/null | grep -aoE '{marker}:[0-9]+' | tail -n 1"
+        exit_code = None
+        deadline = time.monotonic() + timeout
+        delay = POLL_INITIAL_DELAY
+        while True:
+            found = (await self._execute_raw_command(poll)).get("output") or ""
+            if marker in found:
+                exit_code = int(found.strip().rsplit(":", 1)[1])
+                break
+            if time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+            delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
+
+        output = await self._read_output(self._log_path(session_name), offset=offset)
+        self._output_offsets[session_name] = output["next_offset"]
+        text = _strip_terminal_codes(output["output"])
+        text = "\n".join(line for line in text.split("\n") if not re.match(rf"\s*{marker}:\d+\s*$", line))
+
+        result = {
+            "output": text,
+            "exit_code": exit_code,
+            "completed": exit_code is not None,
+            "total_bytes": output["total_bytes"],
+        }
+        if output["truncated"]:
+            result["truncated"] = True
+        if exit_code is None:
+            result["message"] = (
+                f"Command did not finish within {timeout} seconds and is still running in session "
+                f"'{session_name}'. Use check_command_output to follow it."
+            )
+        return result
+
+    async def _run_blocking_command(self, command: str, cwd: str, timeout: int) -> Dict[str, Any]:
+        """Run a command to completion in its own process session.
+
+        Used for blocking commands without a session name. The command runs in
+        a fresh shell in ``cwd``, not in a tmux session. It is started
+        asynchronously with its output redirected to a log file of its own,
+        and completion is detected from the session command's exit code,
+        polled with exponential backoff. The output is read once at the end,
+        starting from a byte offset so only the tail beyond MAX_OUTPUT_BYTES
+        is transferred.
+        """
+        from daytona_sdk import SessionExecuteRequest
+
+        session_id = f"blocking_{uuid4().hex[:12]}"
+        # Not the log of a tmux session, which check_command_output reads from an offset
+        log_path = self._log_path(session_id)
+        await self.sandbox.process.create_session(session_id)
+        try:
+            response = await self.sandbox.process.execute_session_command(
+                session_id=session_id,
+                req=SessionExecuteRequest(
+                    command=f"mkdir -p {LOG_DIR} && cd {shlex.quote(cwd)} && ( {command} ) > {log_path} 2>&1",
+                    var_async=True
+                )
+            )
+
+            exit_code = None
+            deadline = time.monotonic() + timeout
+            delay = POLL_INITIAL_DELAY
+            while True:
+                status = await self.sandbox.process.get_session_command(session_id, response.cmd_id)
+                exit_code = status.exit_code
+                if exit_code is not None or time.monotonic() >= deadline:
+                    break
+                await asyncio.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+                delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
+
+            output = await self._read_output(log_path)
+            await self._execute_raw_command(f"rm -f {log_path}")
+        finally:
+            # Deleting the session also stops a command that outlived its timeout
+            try:
+                await self.sandbox.process.delete_session(session_id)
+            except Exception as e:
+                logger.warning(f"Failed to delete blocking command session {session_id}: {e}")
+
+        result = {
+            "output": output["output"],
+            "exit_code": exit_code,
+            "completed": exit_code is not None,
+            "total_bytes": output["total_bytes"],
+        }
+        if output["truncated"]:
+            result["truncated"] = True
+        if exit_code is None:
+            result["message"] = f"Command did not finish within {timeout} seconds and was terminated."
+        return result
+
+    async def _read_output(
+        self,
+        log_path: str,
+        offset: int = 0,
+        max_bytes: int = MAX_OUTPUT_BYTES,
+        tail_lines: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Read a log file from a byte offset in one round trip.
+
+        When more than ``max_bytes`` were written past ``offset`` only the last
+        ``max_bytes`` are returned. With ``tail_lines`` the last lines of the
+        whole log are returned instead, still capped at ``max_bytes``.
+        ``next_offset`` is where the next read should continue.
+        """
+        path = shlex.quote(log_path)
+        if tail_lines:
+            script = (
+                f"size=$(stat -c %s {path} 2>/dev/null || echo 0); "
+                f"echo \"$size {offset}\"; "
+                f"tail -n {int(tail_lines)} {path} 2>/dev/null | tail -c {max_bytes}"
+            )
+        else:
+            script = (
+                f"size=$(stat -c %s {path} 2>/dev/null || echo 0); "
+                f"start=$(( size - {max_bytes} > {offset} ? size - {max_bytes} : {offset} )); "
+                f"[ $start -gt $size ] && start=$size; "
+                f"echo \"$size $start\"; "
+                f"tail -c +$((start + 1)) {path} 2>/dev/null | head -c $((size - start))"
+            )
+        result = await self._execute_raw_command(script)
+        header, _, output = (result.get("output") or "").partition("\n")
+        try:
+            total_bytes, start = (int(value) for value in header.split())
+        except ValueError:
+            total_bytes, start = 0, 0
+        return {
+            "output": output,
+            "total_bytes": total_bytes,
+            "next_offset": total_bytes,
+            "truncated": start > offset,
+        }
+
+    async def _kill_tmux_session(self, session_name: str):
+        """Kill a tmux session and remove its output log."""
+        await self._execute_raw_command(f"tmux kill-session -t {session_name}; rm -f {self._log_path(session_name)}")
+        self._output_offsets.pop(session_name, None)
+
+    def _log_path(self, session_name: str) -> str:
+        return f"{LOG_DIR}/{re.sub(r'[^A-Za-z0-9_.-]', '_', session_name)}.log"
+
     async def _execute_raw_command(self, command: str) -> Dict[str, Any]:
         """Execute a raw command directly in the sandbox."""
         # Ensure session exists for raw commands
@@ -231,7 +411,7 @@ class SandboxShellTool(SandboxToolsBase):
         "type": "function",
         "function": {
             "name": "check_command_output",
-            "description": "Check the output of a previously executed command in a tmux session. Use this to monitor the progress or results of non-blocking commands.",
+            "description": "Check the output of a previously executed command in a tmux session. Use this to monitor the progress or results of non-blocking commands. Only output produced since the previous check is returned, capped to the most recent 64 KB; total_bytes reports the full log size.",
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -239,6 +419,10 @@ class SandboxShellTool(SandboxToolsBase):
                         "type": "string",
                         "description": "The name of the tmux session to check."
                     },
+                    "tail_lines": {
+                        "type": "integer",
+                        "description": "Optional number of lines to return from the end of the session's full output instead of only the new output since the previous check."
+                    },
                     "kill_session": {
                         "type": "boolean",
                         "description": "Whether to terminate the tmux session after checking. Set to true when you're done with the command.",
@@ -264,10 +448,12 @@ class SandboxShellTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("shell", writes=["shell:{session_name}"])
     async def check_command_output(
         self,
         session_name: str,
-        kill_session: bool = False
+        kill_session: bool = False,
+        tail_lines: Optional[int] = None
     ) -> ToolResult:
         try:
             # Ensure sandbox is initialized
@@ -278,22 +464,37 @@ class SandboxShellTool(SandboxToolsBase):
             if "not_exists" in check_result.get("output", ""):
                 return self.fail_response(f"Tmux session '{session_name}' does not exist.")
             
-            # Get output from tmux pane
-            output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S - -E -")
-            output = output_result.get("output", "")
+            # Read only what the session logged since the last check
+            has_log = session_name in self._output_offsets
+            log_result = await self._read_output(
+                self._log_path(session_name),
+                offset=self._output_offsets.get(session_name, 0),
+                tail_lines=tail_lines
+            )
+            self._output_offsets[session_name] = log_result["next_offset"]
+            output = _strip_terminal_codes(log_result["output"])
+            
+            if log_result["total_bytes"] == 0 and not has_log:
+                # Sessions started without a log file: fall back to the recent pane contents
+                output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S -{FALLBACK_PANE_LINES}")
+                output = output_result.get("output", "")
             
             # Kill session if requested
             if kill_session:
-                await self._execute_raw_command(f"tmux kill-session -t {session_name}")
+                await self._kill_tmux_session(session_name)
                 termination_status = "Session terminated."
             else:
                 termination_status = "Session still running."
             
-            return self.success_response({
+            response = {
                 "output": output,
                 "session_name": session_name,
-                "status": termination_status
-            })
+                "status": termination_status,
+                "total_bytes": log_result["total_bytes"]
+            }
+            if log_result["truncated"]:
+                response["truncated"] = True
+            return self.success_response(response)
                 
         except Exception as e:
             return self.fail_response(f"Error checking command output: {str(e)}")
@@ -322,6 +523,7 @@ class SandboxShellTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("shell", writes=["shell:{session_name}"])
     async def terminate_command(
         self,
         session_name: str
@@ -336,7 +538,7 @@ class SandboxShellTool(SandboxToolsBase):
                 return self.fail_response(f"Tmux session '{session_name}' does not exist.")
             
             # Kill the session
-            await self._execute_raw_command(f"tmux kill-session -t {session_name}")
+            await self._kill_tmux_session(session_name)
             
             return self.success_response({
                 "message": f"Tmux session '{session_name}' terminated successfully."
@@ -362,6 +564,7 @@ class SandboxShellTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("shell", reads=["shell:*"])
     async def list_commands(self) -> ToolResult:
         try:
             # Ensure sandbox is initialized
@@ -394,82 +597,6 @@ class SandboxShellTool(SandboxToolsBase):
         except Exception as e:
             return self.fail_response(f"Error listing commands: {str(e)}")
 
-    def _is_command_completed(self, current_output: str, marker: str) -> bool:
-        """
-        Check if command execution is completed by comparing marker from end to start.
-        
-        Args:
-            current_output: Current output content
-            marker: Completion marker
-            
-        Returns:
-            bool: True if command completed, False otherwise
-        """
-        if not current_output or not marker:
-            return False
-
-        # Find the last complete marker match position to start comparison
-        # Avoid terminal prompt output at the end
-        marker_end_pos = -1
-        for i in range(len(current_output) - len(marker), -1, -1):
-            if current_output[i:i+len(marker)] == marker:
-                marker_end_pos = i + len(marker) - 1
-                break
-        
-        # Start comparison from found marker position or end of output
-        if marker_end_pos != -1:
-            output_idx = marker_end_pos
-            marker_idx = len(marker) - 1
-        else:
-            output_idx = len(current_output) - 1
-            marker_idx = len(marker) - 1
-        
-        # Compare characters from end to start
-        while marker_idx >= 0 and output_idx >= 0:
-            # Skip newlines in current_output
-            if current_output[output_idx] == '\n':
-                output_idx -= 1
-                continue
-                
-            # Compare characters
-            if current_output[output_idx] != marker[marker_idx]:
-                return False
-                
-            # Continue comparison
-            output_idx -= 1
-            marker_idx -= 1
-        
-        # If marker not fully matched
-        if marker_idx >= 0:
-            return False
-            
-        # Check if preceded by "echo " (command just started)
-        check_count = 0
-        echo_chars = "echo "
-        echo_idx = len(echo_chars) - 1
-        
-        while output_idx >= 0 and check_count < 5:
-            # Skip newlines
-            if current_output[output_idx] == '\n':
-                output_idx -= 1
-                continue
-                
-            check_count += 1
-            
-            # Check for "echo " pattern
-            if echo_idx >= 0 and current_output[output_idx] == echo_chars[echo_idx]:
-                echo_idx -= 1
-            else:
-                echo_idx = len(echo_chars) - 1
-                
-            output_idx -= 1
-            
-        # If "echo " found, command just started
-        if echo_idx < 0:
-            return False
-            
-        return True
-
     async def cleanup(self):
         """Clean up all sessions."""
         for session_name in list(self._sessions.keys()):
@@ -478,6 +605,6 @@ class SandboxShellTool(SandboxToolsBase):
         # Also clean up any tmux sessions
         try:
             await self._ensure_sandbox()
-            await self._execute_raw_command("tmux kill-server 2>/dev/null || true")
+            await self._execute_raw_command(f"tmux kill-server 2>/dev/null || true; rm -rf {LOG_DIR}")
         except:
             pass
\ No newline at end of file
@@ -2,7 +2,7 @@ import json
 import os
 from typing import Optional, Dict, Any, List
 
-from agentpress.tool import ToolResult, openapi_schema, usage_example
+from agentpress.tool import ToolResult, openapi_schema, usage_example, cacheable, invalidates
 from agentpress.thread_manager import ThreadManager
 from sandbox.tool_base import SandboxToolsBase
 from utils.logger import logger
@@ -69,6 +69,7 @@ class SandboxTemplatesTool(SandboxToolsBase):
         <invoke name="list_templates" />
         </function_calls>
     ''')
+    @cacheable(ttl=3600)
     async def list_templates(self) -> ToolResult:
         try:
             await self._ensure_sandbox()
@@ -109,6 +110,7 @@ class SandboxTemplatesTool(SandboxToolsBase):
         </invoke>
         </function_calls>
     ''')
+    @invalidates("workspace")
     async def scaffold_from_template(self, template_name: str, project_name: str, package_manager: str = "pnpm") -> ToolResult:
         try:
             await self._ensure_sandbox()
@@ -1,13 +1,14 @@
 import os
+import asyncio
 import base64
 import mimetypes
 from typing import Optional, Tuple
-from io import BytesIO
-from PIL import Image
 from urllib.parse import urlparse
 from agentpress.tool import ToolResult, openapi_schema, usage_example
 from sandbox.tool_base import SandboxToolsBase
 from agentpress.thread_manager import ThreadManager
+from services.image_processing import get_image_processing_service
+from utils.logger import logger
 import json
 import requests
 
@@ -22,12 +23,6 @@ mimetypes.add_type("image/gif", ".gif")
 MAX_IMAGE_SIZE = 10 * 1024 * 1024
 MAX_COMPRESSED_SIZE = 5 * 1024 * 1024
 
-# Compression settings
-DEFAULT_MAX_WIDTH = 1920
-DEFAULT_MAX_HEIGHT = 1080
-DEFAULT_JPEG_QUALITY = 85
-DEFAULT_PNG_COMPRESS_LEVEL = 6
-
 class SandboxVisionTool(SandboxToolsBase):
     """Tool for allowing the agent to 'see' images within the sandbox."""
 
@@ -37,70 +32,6 @@ class SandboxVisionTool(SandboxToolsBase):
         # Make thread_manager accessible within the tool instance
         self.thread_manager = thread_manager
 
-    def compress_image(self, image_bytes: bytes, mime_type: str, file_path: str) -> Tuple[bytes, str]:
-        """Compress an image to reduce its size while maintaining reasonable quality.
-        
-        Args:
-            image_bytes: Original image bytes
-            mime_type: MIME type of the image
-            file_path: Path to the image file (for logging)
-            
-        Returns:
-            Tuple of (compressed_bytes, new_mime_type)
-        """
-        try:
-            # Open image from bytes
-            img = Image.open(BytesIO(image_bytes))
-            
-            # Convert RGBA to RGB if necessary (for JPEG)
-            if img.mode in ('RGBA', 'LA', 'P'):
-                # Create a white background
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            
-            # Calculate new dimensions while maintaining aspect ratio
-            width, height = img.size
-            if width > DEFAULT_MAX_WIDTH or height > DEFAULT_MAX_HEIGHT:
-                ratio = min(DEFAULT_MAX_WIDTH / width, DEFAULT_MAX_HEIGHT / height)
-                new_width = int(width * ratio)
-                new_height = int(height * ratio)
-                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                print(f"[SeeImage] Resized image from {width}x{height} to {new_width}x{new_height}")
-            
-            # Save to bytes with compression
-            output = BytesIO()
-            
-            # Determine output format based on original mime type
-            if mime_type == 'image/gif':
-                # Keep GIFs as GIFs to preserve animation
-                img.save(output, format='GIF', optimize=True)
-                output_mime = 'image/gif'
-            elif mime_type == 'image/png':
-                # Compress PNG
-                img.save(output, format='PNG', optimize=True, compress_level=DEFAULT_PNG_COMPRESS_LEVEL)
-                output_mime = 'image/png'
-            else:
-                # Convert everything else to JPEG for better compression
-                img.save(output, format='JPEG', quality=DEFAULT_JPEG_QUALITY, optimize=True)
-                output_mime = 'image/jpeg'
-            
-            compressed_bytes = output.getvalue()
-            
-            # Log compression results
-            original_size = len(image_bytes)
-            compressed_size = len(compressed_bytes)
-            compression_ratio = (1 - compressed_size / original_size) * 100
-            print(f"[SeeImage] Compressed '{file_path}' from {original_size / 1024:.1f}KB to {compressed_size / 1024:.1f}KB ({compression_ratio:.1f}% reduction)")
-            
-            return compressed_bytes, output_mime
-            
-        except Exception as e:
-            print(f"[SeeImage] Failed to compress image: {str(e)}. Using original.")
-            return image_bytes, mime_type
-
     def is_url(self, file_path: str) -> bool:
         """check if the file path is url"""
         parsed_url = urlparse(file_path)
@@ -177,7 +108,7 @@ class SandboxVisionTool(SandboxToolsBase):
             is_url = self.is_url(file_path)
             if is_url:
                 try:
-                    image_bytes, mime_type = self.download_image_from_url(file_path)
+                    image_bytes, mime_type = await asyncio.to_thread(self.download_image_from_url, file_path)
                     original_size = len(image_bytes)
                     cleaned_path = file_path
                 except Exception as e:
@@ -204,7 +135,7 @@ class SandboxVisionTool(SandboxToolsBase):
 
                 # Read image file content
                 try:
-                    image_bytes = await self.sandbox.fs.download_file(full_path)
+                    image_bytes = await self._read_file(full_path, file_info)
                 except Exception as e:
                     return self.fail_response(f"Could not read image file: {cleaned_path}")
 
@@ -223,25 +154,32 @@ class SandboxVisionTool(SandboxToolsBase):
                 original_size = file_info.size
             
 
-            # Compress the image
-            compressed_bytes, compressed_mime_type = self.compress_image(image_bytes, mime_type, cleaned_path)
+            # Compress the image off the event loop (cached by content hash)
+            image_service = get_image_processing_service()
+            compressed = await image_service.compress(image_bytes, mime_type)
+            compressed_bytes, compressed_mime_type = compressed.data, compressed.mime_type
+            logger.debug(f"[SeeImage] Compressed '{cleaned_path}' from {len(image_bytes) / 1024:.1f}KB to {len(compressed_bytes) / 1024:.1f}KB")
             
             # Check if compressed image is still too large
             if len(compressed_bytes) > MAX_COMPRESSED_SIZE:
                 return self.fail_response(f"Image file '{cleaned_path}' is still too large after compression ({len(compressed_bytes) / (1024*1024):.2f}MB). Maximum compressed size is {MAX_COMPRESSED_SIZE / (1024*1024)}MB.")
 
-            # Convert to base64
-            base64_image = base64.b64encode(compressed_bytes).decode('utf-8')
-
             # Prepare the temporary message content
             image_context_data = {
                 "mime_type": compressed_mime_type,
-                "base64": base64_image,
                 "file_path": cleaned_path, # Include path for context
                 "original_size": original_size,
                 "compressed_size": len(compressed_bytes)
             }
 
+            # Reference the image by storage URL so the message row stays small;
+            # fall back to inline base64 if the upload fails
+            try:
+                image_context_data["image_url"] = await image_service.store(compressed, prefix="image_context")
+            except Exception as e:
+                logger.warning(f"Failed to upload image context for '{cleaned_path}', storing inline: {e}")
+                image_context_data["base64"] = base64.b64encode(compressed_bytes).decode('utf-8')
+
             # Add the temporary message using the thread_manager callback
             # Use a distinct type like 'image_context'
             await self.thread_manager.add_message(
@@ -5,7 +5,7 @@ from pathlib import Path
 import time
 from uuid import uuid4
 
-from agentpress.tool import ToolResult, openapi_schema, usage_example
+from agentpress.tool import ToolResult, openapi_schema, usage_example, cacheable, invalidates
 from agentpress.thread_manager import ThreadManager
 from sandbox.tool_base import SandboxToolsBase
 from utils.logger import logger
@@ -156,6 +156,7 @@ class SandboxWebDevTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @cacheable(ttl=120, scope="workspace")
     async def get_project_structure(self, project_name: str, max_depth: int = 3) -> ToolResult:
         try:
             await self._ensure_sandbox()
@@ -225,6 +226,7 @@ To run this project:
         </invoke>
         </function_calls>
         ''')
+    @invalidates("workspace")
     async def build_project(self, project_name: str, package_manager: str = "pnpm") -> ToolResult:
         try:
             await self._ensure_sandbox()
@@ -1,4 +1,4 @@
-from agentpress.tool import ToolResult, openapi_schema, usage_example
+from agentpress.tool import ToolResult, openapi_schema, usage_example, cacheable, invalidates
 from sandbox.tool_base import SandboxToolsBase
 from utils.logger import logger
 from typing import List, Dict, Any, Optional
@@ -166,6 +166,7 @@ class TaskListTool(SandboxToolsBase):
         </function_calls>
         '''
     )
+    @cacheable(ttl=300)
     async def view_tasks(self) -> ToolResult:
         """View all tasks and sections"""
         try:
@@ -265,6 +266,7 @@ class TaskListTool(SandboxToolsBase):
         </function_calls>
         '''
     )
+    @invalidates()
     async def create_tasks(self, sections: Optional[List[Dict[str, Any]]] = None,
                           section_title: Optional[str] = None, section_id: Optional[str] = None,
                           task_contents: Optional[List[str]] = None) -> ToolResult:
@@ -393,6 +395,7 @@ class TaskListTool(SandboxToolsBase):
         </function_calls>
         '''
     )
+    @invalidates()
     async def update_tasks(self, task_ids, content: Optional[str] = None,
                           status: Optional[str] = None, section_id: Optional[str] = None) -> ToolResult:
         """Update one or more tasks"""
@@ -516,6 +519,7 @@ class TaskListTool(SandboxToolsBase):
         </function_calls>
         '''
     )
+    @invalidates()
     async def delete_tasks(self, task_ids=None, section_ids=None, confirm: bool = False) -> ToolResult:
         """Delete one or more tasks and/or sections"""
         try:
@@ -608,6 +612,7 @@ class TaskListTool(SandboxToolsBase):
         </function_calls>
         '''
     )
+    @invalidates()
     async def clear_all(self, confirm: bool) -> ToolResult:
         """Clear everything and start fresh"""
         try:
@@ -1,5 +1,5 @@
 from typing import Dict, Any, List, Callable, Awaitable
-from agentpress.tool import ToolResult, ToolSchema, SchemaType
+from agentpress.tool import ToolResult, ToolSchema, SchemaType, ToolCachePolicy
 from utils.logger import logger
 
 
@@ -46,6 +46,12 @@ class DynamicToolBuilder:
         schema = self._create_tool_schema(method_name, description, tool_info)
         
         dynamic_tool_method.tool_schemas = [schema]
+        # Listings are reused within a run until another tool of the same server is called
+        cache_scope = f"mcp:{server_name}"
+        if clean_tool_name.startswith('list_'):
+            dynamic_tool_method.tool_cache = ToolCachePolicy(ttl=300, scope=cache_scope)
+        else:
+            dynamic_tool_method.tool_invalidates = [cache_scope]
         
         tool_data = {
             'method': dynamic_tool_method,
@@ -1,18 +1,52 @@
 from tavily import AsyncTavilyClient
 import httpx
 from dotenv import load_dotenv
-from agentpress.tool import Tool, ToolResult, openapi_schema, usage_example
+from agentpress.tool import Tool, ToolResult, openapi_schema, usage_example, tool_resources, cacheable
 from utils.config import config
 from sandbox.tool_base import SandboxToolsBase
 from agentpress.thread_manager import ThreadManager
+from utils.cache import Cache
 import json
 import os
 import datetime
 import asyncio
+import hashlib
 import logging
+import weakref
+from urllib.parse import urlparse
+
+# Scraped pages larger than this are not cached in Redis
+SCRAPE_CACHE_MAX_CHARS = 512 * 1024
 
 # TODO: add subpages, etc... in filters as sometimes its necessary 
 
+
+class _FirecrawlPool:
+    """Keep-alive Firecrawl client and scrape concurrency limit shared by the worker."""
+
+    def __init__(self):
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60.0),
+        )
+        self.semaphore = asyncio.Semaphore(config.WEB_SCRAPE_CONCURRENCY)
+
+
+_firecrawl_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _FirecrawlPool]" = weakref.WeakKeyDictionary()
+
+
+def _get_firecrawl_pool() -> _FirecrawlPool:
+    loop = asyncio.get_running_loop()
+    pool = _firecrawl_pools.get(loop)
+    if pool is None or pool.client.is_closed:
+        pool = _FirecrawlPool()
+        _firecrawl_pools[loop] = pool
+    return pool
+
+
+def _cache_key(prefix: str, *parts) -> str:
+    return f"{prefix}:{hashlib.sha256(json.dumps(parts).encode()).hexdigest()}"
+
 class SandboxWebSearchTool(SandboxToolsBase):
     """Tool for performing web searches using Tavily API and web scraping using Firecrawl."""
 
@@ -71,6 +105,8 @@ class SandboxWebSearchTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    @tool_resources("web", timeout=120)
+    @cacheable(ttl=600)
     async def web_search(
         self, 
         query: str,
@@ -97,15 +133,30 @@ class SandboxWebSearchTool(SandboxToolsBase):
             else:
                 num_results = 20
 
-            # Execute the search with Tavily
-            logging.info(f"Executing web search for query: '{query}' with {num_results} results")
-            search_response = await self.tavily_client.search(
-                query=query,
-                max_results=num_results,
-                include_images=True,
-                include_answer="advanced",
-                search_depth="advanced",
-            )
+            cache_key = _cache_key("web_search", query.strip().lower(), num_results)
+            search_response = None
+            try:
+                search_response = await Cache.get(cache_key)
+            except Exception as e:
+                logging.warning(f"Web search cache read failed: {e}")
+
+            if search_response is not None:
+                logging.info(f"Using cached web search results for query: '{query}'")
+            else:
+                # Execute the search with Tavily
+                logging.info(f"Executing web search for query: '{query}' with {num_results} results")
+                search_response = await self.tavily_client.search(
+                    query=query,
+                    max_results=num_results,
+                    include_images=True,
+                    include_answer="advanced",
+                    search_depth="advanced",
+                )
+                if search_response.get('results') or (search_response.get('answer') or '').strip():
+                    try:
+                        await Cache.set(cache_key, search_response, ttl=config.WEB_SEARCH_CACHE_TTL)
+                    except Exception as e:
+                        logging.warning(f"Web search cache write failed: {e}")
             
             # Check if we have actual results or an answer
             results = search_response.get('results', [])
@@ -161,6 +212,8 @@ class SandboxWebSearchTool(SandboxToolsBase):
         </invoke>
         </function_calls>
         ''')
+    # Scraped pages are saved under /workspace/scrape
+    @tool_resources("web", writes=["fs:scrape/*"], timeout=300)
     async def scrape_webpage(
         self,
         urls: str
@@ -197,7 +250,8 @@ class SandboxWebSearchTool(SandboxToolsBase):
             
             logging.info(f"Processing {len(url_list)} URLs: {url_list}")
             
-            # Process each URL concurrently and collect results
+            # Fetch all URLs concurrently (bounded by the worker's scrape limit),
+            # then write every page to the sandbox in one upload
             tasks = [self._scrape_single_url(url) for url in url_list]
             results = await asyncio.gather(*tasks, return_exceptions=True)
 
@@ -214,8 +268,7 @@ class SandboxWebSearchTool(SandboxToolsBase):
                 else:
                     processed_results.append(result)
             
-            results = processed_results
-
+            results = await self._save_scrape_results(processed_results)
             
             # Summarize results
             successful = sum(1 for r in results if r.get("success", False))
@@ -253,6 +306,10 @@ class SandboxWebSearchTool(SandboxToolsBase):
     async def _scrape_single_url(self, url: str) -> dict:
         """
         Helper function to scrape a single URL and return the result information.
+
+        Pages are served from the shared scrape cache when possible. The
+        returned dict carries the formatted page under ``page``; it is written
+        to the sandbox by ``_save_scrape_results``.
         """
         
         # # Add protocol if missing
@@ -263,98 +320,46 @@ class SandboxWebSearchTool(SandboxToolsBase):
         logging.info(f"Scraping single URL: {url}")
         
         try:
-            # ---------- Firecrawl scrape endpoint ----------
-            logging.info(f"Sending request to Firecrawl for URL: {url}")
-            async with httpx.AsyncClient() as client:
-                headers = {
-                    "Authorization": f"Bearer {self.firecrawl_api_key}",
-                    "Content-Type": "application/json",
-                }
-                payload = {
+            cache_key = _cache_key("web_scrape", url)
+            formatted_result = None
+            try:
+                formatted_result = await Cache.get(cache_key)
+            except Exception as e:
+                logging.warning(f"Scrape cache read failed for {url}: {e}")
+
+            if formatted_result is not None:
+                logging.info(f"Using cached content for {url}")
+            else:
+                data = await self._fetch_from_firecrawl(url)
+
+                # Format the response
+                title = data.get("data", {}).get("metadata", {}).get("title", "")
+                markdown_content = data.get("data", {}).get("markdown", "")
+                logging.info(f"Extracted content from {url}: title='{title}', content length={len(markdown_content)}")
+                
+                formatted_result = {
+                    "title": title,
                     "url": url,
-                    "formats": ["markdown"]
+                    "text": markdown_content
                 }
                 
-                # Use longer timeout and retry logic for more reliability
-                max_retries = 3
-                timeout_seconds = 30
-                retry_count = 0
-                
-                while retry_count < max_retries:
+                # Add metadata if available
+                if "metadata" in data.get("data", {}):
+                    formatted_result["metadata"] = data["data"]["metadata"]
+                    logging.info(f"Added metadata: {data['data']['metadata'].keys()}")
+
+                if markdown_content and len(markdown_content) <= SCRAPE_CACHE_MAX_CHARS:
                     try:
-                        logging.info(f"Sending request to Firecrawl (attempt {retry_count + 1}/{max_retries})")
-                        response = await client.post(
-                            f"{self.firecrawl_url}/v1/scrape",
-                            json=payload,
-                            headers=headers,
-                            timeout=timeout_seconds,
-                        )
-                        response.raise_for_status()
-                        data = response.json()
-                        logging.info(f"Successfully received response from Firecrawl for {url}")
-                        break
-                    except (httpx.ReadTimeout, httpx.ConnectTimeout, httpx.ReadError) as timeout_err:
-                        retry_count += 1
-                        logging.warning(f"Request timed out (attempt {retry_count}/{max_retries}): {str(timeout_err)}")
-                        if retry_count >= max_retries:
-                            raise Exception(f"Request timed out after {max_retries} attempts with {timeout_seconds}s timeout")
-                        # Exponential backoff
-                        logging.info(f"Waiting {2 ** retry_count}s before retry")
-                        await asyncio.sleep(2 ** retry_count)
+                        await Cache.set(cache_key, formatted_result, ttl=config.WEB_SCRAPE_CACHE_TTL)
                     except Exception as e:
-                        # Don't retry on non-timeout errors
-                        logging.error(f"Error during scraping: {str(e)}")
-                        raise e
+                        logging.warning(f"Scrape cache write failed for {url}: {e}")
 
-            # Format the response
-            title = data.get("data", {}).get("metadata", {}).get("title", "")
-            markdown_content = data.get("data", {}).get("markdown", "")
-            logging.info(f"Extracted content from {url}: title='{title}', content length={len(markdown_content)}")
-            
-            formatted_result = {
-                "title": title,
-                "url": url,
-                "text": markdown_content
-            }
-            
-            # Add metadata if available
-            if "metadata" in data.get("data", {}):
-                formatted_result["metadata"] = data["data"]["metadata"]
-                logging.info(f"Added metadata: {data['data']['metadata'].keys()}")
-            
-            # Create a simple filename from the URL domain and date
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            # Extract domain from URL for the filename
-            from urllib.parse import urlparse
-            parsed_url = urlparse(url)
-            domain = parsed_url.netloc.replace("www.", "")
-            
-            # Clean up domain for filename
-            domain = "".join([c if c.isalnum() else "_" for c in domain])
-            safe_filename = f"{timestamp}_{domain}.json"
-            
-            logging.info(f"Generated filename: {safe_filename}")
-            
-            # Save results to a file in the /workspace/scrape directory
-            scrape_dir = f"{self.workspace_path}/scrape"
-            await self.sandbox.fs.create_folder(scrape_dir, "755")
-            
-            results_file_path = f"{scrape_dir}/{safe_filename}"
-            json_content = json.dumps(formatted_result, ensure_ascii=False, indent=2)
-            logging.info(f"Saving content to file: {results_file_path}, size: {len(json_content)} bytes")
-            
-            await self.sandbox.fs.upload_file(
-                json_content.encode(),
-                results_file_path,
-            )
-            
             return {
                 "url": url,
                 "success": True,
-                "title": title,
-                "file_path": results_file_path,
-                "content_length": len(markdown_content)
+                "title": formatted_result.get("title", ""),
+                "content_length": len(formatted_result.get("text", "")),
+                "page": formatted_result
             }
         
         except Exception as e:
@@ -368,6 +373,82 @@ class SandboxWebSearchTool(SandboxToolsBase):
                 "error": error_message
             }
 
+    async def _fetch_from_firecrawl(self, url: str) -> dict:
+        """Scrape a URL through Firecrawl on the worker's pooled client, retrying timeouts."""
+        pool = _get_firecrawl_pool()
+        headers = {
+            "Authorization": f"Bearer {self.firecrawl_api_key}",
+            "Content-Type": "application/json",
+        }
+        payload = {
+            "url": url,
+            "formats": ["markdown"]
+        }
+        
+        # Use longer timeout and retry logic for more reliability
+        max_retries = 3
+        timeout_seconds = 30
+        retry_count = 0
+        
+        while True:
+            try:
+                async with pool.semaphore:
+                    logging.info(f"Sending request to Firecrawl for {url} (attempt {retry_count + 1}/{max_retries})")
+                    response = await pool.client.post(
+                        f"{self.firecrawl_url}/v1/scrape",
+                        json=payload,
+                        headers=headers,
+                        timeout=timeout_seconds,
+                    )
+                response.raise_for_status()
+                logging.info(f"Successfully received response from Firecrawl for {url}")
+                return response.json()
+            except (httpx.ReadTimeout, httpx.ConnectTimeout, httpx.ReadError) as timeout_err:
+                retry_count += 1
+                logging.warning(f"Request timed out (attempt {retry_count}/{max_retries}): {str(timeout_err)}")
+                if retry_count >= max_retries:
+                    raise Exception(f"Request timed out after {max_retries} attempts with {timeout_seconds}s timeout")
+                # Exponential backoff, outside the semaphore so other URLs can proceed
+                logging.info(f"Waiting {2 ** retry_count}s before retry")
+                await asyncio.sleep(2 ** retry_count)
+            except Exception as e:
+                # Don't retry on non-timeout errors
+                logging.error(f"Error during scraping: {str(e)}")
+                raise e
+
+    async def _save_scrape_results(self, results: list) -> list:
+        """Write all successfully scraped pages to /workspace/scrape in one batch.
+
+        Successful entries get their ``file_path`` and lose the page content.
+        """
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        scrape_dir = f"{self.workspace_path}/scrape"
+        files = {}
+
+        for result in results:
+            page = result.pop("page", None)
+            if result.get("success") and page is not None:
+                # Create a simple filename from the URL domain and date
+                domain = urlparse(result["url"]).netloc.replace("www.", "")
+                domain = "".join([c if c.isalnum() else "_" for c in domain])
+                url_hash = hashlib.sha256(result["url"].encode()).hexdigest()[:8]
+                results_file_path = f"{scrape_dir}/{timestamp}_{domain}_{url_hash}.json"
+                files[results_file_path] = json.dumps(page, ensure_ascii=False, indent=2).encode()
+                result["file_path"] = results_file_path
+
+        if files:
+            logging.info(f"Saving {len(files)} scraped pages to {scrape_dir}, {sum(len(d) for d in files.values())} bytes")
+            try:
+                await self._upload_files(files)
+            except Exception as e:
+                logging.error(f"Error saving scrape results: {str(e)}")
+                for result in results:
+                    if result.pop("file_path", None):
+                        result["success"] = False
+                        result["error"] = f"Failed to save results: {str(e)}"
+
+        return results
+
 if __name__ == "__main__":
     async def test_web_search():
         """Test function for the web search tool"""
@@ -137,6 +137,9 @@ class VersionService:
         
         if not result.data:
             raise Exception("Failed to update agent current version")
+
+        from agent.config_cache import invalidate_agent_config
+        await invalidate_agent_config(agent_id)
     
     def _version_from_db_row(self, row: Dict[str, Any]) -> AgentVersion:
         config = row.get('config', {})
@@ -0,0 +1,95 @@
+"""
+Write-behind buffering of thread messages for AgentPress.
+
+Messages get their message_id on the client and are handed back to the caller
+at once. The rows are inserted in multi-row batches shortly afterwards, or
+earlier when the caller flushes at a turn boundary. Batches are inserted one
+at a time in the order the messages were added.
+
+created_at is assigned by the database (see the assign_message_created_at
+trigger): rows are sent with created_at NULL and get the database clock, never
+earlier than the thread's newest message, so reading a thread by created_at
+returns the messages in the order they were added whatever the worker's clock
+says. The row handed back carries a provisional created_at from the local
+clock, for display only.
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from utils.config import config
+from utils.logger import logger
+
+# Rows per insert request
+MAX_BATCH_SIZE = 100
+
+
+class MessageWriteBuffer:
+    """Ordered write-behind buffer for rows of the messages table."""
+
+    def __init__(
+        self,
+        db,
+        on_persisted: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None,
+        flush_interval: Optional[float] = None,
+        max_batch_size: int = MAX_BATCH_SIZE
+    ):
+        """Initialize the buffer.
+
+        Args:
+            db: DBConnection used for the inserts
+            on_persisted: Called with each batch once it has been inserted
+            flush_interval: Seconds a message may wait before it is inserted
+            max_batch_size: Rows per insert request
+        """
+        self.db = db
+        self.on_persisted = on_persisted
+        self.flush_interval = config.MESSAGE_FLUSH_INTERVAL_MS / 1000 if flush_interval is None else flush_interval
+        self.max_batch_size = max_batch_size
+        self._pending: List[Dict[str, Any]] = []
+        self._lock: Optional[asyncio.Lock] = None
+        self._timer: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def add(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue a row for insertion and return it with its message_id and a provisional created_at."""
+        row = {**row, 'message_id': str(uuid.uuid4()), 'created_at': None}
+        self._pending.append(row)
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+        return {**row, 'created_at': datetime.now(timezone.utc).isoformat()}
+
+    async def flush(self) -> None:
+        """Insert every queued row, in order.
+
+        Raises the insert error if a batch fails; its rows and all later ones
+        stay queued and are retried, still in order, by the next flush. A
+        failed batch may still have been committed (e.g. the response timed
+        out), so batches are written as upserts that skip rows whose
+        message_id already exists.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while self._pending:
+                batch = self._pending[:self.max_batch_size]
+                client = await self.db.client
+                await client.table('messages').upsert(
+                    batch, on_conflict='message_id', ignore_duplicates=True
+                ).execute()
+                del self._pending[:len(batch)]
+                logger.debug(f"Inserted batch of {len(batch)} messages")
+                if self.on_persisted:
+                    await self.on_persisted(batch)
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"Deferred insert of {self.pending} messages failed, retrying at the next flush: {e}")
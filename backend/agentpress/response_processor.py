@@ -18,9 +18,12 @@ from dataclasses import dataclass
 from utils.logger import logger
 from agentpress.tool import ToolResult
 from agentpress.tool_registry import ToolRegistry
+from agentpress.tool_cache import ToolResultCache
+from agentpress.tool_scheduler import ToolScheduler, as_completed, task_result
 from agentpress.xml_tool_parser import XMLToolParser
-from langfuse.client import StatefulTraceClient
-from services.langfuse import langfuse
+from services import tracing
+from services.tracing import Trace
+from services.llm_router import is_provider_error
 from utils.json_helpers import (
     ensure_dict, ensure_list, safe_json_parse, 
     to_json_string, format_for_yield
@@ -86,7 +89,7 @@ class ProcessorConfig:
 class ResponseProcessor:
     """Processes LLM responses, extracting and executing tool calls."""
     
-    def __init__(self, tool_registry: ToolRegistry, add_message_callback: Callable, trace: Optional[StatefulTraceClient] = None, is_agent_builder: bool = False, target_agent_id: Optional[str] = None, agent_config: Optional[dict] = None):
+    def __init__(self, tool_registry: ToolRegistry, add_message_callback: Callable, trace: Optional[Trace] = None, is_agent_builder: bool = False, target_agent_id: Optional[str] = None, agent_config: Optional[dict] = None):
         """Initialize the ResponseProcessor.
         
         Args:
@@ -97,9 +100,13 @@ class ResponseProcessor:
         """
         self.tool_registry = tool_registry
         self.add_message = add_message_callback
-        self.trace = trace or langfuse.trace(name="anonymous:response_processor")
+        self.trace = trace or tracing.trace(name="anonymous:response_processor")
         # Initialize the XML parser
         self.xml_parser = XMLToolParser()
+        # Schedules tool calls by their declared resources, tool class limits and timeouts
+        self.tool_scheduler = ToolScheduler(tool_registry, self._execute_tool)
+        # Results of cacheable tools, reused for identical calls within the run
+        self.tool_cache = ToolResultCache(tool_registry)
         self.is_agent_builder = is_agent_builder
         self.target_agent_id = target_agent_id
         self.agent_config = agent_config
@@ -247,7 +254,7 @@ class ResponseProcessor:
 
                 if hasattr(chunk, 'choices') and chunk.choices and hasattr(chunk.choices[0], 'finish_reason') and chunk.choices[0].finish_reason:
                     finish_reason = chunk.choices[0].finish_reason
-                    logger.debug(f"Detected finish_reason: {finish_reason}")
+                    logger.debug("Detected finish_reason: %s", finish_reason)
 
                 if hasattr(chunk, 'choices') and chunk.choices:
                     delta = chunk.choices[0].delta if hasattr(chunk.choices[0], 'delta') else None
@@ -305,7 +312,9 @@ class ResponseProcessor:
                                         if started_msg_obj: yield format_for_yield(started_msg_obj)
                                         yielded_tool_indices.add(tool_index) # Mark status as yielded
 
-                                        execution_task = asyncio.create_task(self._execute_tool(tool_call))
+                                        execution_task = self.tool_scheduler.submit(
+                                            tool_call, serialize=config.tool_execution_strategy == "sequential"
+                                        )
                                         pending_tool_executions.append({
                                             "task": execution_task, "tool_call": tool_call,
                                             "tool_index": tool_index, "context": context
@@ -375,7 +384,9 @@ class ResponseProcessor:
                                 if started_msg_obj: yield format_for_yield(started_msg_obj)
                                 yielded_tool_indices.add(tool_index) # Mark status as yielded
 
-                                execution_task = asyncio.create_task(self._execute_tool(tool_call_data))
+                                execution_task = self.tool_scheduler.submit(
+                                    tool_call_data, serialize=config.tool_execution_strategy == "sequential"
+                                )
                                 pending_tool_executions.append({
                                     "task": execution_task, "tool_call": tool_call_data,
                                     "tool_index": tool_index, "context": context
@@ -423,76 +434,6 @@ class ResponseProcessor:
                     self.trace.event(name="failed_to_calculate_usage", level="WARNING", status_message=(f"Failed to calculate usage: {str(e)}"))
 
 
-            # Wait for pending tool executions from streaming phase
-            tool_results_buffer = [] # Stores (tool_call, result, tool_index, context)
-            if pending_tool_executions:
-                logger.debug(f"Waiting for {len(pending_tool_executions)} pending streamed tool executions")
-                self.trace.event(name="waiting_for_pending_streamed_tool_executions", level="DEFAULT", status_message=(f"Waiting for {len(pending_tool_executions)} pending streamed tool executions"))
-                # ... (asyncio.wait logic) ...
-                pending_tasks = [execution["task"] for execution in pending_tool_executions]
-                done, _ = await asyncio.wait(pending_tasks)
-
-                for execution in pending_tool_executions:
-                    tool_idx = execution.get("tool_index", -1)
-                    context = execution["context"]
-                    tool_name = context.function_name
-                    
-                    # Check if status was already yielded during stream run
-                    if tool_idx in yielded_tool_indices:
-                         logger.debug(f"Status for tool index {tool_idx} already yielded.")
-                         # Still need to process the result for the buffer
-                         try:
-                             if execution["task"].done():
-                                 result = execution["task"].result()
-                                 context.result = result
-                                 tool_results_buffer.append((execution["tool_call"], result, tool_idx, context))
-                                 
-                                 if tool_name in ['ask', 'complete']:
-                                     logger.debug(f"Terminating tool '{tool_name}' completed during streaming. Setting termination flag.")
-                                     self.trace.event(name="terminating_tool_completed_during_streaming", level="DEFAULT", status_message=(f"Terminating tool '{tool_name}' completed during streaming. Setting termination flag."))
-                                     agent_should_terminate = True
-                                     
-                             else: # Should not happen with asyncio.wait
-                                logger.warning(f"Task for tool index {tool_idx} not done after wait.")
-                                self.trace.event(name="task_for_tool_index_not_done_after_wait", level="WARNING", status_message=(f"Task for tool index {tool_idx} not done after wait."))
-                         except Exception as e:
-                             logger.error(f"Error getting result for pending tool execution {tool_idx}: {str(e)}")
-                             self.trace.event(name="error_getting_result_for_pending_tool_execution", level="ERROR", status_message=(f"Error getting result for pending tool execution {tool_idx}: {str(e)}"))
-                             context.error = e
-                             # Save and Yield tool error status message (even if started was yielded)
-                             error_msg_obj = await self._yield_and_save_tool_error(context, thread_id, thread_run_id)
-                             if error_msg_obj: yield format_for_yield(error_msg_obj)
-                         continue # Skip further status yielding for this tool index
-
-                    # If status wasn't yielded before (shouldn't happen with current logic), yield it now
-                    try:
-                        if execution["task"].done():
-                            result = execution["task"].result()
-                            context.result = result
-                            tool_results_buffer.append((execution["tool_call"], result, tool_idx, context))
-                            
-                            # Check if this is a terminating tool
-                            if tool_name in ['ask', 'complete']:
-                                logger.debug(f"Terminating tool '{tool_name}' completed during streaming. Setting termination flag.")
-                                self.trace.event(name="terminating_tool_completed_during_streaming", level="DEFAULT", status_message=(f"Terminating tool '{tool_name}' completed during streaming. Setting termination flag."))
-                                agent_should_terminate = True
-                                
-                            # Save and Yield tool completed/failed status
-                            completed_msg_obj = await self._yield_and_save_tool_completed(
-                                context, None, thread_id, thread_run_id
-                            )
-                            if completed_msg_obj: yield format_for_yield(completed_msg_obj)
-                            yielded_tool_indices.add(tool_idx)
-                    except Exception as e:
-                        logger.error(f"Error getting result/yielding status for pending tool execution {tool_idx}: {str(e)}")
-                        self.trace.event(name="error_getting_result_yielding_status_for_pending_tool_execution", level="ERROR", status_message=(f"Error getting result/yielding status for pending tool execution {tool_idx}: {str(e)}"))
-                        context.error = e
-                        # Save and Yield tool error status
-                        error_msg_obj = await self._yield_and_save_tool_error(context, thread_id, thread_run_id)
-                        if error_msg_obj: yield format_for_yield(error_msg_obj)
-                        yielded_tool_indices.add(tool_idx)
-
-
             # Save and yield finish status if limit was reached
             if finish_reason == "xml_tool_limit_reached":
                 finish_content = {"status_type": "finish", "finish_reason": "xml_tool_limit_reached"}
@@ -612,77 +553,56 @@ class ResponseProcessor:
                     all_tool_data_map[xml_tool_index_start + idx] = item
 
 
-                tool_results_map = {} # tool_index -> (tool_call, result, context)
+                # Tools started during the stream: save each result as soon as it finishes
+                if config.execute_on_stream and pending_tool_executions:
+                    logger.debug(f"Processing {len(pending_tool_executions)} streamed tool executions as they complete")
+                    self.trace.event(name="processing_streamed_tool_results", level="DEFAULT", status_message=(f"Processing {len(pending_tool_executions)} streamed tool executions as they complete"))
+                    async for position, task in as_completed(execution["task"] for execution in pending_tool_executions):
+                        execution = pending_tool_executions[position]
+                        context = execution["context"]
+                        result = task_result(task)
 
-                # Populate from buffer if executed on stream
-                if config.execute_on_stream and tool_results_buffer:
-                    logger.debug(f"Processing {len(tool_results_buffer)} buffered tool results")
-                    self.trace.event(name="processing_buffered_tool_results", level="DEFAULT", status_message=(f"Processing {len(tool_results_buffer)} buffered tool results"))
-                    for tool_call, result, tool_idx, context in tool_results_buffer:
-                        if last_assistant_message_object: context.assistant_message_id = last_assistant_message_object['message_id']
-                        tool_results_map[tool_idx] = (tool_call, result, context)
+                        if context.function_name in ['ask', 'complete']:
+                            logger.debug(f"Terminating tool '{context.function_name}' completed during streaming. Setting termination flag.")
+                            self.trace.event(name="terminating_tool_completed_during_streaming", level="DEFAULT", status_message=(f"Terminating tool '{context.function_name}' completed during streaming. Setting termination flag."))
+                            agent_should_terminate = True
 
-                # Or execute now if not streamed
-                elif final_tool_calls_to_process and not config.execute_on_stream:
-                    logger.debug(f"Executing {len(final_tool_calls_to_process)} tools ({config.tool_execution_strategy}) after stream")
-                    self.trace.event(name="executing_tools_after_stream", level="DEFAULT", status_message=(f"Executing {len(final_tool_calls_to_process)} tools ({config.tool_execution_strategy}) after stream"))
-                    results_list = await self._execute_tools(final_tool_calls_to_process, config.tool_execution_strategy)
-                    current_tool_idx = 0
-                    for tc, res in results_list:
-                       # Map back using all_tool_data_map which has correct indices
-                       if current_tool_idx in all_tool_data_map:
-                           tool_data = all_tool_data_map[current_tool_idx]
-                           context = self._create_tool_context(
-                               tc, current_tool_idx,
-                               last_assistant_message_object['message_id'] if last_assistant_message_object else None,
-                               tool_data.get('parsing_details')
-                           )
-                           context.result = res
-                           tool_results_map[current_tool_idx] = (tc, res, context)
-                       else:
-                           logger.warning(f"Could not map result for tool index {current_tool_idx}")
-                           self.trace.event(name="could_not_map_result_for_tool_index", level="WARNING", status_message=(f"Could not map result for tool index {current_tool_idx}"))
-                       current_tool_idx += 1
-
-                # Save and Yield each result message
-                if tool_results_map:
-                    logger.debug(f"Saving and yielding {len(tool_results_map)} final tool result messages")
-                    self.trace.event(name="saving_and_yielding_final_tool_result_messages", level="DEFAULT", status_message=(f"Saving and yielding {len(tool_results_map)} final tool result messages"))
-                    for tool_idx in sorted(tool_results_map.keys()):
-                        tool_call, result, context = tool_results_map[tool_idx]
-                        context.result = result
-                        if not context.assistant_message_id and last_assistant_message_object:
+                        if last_assistant_message_object:
                             context.assistant_message_id = last_assistant_message_object['message_id']
 
-                        # Yield start status ONLY IF executing non-streamed (already yielded if streamed)
-                        if not config.execute_on_stream and tool_idx not in yielded_tool_indices:
-                            started_msg_obj = await self._yield_and_save_tool_started(context, thread_id, thread_run_id)
-                            if started_msg_obj: yield format_for_yield(started_msg_obj)
-                            yielded_tool_indices.add(tool_idx) # Mark status yielded
+                        async for message in self._save_and_yield_tool_result(
+                            context, execution["tool_call"], result, thread_id, thread_run_id,
+                            config.xml_adding_strategy, tool_result_message_objects
+                        ):
+                            yield message
 
-                        # Save the tool result message to DB
-                        saved_tool_result_object = await self._add_tool_result( # Returns full object or None
-                            thread_id, tool_call, result, config.xml_adding_strategy,
-                            context.assistant_message_id, context.parsing_details
+                # Or execute now if not streamed, saving results in the order they finish
+                elif final_tool_calls_to_process and not config.execute_on_stream:
+                    logger.debug(f"Executing {len(final_tool_calls_to_process)} tools ({config.tool_execution_strategy}) after stream")
+                    self.trace.event(name="executing_tools_after_stream", level="DEFAULT", status_message=(f"Executing {len(final_tool_calls_to_process)} tools ({config.tool_execution_strategy}) after stream"))
+                    async for current_tool_idx, tc, res in self._execute_tools(final_tool_calls_to_process, config.tool_execution_strategy):
+                        # Map back using all_tool_data_map which has correct indices
+                        if current_tool_idx not in all_tool_data_map:
+                            logger.warning(f"Could not map result for tool index {current_tool_idx}")
+                            self.trace.event(name="could_not_map_result_for_tool_index", level="WARNING", status_message=(f"Could not map result for tool index {current_tool_idx}"))
+                            continue
+
+                        tool_data = all_tool_data_map[current_tool_idx]
+                        context = self._create_tool_context(
+                            tc, current_tool_idx,
+                            last_assistant_message_object['message_id'] if last_assistant_message_object else None,
+                            tool_data.get('parsing_details')
                         )
 
-                        # Yield completed/failed status (linked to saved result ID if available)
-                        completed_msg_obj = await self._yield_and_save_tool_completed(
-                            context,
-                            saved_tool_result_object['message_id'] if saved_tool_result_object else None,
-                            thread_id, thread_run_id
-                        )
-                        if completed_msg_obj: yield format_for_yield(completed_msg_obj)
-                        # Don't add to yielded_tool_indices here, completion status is separate yield
+                        started_msg_obj = await self._yield_and_save_tool_started(context, thread_id, thread_run_id)
+                        if started_msg_obj: yield format_for_yield(started_msg_obj)
+                        yielded_tool_indices.add(current_tool_idx)
 
-                        # Yield the saved tool result object
-                        if saved_tool_result_object:
-                            tool_result_message_objects[tool_idx] = saved_tool_result_object
-                            yield format_for_yield(saved_tool_result_object)
-                        else:
-                             logger.error(f"Failed to save tool result for index {tool_idx}, not yielding result message.")
-                             self.trace.event(name="failed_to_save_tool_result_for_index", level="ERROR", status_message=(f"Failed to save tool result for index {tool_idx}, not yielding result message."))
-                             # Optionally yield error status for saving failure?
+                        async for message in self._save_and_yield_tool_result(
+                            context, tc, res, thread_id, thread_run_id,
+                            config.xml_adding_strategy, tool_result_message_objects
+                        ):
+                            yield message
 
             # --- Final Finish Status ---
             if finish_reason and finish_reason != "xml_tool_limit_reached":
@@ -813,12 +733,15 @@ class ResponseProcessor:
                         self.trace.event(name="error_saving_assistant_response_end_for_stream", level="ERROR", status_message=(f"Error saving assistant response end for stream: {str(e)}"))
 
         except Exception as e:
+            # Tools started during the stream would otherwise keep running unobserved
+            self.tool_scheduler.cancel_pending()
             logger.error(f"Error processing stream: {str(e)}", exc_info=True)
             self.trace.event(name="error_processing_stream", level="ERROR", status_message=(f"Error processing stream: {str(e)}"))
             # Save and yield error status message
             
             err_content = {"role": "system", "status_type": "error", "message": str(e)}
-            if (not "AnthropicException - Overloaded" in str(e)):
+            provider_retry = is_provider_error(e) and continuous_state.get('provider_retry_available', False)
+            if not provider_retry:
                 err_msg_obj = await self.add_message(
                     thread_id=thread_id, type="status", content=err_content, 
                     is_llm_message=False, metadata={"thread_run_id": thread_run_id if 'thread_run_id' in locals() else None}
@@ -828,8 +751,9 @@ class ResponseProcessor:
                 logger.critical(f"Re-raising error to stop further processing: {str(e)}")
                 self.trace.event(name="re_raising_error_to_stop_further_processing", level="ERROR", status_message=(f"Re-raising error to stop further processing: {str(e)}"))
             else:
-                logger.error(f"AnthropicException - Overloaded detected - Falling back to OpenRouter: {str(e)}", exc_info=True)
-                self.trace.event(name="anthropic_exception_overloaded_detected", level="ERROR", status_message=(f"AnthropicException - Overloaded detected - Falling back to OpenRouter: {str(e)}"))
+                # ThreadManager retries it, so this is not the run's final status
+                logger.error(f"LLM provider error during stream: {str(e)}", exc_info=True)
+                self.trace.event(name="llm_provider_error", level="ERROR", status_message=(f"LLM provider error during stream: {str(e)}"))
             raise # Use bare 'raise' to preserve the original exception with its traceback
 
         finally:
@@ -956,46 +880,23 @@ class ResponseProcessor:
             if config.execute_tools and tool_calls_to_execute:
                 logger.debug(f"Executing {len(tool_calls_to_execute)} tools with strategy: {config.tool_execution_strategy}")
                 self.trace.event(name="executing_tools_with_strategy", level="DEFAULT", status_message=(f"Executing {len(tool_calls_to_execute)} tools with strategy: {config.tool_execution_strategy}"))
-                tool_results = await self._execute_tools(tool_calls_to_execute, config.tool_execution_strategy)
-
-                for i, (returned_tool_call, result) in enumerate(tool_results):
-                    original_data = all_tool_data[i]
-                    tool_call_from_data = original_data['tool_call']
-                    parsing_details = original_data['parsing_details']
-                    current_assistant_id = assistant_message_object['message_id'] if assistant_message_object else None
+                current_assistant_id = assistant_message_object['message_id'] if assistant_message_object else None
 
+                # Results are saved in the order the tools finish
+                async for i, tool_call_from_data, result in self._execute_tools(tool_calls_to_execute, config.tool_execution_strategy):
                     context = self._create_tool_context(
-                        tool_call_from_data, tool_index, current_assistant_id, parsing_details
+                        tool_call_from_data, i, current_assistant_id, all_tool_data[i]['parsing_details']
                     )
-                    context.result = result
 
                     # Save and Yield start status
                     started_msg_obj = await self._yield_and_save_tool_started(context, thread_id, thread_run_id)
                     if started_msg_obj: yield format_for_yield(started_msg_obj)
 
-                    # Save tool result
-                    saved_tool_result_object = await self._add_tool_result(
-                        thread_id, tool_call_from_data, result, config.xml_adding_strategy,
-                        current_assistant_id, parsing_details
-                    )
-
-                    # Save and Yield completed/failed status
-                    completed_msg_obj = await self._yield_and_save_tool_completed(
-                        context,
-                        saved_tool_result_object['message_id'] if saved_tool_result_object else None,
-                        thread_id, thread_run_id
-                    )
-                    if completed_msg_obj: yield format_for_yield(completed_msg_obj)
-
-                    # Yield the saved tool result object
-                    if saved_tool_result_object:
-                        tool_result_message_objects[tool_index] = saved_tool_result_object
-                        yield format_for_yield(saved_tool_result_object)
-                    else:
-                         logger.error(f"Failed to save tool result for index {tool_index}")
-                         self.trace.event(name="failed_to_save_tool_result_for_index", level="ERROR", status_message=(f"Failed to save tool result for index {tool_index}"))
-
-                    tool_index += 1
+                    async for message in self._save_and_yield_tool_result(
+                        context, tool_call_from_data, result, thread_id, thread_run_id,
+                        config.xml_adding_strategy, tool_result_message_objects
+                    ):
+                        yield message
 
             # --- Save and Yield Final Status ---
             if finish_reason:
@@ -1176,7 +1077,7 @@ class ResponseProcessor:
                 parsing_details = xml_tool_call.parsing_details
                 parsing_details["raw_xml"] = xml_tool_call.raw_xml
                 
-                logger.debug(f"Parsed new format tool call: {tool_call}")
+                logger.debug("Parsed new format tool call: %s", tool_call)
                 return tool_call, parsing_details
             
             # If not the expected <function_calls><invoke> format, return None
@@ -1223,7 +1124,7 @@ class ResponseProcessor:
             function_name = tool_call["function_name"]
             arguments = tool_call["arguments"]
 
-            logger.debug(f"Executing tool: {function_name} with arguments: {arguments}")
+            logger.debug("Executing tool: %s with arguments: %s", function_name, arguments)
             self.trace.event(name="executing_tool", level="DEFAULT", status_message=(f"Executing tool: {function_name} with arguments: {arguments}"))
             
             if isinstance(arguments, str):
@@ -1242,9 +1143,21 @@ class ResponseProcessor:
                 span.end(status_message="tool_not_found", level="ERROR")
                 return ToolResult(success=False, output=f"Tool function '{function_name}' not found")
             
+            cached_result = self.tool_cache.get(function_name, arguments)
+            if cached_result is not None:
+                logger.debug(f"Reusing cached result of identical {function_name} call")
+                span.end(status_message="tool_cache_hit", output=cached_result)
+                return cached_result
+
             logger.debug(f"Found tool function for '{function_name}', executing...")
-            result = await tool_fn(**arguments)
-            logger.debug(f"Tool execution complete: {function_name} -> {result}")
+            # Mutating tools drop the cached reads they affect, before and after running
+            self.tool_cache.invalidate(function_name)
+            try:
+                result = await self._call_tool(tool_fn, arguments)
+            finally:
+                self.tool_cache.invalidate(function_name)
+            self.tool_cache.put(function_name, arguments, result)
+            logger.debug("Tool execution complete: %s -> %s", function_name, result)
             span.end(status_message="tool_executed", output=result)
             return result
         except Exception as e:
@@ -1252,143 +1165,114 @@ class ResponseProcessor:
             span.end(status_message="tool_execution_error", output=f"Error executing tool: {str(e)}", level="ERROR")
             return ToolResult(success=False, output=f"Error executing tool: {str(e)}")
 
+    async def _call_tool(self, tool_fn: Callable, arguments: Dict[str, Any]) -> ToolResult:
+        """Call a tool function; retry once when its tool repaired the cause of a failure.
+
+        Only read-only (@cacheable) functions are replayed. A mutating call may
+        have taken effect before failing, so it still triggers the repair but
+        returns its failure for the agent to decide on.
+        """
+        tool = getattr(tool_fn, '__self__', None)
+        recover = getattr(tool, 'recover_from_failure', None)
+        if recover is None:
+            return await tool_fn(**arguments)
+
+        replayable = getattr(tool_fn, 'tool_cache', None) is not None
+        try:
+            result = await tool_fn(**arguments)
+        except Exception as e:
+            if not await recover(str(e)) or not replayable:
+                raise
+        else:
+            if not isinstance(result, ToolResult) or result.success:
+                return result
+            if not await recover(str(result.output)) or not replayable:
+                return result
+
+        logger.info(f"Retrying {tool_fn.__name__} after {tool.__class__.__name__} recovered from a failure")
+        return await tool_fn(**arguments)
+
     async def _execute_tools(
         self, 
         tool_calls: List[Dict[str, Any]], 
         execution_strategy: ToolExecutionStrategy = "sequential"
-    ) -> List[Tuple[Dict[str, Any], ToolResult]]:
-        """Execute tool calls with the specified strategy.
+    ) -> AsyncGenerator[Tuple[int, Dict[str, Any], ToolResult], None]:
+        """Execute tool calls with the specified strategy, yielding results as they finish.
         
-        This is the main entry point for tool execution. It dispatches to the appropriate
-        execution method based on the provided strategy.
+        This is the main entry point for tool execution. Calls go through the tool
+        scheduler, which applies the tools' declared resources, class limits and timeouts.
         
         Args:
             tool_calls: List of tool calls to execute
             execution_strategy: Strategy for executing tools:
-                - "sequential": Execute tools one after another, waiting for each to complete
-                - "parallel": Execute all tools simultaneously for better performance 
+                - "sequential": Execute tools one after another, stopping after a terminating tool
+                - "parallel": Execute tools concurrently unless they use conflicting resources
                 
-        Returns:
-            List of tuples containing the original tool call and its result
+        Yields:
+            Tuples of the tool call's index, the tool call and its result, in completion order
         """
-        logger.debug(f"Executing {len(tool_calls)} tools with strategy: {execution_strategy}")
+        if not tool_calls:
+            return
+
+        tool_names = [t.get('function_name', 'unknown') for t in tool_calls]
+        logger.debug("Executing %s tools with strategy %s: %s", len(tool_calls), execution_strategy, tool_names)
         self.trace.event(name="executing_tools_with_strategy", level="DEFAULT", status_message=(f"Executing {len(tool_calls)} tools with strategy: {execution_strategy}"))
-            
-        if execution_strategy == "sequential":
-            return await self._execute_tools_sequentially(tool_calls)
-        elif execution_strategy == "parallel":
-            return await self._execute_tools_in_parallel(tool_calls)
-        else:
+
+        if execution_strategy not in ("sequential", "parallel"):
             logger.warning(f"Unknown execution strategy: {execution_strategy}, falling back to sequential")
-            return await self._execute_tools_sequentially(tool_calls)
+            execution_strategy = "sequential"
 
-    async def _execute_tools_sequentially(self, tool_calls: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], ToolResult]]:
-        """Execute tool calls sequentially and return results.
-        
-        This method executes tool calls one after another, waiting for each tool to complete
-        before starting the next one. This is useful when tools have dependencies on each other.
-        
-        Args:
-            tool_calls: List of tool calls to execute
-            
-        Returns:
-            List of tuples containing the original tool call and its result
-        """
-        if not tool_calls:
-            return []
-            
-        try:
-            tool_names = [t.get('function_name', 'unknown') for t in tool_calls]
-            logger.debug(f"Executing {len(tool_calls)} tools sequentially: {tool_names}")
-            self.trace.event(name="executing_tools_sequentially", level="DEFAULT", status_message=(f"Executing {len(tool_calls)} tools sequentially: {tool_names}"))
-            
-            results = []
+        if execution_strategy == "sequential":
             for index, tool_call in enumerate(tool_calls):
+                task = self.tool_scheduler.submit(tool_call, serialize=True)
+                await asyncio.wait([task])
+                yield index, tool_call, task_result(task)
+
+                # Check if this is a terminating tool (ask or complete)
                 tool_name = tool_call.get('function_name', 'unknown')
-                logger.debug(f"Executing tool {index+1}/{len(tool_calls)}: {tool_name}")
-                
-                try:
-                    result = await self._execute_tool(tool_call)
-                    results.append((tool_call, result))
-                    logger.debug(f"Completed tool {tool_name} with success={result.success}")
-                    
-                    # Check if this is a terminating tool (ask or complete)
-                    if tool_name in ['ask', 'complete']:
-                        logger.debug(f"Terminating tool '{tool_name}' executed. Stopping further tool execution.")
-                        self.trace.event(name="terminating_tool_executed", level="DEFAULT", status_message=(f"Terminating tool '{tool_name}' executed. Stopping further tool execution."))
-                        break  # Stop executing remaining tools
-                        
-                except Exception as e:
-                    logger.error(f"Error executing tool {tool_name}: {str(e)}")
-                    self.trace.event(name="error_executing_tool", level="ERROR", status_message=(f"Error executing tool {tool_name}: {str(e)}"))
-                    error_result = ToolResult(success=False, output=f"Error executing tool: {str(e)}")
-                    results.append((tool_call, error_result))
-            
-            logger.debug(f"Sequential execution completed for {len(results)} tools (out of {len(tool_calls)} total)")
-            self.trace.event(name="sequential_execution_completed", level="DEFAULT", status_message=(f"Sequential execution completed for {len(results)} tools (out of {len(tool_calls)} total)"))
-            return results
-            
-        except Exception as e:
-            logger.error(f"Error in sequential tool execution: {str(e)}", exc_info=True)
-            # Return partial results plus error results for remaining tools
-            completed_results = results if 'results' in locals() else []
-            completed_tool_names = [r[0].get('function_name', 'unknown') for r in completed_results]
-            remaining_tools = [t for t in tool_calls if t.get('function_name', 'unknown') not in completed_tool_names]
-            
-            # Add error results for remaining tools
-            error_results = [(tool, ToolResult(success=False, output=f"Execution error: {str(e)}")) 
-                            for tool in remaining_tools]
-                            
-            return completed_results + error_results
-
-    async def _execute_tools_in_parallel(self, tool_calls: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], ToolResult]]:
-        """Execute tool calls in parallel and return results.
-        
-        This method executes all tool calls simultaneously using asyncio.gather, which
-        can significantly improve performance when executing multiple independent tools.
-        
-        Args:
-            tool_calls: List of tool calls to execute
-            
-        Returns:
-            List of tuples containing the original tool call and its result
-        """
-        if not tool_calls:
-            return []
-            
-        try:
-            tool_names = [t.get('function_name', 'unknown') for t in tool_calls]
-            logger.debug(f"Executing {len(tool_calls)} tools in parallel: {tool_names}")
-            self.trace.event(name="executing_tools_in_parallel", level="DEFAULT", status_message=(f"Executing {len(tool_calls)} tools in parallel: {tool_names}"))
-            
-            # Create tasks for all tool calls
-            tasks = [self._execute_tool(tool_call) for tool_call in tool_calls]
-            
-            # Execute all tasks concurrently with error handling
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Process results and handle any exceptions
-            processed_results = []
-            for i, (tool_call, result) in enumerate(zip(tool_calls, results)):
-                if isinstance(result, Exception):
-                    logger.error(f"Error executing tool {tool_call.get('function_name', 'unknown')}: {str(result)}")
-                    self.trace.event(name="error_executing_tool", level="ERROR", status_message=(f"Error executing tool {tool_call.get('function_name', 'unknown')}: {str(result)}"))
-                    # Create error result
-                    error_result = ToolResult(success=False, output=f"Error executing tool: {str(result)}")
-                    processed_results.append((tool_call, error_result))
-                else:
-                    processed_results.append((tool_call, result))
-            
-            logger.debug(f"Parallel execution completed for {len(tool_calls)} tools")
-            self.trace.event(name="parallel_execution_completed", level="DEFAULT", status_message=(f"Parallel execution completed for {len(tool_calls)} tools"))
-            return processed_results
-        
-        except Exception as e:
-            logger.error(f"Error in parallel tool execution: {str(e)}", exc_info=True)
-            self.trace.event(name="error_in_parallel_tool_execution", level="ERROR", status_message=(f"Error in parallel tool execution: {str(e)}"))
-            # Return error results for all tools if the gather itself fails
-            return [(tool_call, ToolResult(success=False, output=f"Execution error: {str(e)}")) 
-                    for tool_call in tool_calls]
+                if tool_name in ['ask', 'complete']:
+                    logger.debug(f"Terminating tool '{tool_name}' executed. Stopping further tool execution.")
+                    self.trace.event(name="terminating_tool_executed", level="DEFAULT", status_message=(f"Terminating tool '{tool_name}' executed. Stopping further tool execution."))
+                    break
+        else:
+            tasks = [self.tool_scheduler.submit(tool_call) for tool_call in tool_calls]
+            async for index, task in as_completed(tasks):
+                yield index, tool_calls[index], task_result(task)
+
+        logger.debug(f"{execution_strategy.capitalize()} execution completed for {len(tool_calls)} tools")
+
+    async def _save_and_yield_tool_result(
+        self,
+        context: ToolExecutionContext,
+        tool_call: Dict[str, Any],
+        result: ToolResult,
+        thread_id: str,
+        thread_run_id: str,
+        strategy: Union[XmlAddingStrategy, str],
+        saved_results: Dict[int, Dict[str, Any]]
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """Save a finished tool's result, then yield its completed/failed status and the result message."""
+        context.result = result
+
+        saved_tool_result_object = await self._add_tool_result(
+            thread_id, tool_call, result, strategy,
+            context.assistant_message_id, context.parsing_details
+        )
+
+        # Save and Yield completed/failed status (linked to saved result ID if available)
+        completed_msg_obj = await self._yield_and_save_tool_completed(
+            context,
+            saved_tool_result_object['message_id'] if saved_tool_result_object else None,
+            thread_id, thread_run_id
+        )
+        if completed_msg_obj: yield format_for_yield(completed_msg_obj)
+
+        if saved_tool_result_object:
+            saved_results[context.tool_index] = saved_tool_result_object
+            yield format_for_yield(saved_tool_result_object)
+        else:
+            logger.error(f"Failed to save tool result for index {context.tool_index}, not yielding result message.")
+            self.trace.event(name="failed_to_save_tool_result_for_index", level="ERROR", status_message=(f"Failed to save tool result for index {context.tool_index}, not yielding result message."))
 
     async def _add_tool_result(
         self, 
@@ -1452,7 +1336,7 @@ class ResponseProcessor:
                     # Fallback to string representation of the whole result
                     content = str(result)
                 
-                logger.debug(f"Formatted tool result content: {content[:100]}...")
+                logger.debug("Formatted tool result content: %.100s...", content)
                 self.trace.event(name="formatted_tool_result_content", level="DEFAULT", status_message=(f"Formatted tool result content: {content[:100]}..."))
                 
                 # Create the tool response message with proper format
@@ -1463,7 +1347,7 @@ class ResponseProcessor:
                     "content": content
                 }
                 
-                logger.debug(f"Adding native tool result for tool_call_id={tool_call['id']} with role=tool")
+                logger.debug("Adding native tool result for tool_call_id=%s with role=tool", tool_call['id'])
                 self.trace.event(name="adding_native_tool_result_for_tool_call_id", level="DEFAULT", status_message=(f"Adding native tool result for tool_call_id={tool_call['id']} with role=tool"))
                 
                 # Add as a tool message to the conversation history
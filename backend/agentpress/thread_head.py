@@ -0,0 +1,110 @@
+"""
+Thread head tracking for the agent loop.
+
+The thread head is the latest message of each type the agent loop looks at
+between iterations: the newest ``browser_state``, the newest unconsumed
+``image_context`` and the newest conversation message (assistant/tool/user).
+
+It is loaded with one ``get_thread_head`` RPC and mirrored in a Redis hash that
+ThreadManager keeps current as its buffered messages are inserted, so iterations
+after the first read it without touching the messages table. Writers that insert or delete messages
+outside of ThreadManager must call ``invalidate_thread_head``.
+"""
+
+import json
+from typing import Any, Dict, Optional
+
+from services import redis
+from utils.logger import logger
+
+THREAD_HEAD_TTL = 3600
+CONVERSATION_TYPES = ('assistant', 'tool', 'user')
+STATE_TYPES = ('browser_state', 'image_context')
+
+# Marker field: only a hash that was fully loaded from the database is trusted
+_LOADED_FIELD = '_loaded'
+
+
+def _key(thread_id: str) -> str:
+    return f"thread_head:{thread_id}"
+
+
+def _head_field(message_type: str) -> Optional[str]:
+    if message_type in STATE_TYPES:
+        return message_type
+    if message_type in CONVERSATION_TYPES:
+        return 'conversation'
+    return None
+
+
+def _parse_content(content: Any) -> Any:
+    if isinstance(content, str):
+        try:
+            return json.loads(content)
+        except json.JSONDecodeError:
+            return content
+    return content
+
+
+async def load_thread_head(client, thread_id: str) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Load the head from the database and refresh the Redis mirror."""
+    result = await client.rpc('get_thread_head', {'p_thread_id': thread_id}).execute()
+    head = result.data or {}
+    if isinstance(head, str):
+        head = json.loads(head)
+
+    for entry in head.values():
+        if entry and 'content' in entry:
+            entry['content'] = _parse_content(entry['content'])
+
+    mapping = {field: json.dumps(head.get(field)) for field in (*STATE_TYPES, 'conversation')}
+    mapping[_LOADED_FIELD] = '1'
+    try:
+        await redis.hset(_key(thread_id), mapping)
+        await redis.expire(_key(thread_id), THREAD_HEAD_TTL)
+    except Exception as e:
+        logger.warning(f"Failed to cache thread head for {thread_id}: {e}")
+
+    return {field: head.get(field) for field in (*STATE_TYPES, 'conversation')}
+
+
+async def get_thread_head(client, thread_id: str, refresh: bool = False) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Return the thread head, served from Redis unless missing or ``refresh`` is set."""
+    if not refresh:
+        try:
+            cached = await redis.hgetall(_key(thread_id))
+            if cached and cached.get(_LOADED_FIELD):
+                return {
+                    field: json.loads(cached[field]) if cached.get(field) else None
+                    for field in (*STATE_TYPES, 'conversation')
+                }
+        except Exception as e:
+            logger.warning(f"Failed to read cached thread head for {thread_id}: {e}")
+
+    return await load_thread_head(client, thread_id)
+
+
+async def record_message(thread_id: str, message: Dict[str, Any]) -> None:
+    """Advance the head for a message that was just inserted."""
+    message_type = message.get('type')
+    field = _head_field(message_type)
+    if not field:
+        return
+
+    entry = {'message_id': message.get('message_id'), 'type': message_type}
+    if field in STATE_TYPES:
+        entry['content'] = _parse_content(message.get('content'))
+
+    try:
+        await redis.hset(_key(thread_id), {field: json.dumps(entry, default=str)})
+        await redis.expire(_key(thread_id), THREAD_HEAD_TTL)
+    except Exception as e:
+        logger.warning(f"Failed to update thread head for {thread_id}, invalidating: {e}")
+        await invalidate_thread_head(thread_id)
+
+
+async def invalidate_thread_head(thread_id: str) -> None:
+    try:
+        await redis.delete(_key(thread_id))
+    except Exception as e:
+        logger.warning(f"Failed to invalidate thread head for {thread_id}: {e}")
@@ -13,17 +13,20 @@ This module provides comprehensive conversation management, including:
 import json
 from typing import List, Dict, Any, Optional, Type, Union, AsyncGenerator, Literal, cast
 from services.llm import make_llm_api_call
+from services.llm_router import is_provider_error
 from agentpress.tool import Tool
 from agentpress.tool_registry import ToolRegistry
 from agentpress.context_manager import ContextManager
+from agentpress import thread_head
+from agentpress.message_buffer import MessageWriteBuffer
 from agentpress.response_processor import (
     ResponseProcessor,
     ProcessorConfig
 )
 from services.supabase import DBConnection
 from utils.logger import logger
-from langfuse.client import StatefulGenerationClient, StatefulTraceClient
-from services.langfuse import langfuse
+from services import tracing
+from services.tracing import Span, Trace
 from litellm.utils import token_counter
 from services.billing import calculate_token_cost, handle_usage_with_credits
 import re
@@ -34,6 +37,19 @@ import yaml
 # Type alias for tool choice
 ToolChoice = Literal["auto", "required", "none"]
 
+# Messages that are inserted before add_message returns, together with everything added before them
+FLUSH_MESSAGE_TYPES = ('user', 'assistant_response_end')
+FLUSH_STATUS_TYPES = ('finish', 'thread_run_end', 'error')
+
+# Times a run retries an LLM call that failed with a provider error mid-stream
+MAX_PROVIDER_RETRIES = 2
+
+
+def _is_flush_point(type: str, content: Any) -> bool:
+    if type in FLUSH_MESSAGE_TYPES:
+        return True
+    return type == 'status' and isinstance(content, dict) and content.get('status_type') in FLUSH_STATUS_TYPES
+
 class ThreadManager:
     """Manages conversation threads with LLM models and tool execution.
 
@@ -42,7 +58,7 @@ class ThreadManager:
     XML-based tool execution patterns.
     """
 
-    def __init__(self, trace: Optional[StatefulTraceClient] = None, is_agent_builder: bool = False, target_agent_id: Optional[str] = None, agent_config: Optional[dict] = None):
+    def __init__(self, trace: Optional[Trace] = None, is_agent_builder: bool = False, target_agent_id: Optional[str] = None, agent_config: Optional[dict] = None):
         """Initialize ThreadManager.
 
         Args:
@@ -58,7 +74,7 @@ class ThreadManager:
         self.target_agent_id = target_agent_id
         self.agent_config = agent_config
         if not self.trace:
-            self.trace = langfuse.trace(name="anonymous:thread_manager")
+            self.trace = tracing.trace(name="anonymous:thread_manager")
         self.response_processor = ResponseProcessor(
             tool_registry=self.tool_registry,
             add_message_callback=self.add_message,
@@ -68,6 +84,7 @@ class ThreadManager:
             agent_config=self.agent_config
         )
         self.context_manager = ContextManager()
+        self.message_buffer = MessageWriteBuffer(self.db, on_persisted=self._record_persisted_messages)
 
     def add_tool(self, tool_class: Type[Tool], function_names: Optional[List[str]] = None, **kwargs):
         """Add a tool to the ThreadManager."""
@@ -137,6 +154,11 @@ class ThreadManager:
     ):
         """Add a message to the thread in the database.
 
+        The message is returned with its message_id right away and inserted
+        through the write buffer: with the next batch, or before this call
+        returns for user messages, assistant_response_end and finish,
+        thread_run_end and error statuses.
+
         Args:
             thread_id: The ID of the thread to add the message to.
             type: The type of the message (e.g., 'text', 'image_url', 'tool_call', 'tool', 'user', 'assistant').
@@ -149,63 +171,64 @@ class ThreadManager:
             agent_id: Optional ID of the agent associated with this message.
             agent_version_id: Optional ID of the specific agent version used.
         """
-        logger.debug(f"Adding message of type '{type}' to thread {thread_id} (agent: {agent_id}, version: {agent_version_id})")
-        client = await self.db.client
+        logger.debug("Adding message of type '%s' to thread %s (agent: %s, version: %s)", type, thread_id, agent_id, agent_version_id)
 
-        # Prepare data for insertion
+        # Prepare data for insertion; every row carries the same columns so rows can be inserted together
         data_to_insert = {
             'thread_id': thread_id,
             'type': type,
             'content': content,
             'is_llm_message': is_llm_message,
             'metadata': metadata or {},
+            'agent_id': agent_id,
+            'agent_version_id': agent_version_id,
         }
-        
-        # Add agent information if provided
-        if agent_id:
-            data_to_insert['agent_id'] = agent_id
-        if agent_version_id:
-            data_to_insert['agent_version_id'] = agent_version_id
 
         try:
-            # Insert the message and get the inserted row data including the id
-            result = await client.table('messages').insert(data_to_insert).execute()
-            logger.debug(f"Successfully added message to thread {thread_id}")
-
-            if result.data and len(result.data) > 0 and isinstance(result.data[0], dict) and 'message_id' in result.data[0]:
-                saved_message = result.data[0]
-                # If this is an assistant_response_end, attempt to deduct credits if over limit
-                if type == "assistant_response_end" and isinstance(content, dict):
-                    try:
-                        usage = content.get("usage", {}) if isinstance(content, dict) else {}
-                        prompt_tokens = int(usage.get("prompt_tokens", 0) or 0)
-                        completion_tokens = int(usage.get("completion_tokens", 0) or 0)
-                        model = content.get("model") if isinstance(content, dict) else None
-                        # Compute token cost
-                        token_cost = calculate_token_cost(prompt_tokens, completion_tokens, model or "unknown")
-                        # Fetch account_id for this thread, which equals user_id for personal accounts
-                        thread_row = await client.table('threads').select('account_id').eq('thread_id', thread_id).limit(1).execute()
-                        user_id = thread_row.data[0]['account_id'] if thread_row.data and len(thread_row.data) > 0 else None
-                        if user_id and token_cost > 0:
-                            # Deduct credits if applicable and record usage against this message
-                            await handle_usage_with_credits(
-                                client,
-                                user_id,
-                                token_cost,
-                                thread_id=thread_id,
-                                message_id=saved_message['message_id'],
-                                model=model or "unknown"
-                            )
-                    except Exception as billing_e:
-                        logger.error(f"Error handling credit usage for message {saved_message.get('message_id')}: {str(billing_e)}", exc_info=True)
-                return saved_message
-            else:
-                logger.error(f"Insert operation failed or did not return expected data structure for thread {thread_id}. Result data: {result.data}")
-                return None
+            # The message gets its id now and is inserted with the next batch
+            saved_message = self.message_buffer.add(data_to_insert)
+            if _is_flush_point(type, content):
+                await self.message_buffer.flush()
+            logger.debug("Successfully added message to thread %s", thread_id)
+
+            # If this is an assistant_response_end, attempt to deduct credits if over limit
+            if type == "assistant_response_end" and isinstance(content, dict):
+                try:
+                    client = await self.db.client
+                    usage = content.get("usage", {}) if isinstance(content, dict) else {}
+                    prompt_tokens = int(usage.get("prompt_tokens", 0) or 0)
+                    completion_tokens = int(usage.get("completion_tokens", 0) or 0)
+                    model = content.get("model") if isinstance(content, dict) else None
+                    # Compute token cost
+                    token_cost = calculate_token_cost(prompt_tokens, completion_tokens, model or "unknown")
+                    # Fetch account_id for this thread, which equals user_id for personal accounts
+                    thread_row = await client.table('threads').select('account_id').eq('thread_id', thread_id).limit(1).execute()
+                    user_id = thread_row.data[0]['account_id'] if thread_row.data and len(thread_row.data) > 0 else None
+                    if user_id and token_cost > 0:
+                        # Deduct credits if applicable and record usage against this message
+                        await handle_usage_with_credits(
+                            client,
+                            user_id,
+                            token_cost,
+                            thread_id=thread_id,
+                            message_id=saved_message['message_id'],
+                            model=model or "unknown"
+                        )
+                except Exception as billing_e:
+                    logger.error(f"Error handling credit usage for message {saved_message.get('message_id')}: {str(billing_e)}", exc_info=True)
+            return saved_message
         except Exception as e:
             logger.error(f"Failed to add message to thread {thread_id}: {str(e)}", exc_info=True)
             raise
 
+    async def flush_messages(self) -> None:
+        """Insert every message still waiting in the write buffer."""
+        await self.message_buffer.flush()
+
+    async def _record_persisted_messages(self, messages: List[Dict[str, Any]]) -> None:
+        for message in messages:
+            await thread_head.record_message(message['thread_id'], message)
+
     async def get_llm_messages(self, thread_id: str) -> List[Dict[str, Any]]:
         """Get all messages for a thread.
 
@@ -218,7 +241,8 @@ class ThreadManager:
         Returns:
             List of message objects.
         """
-        logger.debug(f"Getting messages for thread {thread_id}")
+        logger.debug("Getting messages for thread %s", thread_id)
+        await self.message_buffer.flush()
         client = await self.db.client
 
         try:
@@ -290,7 +314,7 @@ class ThreadManager:
         enable_thinking: Optional[bool] = False,
         reasoning_effort: Optional[str] = 'low',
         enable_context_manager: bool = True,
-        generation: Optional[StatefulGenerationClient] = None,
+        generation: Optional[Span] = None,
     ) -> Union[Dict[str, Any], AsyncGenerator]:
         """Run a conversation thread with LLM integration and tool execution.
 
@@ -514,7 +538,7 @@ When using the tools:
                 openapi_tool_schemas = None
                 if config.native_tool_calling:
                     openapi_tool_schemas = self.tool_registry.get_openapi_schemas()
-                    logger.debug(f"Retrieved {len(openapi_tool_schemas) if openapi_tool_schemas else 0} OpenAPI tool schemas")
+                    logger.debug("Retrieved %s OpenAPI tool schemas", len(openapi_tool_schemas) if openapi_tool_schemas else 0)
 
                 # print(f"\n\n\n\n prepared_messages: {prepared_messages}\n\n\n\n")
 
@@ -534,7 +558,8 @@ When using the tools:
                               "enable_thinking": enable_thinking,
                               "reasoning_effort": reasoning_effort,
                               "tool_choice": tool_choice,
-                              "tools": openapi_tool_schemas,
+                              # Names only: the schemas are the same on every call
+                              "tools": [schema.get("function", {}).get("name") for schema in openapi_tool_schemas] if openapi_tool_schemas else None,
                             }
                         )
 
@@ -606,11 +631,21 @@ When using the tools:
         # Define a wrapper generator that handles auto-continue logic
         async def auto_continue_wrapper():
             nonlocal auto_continue, auto_continue_count
+            provider_retries = 0
+
+            def can_retry_provider_error() -> bool:
+                return provider_retries < MAX_PROVIDER_RETRIES and (
+                    native_max_auto_continues == 0 or auto_continue_count < native_max_auto_continues
+                )
 
             while auto_continue and (native_max_auto_continues == 0 or auto_continue_count < native_max_auto_continues):
                 # Reset auto_continue for this iteration
                 auto_continue = False
 
+                # Tells the response processor whether a provider error will be retried,
+                # so the error status is only saved on the final failure
+                continuous_state['provider_retry_available'] = can_retry_provider_error()
+
                 # Run the thread once, passing the potentially modified system prompt
                 # Pass temp_msg only on the first iteration
                 try:
@@ -660,12 +695,10 @@ When using the tools:
                         if not auto_continue:
                             break
                     except Exception as e:
-                        if ("AnthropicException - Overloaded" in str(e)):
-                            logger.error(f"AnthropicException - Overloaded detected - Falling back to OpenRouter: {str(e)}", exc_info=True)
-                            nonlocal llm_model
-                            # Remove "-20250514" from the model name if present
-                            model_name_cleaned = llm_model.replace("-20250514", "")
-                            llm_model = f"openrouter/{model_name_cleaned}"
+                        if is_provider_error(e) and can_retry_provider_error():
+                            # The router moves the retry to the fallback model while the provider's circuit is open
+                            provider_retries += 1
+                            logger.error(f"LLM provider error mid-stream, retrying ({provider_retries}/{MAX_PROVIDER_RETRIES}): {str(e)}", exc_info=True)
                             auto_continue = True
                             continue # Continue the loop
                         else:
@@ -4,10 +4,12 @@ Core tool system providing the foundation for creating and managing tools.
 This module defines the base classes and decorators for creating tools in AgentPress:
 - Tool base class for implementing tool functionality
 - Schema decorators for OpenAPI tool definitions
+- Resource declarations used to schedule concurrent tool calls
+- Cache declarations used to reuse results of read-only tool calls
 - Result containers for standardized tool outputs
 """
 
-from typing import Dict, Any, Union, Optional, List
+from typing import Dict, Any, Union, Optional, List, Callable
 from dataclasses import dataclass, field
 from abc import ABC
 import json
@@ -42,6 +44,36 @@ class ToolResult:
     success: bool
     output: str
 
+# A resource a tool call touches: a template formatted with the call's arguments
+# (e.g. "fs:{file_path}"), or a function of the arguments returning the key or None
+ResourceSpec = Union[str, Callable[[Dict[str, Any]], Optional[str]]]
+
+@dataclass
+class ToolResources:
+    """Scheduling declaration of a tool function.
+    
+    Attributes:
+        tool_class (str): Concurrency class; calls of the same class share a limit
+        writes (List[ResourceSpec]): Resources the call needs to itself
+        reads (List[ResourceSpec]): Resources the call can share with other readers
+        timeout (Optional[float]): Seconds after which the call is abandoned
+    """
+    tool_class: str = "default"
+    writes: List[ResourceSpec] = field(default_factory=list)
+    reads: List[ResourceSpec] = field(default_factory=list)
+    timeout: Optional[float] = None
+
+@dataclass
+class ToolCachePolicy:
+    """Result caching declaration of a read-only tool function.
+    
+    Attributes:
+        ttl (float): Seconds a successful result is reused within a run
+        scope (Optional[str]): Invalidation scope, defaults to the tool's class name
+    """
+    ttl: float
+    scope: Optional[str] = None
+
 class Tool(ABC):
     """Abstract base class for all tools.
     
@@ -106,6 +138,18 @@ class Tool(ABC):
         logger.debug(f"Tool {self.__class__.__name__} returned failed result: {msg}")
         return ToolResult(success=False, output=msg)
 
+    async def recover_from_failure(self, error: str) -> bool:
+        """Try to repair state a failed call may have hit, e.g. a stopped sandbox.
+        
+        Args:
+            error: Error message of the failed call
+            
+        Returns:
+            True when something was repaired; only read-only (@cacheable)
+            functions are then retried once, other calls return their failure
+        """
+        return False
+
 def _add_schema(func, schema: ToolSchema):
     """Helper to add schema to a function."""
     if not hasattr(func, 'tool_schemas'):
@@ -134,6 +178,53 @@ def usage_example(example: str):
         ))
     return decorator
 
+def tool_resources(
+    tool_class: str,
+    writes: Optional[List[ResourceSpec]] = None,
+    reads: Optional[List[ResourceSpec]] = None,
+    timeout: Optional[float] = None
+):
+    """Decorator declaring the resources and limits of a tool function.
+
+    Calls that write a resource wait for earlier calls using it, and calls
+    using a resource wait for earlier calls writing it. A key ending in "*"
+    covers every key with that prefix.
+    """
+    def decorator(func):
+        logger.debug(f"Declaring {tool_class} resources for function {func.__name__}")
+        func.tool_resources = ToolResources(
+            tool_class=tool_class,
+            writes=list(writes or []),
+            reads=list(reads or []),
+            timeout=timeout
+        )
+        return func
+    return decorator
+
+def cacheable(ttl: float = 300, scope: Optional[str] = None):
+    """Decorator marking a read-only tool function whose successful results can be reused.
+
+    Identical calls (same function and arguments) within one run are served
+    from the run's cache until the TTL expires or a function declaring
+    @invalidates for the same scope runs.
+    """
+    def decorator(func):
+        logger.debug(f"Marking function {func.__name__} as cacheable for {ttl}s")
+        func.tool_cache = ToolCachePolicy(ttl=ttl, scope=scope)
+        return func
+    return decorator
+
+def invalidates(*scopes: str):
+    """Decorator marking a tool function that changes state read by cacheable functions.
+
+    Without scopes it invalidates the cacheable functions of its own tool class.
+    """
+    def decorator(func):
+        logger.debug(f"Marking function {func.__name__} as invalidating {list(scopes) or 'its tool'}")
+        func.tool_invalidates = list(scopes)
+        return func
+    return decorator
+
 # def xml_schema(**kwargs):
 #     """Deprecated decorator - does nothing, kept for compatibility."""
 #     def decorator(func):
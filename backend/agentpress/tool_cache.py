@@ -0,0 +1,88 @@
+"""
+Per-run memoization of tool results for AgentPress.
+
+Successful results of functions marked @cacheable are reused for identical
+calls (same function, canonicalized arguments) until their TTL expires.
+Functions marked @invalidates drop the cached results of their scopes when
+they start and again when they finish.
+"""
+
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from agentpress.tool import ToolResult
+from agentpress.tool_registry import ToolRegistry
+from utils.logger import logger
+
+# Cached results per run; the least recently used are dropped first
+MAX_CACHED_RESULTS = 128
+
+
+@dataclass
+class CachedResult:
+    result: ToolResult
+    scope: str
+    expires_at: float
+
+
+class ToolResultCache:
+    """Results of cacheable tool calls within one agent run."""
+
+    def __init__(self, tool_registry: ToolRegistry, max_entries: int = MAX_CACHED_RESULTS):
+        self.tool_registry = tool_registry
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedResult]" = OrderedDict()
+
+    @staticmethod
+    def cache_key(function_name: str, arguments: Dict[str, Any]) -> Optional[str]:
+        """Key of a call: the function name plus its arguments as canonical JSON."""
+        try:
+            return f"{function_name}:{json.dumps(arguments, sort_keys=True, separators=(',', ':'))}"
+        except (TypeError, ValueError):
+            return None
+
+    def get(self, function_name: str, arguments: Dict[str, Any]) -> Optional[ToolResult]:
+        """Return the cached result of an identical earlier call, if still valid."""
+        if not self._entries or self.tool_registry.get_tool_cache_policy(function_name) is None:
+            return None
+        key = self.cache_key(function_name, arguments)
+        entry = self._entries.get(key) if key else None
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry.result
+
+    def put(self, function_name: str, arguments: Dict[str, Any], result: ToolResult) -> None:
+        """Store the result of a call if the function is cacheable and the call succeeded."""
+        if not result or not result.success:
+            return
+        policy = self.tool_registry.get_tool_cache_policy(function_name)
+        if policy is None:
+            return
+        key = self.cache_key(function_name, arguments)
+        if key is None:
+            return
+
+        self._entries[key] = CachedResult(result=result, scope=policy.scope, expires_at=time.monotonic() + policy.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, function_name: str) -> None:
+        """Drop the cached results of the scopes a function invalidates."""
+        if not self._entries:
+            return
+        scopes = self.tool_registry.get_invalidated_scopes(function_name)
+        if not scopes:
+            return
+        stale = [key for key, entry in self._entries.items() if entry.scope in scopes]
+        for key in stale:
+            del self._entries[key]
+        if stale:
+            logger.debug(f"{function_name} invalidated {len(stale)} cached tool results in {scopes}")
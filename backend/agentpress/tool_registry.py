@@ -1,5 +1,6 @@
 from typing import Dict, Type, Any, List, Optional, Callable
-from agentpress.tool import Tool, SchemaType
+from agentpress.tool import Tool, SchemaType, ToolResources, ToolCachePolicy
+from dataclasses import replace
 from utils.logger import logger
 import json
 
@@ -72,9 +73,58 @@ class ToolRegistry:
             function = getattr(tool_instance, function_name)
             available_functions[function_name] = function
             
-        logger.debug(f"Retrieved {len(available_functions)} available functions")
+        logger.debug("Retrieved %s available functions", len(available_functions))
         return available_functions
 
+    def get_tool_resources(self, function_name: str) -> Optional[ToolResources]:
+        """Get the resource declaration of a tool function.
+        
+        Args:
+            function_name: Name of the tool function
+            
+        Returns:
+            The function's ToolResources, or None if it declares none
+        """
+        return self._get_function_attribute(function_name, 'tool_resources')
+
+    def get_tool_cache_policy(self, function_name: str) -> Optional[ToolCachePolicy]:
+        """Get the cache policy of a cacheable tool function.
+        
+        Args:
+            function_name: Name of the tool function
+            
+        Returns:
+            The function's ToolCachePolicy with its scope resolved, or None if it is not cacheable
+        """
+        policy = self._get_function_attribute(function_name, 'tool_cache')
+        if policy is None:
+            return None
+        return replace(policy, scope=policy.scope or self._tool_class_name(function_name))
+
+    def get_invalidated_scopes(self, function_name: str) -> List[str]:
+        """Get the cache scopes a tool function invalidates.
+        
+        Args:
+            function_name: Name of the tool function
+            
+        Returns:
+            List of scopes, empty if the function does not invalidate cached results
+        """
+        scopes = self._get_function_attribute(function_name, 'tool_invalidates')
+        if scopes is None:
+            return []
+        return scopes or [self._tool_class_name(function_name)]
+
+    def _get_function_attribute(self, function_name: str, attribute: str) -> Any:
+        tool_info = self.tools.get(function_name)
+        if not tool_info:
+            return None
+        function = getattr(tool_info['instance'], function_name, None)
+        return getattr(function, attribute, None)
+
+    def _tool_class_name(self, function_name: str) -> str:
+        return type(self.tools[function_name]['instance']).__name__
+
     def get_tool(self, tool_name: str) -> Dict[str, Any]:
         """Get a specific tool by name.
         
@@ -100,7 +150,7 @@ class ToolRegistry:
             for tool_info in self.tools.values()
             if tool_info['schema'].schema_type == SchemaType.OPENAPI
         ]
-        logger.debug(f"Retrieved {len(schemas)} OpenAPI schemas")
+        logger.debug("Retrieved %s OpenAPI schemas", len(schemas))
         return schemas
 
     def get_usage_examples(self) -> Dict[str, str]:
@@ -121,9 +171,9 @@ class ToolRegistry:
                 for schema in all_schemas[tool_name]:
                     if schema.schema_type == SchemaType.USAGE_EXAMPLE:
                         examples[tool_name] = schema.schema.get('example', '')
-                        logger.debug(f"Found usage example for {tool_name}")
+                        logger.debug("Found usage example for %s", tool_name)
                         break
         
-        logger.debug(f"Retrieved {len(examples)} usage examples")
+        logger.debug("Retrieved %s usage examples", len(examples))
         return examples
 
@@ -0,0 +1,177 @@
+"""
+Resource-aware scheduling of tool calls for AgentPress.
+
+Tool calls are started in the order they are submitted. Each call first waits
+for the earlier calls it conflicts with (both use a resource and at least one
+of them writes it), then for a slot of its tool class, and is abandoned once
+it exceeds its timeout. Calls that don't conflict run concurrently.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from agentpress.tool import ToolResult, ToolResources, ResourceSpec
+from agentpress.tool_registry import ToolRegistry
+from utils.config import config
+from utils.json_helpers import safe_json_parse
+from utils.logger import logger
+
+# Concurrent calls per tool class within one run
+DEFAULT_CLASS_LIMITS: Dict[str, int] = {
+    "default": 8,
+    "fs": 8,
+    "shell": 4,
+    "browser": 1,
+    "web": 4,
+    "control": 1,
+}
+
+# (resource key, exclusive)
+Resource = Tuple[str, bool]
+
+# Exclusive claim on everything: ordered after every earlier call and before every later one
+BARRIER: Resource = ("*", True)
+
+
+@dataclass
+class ScheduledCall:
+    tool_call: Dict[str, Any]
+    resources: List[Resource]
+    task: asyncio.Task
+
+
+def _keys_overlap(a: str, b: str) -> bool:
+    if a == b:
+        return True
+    if a.endswith("*") and b.startswith(a[:-1]):
+        return True
+    return b.endswith("*") and a.startswith(b[:-1])
+
+
+def _conflicts(a: List[Resource], b: List[Resource]) -> bool:
+    # A barrier also conflicts with calls that declare no resources
+    if BARRIER in a or BARRIER in b:
+        return True
+    return any(
+        (exclusive_a or exclusive_b) and _keys_overlap(key_a, key_b)
+        for key_a, exclusive_a in a
+        for key_b, exclusive_b in b
+    )
+
+
+class ToolScheduler:
+    """Runs the tool calls of an agent run with per-resource ordering, per-class limits and timeouts."""
+
+    def __init__(
+        self,
+        tool_registry: ToolRegistry,
+        execute: Callable[[Dict[str, Any]], Awaitable[ToolResult]],
+        class_limits: Optional[Dict[str, int]] = None,
+        default_timeout: Optional[float] = None
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            tool_registry: Registry used to look up the tools' resource declarations
+            execute: Coroutine function executing a single tool call
+            class_limits: Concurrent calls per tool class (unlisted classes use "default")
+            default_timeout: Timeout for tools that declare none
+        """
+        self.tool_registry = tool_registry
+        self.execute = execute
+        self.class_limits = {**DEFAULT_CLASS_LIMITS, **(class_limits or {})}
+        self.default_timeout = default_timeout or config.TOOL_DEFAULT_TIMEOUT
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._inflight: List[ScheduledCall] = []
+
+    def submit(self, tool_call: Dict[str, Any], serialize: bool = False) -> asyncio.Task:
+        """Schedule a tool call and return the task that resolves to its ToolResult.
+
+        Args:
+            tool_call: Tool call with function_name and arguments
+            serialize: Order the call after every earlier call, and every later call after it
+        """
+        spec = self.tool_registry.get_tool_resources(tool_call.get("function_name")) or ToolResources()
+        resources = [BARRIER] if serialize else self._resolve_resources(spec, tool_call.get("arguments"))
+
+        self._inflight = [call for call in self._inflight if not call.task.done()]
+        blockers = [call.task for call in self._inflight if _conflicts(resources, call.resources)]
+
+        task = asyncio.create_task(self._run(tool_call, spec, blockers))
+        self._inflight.append(ScheduledCall(tool_call=tool_call, resources=resources, task=task))
+        return task
+
+    def cancel_pending(self) -> None:
+        """Cancel every call that has not finished yet."""
+        for call in self._inflight:
+            if not call.task.done():
+                call.task.cancel()
+        self._inflight = []
+
+    async def _run(self, tool_call: Dict[str, Any], spec: ToolResources, blockers: List[asyncio.Task]) -> ToolResult:
+        function_name = tool_call.get("function_name", "unknown")
+        if blockers:
+            logger.debug(f"Tool {function_name} waiting for {len(blockers)} conflicting tool calls")
+            await asyncio.wait(blockers)
+
+        timeout = spec.timeout or self.default_timeout
+        async with self._semaphore(spec.tool_class):
+            try:
+                return await asyncio.wait_for(self.execute(tool_call), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Tool {function_name} timed out after {timeout:g}s")
+                return ToolResult(success=False, output=f"Tool {function_name} did not finish within {timeout:g} seconds and was stopped")
+
+    def _semaphore(self, tool_class: str) -> asyncio.Semaphore:
+        if tool_class not in self._semaphores:
+            limit = self.class_limits.get(tool_class, self.class_limits["default"])
+            self._semaphores[tool_class] = asyncio.Semaphore(limit)
+        return self._semaphores[tool_class]
+
+    def _resolve_resources(self, spec: ToolResources, arguments: Any) -> List[Resource]:
+        arguments = safe_json_parse(arguments)
+        if not isinstance(arguments, dict):
+            arguments = {}
+
+        resources = []
+        for specs, exclusive in ((spec.writes, True), (spec.reads, False)):
+            for resource in specs:
+                key = self._resource_key(resource, arguments)
+                if key:
+                    resources.append((key, exclusive))
+        return resources
+
+    @staticmethod
+    def _resource_key(resource: ResourceSpec, arguments: Dict[str, Any]) -> Optional[str]:
+        if callable(resource):
+            try:
+                return resource(arguments)
+            except Exception as e:
+                logger.warning(f"Failed to resolve tool resource, treating it as unknown: {e}")
+                return "*"
+        try:
+            return resource.format_map(arguments)
+        except (KeyError, IndexError, ValueError):
+            # Unknown argument: cover everything the template could name
+            return resource.split("{", 1)[0] + "*"
+
+
+async def as_completed(tasks: Iterable[asyncio.Task]) -> AsyncGenerator[Tuple[int, asyncio.Task], None]:
+    """Yield (position, task) for each task as it finishes; ties keep submission order."""
+    positions = {task: position for position, task in enumerate(tasks)}
+    pending = set(positions)
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in sorted(done, key=positions.get):
+            yield positions[task], task
+
+
+def task_result(task: asyncio.Task) -> ToolResult:
+    """Result of a finished tool task, with failures and cancellation turned into failed results."""
+    try:
+        return task.result()
+    except asyncio.CancelledError:
+        return ToolResult(success=False, output="Tool execution was cancelled")
+    except Exception as e:
+        return ToolResult(success=False, output=f"Error executing tool: {str(e)}")
@@ -68,6 +68,12 @@ async def lifespan(app: FastAPI):
         # Start background tasks
         # asyncio.create_task(agent_api.restore_running_agent_runs())
         
+        # Keep the warm sandbox pool topped up
+        sandbox_pool_task = None
+        if config.SANDBOX_POOL_SIZE > 0:
+            from sandbox.pool import get_sandbox_pool
+            sandbox_pool_task = asyncio.create_task(get_sandbox_pool().run_refill_loop())
+        
         triggers_api.initialize(db)
         pipedream_api.initialize(db)
         credentials_api.initialize(db)
@@ -76,6 +82,9 @@ async def lifespan(app: FastAPI):
         
         yield
         
+        if sandbox_pool_task:
+            sandbox_pool_task.cancel()
+        
         # Clean up agent resources
         logger.debug("Cleaning up agent resources")
         await agent_api.cleanup()
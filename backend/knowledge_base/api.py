@@ -1,10 +1,13 @@
 import json
-from typing import List, Optional
+import os
+import tempfile
+from typing import List, Optional, Tuple
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, BackgroundTasks
 from pydantic import BaseModel, Field, HttpUrl
 from utils.auth_utils import get_current_user_id_from_jwt, verify_agent_access
 from services.supabase import DBConnection
 from knowledge_base.file_processor import FileProcessor
+from knowledge_base.retrieval import fetch_knowledge_base_context
 from utils.logger import logger
 from flags.flags import is_enabled
 
@@ -51,6 +54,12 @@ class UpdateKnowledgeBaseEntryRequest(BaseModel):
     usage_context: Optional[str] = Field(None, pattern="^(always|on_request|contextual)$")
     is_active: Optional[bool] = None
 
+class GitRepositoryRequest(BaseModel):
+    git_url: HttpUrl
+    branch: str = Field(default="main", min_length=1, max_length=255)
+    include_patterns: Optional[List[str]] = None
+    exclude_patterns: Optional[List[str]] = None
+
 class ProcessingJobResponse(BaseModel):
     job_id: str
     job_type: str
@@ -65,6 +74,29 @@ class ProcessingJobResponse(BaseModel):
 
 db = DBConnection()
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+async def _spool_upload(file: UploadFile) -> Tuple[str, int]:
+    """Copy an upload to a temp file in chunks, enforcing the size limit while reading.
+
+    The background job reads from the temp file, so uploads are never held in
+    memory as a whole. The caller owns the returned path.
+    """
+    fd, path = tempfile.mkstemp(prefix="kb_upload_")
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > FileProcessor.MAX_FILE_SIZE:
+                    raise HTTPException(status_code=413, detail=f"File too large (max: {FileProcessor.MAX_FILE_SIZE} bytes)")
+                out.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, size
+
 
 @router.get("/agents/{agent_id}", response_model=KnowledgeBaseListResponse)
 async def get_agent_knowledge_base(
@@ -160,6 +192,11 @@ async def create_agent_knowledge_base_entry(
         
         created_entry = result.data[0]
         
+        await FileProcessor().index_entry_chunks(
+            created_entry['entry_id'], agent_id, created_entry['name'],
+            created_entry.get('description'), created_entry['content']
+        )
+        
         return KnowledgeBaseEntryResponse(
             entry_id=created_entry['entry_id'],
             name=created_entry['name'],
@@ -199,15 +236,79 @@ async def upload_file_to_agent_kb(
         agent_data = await verify_agent_access(client, agent_id, user_id)
         account_id = agent_data['account_id']
         
-        file_content = await file.read()
+        file_path, file_size = await _spool_upload(file)
+        try:
+            job_id = await client.rpc('create_agent_kb_processing_job', {
+                'p_agent_id': agent_id,
+                'p_account_id': account_id,
+                'p_job_type': 'zip_extraction' if (file.filename or '').lower().endswith('.zip') else 'file_upload',
+                'p_source_info': {
+                    'filename': file.filename,
+                    'mime_type': file.content_type,
+                    'file_size': file_size
+                }
+            }).execute()
+            
+            if not job_id.data:
+                raise HTTPException(status_code=500, detail="Failed to create processing job")
+        except BaseException:
+            os.unlink(file_path)
+            raise
+        
+        job_id = job_id.data
+        background_tasks.add_task(
+            process_file_background,
+            job_id,
+            agent_id,
+            account_id,
+            file_path,
+            file.filename,
+            file.content_type or 'application/octet-stream'
+        )
+        
+        return {
+            "job_id": job_id,
+            "message": "File upload started. Processing in background.",
+            "filename": file.filename
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error uploading file to agent {agent_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to upload file")
+
+
+@router.post("/agents/{agent_id}/git-repository")
+async def sync_git_repository_to_agent_kb(
+    agent_id: str,
+    request: GitRepositoryRequest,
+    background_tasks: BackgroundTasks,
+    user_id: str = Depends(get_current_user_id_from_jwt)
+):
+    if not await is_enabled("knowledge_base"):
+        raise HTTPException(
+            status_code=403, 
+            detail="This feature is not available at the moment."
+        )
+    
+    """Add a git repository to an agent's knowledge base, or re-sync it if already added"""
+    try:
+        client = await db.client
+        
+        agent_data = await verify_agent_access(client, agent_id, user_id)
+        account_id = agent_data['account_id']
+        git_url = str(request.git_url)
+        
         job_id = await client.rpc('create_agent_kb_processing_job', {
             'p_agent_id': agent_id,
             'p_account_id': account_id,
-            'p_job_type': 'file_upload',
+            'p_job_type': 'git_clone',
             'p_source_info': {
-                'filename': file.filename,
-                'mime_type': file.content_type,
-                'file_size': len(file_content)
+                'git_url': git_url,
+                'branch': request.branch,
+                'include_patterns': request.include_patterns,
+                'exclude_patterns': request.exclude_patterns
             }
         }).execute()
         
@@ -216,26 +317,28 @@ async def upload_file_to_agent_kb(
         
         job_id = job_id.data
         background_tasks.add_task(
-            process_file_background,
+            process_git_repository_background,
             job_id,
             agent_id,
             account_id,
-            file_content,
-            file.filename,
-            file.content_type or 'application/octet-stream'
+            git_url,
+            request.branch,
+            request.include_patterns,
+            request.exclude_patterns
         )
         
         return {
             "job_id": job_id,
-            "message": "File upload started. Processing in background.",
-            "filename": file.filename
+            "message": "Git repository sync started. Processing in background.",
+            "git_url": git_url,
+            "branch": request.branch
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error uploading file to agent {agent_id}: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to upload file")
+        logger.error(f"Error syncing git repository to agent {agent_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to sync git repository")
 
 
 @router.put("/{entry_id}", response_model=KnowledgeBaseEntryResponse)
@@ -288,6 +391,12 @@ async def update_knowledge_base_entry(
         
         updated_entry = result.data[0]
         
+        if any(field in update_data for field in ('name', 'description', 'content')):
+            await FileProcessor().index_entry_chunks(
+                entry_id, agent_id, updated_entry['name'],
+                updated_entry.get('description'), updated_entry['content']
+            )
+        
         logger.debug(f"Updated agent knowledge base entry {entry_id} for agent {agent_id}")
         
         return KnowledgeBaseEntryResponse(
@@ -455,11 +564,11 @@ async def process_file_background(
     job_id: str,
     agent_id: str,
     account_id: str,
-    file_content: bytes,
+    file_path: str,
     filename: str,
     mime_type: str
 ):
-    """Background task to process uploaded files"""
+    """Background task to process uploaded files; removes the spooled upload when done"""
     
     processor = FileProcessor()
     client = await processor.db.client
@@ -470,16 +579,17 @@ async def process_file_background(
         }).execute()
         
         result = await processor.process_file_upload(
-            agent_id, account_id, file_content, filename, mime_type
+            agent_id, account_id, file_path, filename, mime_type, job_id=job_id
         )
         
         if result['success']:
+            is_archive = 'zip_entry_id' in result
             await client.rpc('update_agent_kb_job_status', {
                 'p_job_id': job_id,
                 'p_status': 'completed',
                 'p_result_info': result,
-                'p_entries_created': 1,
-                'p_total_files': 1
+                'p_entries_created': result['total_extracted'] if is_archive else (0 if result.get('skipped') else 1),
+                'p_total_files': result['total_extracted'] + result['total_failed'] + result['total_skipped'] if is_archive else 1
             }).execute()
         else:
             await client.rpc('update_agent_kb_job_status', {
@@ -498,12 +608,68 @@ async def process_file_background(
             }).execute()
         except:
             pass
+    finally:
+        try:
+            os.unlink(file_path)
+        except OSError:
+            pass
+
+
+async def process_git_repository_background(
+    job_id: str,
+    agent_id: str,
+    account_id: str,
+    git_url: str,
+    branch: str,
+    include_patterns: Optional[List[str]],
+    exclude_patterns: Optional[List[str]]
+):
+    """Background task to clone or incrementally re-sync a git repository"""
+    
+    processor = FileProcessor()
+    client = await processor.db.client
+    try:
+        await client.rpc('update_agent_kb_job_status', {
+            'p_job_id': job_id,
+            'p_status': 'processing'
+        }).execute()
+        
+        result = await processor.process_git_repository(
+            agent_id, account_id, git_url, branch, include_patterns, exclude_patterns, job_id=job_id
+        )
+        
+        if result['success']:
+            await client.rpc('update_agent_kb_job_status', {
+                'p_job_id': job_id,
+                'p_status': 'completed',
+                'p_result_info': result,
+                'p_entries_created': result['total_processed'],
+                'p_total_files': result['total_processed'] + result['total_failed'] + result['total_skipped']
+            }).execute()
+        else:
+            await client.rpc('update_agent_kb_job_status', {
+                'p_job_id': job_id,
+                'p_status': 'failed',
+                'p_error_message': result.get('error', 'Unknown error')
+            }).execute()
+            
+    except Exception as e:
+        logger.error(f"Error in background git repository processing for job {job_id}: {str(e)}")
+        try:
+            await client.rpc('update_agent_kb_job_status', {
+                'p_job_id': job_id,
+                'p_status': 'failed',
+                'p_error_message': str(e)
+            }).execute()
+        except:
+            pass
 
 
 @router.get("/agents/{agent_id}/context")
 async def get_agent_knowledge_base_context(
     agent_id: str,
     max_tokens: int = 4000,
+    query: Optional[str] = None,
     user_id: str = Depends(get_current_user_id_from_jwt)
 ):
     if not await is_enabled("knowledge_base"):
@@ -519,16 +685,14 @@ async def get_agent_knowledge_base_context(
         # Verify agent access
         await verify_agent_access(client, agent_id, user_id)
         
-        result = await client.rpc('get_agent_knowledge_base_context', {
-            'p_agent_id': agent_id,
-            'p_max_tokens': max_tokens
-        }).execute()
-        
-        context = result.data if result.data else None
+        context = await fetch_knowledge_base_context(
+            client, agent_id, query=query, max_tokens=max_tokens, log_usage=False
+        )
         
         return {
             "context": context,
             "max_tokens": max_tokens,
+            "query": query,
             "agent_id": agent_id
         }
         
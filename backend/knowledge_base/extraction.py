@@ -0,0 +1,143 @@
+"""
+Text extraction for knowledge base files.
+
+These functions run in the ingestion process pool, so they take paths (a
+file, or a ZIP archive plus member name) instead of bytes and only import
+the parsing libraries, not the backend services.
+"""
+
+import hashlib
+import io
+import re
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+import chardet
+import PyPDF2
+import docx
+
+SUPPORTED_TEXT_EXTENSIONS = {
+    '.txt'
+}
+
+SUPPORTED_DOCUMENT_EXTENSIONS = {
+    '.pdf', '.docx'
+}
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+@contextmanager
+def open_source(path: str, member: Optional[str] = None) -> Iterator[BinaryIO]:
+    """Open a file, or a member of the ZIP archive at ``path``, for streaming reads."""
+    if member is None:
+        with open(path, 'rb') as f:
+            yield f
+    else:
+        with zipfile.ZipFile(path) as archive, archive.open(member) as f:
+            yield f
+
+
+def hash_source(path: str, member: Optional[str] = None) -> Tuple[str, int]:
+    """SHA-256 and size of a source, read in blocks."""
+    digest = hashlib.sha256()
+    size = 0
+    with open_source(path, member) as f:
+        while block := f.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+            size += len(block)
+    return digest.hexdigest(), size
+
+
+def is_supported(filename: str, mime_type: str) -> bool:
+    extension = Path(filename).suffix.lower()
+    return (
+        extension in SUPPORTED_TEXT_EXTENSIONS
+        or extension in SUPPORTED_DOCUMENT_EXTENSIONS
+        or mime_type.startswith('text/')
+    )
+
+
+def extract_source(path: str, member: Optional[str], filename: str, mime_type: str, max_size: int) -> str:
+    """Read a source and extract its text. Raises ValueError for oversized or unsupported files."""
+    with open_source(path, member) as f:
+        file_content = f.read(max_size + 1)
+    if len(file_content) > max_size:
+        raise ValueError(f"File too large: more than {max_size} bytes")
+    return extract_content(file_content, filename, mime_type)
+
+
+def extract_content(file_content: bytes, filename: str, mime_type: str) -> str:
+    file_extension = Path(filename).suffix.lower()
+
+    if file_extension in SUPPORTED_TEXT_EXTENSIONS or mime_type.startswith('text/'):
+        return extract_text_content(file_content)
+    elif file_extension == '.pdf':
+        return extract_pdf_content(file_content)
+    elif file_extension == '.docx':
+        return extract_docx_content(file_content)
+    else:
+        raise ValueError(f"Unsupported file format: {file_extension}. Only .txt, .pdf, and .docx files are supported.")
+
+
+def extract_text_content(file_content: bytes) -> str:
+    detected = chardet.detect(file_content)
+    encoding = detected.get('encoding') or 'utf-8'
+
+    try:
+        raw_text = file_content.decode(encoding)
+    except (UnicodeDecodeError, LookupError):
+        raw_text = file_content.decode('utf-8', errors='replace')
+
+    return sanitize_content(raw_text)
+
+
+def extract_pdf_content(file_content: bytes) -> str:
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
+    text_content = []
+
+    for page in pdf_reader.pages:
+        text_content.append(page.extract_text())
+
+    raw_text = '\n\n'.join(text_content)
+    return sanitize_content(raw_text)
+
+
+def extract_docx_content(file_content: bytes) -> str:
+    doc = docx.Document(io.BytesIO(file_content))
+    text_content = []
+
+    for paragraph in doc.paragraphs:
+        text_content.append(paragraph.text)
+
+    raw_text = '\n'.join(text_content)
+    return sanitize_content(raw_text)
+
+
+def sanitize_content(content: str) -> str:
+    if not content:
+        return content
+
+    sanitized = ''.join(char for char in content if ord(char) >= 32 or char in '\n\r\t')
+
+    sanitized = sanitized.replace('\x00', '')
+    sanitized = sanitized.replace('\u0000', '')
+
+    sanitized = sanitized.replace('\ufeff', '')
+
+    sanitized = sanitized.replace('\r\n', '\n').replace('\r', '\n')
+
+    sanitized = re.sub(r'\n{4,}', '\n\n\n', sanitized)
+
+    return sanitized.strip()
+
+
+def get_extraction_method(file_extension: str, mime_type: str) -> str:
+    if file_extension == '.pdf':
+        return 'PyPDF2'
+    elif file_extension == '.docx':
+        return 'python-docx'
+    else:
+        return 'text encoding detection'
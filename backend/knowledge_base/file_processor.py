@@ -1,63 +1,282 @@
 import os
-import io
-import zipfile
 import tempfile
 import shutil
 import asyncio
-import subprocess
+import fcntl
+import hashlib
+import time
 import re
-from typing import List, Dict, Any, Optional, Tuple
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import partial
+from typing import List, Dict, Any, Optional, Iterable
 from pathlib import Path
 import mimetypes
-import chardet
-
-import PyPDF2
-import docx
 
+from knowledge_base import extraction
+from utils.config import config
 from utils.logger import logger
 from services.supabase import DBConnection
 
+_extraction_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_extraction_pool() -> ProcessPoolExecutor:
+    """Process pool for PDF/DOCX/text extraction, shared by all ingestion jobs of this process."""
+    global _extraction_pool
+    if _extraction_pool is None:
+        _extraction_pool = ProcessPoolExecutor(
+            max_workers=config.KB_EXTRACTION_WORKERS,
+            # Forking a process with a running event loop and client threads is unsafe
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _extraction_pool
+
+
+@dataclass
+class SourceFile:
+    """A file to ingest: a path on disk, or a member of the ZIP archive at ``path``."""
+    path: str
+    relative_path: str
+    member: Optional[str] = None
+
+    @property
+    def filename(self) -> str:
+        return os.path.basename(self.relative_path)
+
+    @property
+    def mime_type(self) -> str:
+        mime_type, _ = mimetypes.guess_type(self.filename)
+        return mime_type or 'application/octet-stream'
+
+
+@dataclass
+class PreparedFile:
+    source: SourceFile
+    status: str  # 'new', 'changed', 'unchanged' or 'failed'
+    content: Optional[str] = None
+    content_hash: Optional[str] = None
+    file_size: int = 0
+    entry_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class IngestionProgress:
+    """Reports per-file progress of a processing job, at most once per interval."""
+
+    def __init__(self, job_id: Optional[str], interval: float = 1.0):
+        self.job_id = job_id
+        self.interval = interval
+        self.total_files = 0
+        self.processed = 0
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.failed = 0
+        self.current_file: Optional[str] = None
+        self._last_report = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'processed_files': self.processed,
+            'total_files': self.total_files,
+            'created': self.created,
+            'updated': self.updated,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'current_file': self.current_file
+        }
+
+    async def file_done(self, relative_path: str, status: str) -> None:
+        self.processed += 1
+        self.current_file = relative_path
+        if status == 'new':
+            self.created += 1
+        elif status == 'changed':
+            self.updated += 1
+        elif status == 'unchanged':
+            self.skipped += 1
+        else:
+            self.failed += 1
+        await self.report()
+
+    async def report(self, force: bool = False) -> None:
+        if not self.job_id:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_report < self.interval:
+            return
+        self._last_report = now
+        try:
+            client = await DBConnection().client
+            await client.rpc('update_agent_kb_job_status', {
+                'p_job_id': self.job_id,
+                'p_status': 'processing',
+                'p_result_info': {'progress': self.snapshot()},
+                'p_entries_created': self.created,
+                'p_total_files': self.total_files
+            }).execute()
+        except Exception as e:
+            logger.warning(f"Failed to report progress for knowledge base job {self.job_id}: {e}")
+
+
 class FileProcessor:
-    SUPPORTED_TEXT_EXTENSIONS = {
-        '.txt'
-    }
-    
-    SUPPORTED_DOCUMENT_EXTENSIONS = {
-        '.pdf', '.docx'
-    }
-    
+    SUPPORTED_TEXT_EXTENSIONS = extraction.SUPPORTED_TEXT_EXTENSIONS
+    SUPPORTED_DOCUMENT_EXTENSIONS = extraction.SUPPORTED_DOCUMENT_EXTENSIONS
+
     MAX_FILE_SIZE = 50 * 1024 * 1024
     MAX_ZIP_ENTRIES = 1000
     MAX_CONTENT_LENGTH = 100000
-    
+    # ~400 tokens at the 4 characters per token estimate used for content_tokens
+    CHUNK_MAX_CHARS = 1600
+    # Entries per bulk insert, and chunk rows per insert
+    ENTRY_BATCH_SIZE = 50
+    CHUNK_BATCH_SIZE = 500
+    # File paths per lookup query (they end up in the request URL)
+    PATH_LOOKUP_BATCH_SIZE = 100
+    # Wait between attempts to take the lock of a git clone another sync is using
+    GIT_LOCK_POLL_SECONDS = 0.5
+
     def __init__(self):
         self.db = DBConnection()
-    
+
+    async def index_entry_chunks(
+        self,
+        entry_id: str,
+        agent_id: str,
+        name: str,
+        description: Optional[str],
+        content: str
+    ) -> int:
+        """Replace the search chunks of a knowledge base entry. Returns the number of chunks."""
+        return await self.index_entries_chunks([{
+            'entry_id': entry_id,
+            'agent_id': agent_id,
+            'name': name,
+            'description': description,
+            'content': content
+        }])
+
+    async def index_entries_chunks(self, entries: List[Dict[str, Any]]) -> int:
+        """Replace the search chunks of several entries with one delete and batched inserts."""
+        if not entries:
+            return 0
+
+        client = await self.db.client
+        chunks = []
+        for entry in entries:
+            heading = '\n'.join(part for part in (entry['name'], entry.get('description')) if part)
+            chunks.extend(
+                {
+                    'entry_id': entry['entry_id'],
+                    'agent_id': entry['agent_id'],
+                    'chunk_index': index,
+                    'heading': heading,
+                    'content': chunk,
+                    'content_tokens': len(chunk) // 4
+                }
+                for index, chunk in enumerate(self.chunk_content(entry['content']))
+            )
+
+        await client.table('agent_knowledge_base_chunks').delete().in_('entry_id', [e['entry_id'] for e in entries]).execute()
+        for start in range(0, len(chunks), self.CHUNK_BATCH_SIZE):
+            await client.table('agent_knowledge_base_chunks').insert(chunks[start:start + self.CHUNK_BATCH_SIZE]).execute()
+        return len(chunks)
+
+    @classmethod
+    def chunk_content(cls, content: str, max_chars: Optional[int] = None) -> List[str]:
+        """Split content into chunks of at most max_chars, on paragraph boundaries where possible."""
+        max_chars = max_chars or cls.CHUNK_MAX_CHARS
+        chunks = []
+        current = ''
+
+        for block in cls._split_blocks(content or '', max_chars):
+            if current and len(current) + 2 + len(block) > max_chars:
+                chunks.append(current)
+                current = block
+            else:
+                current = f"{current}\n\n{block}" if current else block
+
+        if current:
+            chunks.append(current)
+        return chunks
+
+    @staticmethod
+    def _split_blocks(content: str, max_chars: int):
+        for paragraph in re.split(r'\n\s*\n', content):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if len(paragraph) <= max_chars:
+                yield paragraph
+                continue
+
+            # Oversized paragraph: break between words, hard-split words that are still too long
+            piece = ''
+            for word in re.findall(r'\S+\s*', paragraph):
+                while len(word) > max_chars:
+                    if piece.strip():
+                        yield piece.strip()
+                    piece = ''
+                    yield word[:max_chars]
+                    word = word[max_chars:]
+                if len(piece) + len(word) > max_chars:
+                    yield piece.strip()
+                    piece = ''
+                piece += word
+            if piece.strip():
+                yield piece.strip()
+
     async def process_file_upload(
-        self, 
-        agent_id: str, 
-        account_id: str, 
-        file_content: bytes, 
-        filename: str, 
-        mime_type: str
+        self,
+        agent_id: str,
+        account_id: str,
+        file_path: str,
+        filename: str,
+        mime_type: str,
+        job_id: Optional[str] = None
     ) -> Dict[str, Any]:
+        """Ingest an uploaded file that was spooled to ``file_path``.
+
+        Re-uploading a file with unchanged contents returns the existing entry.
+        """
         try:
-            file_size = len(file_content)
+            file_size = os.path.getsize(file_path)
             if file_size > self.MAX_FILE_SIZE:
                 raise ValueError(f"File too large: {file_size} bytes (max: {self.MAX_FILE_SIZE})")
-            
+
             file_extension = Path(filename).suffix.lower()
 
             if file_extension == '.zip':
-                return await self._process_zip_file(agent_id, account_id, file_content, filename)
-            
-            content = await self._extract_file_content(file_content, filename, mime_type)
-            
+                return await self._process_zip_file(agent_id, account_id, file_path, filename, job_id)
+
+            client = await self.db.client
+            content_hash, _ = await asyncio.to_thread(extraction.hash_source, file_path)
+
+            existing = await client.table('agent_knowledge_base_entries').select('entry_id')\
+                .eq('agent_id', agent_id)\
+                .eq('source_type', 'file')\
+                .eq('file_path', filename)\
+                .eq('content_hash', content_hash)\
+                .limit(1).execute()
+            if existing.data:
+                logger.debug(f"Skipping unchanged knowledge base file {filename} for agent {agent_id}")
+                return {
+                    'success': True,
+                    'entry_id': existing.data[0]['entry_id'],
+                    'filename': filename,
+                    'skipped': True
+                }
+
+            content = await self._extract(SourceFile(path=file_path, relative_path=filename), mime_type)
+
             if not content or not content.strip():
                 raise ValueError(f"No extractable content found in {filename}")
-            
-            client = await self.db.client
-            
+
             entry_data = {
                 'agent_id': agent_id,
                 'account_id': account_id,
@@ -69,19 +288,23 @@ class FileProcessor:
                     'filename': filename,
                     'mime_type': mime_type,
                     'file_size': file_size,
-                    'extraction_method': self._get_extraction_method(file_extension, mime_type)
+                    'extraction_method': extraction.get_extraction_method(file_extension, mime_type)
                 },
+                'file_path': filename,
                 'file_size': file_size,
                 'file_mime_type': mime_type,
+                'content_hash': content_hash,
                 'usage_context': 'always',
                 'is_active': True
             }
-            
+
             result = await client.table('agent_knowledge_base_entries').insert(entry_data).execute()
-            
+
             if not result.data:
                 raise Exception("Failed to create knowledge base entry")
-            
+
+            await self.index_entries_chunks(result.data)
+
             return {
                 'success': True,
                 'entry_id': result.data[0]['entry_id'],
@@ -89,7 +312,7 @@ class FileProcessor:
                 'content_length': len(content),
                 'extraction_method': entry_data['source_metadata']['extraction_method']
             }
-            
+
         except Exception as e:
             logger.error(f"Error processing file {filename}: {str(e)}")
             return {
@@ -97,115 +320,97 @@ class FileProcessor:
                 'filename': filename,
                 'error': str(e)
             }
-    
+
     async def _process_zip_file(
-        self, 
-        agent_id: str, 
-        account_id: str, 
-        zip_content: bytes, 
-        zip_filename: str
+        self,
+        agent_id: str,
+        account_id: str,
+        zip_path: str,
+        zip_filename: str,
+        job_id: Optional[str] = None
     ) -> Dict[str, Any]:
         try:
-            client = await self.db.client
-            
-            zip_entry_data = {
-                'agent_id': agent_id,
-                'account_id': account_id,
-                'name': f"📦 {zip_filename}",
-                'description': f"ZIP archive: {zip_filename}",
-                'content': f"ZIP archive containing multiple files. Extracted files will appear as separate entries.",
-                'source_type': 'file',
-                'source_metadata': {
-                    'filename': zip_filename,
-                    'mime_type': 'application/zip',
-                    'file_size': len(zip_content),
-                    'is_zip_container': True
+            zip_size = os.path.getsize(zip_path)
+            with zipfile.ZipFile(zip_path) as zip_ref:
+                members = [info for info in zip_ref.infolist() if not info.is_dir()]
+
+            if len(members) > self.MAX_ZIP_ENTRIES:
+                raise ValueError(f"ZIP contains too many files: {len(members)} (max: {self.MAX_ZIP_ENTRIES})")
+
+            zip_container = await self._get_or_create_container(
+                agent_id,
+                {
+                    'agent_id': agent_id,
+                    'account_id': account_id,
+                    'name': f"📦 {zip_filename}",
+                    'description': f"ZIP archive: {zip_filename}",
+                    'content': f"ZIP archive containing multiple files. Extracted files will appear as separate entries.",
+                    'source_type': 'file',
+                    'source_metadata': {
+                        'filename': zip_filename,
+                        'mime_type': 'application/zip',
+                        'file_size': zip_size,
+                        'is_zip_container': True
+                    },
+                    'file_size': zip_size,
+                    'file_mime_type': 'application/zip',
+                    'usage_context': 'always',
+                    'is_active': True
                 },
-                'file_size': len(zip_content),
-                'file_mime_type': 'application/zip',
-                'usage_context': 'always',
-                'is_active': True
-            }
-            
-            zip_result = await client.table('agent_knowledge_base_entries').insert(zip_entry_data).execute()
-            zip_entry_id = zip_result.data[0]['entry_id']
-            
-            extracted_files = []
-            failed_files = []
-            
-            with zipfile.ZipFile(io.BytesIO(zip_content), 'r') as zip_ref:
-                file_list = zip_ref.namelist()
-                
-                if len(file_list) > self.MAX_ZIP_ENTRIES:
-                    raise ValueError(f"ZIP contains too many files: {len(file_list)} (max: {self.MAX_ZIP_ENTRIES})")
-                
-                for file_path in file_list:
-                    if file_path.endswith('/'):
-                        continue
-                    
-                    try:
-                        file_content = zip_ref.read(file_path)
-                        filename = os.path.basename(file_path)
-                        
-                        if not filename:
-                            continue
-                        
-                        mime_type, _ = mimetypes.guess_type(filename)
-                        if not mime_type:
-                            mime_type = 'application/octet-stream'
-                        
-                        content = await self._extract_file_content(file_content, filename, mime_type)
-                        
-                        if content and content.strip():
-                            extracted_entry_data = {
-                                'agent_id': agent_id,
-                                'account_id': account_id,
-                                'name': f"📄 {filename}",
-                                'description': f"Extracted from {zip_filename}: {file_path}",
-                                'content': content[:self.MAX_CONTENT_LENGTH],
-                                'source_type': 'zip_extracted',
-                                'source_metadata': {
-                                    'filename': filename,
-                                    'original_path': file_path,
-                                    'zip_filename': zip_filename,
-                                    'mime_type': mime_type,
-                                    'file_size': len(file_content),
-                                    'extraction_method': self._get_extraction_method(Path(filename).suffix.lower(), mime_type)
-                                },
-                                'file_size': len(file_content),
-                                'file_mime_type': mime_type,
-                                'extracted_from_zip_id': zip_entry_id,
-                                'usage_context': 'always',
-                                'is_active': True
-                            }
-                            
-                            extracted_result = await client.table('agent_knowledge_base_entries').insert(extracted_entry_data).execute()
-                            
-                            extracted_files.append({
-                                'filename': filename,
-                                'path': file_path,
-                                'entry_id': extracted_result.data[0]['entry_id'],
-                                'content_length': len(content)
-                            })
-                        
-                    except Exception as e:
-                        logger.error(f"Error extracting {file_path} from ZIP: {str(e)}")
-                        failed_files.append({
-                            'filename': os.path.basename(file_path),
-                            'path': file_path,
-                            'error': str(e)
-                        })
-            
+                {'source_metadata->>filename': zip_filename, 'source_metadata->>is_zip_container': 'true'}
+            )
+            zip_entry_id = zip_container['entry_id']
+
+            sources = [
+                SourceFile(path=zip_path, relative_path=info.filename, member=info.filename)
+                for info in members
+                if os.path.basename(info.filename) and info.file_size <= self.MAX_FILE_SIZE
+            ]
+
+            def build_entry(prepared: PreparedFile) -> Dict[str, Any]:
+                source = prepared.source
+                return {
+                    'agent_id': agent_id,
+                    'account_id': account_id,
+                    'name': f"📄 {source.filename}",
+                    'description': f"Extracted from {zip_filename}: {source.relative_path}",
+                    'content': prepared.content,
+                    'source_type': 'zip_extracted',
+                    'source_metadata': {
+                        'filename': source.filename,
+                        'original_path': source.relative_path,
+                        'zip_filename': zip_filename,
+                        'mime_type': source.mime_type,
+                        'file_size': prepared.file_size,
+                        'extraction_method': extraction.get_extraction_method(Path(source.filename).suffix.lower(), source.mime_type)
+                    },
+                    'file_path': source.relative_path,
+                    'file_size': prepared.file_size,
+                    'file_mime_type': source.mime_type,
+                    'content_hash': prepared.content_hash,
+                    'extracted_from_zip_id': zip_entry_id,
+                    'usage_context': 'always',
+                    'is_active': True
+                }
+
+            result = await self._ingest_files(zip_entry_id, sources, build_entry, job_id)
+
             return {
                 'success': True,
                 'zip_entry_id': zip_entry_id,
                 'zip_filename': zip_filename,
-                'extracted_files': extracted_files,
-                'failed_files': failed_files,
-                'total_extracted': len(extracted_files),
-                'total_failed': len(failed_files)
+                'extracted_files': [
+                    {'filename': os.path.basename(f['path']), **f} for f in result['ingested']
+                ],
+                'failed_files': [
+                    {'filename': os.path.basename(f['path']), **f} for f in result['failed']
+                ],
+                'total_extracted': len(result['ingested']),
+                'total_failed': len(result['failed']),
+                'total_skipped': result['skipped'],
+                'total_removed': result['removed']
             }
-            
+
         except Exception as e:
             logger.error(f"Error processing ZIP file {zip_filename}: {str(e)}")
             return {
@@ -213,141 +418,171 @@ class FileProcessor:
                 'zip_filename': zip_filename,
                 'error': str(e)
             }
-    
+
     async def process_git_repository(
-        self, 
-        agent_id: str, 
-        account_id: str, 
+        self,
+        agent_id: str,
+        account_id: str,
         git_url: str,
         branch: str = 'main',
         include_patterns: List[str] = None,
-        exclude_patterns: List[str] = None
+        exclude_patterns: List[str] = None,
+        job_id: Optional[str] = None
     ) -> Dict[str, Any]:
         if include_patterns is None:
             include_patterns = ['*.txt', '*.pdf', '*.docx']
-        
+
         if exclude_patterns is None:
             exclude_patterns = ['node_modules/*', '.git/*', '*.pyc', '__pycache__/*', '.env', '*.log']
-        
-        temp_dir = None
+
         try:
-            temp_dir = tempfile.mkdtemp()
-            
-            clone_cmd = ['git', 'clone', '--depth', '1', '--branch', branch, git_url, temp_dir]
-            process = await asyncio.create_subprocess_exec(
-                *clone_cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+            repo_name = git_url.split('/')[-1].replace('.git', '')
+            repo_container = await self._get_or_create_container(
+                agent_id,
+                {
+                    'agent_id': agent_id,
+                    'account_id': account_id,
+                    'name': f"🔗 {repo_name}",
+                    'description': f"Git repository: {git_url} (branch: {branch})",
+                    'content': f"Git repository cloned from {git_url}. Individual files are processed as separate entries.",
+                    'source_type': 'git_repo',
+                    'source_metadata': {
+                        'git_url': git_url,
+                        'branch': branch,
+                        'include_patterns': include_patterns,
+                        'exclude_patterns': exclude_patterns
+                    },
+                    'usage_context': 'always',
+                    'is_active': True
+                },
+                {'source_metadata->>git_url': git_url, 'source_metadata->>branch': branch}
+            )
+            repo_entry_id = repo_container['entry_id']
+            previous_metadata = repo_container['source_metadata']
+            last_sync = previous_metadata.get('last_sync') or {}
+            last_commit = last_sync.get('commit')
+            # Files outside the previous patterns were never ingested, so a pattern change needs a full listing
+            patterns_changed = (
+                last_sync.get('include_patterns') != include_patterns
+                or last_sync.get('exclude_patterns') != exclude_patterns
             )
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                raise Exception(f"Git clone failed: {stderr.decode()}")
-            
+
+            cache_dir = self._git_cache_dir(git_url, branch)
+            async with self._git_cache_lock(cache_dir):
+                commit = await self._sync_git_cache(cache_dir, git_url, branch)
+
+                if commit == last_commit and not patterns_changed:
+                    logger.info(f"Git repository {git_url} ({branch}) unchanged at {commit}")
+                    return {
+                        'success': True,
+                        'repo_entry_id': repo_entry_id,
+                        'repo_name': repo_name,
+                        'git_url': git_url,
+                        'branch': branch,
+                        'commit': commit,
+                        'previous_commit': last_commit,
+                        'processed_files': [],
+                        'failed_files': [],
+                        'total_processed': 0,
+                        'total_failed': 0,
+                        'total_skipped': 0,
+                        'total_removed': 0
+                    }
+
+                await self._git('checkout', '--force', '--detach', commit, cwd=cache_dir)
+
+                removed_paths = None
+                if last_commit and not patterns_changed and await self._git_has_commit(cache_dir, last_commit):
+                    changed_paths, removed_paths = await self._git_changed_paths(cache_dir, last_commit, commit)
+                    logger.info(
+                        f"Incremental sync of {git_url} ({branch}) {last_commit[:12]}..{commit[:12]}: "
+                        f"{len(changed_paths)} changed, {len(removed_paths)} removed"
+                    )
+                else:
+                    changed_paths = await self._git_tracked_paths(cache_dir)
+                    logger.info(f"Full sync of {git_url} ({branch}) at {commit[:12]}: {len(changed_paths)} files")
+
+                sources = []
+                for relative_path in changed_paths:
+                    if not self._should_include_file(relative_path, include_patterns, exclude_patterns):
+                        continue
+                    file_path = os.path.join(cache_dir, relative_path)
+                    if not os.path.isfile(file_path):
+                        continue
+                    if os.path.getsize(file_path) > self.MAX_FILE_SIZE:
+                        # A file that grew past the limit must not keep its old entry
+                        if removed_paths is not None:
+                            removed_paths.append(relative_path)
+                        continue
+                    sources.append(SourceFile(path=file_path, relative_path=relative_path))
+
+                def build_entry(prepared: PreparedFile) -> Dict[str, Any]:
+                    source = prepared.source
+                    return {
+                        'agent_id': agent_id,
+                        'account_id': account_id,
+                        'name': f"📄 {source.filename}",
+                        'description': f"From {repo_name}: {source.relative_path}",
+                        'content': prepared.content,
+                        'source_type': 'git_repo',
+                        'source_metadata': {
+                            'filename': source.filename,
+                            'relative_path': source.relative_path,
+                            'git_url': git_url,
+                            'branch': branch,
+                            'repo_name': repo_name,
+                            'mime_type': source.mime_type,
+                            'file_size': prepared.file_size,
+                            'extraction_method': extraction.get_extraction_method(Path(source.filename).suffix.lower(), source.mime_type)
+                        },
+                        'file_path': source.relative_path,
+                        'file_size': prepared.file_size,
+                        'file_mime_type': source.mime_type,
+                        'content_hash': prepared.content_hash,
+                        'extracted_from_zip_id': repo_entry_id,
+                        'usage_context': 'always',
+                        'is_active': True
+                    }
+
+                result = await self._ingest_files(repo_entry_id, sources, build_entry, job_id, removed_paths)
+
             client = await self.db.client
-            
-            repo_name = git_url.split('/')[-1].replace('.git', '')
-            repo_entry_data = {
-                'agent_id': agent_id,
-                'account_id': account_id,
-                'name': f"🔗 {repo_name}",
-                'description': f"Git repository: {git_url} (branch: {branch})",
-                'content': f"Git repository cloned from {git_url}. Individual files are processed as separate entries.",
-                'source_type': 'git_repo',
+            await client.table('agent_knowledge_base_entries').update({
                 'source_metadata': {
+                    **previous_metadata,
                     'git_url': git_url,
                     'branch': branch,
                     'include_patterns': include_patterns,
-                    'exclude_patterns': exclude_patterns
-                },
-                'usage_context': 'always',
-                'is_active': True
-            }
-            
-            repo_result = await client.table('agent_knowledge_base_entries').insert(repo_entry_data).execute()
-            repo_entry_id = repo_result.data[0]['entry_id']
-            
-            processed_files = []
-            failed_files = []
-            
-            for root, dirs, files in os.walk(temp_dir):
-                if '.git' in dirs:
-                    dirs.remove('.git')
-                
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    relative_path = os.path.relpath(file_path, temp_dir)
-                    
-                    if not self._should_include_file(relative_path, include_patterns, exclude_patterns):
-                        continue
-                    
-                    try:
-                        with open(file_path, 'rb') as f:
-                            file_content = f.read()
-                        
-                        if len(file_content) > self.MAX_FILE_SIZE:
-                            continue
-                        
-                        mime_type, _ = mimetypes.guess_type(file)
-                        if not mime_type:
-                            mime_type = 'application/octet-stream'
-                        
-                        content = await self._extract_file_content(file_content, file, mime_type)
-                        
-                        if content and content.strip():
-                            file_entry_data = {
-                                'agent_id': agent_id,
-                                'account_id': account_id,
-                                'name': f"📄 {file}",
-                                'description': f"From {repo_name}: {relative_path}",
-                                'content': content[:self.MAX_CONTENT_LENGTH],
-                                'source_type': 'git_repo',
-                                'source_metadata': {
-                                    'filename': file,
-                                    'relative_path': relative_path,
-                                    'git_url': git_url,
-                                    'branch': branch,
-                                    'repo_name': repo_name,
-                                    'mime_type': mime_type,
-                                    'file_size': len(file_content),
-                                    'extraction_method': self._get_extraction_method(Path(file).suffix.lower(), mime_type)
-                                },
-                                'file_size': len(file_content),
-                                'file_mime_type': mime_type,
-                                'extracted_from_zip_id': repo_entry_id,
-                                'usage_context': 'always',
-                                'is_active': True
-                            }
-                            
-                            file_result = await client.table('agent_knowledge_base_entries').insert(file_entry_data).execute()
-                            
-                            processed_files.append({
-                                'filename': file,
-                                'relative_path': relative_path,
-                                'entry_id': file_result.data[0]['entry_id'],
-                                'content_length': len(content)
-                            })
-                    
-                    except Exception as e:
-                        logger.error(f"Error processing {relative_path} from git repo: {str(e)}")
-                        failed_files.append({
-                            'filename': file,
-                            'relative_path': relative_path,
-                            'error': str(e)
-                        })
-            
+                    'exclude_patterns': exclude_patterns,
+                    'last_sync': {
+                        'commit': commit,
+                        'include_patterns': include_patterns,
+                        'exclude_patterns': exclude_patterns,
+                        'synced_at': datetime.now(timezone.utc).isoformat()
+                    }
+                }
+            }).eq('entry_id', repo_entry_id).execute()
+
             return {
                 'success': True,
                 'repo_entry_id': repo_entry_id,
                 'repo_name': repo_name,
                 'git_url': git_url,
                 'branch': branch,
-                'processed_files': processed_files,
-                'failed_files': failed_files,
-                'total_processed': len(processed_files),
-                'total_failed': len(failed_files)
+                'commit': commit,
+                'previous_commit': last_commit,
+                'processed_files': [
+                    {'filename': os.path.basename(f['path']), 'relative_path': f['path'], **f} for f in result['ingested']
+                ],
+                'failed_files': [
+                    {'filename': os.path.basename(f['path']), 'relative_path': f['path'], **f} for f in result['failed']
+                ],
+                'total_processed': len(result['ingested']),
+                'total_failed': len(result['failed']),
+                'total_skipped': result['skipped'],
+                'total_removed': result['removed']
             }
-            
+
         except Exception as e:
             logger.error(f"Error processing git repository {git_url}: {str(e)}")
             return {
@@ -355,99 +590,271 @@ class FileProcessor:
                 'git_url': git_url,
                 'error': str(e)
             }
-        
-        finally:
-            if temp_dir and os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir, ignore_errors=True)
-    
-    async def _extract_file_content(self, file_content: bytes, filename: str, mime_type: str) -> str:
-        file_extension = Path(filename).suffix.lower()
-        
+
+    def _git_cache_dir(self, git_url: str, branch: str) -> str:
+        cache_root = config.KB_GIT_CACHE_DIR or os.path.join(tempfile.gettempdir(), 'kb_git_cache')
+        os.makedirs(cache_root, exist_ok=True)
+        key = hashlib.sha256(f"{git_url}|{branch}".encode()).hexdigest()[:32]
+        return os.path.join(cache_root, key)
+
+    @asynccontextmanager
+    async def _git_cache_lock(self, cache_dir: str):
+        """Serialize syncs of the same clone across jobs and worker processes.
+
+        The lock is polled without blocking, so a long sync holds no thread of
+        the default executor while others wait for it.
+        """
+        lock_file = open(f"{cache_dir}.lock", 'w')
         try:
-            if file_extension in self.SUPPORTED_TEXT_EXTENSIONS or mime_type.startswith('text/'):
-                return self._extract_text_content(file_content)
-            
-            elif file_extension == '.pdf':
-                return self._extract_pdf_content(file_content)
-            
-            elif file_extension == '.docx':
-                return self._extract_docx_content(file_content)
-            
-            else:
-                raise ValueError(f"Unsupported file format: {file_extension}. Only .txt, .pdf, and .docx files are supported.")
-        
-        except Exception as e:
-            logger.error(f"Error extracting content from {filename}: {str(e)}")
-            return f"Error extracting content: {str(e)}"
-    
-    def _extract_text_content(self, file_content: bytes) -> str:
-        detected = chardet.detect(file_content)
-        encoding = detected.get('encoding', 'utf-8')
-        
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(self.GIT_LOCK_POLL_SECONDS)
+            yield
+        finally:
+            lock_file.close()
+
+    async def _sync_git_cache(self, cache_dir: str, git_url: str, branch: str) -> str:
+        """Bring the cached clone of a branch up to date and return the branch's head commit.
+
+        The clone is kept between syncs so only new objects are fetched. It is
+        a blobless clone: file contents are downloaded when checked out.
+        """
+        remote_ref = f"refs/remotes/origin/{branch}"
+        if os.path.isdir(os.path.join(cache_dir, '.git')):
+            try:
+                await self._git('fetch', '--prune', 'origin', f"+refs/heads/{branch}:{remote_ref}", cwd=cache_dir)
+                return (await self._git('rev-parse', remote_ref, cwd=cache_dir)).strip()
+            except Exception as e:
+                logger.warning(f"Fetch into cached clone of {git_url} failed, cloning again: {e}")
+
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        await self._git(
+            'clone', '--filter=blob:none', '--no-checkout', '--single-branch', '--branch', branch, git_url, cache_dir
+        )
+        return (await self._git('rev-parse', remote_ref, cwd=cache_dir)).strip()
+
+    async def _git_has_commit(self, cache_dir: str, commit: str) -> bool:
         try:
-            raw_text = file_content.decode(encoding)
-        except UnicodeDecodeError:
-            raw_text = file_content.decode('utf-8', errors='replace')
-        
-        return self._sanitize_content(raw_text)
-    
-    def _extract_pdf_content(self, file_content: bytes) -> str:
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-        text_content = []
-        
-        for page in pdf_reader.pages:
-            text_content.append(page.extract_text())
-        
-        raw_text = '\n\n'.join(text_content)
-        return self._sanitize_content(raw_text)
-    
-    def _extract_docx_content(self, file_content: bytes) -> str:
-        doc = docx.Document(io.BytesIO(file_content))
-        text_content = []
-        
-        for paragraph in doc.paragraphs:
-            text_content.append(paragraph.text)
-        
-        raw_text = '\n'.join(text_content)
-        return self._sanitize_content(raw_text)
-    
-    
-    def _sanitize_content(self, content: str) -> str:
-        if not content:
-            return content
-
-        sanitized = ''.join(char for char in content if ord(char) >= 32 or char in '\n\r\t')
-
-        sanitized = sanitized.replace('\x00', '')
-        sanitized = sanitized.replace('\u0000', '')
-        
-        sanitized = sanitized.replace('\ufeff', '')
-        
-        sanitized = sanitized.replace('\r\n', '\n').replace('\r', '\n')
-
-        sanitized = re.sub(r'\n{4,}', '\n\n\n', sanitized)
-
-        return sanitized.strip()
-
-    def _get_extraction_method(self, file_extension: str, mime_type: str) -> str:
-        if file_extension == '.pdf':
-            return 'PyPDF2'
-        elif file_extension == '.docx':
-            return 'python-docx'
-        elif file_extension == '.txt':
-            return 'text encoding detection'
+            await self._git('cat-file', '-e', f"{commit}^{{commit}}", cwd=cache_dir)
+            return True
+        except Exception:
+            return False
+
+    async def _git_changed_paths(self, cache_dir: str, old_commit: str, new_commit: str):
+        """Paths added or modified, and paths deleted, between two commits."""
+        output = await self._git(
+            'diff', '--name-status', '-z', '--no-renames', old_commit, new_commit, cwd=cache_dir
+        )
+        fields = output.split('\0')
+        changed, removed = [], []
+        for status, path in zip(fields[0::2], fields[1::2]):
+            if status == 'D':
+                removed.append(path)
+            elif status:
+                changed.append(path)
+        return changed, removed
+
+    async def _git_tracked_paths(self, cache_dir: str) -> List[str]:
+        output = await self._git('ls-files', '-z', cwd=cache_dir)
+        return [path for path in output.split('\0') if path]
+
+    async def _git(self, *args: str, cwd: Optional[str] = None) -> str:
+        process = await asyncio.create_subprocess_exec(
+            'git', *args,
+            cwd=cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await process.communicate()
+
+        if process.returncode != 0:
+            raise Exception(f"Git {args[0]} failed: {stderr.decode(errors='replace').strip()}")
+        return stdout.decode(errors='replace')
+
+    async def _get_or_create_container(self, agent_id: str, entry_data: Dict[str, Any], match: Dict[str, str]) -> Dict[str, Any]:
+        """Reuse the container entry of an earlier ingestion of the same source, or create one.
+
+        Returns the entry's id and its source metadata from before this call;
+        new metadata is merged over the stored one.
+        """
+        client = await self.db.client
+        query = client.table('agent_knowledge_base_entries').select('entry_id, source_metadata')\
+            .eq('agent_id', agent_id)\
+            .eq('source_type', entry_data['source_type'])\
+            .is_('extracted_from_zip_id', 'null')
+        for column, value in match.items():
+            query = query.eq(column, value)
+        existing = await query.order('created_at', desc=True).limit(1).execute()
+
+        if existing.data:
+            container = existing.data[0]
+            previous_metadata = container.get('source_metadata') or {}
+            await client.table('agent_knowledge_base_entries').update({
+                'source_metadata': {**previous_metadata, **entry_data['source_metadata']},
+                'file_size': entry_data.get('file_size')
+            }).eq('entry_id', container['entry_id']).execute()
+            return {'entry_id': container['entry_id'], 'source_metadata': previous_metadata}
+
+        result = await client.table('agent_knowledge_base_entries').insert(entry_data).execute()
+        return {'entry_id': result.data[0]['entry_id'], 'source_metadata': {}}
+
+    async def _ingest_files(
+        self,
+        container_id: str,
+        sources: List[SourceFile],
+        build_entry,
+        job_id: Optional[str] = None,
+        removed_paths: Optional[Iterable[str]] = None
+    ) -> Dict[str, Any]:
+        """Extract and store the files of a container entry.
+
+        Files are hashed first; files whose hash matches the entry stored for
+        the same path are skipped, the rest are extracted in the process pool
+        with bounded concurrency and written in batches.
+
+        Without ``removed_paths`` the sources are a full snapshot and entries
+        for paths not among them are removed. With ``removed_paths`` (an
+        incremental update) only the entries for those paths are removed and
+        only the entries of the given paths are looked up.
+        """
+        client = await self.db.client
+        if removed_paths is None:
+            existing = await self._existing_children(container_id)
         else:
-            return 'text encoding detection'
-    
+            removed_paths = set(removed_paths)
+            existing = await self._existing_children(
+                container_id, [source.relative_path for source in sources] + list(removed_paths)
+            )
+        progress = IngestionProgress(job_id)
+        progress.total_files = len(sources)
+        await progress.report(force=True)
+
+        ingested: List[Dict[str, Any]] = []
+        failed: List[Dict[str, Any]] = []
+        pending_new: List[Dict[str, Any]] = []
+        pending_changed: List[Dict[str, Any]] = []
+
+        async def flush():
+            if pending_new:
+                result = await client.table('agent_knowledge_base_entries').insert(list(pending_new)).execute()
+                rows = result.data or []
+                await self.index_entries_chunks(rows)
+                ingested.extend({'path': row['file_path'], 'entry_id': row['entry_id'], 'content_length': len(row['content'])} for row in rows)
+                pending_new.clear()
+            if pending_changed:
+                result = await client.table('agent_knowledge_base_entries').upsert(list(pending_changed)).execute()
+                rows = result.data or []
+                await self.index_entries_chunks(rows)
+                ingested.extend({'path': row['file_path'], 'entry_id': row['entry_id'], 'content_length': len(row['content'])} for row in rows)
+                pending_changed.clear()
+
+        async def collect(done: Iterable[asyncio.Task]):
+            for task in done:
+                prepared: PreparedFile = task.result()
+                if prepared.status == 'new':
+                    pending_new.append(build_entry(prepared))
+                elif prepared.status == 'changed':
+                    pending_changed.append({'entry_id': prepared.entry_id, **build_entry(prepared)})
+                elif prepared.status == 'failed':
+                    failed.append({'path': prepared.source.relative_path, 'error': prepared.error})
+                await progress.file_done(prepared.source.relative_path, prepared.status)
+            if len(pending_new) + len(pending_changed) >= self.ENTRY_BATCH_SIZE:
+                await flush()
+
+        concurrency = max(1, config.KB_EXTRACTION_WORKERS * 2)
+        in_flight = set()
+        for source in sources:
+            if len(in_flight) >= concurrency:
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                await collect(done)
+            in_flight.add(asyncio.create_task(self._prepare_file(source, existing.get(source.relative_path))))
+        if in_flight:
+            done, _ = await asyncio.wait(in_flight)
+            await collect(done)
+        await flush()
+
+        if removed_paths is None:
+            seen = {source.relative_path for source in sources}
+            removed = [entry['entry_id'] for path, entry in existing.items() if path not in seen]
+        else:
+            removed = [existing[path]['entry_id'] for path in removed_paths if path in existing]
+        if removed:
+            await client.table('agent_knowledge_base_entries').delete().in_('entry_id', removed).execute()
+
+        await progress.report(force=True)
+        return {'ingested': ingested, 'failed': failed, 'skipped': progress.skipped, 'removed': len(removed)}
+
+    async def _existing_children(self, container_id: str, paths: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Entries previously extracted into a container, keyed by file path; optionally only for ``paths``."""
+        client = await self.db.client
+        existing = {}
+        if paths is not None:
+            for start in range(0, len(paths), self.PATH_LOOKUP_BATCH_SIZE):
+                result = await client.table('agent_knowledge_base_entries').select('entry_id, file_path, content_hash')\
+                    .eq('extracted_from_zip_id', container_id)\
+                    .in_('file_path', paths[start:start + self.PATH_LOOKUP_BATCH_SIZE]).execute()
+                for row in result.data or []:
+                    existing[row['file_path']] = row
+            return existing
+
+        batch_size = 1000
+        offset = 0
+        while True:
+            result = await client.table('agent_knowledge_base_entries').select('entry_id, file_path, content_hash')\
+                .eq('extracted_from_zip_id', container_id)\
+                .order('entry_id')\
+                .range(offset, offset + batch_size - 1).execute()
+            for row in result.data or []:
+                if row.get('file_path'):
+                    existing[row['file_path']] = row
+            if not result.data or len(result.data) < batch_size:
+                return existing
+            offset += batch_size
+
+    async def _prepare_file(self, source: SourceFile, existing: Optional[Dict[str, Any]]) -> PreparedFile:
+        try:
+            content_hash, file_size = await asyncio.to_thread(extraction.hash_source, source.path, source.member)
+            if existing and existing.get('content_hash') == content_hash:
+                return PreparedFile(source, 'unchanged', content_hash=content_hash, file_size=file_size, entry_id=existing['entry_id'])
+
+            content = await self._extract(source, source.mime_type)
+            if not content or not content.strip():
+                return PreparedFile(source, 'failed', error="No extractable content")
+
+            return PreparedFile(
+                source,
+                'changed' if existing else 'new',
+                content=content[:self.MAX_CONTENT_LENGTH],
+                content_hash=content_hash,
+                file_size=file_size,
+                entry_id=existing['entry_id'] if existing else None
+            )
+        except Exception as e:
+            logger.error(f"Error extracting {source.relative_path}: {str(e)}")
+            return PreparedFile(source, 'failed', error=str(e))
+
+    async def _extract(self, source: SourceFile, mime_type: str) -> str:
+        """Extract text from a source in the process pool."""
+        if not extraction.is_supported(source.filename, mime_type):
+            raise ValueError(f"Unsupported file format: {Path(source.filename).suffix.lower()}. Only .txt, .pdf, and .docx files are supported.")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            get_extraction_pool(),
+            partial(extraction.extract_source, source.path, source.member, source.filename, mime_type, self.MAX_FILE_SIZE)
+        )
+
     def _should_include_file(self, file_path: str, include_patterns: List[str], exclude_patterns: List[str]) -> bool:
         import fnmatch
-        
+
         for pattern in exclude_patterns:
             if fnmatch.fnmatch(file_path, pattern):
                 return False
-        
+
         for pattern in include_patterns:
             if fnmatch.fnmatch(file_path, pattern):
                 return True
-        
-        return False 
\ No newline at end of file
+
+        return False
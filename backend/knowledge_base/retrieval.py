@@ -0,0 +1,100 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Set
+
+from utils.logger import logger
+
+DEFAULT_CONTEXT_TOKENS = 4000
+MAX_CONTEXT_CHUNKS = 40
+QUERY_MAX_CHARS = 2000
+
+CONTEXT_HEADER = "# AGENT KNOWLEDGE BASE\n\nThe following is your specialized knowledge base. Use this information as context when responding:"
+
+_usage_log_tasks: Set[asyncio.Task] = set()
+
+
+def message_query_text(message: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Text of a user message's content, used as the knowledge base search query."""
+    if not message:
+        return None
+    content = message.get('content')
+    if isinstance(content, list):
+        content = ' '.join(part.get('text', '') for part in content if isinstance(part, dict))
+    if not isinstance(content, str) or not content.strip():
+        return None
+    return content[:QUERY_MAX_CHARS]
+
+
+async def search_knowledge_base(
+    client,
+    agent_id: str,
+    query: Optional[str] = None,
+    max_tokens: int = DEFAULT_CONTEXT_TOKENS,
+    max_chunks: int = MAX_CONTEXT_CHUNKS,
+) -> List[Dict[str, Any]]:
+    result = await client.rpc('search_agent_knowledge_base', {
+        'p_agent_id': agent_id,
+        'p_query': query,
+        'p_max_tokens': max_tokens,
+        'p_max_chunks': max_chunks,
+    }).execute()
+    return result.data or []
+
+
+def format_knowledge_base_context(chunks: List[Dict[str, Any]]) -> Optional[str]:
+    """Group chunks under their entry's heading, in the order they were returned."""
+    if not chunks:
+        return None
+
+    sections = []
+    current_entry = None
+    previous_index = None
+    for chunk in chunks:
+        if chunk['entry_id'] != current_entry:
+            current_entry = chunk['entry_id']
+            section = f"## {chunk['entry_name']}\n"
+            if chunk.get('entry_description'):
+                section += f"{chunk['entry_description']}\n\n"
+            sections.append(section + chunk['content'])
+        else:
+            # Mark gaps between non-adjacent chunks of the same entry
+            separator = "\n\n" if chunk['chunk_index'] == previous_index + 1 else "\n\n[...]\n\n"
+            sections[-1] += separator + chunk['content']
+        previous_index = chunk['chunk_index']
+
+    return CONTEXT_HEADER + "\n\n" + "\n\n".join(sections)
+
+
+async def log_knowledge_base_usage(client, agent_id: str, chunks: List[Dict[str, Any]], usage_type: str = 'context_injection') -> None:
+    """Record one usage row per entry for all chunks injected into a prompt, in a single insert."""
+    tokens_by_entry: Dict[str, int] = {}
+    for chunk in chunks:
+        tokens_by_entry[chunk['entry_id']] = tokens_by_entry.get(chunk['entry_id'], 0) + (chunk.get('content_tokens') or 0)
+    if not tokens_by_entry:
+        return
+
+    try:
+        await client.table('agent_knowledge_base_usage_log').insert([
+            {'entry_id': entry_id, 'agent_id': agent_id, 'usage_type': usage_type, 'tokens_used': tokens}
+            for entry_id, tokens in tokens_by_entry.items()
+        ]).execute()
+    except Exception as e:
+        logger.warning(f"Failed to log knowledge base usage for agent {agent_id}: {e}")
+
+
+async def fetch_knowledge_base_context(
+    client,
+    agent_id: str,
+    query: Optional[str] = None,
+    max_tokens: int = DEFAULT_CONTEXT_TOKENS,
+    log_usage: bool = True,
+) -> Optional[str]:
+    """Build the prompt section for the knowledge base chunks most relevant to ``query``.
+
+    Usage is logged in the background so it stays off the run's critical path.
+    """
+    chunks = await search_knowledge_base(client, agent_id, query, max_tokens)
+    if log_usage and chunks:
+        task = asyncio.create_task(log_knowledge_base_usage(client, agent_id, chunks))
+        _usage_log_tasks.add(task)
+        task.add_done_callback(_usage_log_tasks.discard)
+    return format_knowledge_base_context(chunks)
@@ -17,7 +17,7 @@ from services.supabase import DBConnection
 from services import redis
 from dramatiq.brokers.redis import RedisBroker
 import os
-from services.langfuse import langfuse
+from services import tracing
 from utils.retry import retry
 
 import sentry_sdk
@@ -172,7 +172,7 @@ async def run_agent_background(
             logger.error(f"Error in stop signal checker for {agent_run_id}: {e}", exc_info=True)
             stop_signal_received = True # Stop the run if the checker fails
 
-    trace = langfuse.trace(name="agent_run", id=agent_run_id, session_id=thread_id, metadata={"project_id": project_id, "instance_id": instance_id})
+    trace = tracing.trace(name="agent_run", id=agent_run_id, session_id=thread_id, metadata={"project_id": project_id, "instance_id": instance_id})
     try:
         # Setup Pub/Sub listener for control signals
         pubsub = await redis.create_pubsub()
@@ -0,0 +1,249 @@
+"""
+Per-project sandbox broker shared by all sandbox tools of a run.
+
+Every SandboxToolsBase instance registered for a run asks the same broker for
+its sandbox, so the project lookup, start and lazy creation happen once. The
+lookup is single-flight behind a per-project asyncio lock, and lazy creation
+is additionally guarded by a Redis lock so two workers never both create a
+sandbox for the same project. The handle and preview links are cached and only
+re-validated after a caller reports a failure.
+"""
+
+import asyncio
+import uuid
+import weakref
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from daytona_sdk import AsyncSandbox
+
+from services import redis
+from services.supabase import DBConnection
+from sandbox.sandbox import get_or_start_sandbox, delete_sandbox
+from sandbox.pool import provision_project_sandbox
+from sandbox.file_cache import SandboxFileCache
+from utils.logger import logger
+
+CREATE_LOCK_TTL = 180
+CREATE_LOCK_WAIT_TIMEOUT = 240
+CREATE_LOCK_POLL_INTERVAL = 0.5
+
+
+@dataclass
+class SandboxPreviewLinks:
+    vnc_preview: Optional[str] = None
+    sandbox_url: Optional[str] = None
+    token: Optional[str] = None
+
+
+def extract_preview_url(link) -> Optional[str]:
+    if hasattr(link, 'url'):
+        return link.url
+    return str(link).split("url='")[1].split("'")[0]
+
+
+def extract_preview_token(link) -> Optional[str]:
+    if hasattr(link, 'token'):
+        return link.token
+    if "token='" in str(link):
+        return str(link).split("token='")[1].split("'")[0]
+    return None
+
+
+class SandboxBroker:
+    """Resolves and caches the sandbox handle for one project."""
+
+    def __init__(self, project_id: str, db: Optional[DBConnection] = None):
+        self.project_id = project_id
+        self.db = db or DBConnection()
+        self.sandbox: Optional[AsyncSandbox] = None
+        self.sandbox_id: Optional[str] = None
+        self.sandbox_pass: Optional[str] = None
+        self.preview_links = SandboxPreviewLinks()
+        self._preview_endpoints: Dict[int, Tuple[str, Optional[str]]] = {}
+        self._lock = asyncio.Lock()
+        # File contents read or written by this run's tools
+        self.file_cache = SandboxFileCache()
+        self._close_callbacks: List[Callable[[], Awaitable[None]]] = []
+
+    async def get_sandbox(self) -> AsyncSandbox:
+        """Return the project's sandbox, looking it up, starting or creating it once."""
+        if self.sandbox is not None:
+            return self.sandbox
+
+        async with self._lock:
+            if self.sandbox is not None:
+                return self.sandbox
+
+            sandbox_info = await self._fetch_sandbox_info()
+            if not sandbox_info.get('id'):
+                sandbox_info = await self._create_with_lock()
+
+            self._remember(sandbox_info)
+            self.sandbox = await get_or_start_sandbox(self.sandbox_id)
+            return self.sandbox
+
+    async def get_preview_url(self, port: int) -> str:
+        """Return the preview URL for a sandbox port, cached for the broker's lifetime."""
+        url, _ = await self.get_preview_endpoint(port)
+        return url
+
+    async def get_preview_endpoint(self, port: int) -> Tuple[str, Optional[str]]:
+        """Return ``(url, token)`` of the preview link for a sandbox port, cached like get_preview_url."""
+        if port not in self._preview_endpoints:
+            sandbox = await self.get_sandbox()
+            link = await sandbox.get_preview_link(port)
+            self._preview_endpoints[port] = (extract_preview_url(link), extract_preview_token(link))
+        return self._preview_endpoints[port]
+
+    async def invalidate(self) -> None:
+        """Drop the cached handle so the next get_sandbox re-validates it."""
+        async with self._lock:
+            self.sandbox = None
+            self.file_cache.clear()
+
+    def on_close(self, callback: Callable[[], Awaitable[None]]) -> None:
+        """Register a coroutine function that releases a resource tied to this broker."""
+        self._close_callbacks.append(callback)
+
+    async def aclose(self) -> None:
+        """Release the resources registered with on_close, e.g. pooled HTTP clients."""
+        callbacks, self._close_callbacks = self._close_callbacks, []
+        for callback in callbacks:
+            try:
+                await callback()
+            except Exception as e:
+                logger.warning(f"Error releasing sandbox broker resource for project {self.project_id}: {e}")
+
+    async def _fetch_sandbox_info(self) -> dict:
+        client = await self.db.client
+        project = await client.table('projects').select('sandbox').eq('project_id', self.project_id).execute()
+        if not project.data or len(project.data) == 0:
+            raise ValueError(f"Project {self.project_id} not found")
+        return project.data[0].get('sandbox') or {}
+
+    def _remember(self, sandbox_info: dict) -> None:
+        self.sandbox_id = sandbox_info['id']
+        self.sandbox_pass = sandbox_info.get('pass')
+        self.preview_links = SandboxPreviewLinks(
+            vnc_preview=sandbox_info.get('vnc_preview'),
+            sandbox_url=sandbox_info.get('sandbox_url'),
+            token=sandbox_info.get('token'),
+        )
+        self._preview_endpoints = {}
+        if self.preview_links.sandbox_url:
+            self._preview_endpoints[8080] = (self.preview_links.sandbox_url, self.preview_links.token)
+
+    async def _create_with_lock(self) -> dict:
+        lock_key = f"sandbox_create_lock:{self.project_id}"
+        lock_token = str(uuid.uuid4())
+        acquired = await self._acquire_create_lock(lock_key, lock_token)
+        try:
+            # Another worker may have finished creating it while we waited
+            sandbox_info = await self._fetch_sandbox_info()
+            if sandbox_info.get('id'):
+                return sandbox_info
+            return await self._create_sandbox()
+        finally:
+            if acquired:
+                await self._release_create_lock(lock_key, lock_token)
+
+    async def _acquire_create_lock(self, lock_key: str, lock_token: str) -> bool:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + CREATE_LOCK_WAIT_TIMEOUT
+        while True:
+            try:
+                if await redis.set(lock_key, lock_token, ex=CREATE_LOCK_TTL, nx=True):
+                    return True
+            except Exception as e:
+                # Without Redis fall back to the in-process lock only
+                logger.warning(f"Failed to acquire sandbox create lock for project {self.project_id}: {e}")
+                return False
+
+            if loop.time() >= deadline:
+                raise TimeoutError(f"Timed out waiting for sandbox creation lock for project {self.project_id}")
+
+            sandbox_info = await self._fetch_sandbox_info()
+            if sandbox_info.get('id'):
+                return False
+            await asyncio.sleep(CREATE_LOCK_POLL_INTERVAL)
+
+    async def _release_create_lock(self, lock_key: str, lock_token: str) -> None:
+        try:
+            if await redis.get(lock_key) == lock_token:
+                await redis.delete(lock_key)
+        except Exception as e:
+            logger.warning(f"Failed to release sandbox create lock for project {self.project_id}: {e}")
+
+    async def _create_sandbox(self) -> dict:
+        logger.debug(f"No sandbox recorded for project {self.project_id}; creating lazily")
+        client = await self.db.client
+        # Comes from the warm pool when possible; either way services are probed ready
+        sandbox_obj, sandbox_pass = await provision_project_sandbox(self.project_id)
+        sandbox_id = sandbox_obj.id
+
+        # Gather preview links and token (best-effort parsing)
+        try:
+            vnc_link = await sandbox_obj.get_preview_link(6080)
+            website_link = await sandbox_obj.get_preview_link(8080)
+            vnc_url = extract_preview_url(vnc_link)
+            website_url = extract_preview_url(website_link)
+            token = extract_preview_token(vnc_link)
+        except Exception:
+            # If preview link extraction fails, still proceed but leave fields None
+            logger.warning(f"Failed to extract preview links for sandbox {sandbox_id}", exc_info=True)
+            vnc_url = None
+            website_url = None
+            token = None
+
+        sandbox_info = {
+            'id': sandbox_id,
+            'pass': sandbox_pass,
+            'vnc_preview': vnc_url,
+            'sandbox_url': website_url,
+            'token': token
+        }
+
+        # Persist sandbox metadata to project record
+        update_result = await client.table('projects').update({
+            'sandbox': sandbox_info
+        }).eq('project_id', self.project_id).execute()
+
+        if not update_result.data:
+            # Cleanup created sandbox if DB update failed
+            try:
+                await delete_sandbox(sandbox_id)
+            except Exception:
+                logger.error(f"Failed to delete sandbox {sandbox_id} after DB update failure", exc_info=True)
+            raise Exception("Database update failed when storing sandbox metadata")
+
+        return sandbox_info
+
+
+_brokers: "weakref.WeakKeyDictionary[object, Dict[str, SandboxBroker]]" = weakref.WeakKeyDictionary()
+
+
+def get_sandbox_broker(owner: Optional[object], project_id: str) -> SandboxBroker:
+    """Return the broker for ``project_id`` shared by everything using ``owner``.
+
+    Tools pass their ThreadManager as the owner, so all tools of one run share
+    a broker and it is released together with the run.
+    """
+    if owner is None:
+        return SandboxBroker(project_id)
+
+    brokers = _brokers.setdefault(owner, {})
+    broker = brokers.get(project_id)
+    if broker is None:
+        db = getattr(owner, 'db', None)
+        broker = SandboxBroker(project_id, db=db)
+        brokers[project_id] = broker
+    return broker
+
+
+async def release_sandbox_brokers(owner: Optional[object]) -> None:
+    """Close the brokers of ``owner`` when its run ends."""
+    if owner is None:
+        return
+    for broker in (_brokers.pop(owner, None) or {}).values():
+        await broker.aclose()
@@ -0,0 +1,115 @@
+"""
+Per-run cache of sandbox file contents.
+
+Sandbox tools of one run often read a file they have just written (edit
+loops, sheet updates, presentation exports). The cache keeps recently read or
+written contents keyed by path and validates every hit against the file's
+current mtime and size from ``get_file_info``, which is a cheap metadata call.
+Changes made out of band, e.g. from a shell command, change the metadata and
+turn the next read into a miss. Writes through the cache store the new
+contents without a metadata call; their mtime is unknown until the next read,
+which accepts the entry if the size matches and records the mtime from then on.
+
+Files whose size and mtime (seconds resolution) are both unchanged after an
+out-of-band rewrite are indistinguishable; tools that shell out to modify a
+file they also read through the cache should call ``invalidate``.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from daytona_sdk import AsyncSandbox
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+# Files above this size are passed through without being cached
+DEFAULT_MAX_ENTRY_BYTES = 8 * 1024 * 1024
+
+
+@dataclass
+class _CachedFile:
+    mod_time: Any  # None until the first read after a write through the cache
+    size: int
+    data: bytes
+
+
+class SandboxFileCache:
+    """Size-bounded LRU cache of file contents for one sandbox."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_entry_bytes: int = DEFAULT_MAX_ENTRY_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries: "OrderedDict[str, _CachedFile]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def read(self, sandbox: AsyncSandbox, path: str, file_info: Optional[Any] = None) -> bytes:
+        """Return the file's contents, downloading only when they changed.
+
+        ``file_info`` may be passed when the caller already fetched it.
+        Raises FileNotFoundError when the path does not exist.
+        """
+        if file_info is None:
+            try:
+                file_info = await sandbox.fs.get_file_info(path)
+            except Exception as e:
+                self.invalidate(path)
+                raise FileNotFoundError(path) from e
+
+        if file_info.is_dir:
+            raise IsADirectoryError(path)
+
+        entry = self._entries.get(path)
+        if entry and entry.size == file_info.size and entry.mod_time in (None, file_info.mod_time):
+            entry.mod_time = file_info.mod_time
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return entry.data
+
+        self.misses += 1
+        data = await sandbox.fs.download_file(path)
+        self._store(path, file_info.mod_time, file_info.size, data)
+        return data
+
+    async def write(self, sandbox: AsyncSandbox, path: str, data: bytes) -> None:
+        """Upload a file and keep its new contents cached."""
+        self.invalidate(path)
+        await sandbox.fs.upload_file(data, path)
+        self.update(path, data)
+
+    def update(self, path: str, data: bytes) -> None:
+        """Record contents that were just written to ``path``, e.g. by a remote patch.
+
+        The entry is validated by the next read.
+        """
+        self._store(path, None, len(data), data)
+
+    def peek(self, path: str) -> Optional[bytes]:
+        """Cached contents of ``path`` without validating them against the sandbox.
+
+        Only for callers that verify the contents themselves, e.g. as the
+        expected hash of a remote patch.
+        """
+        entry = self._entries.get(path)
+        return entry.data if entry else None
+
+    def invalidate(self, path: str) -> None:
+        entry = self._entries.pop(path, None)
+        if entry:
+            self._size -= len(entry.data)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+
+    def _store(self, path: str, mod_time: Any, size: int, data: bytes) -> None:
+        self.invalidate(path)
+        if len(data) > self.max_entry_bytes:
+            return
+
+        self._entries[path] = _CachedFile(mod_time=mod_time, size=size, data=data)
+        self._size += len(data)
+        while self._size > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted.data)
@@ -0,0 +1,198 @@
+"""
+Warm sandbox pool.
+
+Keeps ``SANDBOX_POOL_SIZE`` sandboxes per snapshot created, supervisord-started
+and probed ready ahead of time, so the first sandbox tool call of a project
+does not pay for snapshot creation. Pool entries live in a Redis list shared
+by all processes; a project claims one with an atomic LPOP and the sandbox is
+relabeled to the project. Pool members are created with auto-stop disabled,
+so they stay warm while waiting; a claim applies the normal intervals. Claims
+trigger a background refill, and the API process also refills on a timer.
+
+The Daytona client is injected, so the pool can be exercised against a local
+stub exposing ``create``/``get``/``start``/``delete``.
+"""
+
+import asyncio
+import json
+import uuid
+from typing import Optional, Tuple
+
+from daytona_sdk import AsyncSandbox, SandboxState
+
+from services import redis
+from sandbox.sandbox import (
+    SANDBOX_AUTO_ARCHIVE_INTERVAL,
+    SANDBOX_AUTO_STOP_INTERVAL,
+    daytona,
+    build_sandbox_params,
+    create_sandbox,
+    start_supervisord_session,
+    wait_for_sandbox_ready,
+)
+from utils.config import config, Configuration
+from utils.logger import logger
+
+POOL_LABEL = 'pool'
+REFILL_LOCK_TTL = 300
+MAX_CLAIM_ATTEMPTS = 3
+
+
+class SandboxPool:
+    def __init__(self, daytona_client=None, snapshot: Optional[str] = None, size: Optional[int] = None):
+        self.daytona = daytona_client or daytona
+        self.snapshot = snapshot or Configuration.SANDBOX_SNAPSHOT_NAME
+        self.size = config.SANDBOX_POOL_SIZE if size is None else size
+        self._refill_lock = asyncio.Lock()
+        self._refill_task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    @property
+    def pool_key(self) -> str:
+        return f"sandbox_pool:{self.snapshot}"
+
+    async def acquire(self, project_id: str) -> Optional[Tuple[AsyncSandbox, str]]:
+        """Claim a warm sandbox for ``project_id``.
+
+        Returns ``(sandbox, vnc_password)``, or None when the pool is empty or
+        disabled and the caller should create a sandbox itself.
+        """
+        if not self.enabled:
+            return None
+
+        try:
+            for _ in range(MAX_CLAIM_ATTEMPTS):
+                raw = await redis.lpop(self.pool_key)
+                if not raw:
+                    logger.debug(f"Sandbox pool {self.snapshot} is empty")
+                    return None
+
+                entry = json.loads(raw)
+                try:
+                    sandbox = await self._claim(entry['id'], project_id)
+                    logger.info(f"Assigned pooled sandbox {sandbox.id} to project {project_id}")
+                    return sandbox, entry['pass']
+                except Exception as e:
+                    logger.warning(f"Discarding pooled sandbox {entry.get('id')}: {e}")
+                    await self._discard(entry['id'])
+            return None
+        except Exception as e:
+            logger.error(f"Failed to acquire pooled sandbox for project {project_id}: {e}")
+            return None
+        finally:
+            self.schedule_refill()
+
+    async def _claim(self, sandbox_id: str, project_id: str) -> AsyncSandbox:
+        sandbox = await self.daytona.get(sandbox_id)
+        if sandbox.state in (SandboxState.STOPPED, SandboxState.ARCHIVED):
+            # Pool members don't auto-stop, but may have been stopped by hand; bring them back up
+            await self.daytona.start(sandbox)
+            sandbox = await self.daytona.get(sandbox_id)
+            await start_supervisord_session(sandbox)
+            await wait_for_sandbox_ready(sandbox)
+        await sandbox.set_autostop_interval(SANDBOX_AUTO_STOP_INTERVAL)
+        await sandbox.set_auto_archive_interval(SANDBOX_AUTO_ARCHIVE_INTERVAL)
+        await sandbox.set_labels({'id': project_id})
+        return sandbox
+
+    async def _discard(self, sandbox_id: str):
+        try:
+            sandbox = await self.daytona.get(sandbox_id)
+            await self.daytona.delete(sandbox)
+        except Exception as e:
+            logger.warning(f"Failed to delete discarded pooled sandbox {sandbox_id}: {e}")
+
+    async def _create_pooled_sandbox(self) -> None:
+        sandbox_pass = str(uuid.uuid4())
+        # Kept running until claimed; the claim applies the normal intervals
+        sandbox = await self.daytona.create(build_sandbox_params(
+            sandbox_pass, {POOL_LABEL: self.snapshot}, snapshot=self.snapshot,
+            auto_stop_interval=0, auto_archive_interval=0
+        ))
+        try:
+            await start_supervisord_session(sandbox)
+            if not await wait_for_sandbox_ready(sandbox):
+                raise RuntimeError("services did not become ready")
+        except Exception:
+            await self._discard(sandbox.id)
+            raise
+        await redis.rpush(self.pool_key, json.dumps({'id': sandbox.id, 'pass': sandbox_pass}))
+        logger.debug(f"Added sandbox {sandbox.id} to pool {self.snapshot}")
+
+    async def refill(self) -> int:
+        """Top the pool up to ``size``. Returns the number of sandboxes created."""
+        if not self.enabled:
+            return 0
+
+        lock_key = f"{self.pool_key}:refill_lock"
+        lock_token = str(uuid.uuid4())
+        async with self._refill_lock:
+            if not await redis.set(lock_key, lock_token, ex=REFILL_LOCK_TTL, nx=True):
+                # Another process is already refilling
+                return 0
+            try:
+                missing = self.size - await redis.llen(self.pool_key)
+                if missing <= 0:
+                    return 0
+
+                results = await asyncio.gather(
+                    *(self._create_pooled_sandbox() for _ in range(missing)),
+                    return_exceptions=True
+                )
+                created = sum(1 for result in results if not isinstance(result, Exception))
+                for result in results:
+                    if isinstance(result, Exception):
+                        logger.error(f"Failed to create pooled sandbox: {result}")
+                logger.info(f"Refilled sandbox pool {self.snapshot} with {created}/{missing} sandboxes")
+                return created
+            finally:
+                if await redis.get(lock_key) == lock_token:
+                    await redis.delete(lock_key)
+
+    def schedule_refill(self) -> None:
+        """Refill in the background without making the caller wait."""
+        if not self.enabled or (self._refill_task and not self._refill_task.done()):
+            return
+        self._refill_task = asyncio.create_task(self._safe_refill())
+
+    async def _safe_refill(self):
+        try:
+            await self.refill()
+        except Exception as e:
+            logger.error(f"Sandbox pool refill failed: {e}")
+
+    async def run_refill_loop(self, interval: Optional[int] = None):
+        """Keep the pool topped up; meant to run as a long-lived background task."""
+        interval = interval or config.SANDBOX_POOL_REFILL_INTERVAL
+        while True:
+            await self._safe_refill()
+            await asyncio.sleep(interval)
+
+
+_pool: Optional[SandboxPool] = None
+
+
+def get_sandbox_pool() -> SandboxPool:
+    global _pool
+    if _pool is None:
+        _pool = SandboxPool()
+    return _pool
+
+
+async def provision_project_sandbox(project_id: str) -> Tuple[AsyncSandbox, str]:
+    """Return a ready sandbox for a project, from the warm pool when possible.
+
+    Returns ``(sandbox, vnc_password)``. Falls back to creating a sandbox and
+    probing its services when the pool is disabled or empty.
+    """
+    claimed = await get_sandbox_pool().acquire(project_id)
+    if claimed:
+        return claimed
+
+    sandbox_pass = str(uuid.uuid4())
+    sandbox = await create_sandbox(sandbox_pass, project_id)
+    await wait_for_sandbox_ready(sandbox)
+    return sandbox, sandbox_pass
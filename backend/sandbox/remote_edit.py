@@ -0,0 +1,175 @@
+"""
+In-sandbox file patching.
+
+Small edits to large files should not move the whole file over the sandbox
+API twice. ``apply_remote_patch`` sends only the patch (search/replace pairs
+and/or line-range replacements) and a helper script applies it inside the
+sandbox: the file is rewritten atomically through a temp file and rename, an
+optional expected SHA-256 of the current contents detects conflicting
+changes, and only the changed regions plus the new hash come back.
+"""
+
+import base64
+import hashlib
+import json
+import shlex
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+from daytona_sdk import AsyncSandbox
+
+# Patches above this size are uploaded instead of passed on the command line
+INLINE_PATCH_LIMIT = 64 * 1024
+SNIPPET_MAX_CHARS = 4000
+
+_PATCH_SCRIPT = r'''
+import base64, hashlib, json, os, stat, sys, tempfile
+
+def done(**result):
+    print(json.dumps(result))
+    sys.exit(0)
+
+path, source = sys.argv[1], sys.argv[2]
+if source.startswith('/'):
+    with open(source) as f:
+        patch = json.load(f)
+else:
+    patch = json.loads(base64.b64decode(source))
+
+try:
+    with open(path, 'rb') as f:
+        raw = f.read()
+except FileNotFoundError:
+    done(ok=False, error='missing')
+
+expected = patch.get('expected_sha256')
+if expected and hashlib.sha256(raw).hexdigest() != expected:
+    done(ok=False, error='conflict')
+
+text = raw.decode('utf-8')
+regions = []
+
+for item in patch.get('replacements', []):
+    search, replace = item['search'], item['replace']
+    count = text.count(search)
+    if count != 1:
+        lines = [i + 1 for i, line in enumerate(text.split('\n')) if search in line] if count else []
+        done(ok=False, error='not_found' if count == 0 else 'ambiguous', lines=lines)
+    index = text.index(search)
+    start = text.count('\n', 0, index)
+    text = text[:index] + replace + text[index + len(search):]
+    regions.append([start, start + replace.count('\n')])
+
+edits = sorted(patch.get('line_edits', []), key=lambda e: e['start'])
+if edits:
+    lines = text.splitlines(True)
+    delta = 0
+    for edit in edits:
+        new_lines = edit['text'].splitlines(True)
+        start = edit['start'] + delta
+        lines[start:start + edit['end'] - edit['start']] = new_lines
+        regions.append([start, start + max(len(new_lines) - 1, 0)])
+        delta += len(new_lines) - (edit['end'] - edit['start'])
+    text = ''.join(lines)
+
+data = text.encode('utf-8')
+directory = os.path.dirname(path) or '.'
+fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.patch-')
+try:
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+    os.replace(tmp_path, path)
+except BaseException:
+    if os.path.exists(tmp_path):
+        os.unlink(tmp_path)
+    raise
+
+context = patch.get('context', 4)
+new_lines = text.split('\n')
+snippets = []
+for start, end in regions:
+    first = max(0, start - context)
+    last = min(len(new_lines), end + context + 1)
+    snippets.append({'start_line': first + 1, 'end_line': last, 'snippet': '\n'.join(new_lines[first:last])[:%(snippet_max)d]})
+
+done(ok=True, sha256=hashlib.sha256(data).hexdigest(), size=len(data), regions=snippets)
+''' % {'snippet_max': SNIPPET_MAX_CHARS}
+
+
+class RemoteEditError(Exception):
+    """The patch could not be applied in the sandbox (not a content conflict)."""
+
+
+class RemoteEditConflict(Exception):
+    """The file does not match what the patch expects."""
+
+    def __init__(self, reason: str, lines: Optional[List[int]] = None):
+        super().__init__(reason)
+        self.reason = reason
+        self.lines = lines or []
+
+
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def line_edits_between(old: str, new: str) -> List[Dict[str, Any]]:
+    """Describe ``new`` as line-range replacements applied to ``old``."""
+    import difflib
+
+    old_lines = old.splitlines(True)
+    new_lines = new.splitlines(True)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    return [
+        {'start': i1, 'end': i2, 'text': ''.join(new_lines[j1:j2])}
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != 'equal'
+    ]
+
+
+async def apply_remote_patch(
+    sandbox: AsyncSandbox,
+    path: str,
+    replacements: Optional[List[Dict[str, str]]] = None,
+    line_edits: Optional[List[Dict[str, Any]]] = None,
+    expected_sha256: Optional[str] = None,
+    context: int = 4,
+) -> Dict[str, Any]:
+    """Apply a patch to ``path`` inside the sandbox.
+
+    Returns ``{'sha256', 'size', 'regions'}`` for the patched file, where each
+    region carries the changed lines with ``context`` lines around them.
+    Raises RemoteEditConflict when the file changed, is missing or a search
+    string is not unique, and RemoteEditError when the patch could not run.
+    """
+    patch = json.dumps({
+        'replacements': replacements or [],
+        'line_edits': line_edits or [],
+        'expected_sha256': expected_sha256,
+        'context': context,
+    }).encode()
+
+    patch_path = None
+    if len(patch) > INLINE_PATCH_LIMIT:
+        patch_path = f"/tmp/patch_{uuid4().hex}.json"
+        await sandbox.fs.upload_file(patch, patch_path)
+        source = patch_path
+    else:
+        source = base64.b64encode(patch).decode()
+
+    command = f"python3 -c {shlex.quote(_PATCH_SCRIPT)} {shlex.quote(path)} {shlex.quote(source)}"
+    if patch_path:
+        command += f"; status=$?; rm -f {patch_path}; exit $status"
+    response = await sandbox.process.exec(f"/bin/sh -c {shlex.quote(command)}", timeout=60)
+
+    if response.exit_code != 0:
+        raise RemoteEditError(f"Patch script failed with exit code {response.exit_code}: {(response.result or '')[-500:]}")
+    try:
+        result = json.loads((response.result or '').strip().splitlines()[-1])
+    except (IndexError, json.JSONDecodeError) as e:
+        raise RemoteEditError(f"Unexpected patch script output: {(response.result or '')[-500:]}") from e
+
+    if not result.get('ok'):
+        raise RemoteEditConflict(result.get('error', 'conflict'), result.get('lines'))
+    return result
@@ -1,5 +1,7 @@
 from daytona_sdk import AsyncDaytona, DaytonaConfig, CreateSandboxFromSnapshotParams, AsyncSandbox, SessionExecuteRequest, Resources, SandboxState
 from dotenv import load_dotenv
+from typing import Dict, Optional
+import asyncio
 from utils.logger import logger
 from utils.config import config
 from utils.config import Configuration
@@ -30,6 +32,10 @@ else:
 
 daytona = AsyncDaytona(daytona_config)
 
+# Minutes idle before a project's sandbox is stopped, and stopped before it is archived
+SANDBOX_AUTO_STOP_INTERVAL = 120
+SANDBOX_AUTO_ARCHIVE_INTERVAL = 2 * 60
+
 async def get_or_start_sandbox(sandbox_id: str) -> AsyncSandbox:
     """Retrieve a sandbox by ID, check its state, and start it if needed."""
     
@@ -78,19 +84,20 @@ async def start_supervisord_session(sandbox: AsyncSandbox):
         logger.error(f"Error starting supervisord session: {str(e)}")
         raise e
 
-async def create_sandbox(password: str, project_id: str = None) -> AsyncSandbox:
-    """Create a new sandbox with all required services configured and running."""
-    
-    logger.debug("Creating new Daytona sandbox environment")
-    logger.debug("Configuring sandbox with snapshot and environment variables")
-    
-    labels = None
-    if project_id:
-        logger.debug(f"Using sandbox_id as label: {project_id}")
-        labels = {'id': project_id}
-        
-    params = CreateSandboxFromSnapshotParams(
-        snapshot=Configuration.SANDBOX_SNAPSHOT_NAME,
+def build_sandbox_params(
+    password: str,
+    labels: Optional[Dict[str, str]] = None,
+    snapshot: Optional[str] = None,
+    auto_stop_interval: int = SANDBOX_AUTO_STOP_INTERVAL,
+    auto_archive_interval: int = SANDBOX_AUTO_ARCHIVE_INTERVAL
+) -> CreateSandboxFromSnapshotParams:
+    """Build the snapshot parameters shared by on-demand and pooled sandboxes.
+
+    ``snapshot`` defaults to SANDBOX_SNAPSHOT_NAME. An ``auto_stop_interval``
+    of 0 disables auto-stop.
+    """
+    return CreateSandboxFromSnapshotParams(
+        snapshot=snapshot or Configuration.SANDBOX_SNAPSHOT_NAME,
         public=True,
         labels=labels,
         env_vars={
@@ -111,9 +118,22 @@ async def create_sandbox(password: str, project_id: str = None) -> AsyncSandbox:
             memory=4,
             disk=5,
         ),
-        auto_stop_interval=120,
-        auto_archive_interval=2 * 60,
+        auto_stop_interval=auto_stop_interval,
+        auto_archive_interval=auto_archive_interval,
     )
+
+async def create_sandbox(password: str, project_id: str = None) -> AsyncSandbox:
+    """Create a new sandbox with all required services configured and running."""
+    
+    logger.debug("Creating new Daytona sandbox environment")
+    logger.debug("Configuring sandbox with snapshot and environment variables")
+    
+    labels = None
+    if project_id:
+        logger.debug(f"Using sandbox_id as label: {project_id}")
+        labels = {'id': project_id}
+        
+    params = build_sandbox_params(password, labels)
     
     # Create the sandbox
     sandbox = await daytona.create(params)
@@ -125,6 +145,30 @@ async def create_sandbox(password: str, project_id: str = None) -> AsyncSandbox:
     logger.debug(f"Sandbox environment successfully initialized")
     return sandbox
 
+async def wait_for_sandbox_ready(sandbox: AsyncSandbox, timeout: float = 30.0, port: int = 8080) -> bool:
+    """Poll the sandbox until its HTTP server answers, instead of sleeping a fixed time.
+
+    Returns False if the services did not come up within ``timeout`` seconds.
+    """
+    probe_cmd = f"curl -s -o /dev/null -w '%{{http_code}}' http://localhost:{port}/"
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = 0.25
+    while True:
+        try:
+            response = await sandbox.process.exec(probe_cmd, timeout=5)
+            if response.exit_code == 0 and response.result.strip() not in ("", "000"):
+                logger.debug(f"Sandbox {sandbox.id} services ready")
+                return True
+        except Exception as e:
+            logger.debug(f"Readiness probe for sandbox {sandbox.id} failed: {e}")
+
+        if loop.time() + delay > deadline:
+            logger.warning(f"Sandbox {sandbox.id} services not ready after {timeout}s")
+            return False
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 2.0)
+
 async def delete_sandbox(sandbox_id: str) -> bool:
     """Delete a sandbox by its ID."""
     logger.debug(f"Deleting sandbox with ID: {sandbox_id}")
@@ -0,0 +1,142 @@
+"""
+HTTP client for the Stagehand API server running inside the sandbox.
+
+Browser actions talk to the server on port 8004 directly through the
+sandbox's preview link instead of running ``curl`` through
+``sandbox.process.exec``. One keep-alive client is shared per sandbox broker,
+so all browser calls of a run reuse the same connection, and it is closed
+when the broker is. The server's health is checked once and only re-checked
+after a request fails.
+"""
+
+import asyncio
+import weakref
+from typing import Any, Dict, Optional
+
+import httpx
+
+from sandbox.broker import SandboxBroker
+from utils.config import config
+from utils.logger import logger
+
+STAGEHAND_PORT = 8004
+REQUEST_TIMEOUT = 90.0
+HEALTH_TIMEOUT = 10.0
+INIT_TIMEOUT = 90.0
+
+
+class StagehandUnavailableError(Exception):
+    """The Stagehand API server is not reachable or could not be initialized."""
+
+
+class StagehandClient:
+    def __init__(self, broker: SandboxBroker):
+        self.broker = broker
+        self.healthy = False
+        self._client: Optional[httpx.AsyncClient] = None
+        self._base_url: Optional[str] = None
+        self._lock = asyncio.Lock()
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            url, token = await self.broker.get_preview_endpoint(STAGEHAND_PORT)
+            headers = {"Content-Type": "application/json"}
+            if token:
+                headers["X-Daytona-Preview-Token"] = token
+            self._base_url = f"{url.rstrip('/')}/api"
+            self._client = httpx.AsyncClient(
+                headers=headers,
+                timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=10.0),
+                limits=httpx.Limits(max_connections=8, max_keepalive_connections=4, keepalive_expiry=60.0),
+            )
+        return self._client
+
+    async def ensure_healthy(self) -> None:
+        """Check the server and initialize it if needed, unless it was healthy before."""
+        if self.healthy:
+            return
+
+        async with self._lock:
+            if self.healthy:
+                return
+
+            client = await self._get_client()
+            try:
+                response = await client.get(self._base_url, timeout=HEALTH_TIMEOUT)
+                status = response.json().get("status")
+            except (httpx.HTTPError, ValueError) as e:
+                raise StagehandUnavailableError(f"Stagehand API health check failed: {e}") from e
+
+            if status != "healthy":
+                # The browser API is up but not initialized; (re)start it
+                logger.debug(f"Stagehand API reported status {status!r}, initializing")
+                try:
+                    response = await client.post(
+                        f"{self._base_url}/init",
+                        json={"api_key": config.ANTHROPIC_API_KEY},
+                        timeout=INIT_TIMEOUT
+                    )
+                except httpx.HTTPError as e:
+                    raise StagehandUnavailableError(f"Stagehand API initialization failed: {e}") from e
+                if response.is_error:
+                    raise StagehandUnavailableError(f"Stagehand API initialization failed: {response.text[:500]}")
+
+            logger.debug("Stagehand API server is running and healthy")
+            self.healthy = True
+
+    async def request(self, endpoint: str, params: Optional[Dict[str, Any]] = None, method: str = "POST") -> Dict[str, Any]:
+        """Call ``/api/{endpoint}`` and return the decoded JSON body.
+
+        A request that could not connect is retried once after a fresh health
+        check. Raises StagehandUnavailableError, httpx.HTTPError or ValueError
+        for an undecodable body.
+        """
+        for attempt in range(2):
+            await self.ensure_healthy()
+            client = await self._get_client()
+            try:
+                if method == "GET":
+                    response = await client.get(f"{self._base_url}/{endpoint}", params=params)
+                else:
+                    response = await client.request(method, f"{self._base_url}/{endpoint}", json=params)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                await self.reset()
+                if attempt == 0:
+                    logger.warning(f"Stagehand API connection failed, re-checking health: {e}")
+                    continue
+                raise StagehandUnavailableError(f"Stagehand API server is not reachable: {e}") from e
+            except httpx.HTTPError:
+                self.healthy = False
+                raise
+
+            if response.status_code >= 500:
+                self.healthy = False
+            return response.json()
+
+    async def reset(self) -> None:
+        """Drop the connection and health state, e.g. after the sandbox restarted."""
+        self.healthy = False
+        client, self._client = self._client, None
+        if client is not None:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.debug(f"Error closing Stagehand client: {e}")
+
+    async def aclose(self) -> None:
+        """Close the connection pool; the broker calls this when it is closed."""
+        await self.reset()
+        _clients.pop(self.broker, None)
+
+
+_clients: "weakref.WeakKeyDictionary[SandboxBroker, StagehandClient]" = weakref.WeakKeyDictionary()
+
+
+def get_stagehand_client(broker: SandboxBroker) -> StagehandClient:
+    """Return the Stagehand client shared by everything using ``broker``."""
+    client = _clients.get(broker)
+    if client is None:
+        client = StagehandClient(broker)
+        _clients[broker] = client
+        broker.on_close(client.aclose)
+    return client
@@ -1,15 +1,41 @@
-from typing import Optional
-import uuid
 import asyncio
+import io
+import shlex
+import tarfile
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Union
+from uuid import uuid4
 
 from agentpress.thread_manager import ThreadManager
 from agentpress.tool import Tool
-from daytona_sdk import AsyncSandbox
-from sandbox.sandbox import get_or_start_sandbox, create_sandbox, delete_sandbox
+from daytona_sdk import AsyncSandbox, SandboxState
+from sandbox.broker import SandboxBroker, get_sandbox_broker
+from sandbox.sandbox import daytona
 from utils.logger import logger
 from utils.files_utils import clean_path
 from utils.config import config
 
+# Concurrent downloads per batch read
+MAX_CONCURRENT_READS = 8
+
+# Error fragments meaning the sandbox could not be reached, rather than the call itself failing
+SANDBOX_UNAVAILABLE_ERRORS = (
+    "connection", "connect error", "timed out", "not running", "not started",
+    "is stopped", "is archived", "sandbox not found", "502", "503", "504",
+)
+
+def is_sandbox_unavailable(error: str) -> bool:
+    """Whether a tool error looks like the sandbox was unreachable."""
+    error = error.lower()
+    return any(fragment in error for fragment in SANDBOX_UNAVAILABLE_ERRORS)
+
+def workspace_resource(argument: str) -> Callable[[Dict[str, Any]], str]:
+    """Scheduling resource for the workspace file named by a tool call argument."""
+    def resource(arguments: Dict[str, Any]) -> str:
+        path = arguments.get(argument)
+        return f"fs:{clean_path(str(path))}" if path else "fs:*"
+    return resource
+
 class SandboxToolsBase(Tool):
     """Base class for all sandbox tools that provides project-based sandbox access."""
     
@@ -25,85 +51,61 @@ class SandboxToolsBase(Tool):
         self._sandbox_id = None
         self._sandbox_pass = None
 
+    @property
+    def sandbox_broker(self) -> SandboxBroker:
+        """The sandbox broker shared by all sandbox tools of this run."""
+        return get_sandbox_broker(self.thread_manager, self.project_id)
+
     async def _ensure_sandbox(self) -> AsyncSandbox:
         """Ensure we have a valid sandbox instance, retrieving it from the project if needed.
 
-        If the project does not yet have a sandbox, create it lazily and persist
-        the metadata to the `projects` table so subsequent calls can reuse it.
+        Resolution goes through the run's shared SandboxBroker, which looks the
+        sandbox up once, creates it lazily if the project has none yet and
+        caches the handle for every other sandbox tool. A handle the broker has
+        since replaced (after another tool refreshed it) is picked up again.
         """
-        if self._sandbox is None:
+        broker = self.sandbox_broker
+        if self._sandbox is None or broker.sandbox is not self._sandbox:
             try:
-                # Get database client
-                client = await self.thread_manager.db.client
-
-                # Get project data
-                project = await client.table('projects').select('*').eq('project_id', self.project_id).execute()
-                if not project.data or len(project.data) == 0:
-                    raise ValueError(f"Project {self.project_id} not found")
-
-                project_data = project.data[0]
-                sandbox_info = project_data.get('sandbox') or {}
-
-                # If there is no sandbox recorded for this project, create one lazily
-                if not sandbox_info.get('id'):
-                    logger.debug(f"No sandbox recorded for project {self.project_id}; creating lazily")
-                    sandbox_pass = str(uuid.uuid4())
-                    sandbox_obj = await create_sandbox(sandbox_pass, self.project_id)
-                    sandbox_id = sandbox_obj.id
-                    
-                    # Wait 5 seconds for services to start up
-                    logger.info(f"Waiting 5 seconds for sandbox {sandbox_id} services to initialize...")
-                    await asyncio.sleep(5)
-                    
-                    # Gather preview links and token (best-effort parsing)
-                    try:
-                        vnc_link = await sandbox_obj.get_preview_link(6080)
-                        website_link = await sandbox_obj.get_preview_link(8080)
-                        vnc_url = vnc_link.url if hasattr(vnc_link, 'url') else str(vnc_link).split("url='")[1].split("'")[0]
-                        website_url = website_link.url if hasattr(website_link, 'url') else str(website_link).split("url='")[1].split("'")[0]
-                        token = vnc_link.token if hasattr(vnc_link, 'token') else (str(vnc_link).split("token='")[1].split("'")[0] if "token='" in str(vnc_link) else None)
-                    except Exception:
-                        # If preview link extraction fails, still proceed but leave fields None
-                        logger.warning(f"Failed to extract preview links for sandbox {sandbox_id}", exc_info=True)
-                        vnc_url = None
-                        website_url = None
-                        token = None
-
-                    # Persist sandbox metadata to project record
-                    update_result = await client.table('projects').update({
-                        'sandbox': {
-                            'id': sandbox_id,
-                            'pass': sandbox_pass,
-                            'vnc_preview': vnc_url,
-                            'sandbox_url': website_url,
-                            'token': token
-                        }
-                    }).eq('project_id', self.project_id).execute()
-
-                    if not update_result.data:
-                        # Cleanup created sandbox if DB update failed
-                        try:
-                            await delete_sandbox(sandbox_id)
-                        except Exception:
-                            logger.error(f"Failed to delete sandbox {sandbox_id} after DB update failure", exc_info=True)
-                        raise Exception("Database update failed when storing sandbox metadata")
-
-                    # Store local metadata and ensure sandbox is ready
-                    self._sandbox_id = sandbox_id
-                    self._sandbox_pass = sandbox_pass
-                    self._sandbox = await get_or_start_sandbox(self._sandbox_id)
-                else:
-                    # Use existing sandbox metadata
-                    self._sandbox_id = sandbox_info['id']
-                    self._sandbox_pass = sandbox_info.get('pass')
-                    self._sandbox = await get_or_start_sandbox(self._sandbox_id)
-
+                self._sandbox = await broker.get_sandbox()
+                self._sandbox_id = broker.sandbox_id
+                self._sandbox_pass = broker.sandbox_pass
             except Exception as e:
                 logger.error(f"Error retrieving/creating sandbox for project {self.project_id}: {str(e)}", exc_info=True)
                 raise e
 
         return self._sandbox
 
+    async def _refresh_sandbox(self) -> AsyncSandbox:
+        """Re-validate the sandbox handle after an operation on it failed."""
+        self._sandbox = None
+        await self.sandbox_broker.invalidate()
+        return await self._ensure_sandbox()
+
+    async def recover_from_failure(self, error: str) -> bool:
+        """Re-validate the sandbox after a call failed to reach it and restart it if it stopped.
+
+        Only connection and sandbox-unavailable errors are considered. Returns
+        True when the sandbox was confirmed not running and has been refreshed;
+        whether the call is then replayed is up to the caller.
+        """
+        if self._sandbox_id is None or not is_sandbox_unavailable(error):
+            return False
+        try:
+            sandbox = await daytona.get(self._sandbox_id)
+        except Exception as e:
+            logger.warning(f"Failed to check sandbox {self._sandbox_id} after a failed call: {e}")
+            return False
+        if sandbox.state == SandboxState.STARTED:
+            return False
+        logger.warning(f"Sandbox {self._sandbox_id} is {sandbox.state} after a failed call, restarting it")
+        try:
+            await self._refresh_sandbox()
+        except Exception as e:
+            logger.error(f"Failed to refresh sandbox for project {self.project_id}: {e}")
+            return False
+        return True
+
     @property
     def sandbox(self) -> AsyncSandbox:
         """Get the sandbox instance, ensuring it exists."""
@@ -122,4 +124,79 @@ class SandboxToolsBase(Tool):
         """Clean and normalize a path to be relative to /workspace."""
         cleaned_path = clean_path(path, self.workspace_path)
         logger.debug(f"Cleaned path: {path} -> {cleaned_path}")
-        return cleaned_path
\ No newline at end of file
+        return cleaned_path
+
+    async def _read_file(self, path: str, file_info=None) -> bytes:
+        """Read a sandbox file through the run's file cache.
+
+        Raises FileNotFoundError when the path does not exist.
+        """
+        return await self.sandbox_broker.file_cache.read(self.sandbox, path, file_info)
+
+    async def _write_file(self, path: str, data: bytes) -> None:
+        """Upload a sandbox file, keeping the run's file cache current."""
+        await self.sandbox_broker.file_cache.write(self.sandbox, path, data)
+
+    def _update_cached_file(self, path: str, data: bytes) -> None:
+        """Record the contents of a file that was changed in place, e.g. by a remote patch."""
+        self.sandbox_broker.file_cache.update(path, data)
+
+    def _peek_cached_file(self, path: str) -> Optional[bytes]:
+        """Cached contents of a file, unvalidated; None when not cached."""
+        return self.sandbox_broker.file_cache.peek(path)
+
+    def _invalidate_file(self, path: str) -> None:
+        """Forget cached contents of a file changed outside the cache."""
+        self.sandbox_broker.file_cache.invalidate(path)
+
+    async def _upload_files(self, files: Dict[str, bytes], permissions: str = "644") -> None:
+        """Write many files with a single upload.
+
+        ``files`` maps absolute sandbox paths to contents. They are packed into
+        one tar archive that is unpacked inside the sandbox, which also creates
+        any missing parent directories.
+        """
+        if not files:
+            return
+
+        for path in files:
+            self._invalidate_file(path)
+
+        buffer = io.BytesIO()
+        mode = int(permissions, 8)
+        now = time.time()
+        with tarfile.open(fileobj=buffer, mode="w") as archive:
+            for path, data in files.items():
+                info = tarfile.TarInfo(name=path.lstrip('/'))
+                info.size = len(data)
+                info.mode = mode
+                info.mtime = now
+                archive.addfile(info, io.BytesIO(data))
+
+        archive_path = f"/tmp/upload_{uuid4().hex}.tar"
+        await self.sandbox.fs.upload_file(buffer.getvalue(), archive_path)
+        response = await self.sandbox.process.exec(
+            f"/bin/sh -c {shlex.quote(f'tar -xf {archive_path} -C / --no-same-owner; status=$?; rm -f {archive_path}; exit $status')}",
+            timeout=60
+        )
+        if response.exit_code != 0:
+            raise RuntimeError(f"Failed to unpack uploaded files: {response.result}")
+
+    async def _read_files(self, paths: Iterable[str], max_concurrency: int = MAX_CONCURRENT_READS) -> Dict[str, Union[bytes, Exception]]:
+        """Download many files concurrently.
+
+        Returns a mapping of path to contents, or to the exception raised for
+        that path, so one unreadable file does not fail the whole batch.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def read(path: str) -> Union[bytes, Exception]:
+            async with semaphore:
+                try:
+                    return await self.sandbox.fs.download_file(path)
+                except Exception as e:
+                    return e
+
+        paths = list(paths)
+        results = await asyncio.gather(*(read(path) for path in paths))
+        return dict(zip(paths, results))
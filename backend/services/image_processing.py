@@ -0,0 +1,178 @@
+"""
+Shared image processing for the vision, image edit and browser tools.
+
+PIL decoding, resizing and encoding are CPU bound and used to run on the
+event loop. This service runs them in a bounded thread pool (Pillow releases
+the GIL for most of that work), caches compressed results in memory by
+content hash and target size, and stores image binaries in object storage
+under content-addressed names, so messages only carry a URL and the same
+image is never uploaded twice.
+"""
+
+import asyncio
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from io import BytesIO
+from typing import Any, Callable, Optional, Tuple
+
+from PIL import Image
+
+from services.supabase import DBConnection
+from utils.cache import Cache
+from utils.config import config
+from utils.logger import logger
+
+DEFAULT_MAX_WIDTH = 1920
+DEFAULT_MAX_HEIGHT = 1080
+DEFAULT_JPEG_QUALITY = 85
+DEFAULT_PNG_COMPRESS_LEVEL = 6
+
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+IMAGE_REF_TTL = 24 * 60 * 60
+EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/gif': 'gif',
+    'image/webp': 'webp',
+}
+
+
+@dataclass
+class ProcessedImage:
+    data: bytes
+    mime_type: str
+    content_hash: str
+
+
+def compress_image(
+    image_bytes: bytes,
+    mime_type: str,
+    max_width: int = DEFAULT_MAX_WIDTH,
+    max_height: int = DEFAULT_MAX_HEIGHT,
+) -> Tuple[bytes, str]:
+    """Downscale and re-encode an image. CPU bound; run it through the service pool.
+
+    GIFs stay GIFs and PNGs stay PNGs, everything else becomes JPEG. Returns
+    the original bytes and MIME type if the image cannot be processed.
+    """
+    try:
+        img = Image.open(BytesIO(image_bytes))
+
+        # Flatten transparency onto white so the image can be saved as JPEG
+        if img.mode in ('RGBA', 'LA', 'P'):
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            if img.mode == 'P':
+                img = img.convert('RGBA')
+            background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+            img = background
+
+        width, height = img.size
+        if width > max_width or height > max_height:
+            ratio = min(max_width / width, max_height / height)
+            img = img.resize((int(width * ratio), int(height * ratio)), Image.Resampling.LANCZOS)
+
+        output = BytesIO()
+        if mime_type == 'image/gif':
+            img.save(output, format='GIF', optimize=True)
+            output_mime = 'image/gif'
+        elif mime_type == 'image/png':
+            img.save(output, format='PNG', optimize=True, compress_level=DEFAULT_PNG_COMPRESS_LEVEL)
+            output_mime = 'image/png'
+        else:
+            img.save(output, format='JPEG', quality=DEFAULT_JPEG_QUALITY, optimize=True)
+            output_mime = 'image/jpeg'
+        return output.getvalue(), output_mime
+    except Exception as e:
+        logger.warning(f"Failed to compress image, using original: {e}")
+        return image_bytes, mime_type
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ImageProcessingService:
+    def __init__(self, max_workers: Optional[int] = None):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or config.IMAGE_PROCESSING_WORKERS,
+            thread_name_prefix="image-processing"
+        )
+        self._results: "OrderedDict[str, ProcessedImage]" = OrderedDict()
+        self._results_size = 0
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a CPU-bound function in the image processing pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def compress(
+        self,
+        image_bytes: bytes,
+        mime_type: str,
+        max_width: int = DEFAULT_MAX_WIDTH,
+        max_height: int = DEFAULT_MAX_HEIGHT,
+    ) -> ProcessedImage:
+        """Compress an image off the event loop, reusing earlier results for identical input."""
+        source_hash = await self.run(content_hash, image_bytes)
+        key = f"{source_hash}:{mime_type}:{max_width}x{max_height}"
+        cached = self._results.get(key)
+        if cached:
+            self._results.move_to_end(key)
+            return cached
+
+        data, output_mime = await self.run(compress_image, image_bytes, mime_type, max_width, max_height)
+        processed = ProcessedImage(data=data, mime_type=output_mime, content_hash=await self.run(content_hash, data))
+        self._remember(key, processed)
+        return processed
+
+    async def store(self, image: ProcessedImage, bucket_name: str = "browser-screenshots", prefix: str = "image") -> str:
+        """Upload an image under a content-addressed name and return its public URL.
+
+        Identical images map to the same object, so repeated stores only cost
+        a cache lookup.
+        """
+        ref_key = f"image_ref:{bucket_name}:{image.content_hash}"
+        try:
+            url = await Cache.get(ref_key)
+            if url:
+                return url
+        except Exception as e:
+            logger.warning(f"Image reference cache read failed: {e}")
+
+        filename = f"{prefix}_{image.content_hash[:32]}.{EXTENSIONS.get(image.mime_type, 'png')}"
+        client = await DBConnection().client
+        await client.storage.from_(bucket_name).upload(
+            filename,
+            image.data,
+            {"content-type": image.mime_type, "upsert": "true"}
+        )
+        url = await client.storage.from_(bucket_name).get_public_url(filename)
+
+        try:
+            await Cache.set(ref_key, url, ttl=IMAGE_REF_TTL)
+        except Exception as e:
+            logger.warning(f"Image reference cache write failed: {e}")
+        return url
+
+    def _remember(self, key: str, processed: ProcessedImage) -> None:
+        previous = self._results.pop(key, None)
+        if previous:
+            self._results_size -= len(previous.data)
+        self._results[key] = processed
+        self._results_size += len(processed.data)
+        while self._results_size > RESULT_CACHE_MAX_BYTES and self._results:
+            _, evicted = self._results.popitem(last=False)
+            self._results_size -= len(evicted.data)
+
+
+_service: Optional[ImageProcessingService] = None
+
+
+def get_image_processing_service() -> ImageProcessingService:
+    global _service
+    if _service is None:
+        _service = ImageProcessingService()
+    return _service
@@ -6,14 +6,17 @@ This module provides a unified interface for making API calls to different LLM p
 - Streaming responses
 - Tool calls and function calling
 - Retry logic with exponential backoff
+- Failover to fallback models by provider health (see services.llm_router)
 - Model-specific configurations
 - Comprehensive error handling and logging
 """
 
 from typing import Union, Dict, Any, Optional, AsyncGenerator, List
+import functools
 import os
 import litellm
 from litellm.files.main import ModelResponse
+from services.llm_router import llm_router
 from utils.logger import logger
 from utils.config import config
 
@@ -78,38 +81,6 @@ def setup_vertex_ai() -> None:
     else:
         logger.warning("No Google Cloud Project ID found for Vertex AI integration")
 
-def get_openrouter_fallback(model_name: str) -> Optional[str]:
-    """Get OpenRouter fallback model for a given model name."""
-    # Skip if already using OpenRouter
-    if model_name.startswith("openrouter/"):
-        return None
-    
-    # Map models to their OpenRouter equivalents
-    fallback_mapping = {
-        "anthropic/claude-3-7-sonnet-latest": "openrouter/anthropic/claude-3.7-sonnet",
-        "anthropic/claude-sonnet-4-20250514": "openrouter/anthropic/claude-sonnet-4",
-        "xai/grok-4": "openrouter/x-ai/grok-4",
-        "gemini/gemini-2.5-flash": "openrouter/google/gemini-2.5-flash",
-        "gemini/gemini-2.5-pro": "openrouter/google/gemini-2.5-pro",
-    }
-    
-    # Check for exact match first
-    if model_name in fallback_mapping:
-        return fallback_mapping[model_name]
-    
-    # Check for partial matches (e.g., bedrock models)
-    for key, value in fallback_mapping.items():
-        if key in model_name:
-            return value
-    
-    # Default fallbacks by provider
-    if "claude" in model_name.lower() or "anthropic" in model_name.lower():
-        return "openrouter/anthropic/claude-sonnet-4"
-    elif "xai" in model_name.lower() or "grok" in model_name.lower():
-        return "openrouter/x-ai/grok-4"
-    
-    return None
-
 def _configure_token_limits(params: Dict[str, Any], model_name: str, max_tokens: Optional[int]) -> None:
     """Configure token limits based on model type."""
     if max_tokens is None:
@@ -152,16 +123,18 @@ def _apply_anthropic_caching(messages: List[Dict[str, Any]]) -> None:
                     item["cache_control"] = {"type": "ephemeral"}
                     cache_control_count += 1
 
-def _configure_anthopic(params: Dict[str, Any], model_name: str, messages: List[Dict[str, Any]]) -> None:
+def _is_anthropic(model_name: str) -> bool:
+    return "claude" in model_name.lower() or "anthropic" in model_name.lower()
+
+def _configure_anthopic(params: Dict[str, Any], model_name: str) -> None:
     """Configure Anthropic-specific parameters."""
-    if not ("claude" in model_name.lower() or "anthropic" in model_name.lower()):
+    if not _is_anthropic(model_name):
         return
     
     params["extra_headers"] = {
         "anthropic-beta": "output-128k-2025-02-19"
     }
     logger.debug("Added Anthropic-specific headers")
-    _apply_anthropic_caching(messages)
 
 def _configure_openrouter(params: Dict[str, Any], model_name: str) -> None:
     """Configure OpenRouter-specific parameters."""
@@ -255,16 +228,6 @@ def _configure_thinking(params: Dict[str, Any], model_name: str, enable_thinking
         params["reasoning_effort"] = effort_level
         logger.info(f"xAI thinking enabled with reasoning_effort='{effort_level}'")
 
-def _add_fallback_model(params: Dict[str, Any], model_name: str, messages: List[Dict[str, Any]]) -> None:
-    """Add fallback model to the parameters."""
-    fallback_model = get_openrouter_fallback(model_name)
-    if fallback_model:
-        params["fallbacks"] = [{
-            "model": fallback_model,
-            "messages": messages,
-        }]
-        logger.debug(f"Added OpenRouter fallback for model: {model_name} to {fallback_model}")
-
 def _add_tools_config(params: Dict[str, Any], tools: Optional[List[Dict[str, Any]]], tool_choice: str) -> None:
     """Add tools configuration to parameters."""
     if tools is None:
@@ -276,28 +239,23 @@ def _add_tools_config(params: Dict[str, Any], tools: Optional[List[Dict[str, Any
     })
     logger.debug(f"Added {len(tools)} tools to API parameters")
 
-def prepare_params(
-    messages: List[Dict[str, Any]],
+@functools.lru_cache(maxsize=256)
+def _model_params(
     model_name: str,
-    temperature: float = 0,
-    max_tokens: Optional[int] = None,
-    response_format: Optional[Any] = None,
-    tools: Optional[List[Dict[str, Any]]] = None,
-    tool_choice: str = "auto",
-    api_key: Optional[str] = None,
-    api_base: Optional[str] = None,
-    stream: bool = False,
-    top_p: Optional[float] = None,
-    model_id: Optional[str] = None,
-    enable_thinking: Optional[bool] = False,
-    reasoning_effort: Optional[str] = 'low'
+    temperature: float,
+    max_tokens: Optional[int],
+    api_key: Optional[str],
+    api_base: Optional[str],
+    stream: bool,
+    top_p: Optional[float],
+    model_id: Optional[str],
+    enable_thinking: Optional[bool],
+    reasoning_effort: Optional[str]
 ) -> Dict[str, Any]:
-    """Prepare parameters for the API call."""
+    """Parameters that don't depend on the messages, tools or response format; computed once per combination."""
     params = {
         "model": model_name,
-        "messages": messages,
         "temperature": temperature,
-        "response_format": response_format,
         "top_p": top_p,
         "stream": stream,
         "num_retries": MAX_RETRIES,
@@ -312,18 +270,14 @@ def prepare_params(
 
     # Handle token limits
     _configure_token_limits(params, model_name, max_tokens)
-    # Add tools if provided
-    _add_tools_config(params, tools, tool_choice)
     # Add Anthropic-specific parameters
-    _configure_anthopic(params, model_name, params["messages"])
+    _configure_anthopic(params, model_name)
     # Add OpenRouter-specific parameters
     _configure_openrouter(params, model_name)
     # Add Bedrock-specific parameters
     _configure_bedrock(params, model_name, model_id)
     # Add Vertex AI-specific parameters
     _configure_vertex_ai(params, model_name)
-    
-    _add_fallback_model(params, model_name, messages)
     # Add OpenAI GPT-5 specific parameters
     _configure_openai_gpt5(params, model_name)
     # Add Kimi K2-specific parameters
@@ -332,6 +286,39 @@ def prepare_params(
 
     return params
 
+def prepare_params(
+    messages: List[Dict[str, Any]],
+    model_name: str,
+    temperature: float = 0,
+    max_tokens: Optional[int] = None,
+    response_format: Optional[Any] = None,
+    tools: Optional[List[Dict[str, Any]]] = None,
+    tool_choice: str = "auto",
+    api_key: Optional[str] = None,
+    api_base: Optional[str] = None,
+    stream: bool = False,
+    top_p: Optional[float] = None,
+    model_id: Optional[str] = None,
+    enable_thinking: Optional[bool] = False,
+    reasoning_effort: Optional[str] = 'low'
+) -> Dict[str, Any]:
+    """Prepare parameters for the API call."""
+    cached = _model_params(
+        model_name, temperature, max_tokens, api_key, api_base, stream, top_p,
+        model_id, enable_thinking, reasoning_effort
+    )
+    # Copy the nested dicts too, litellm and the caller may change them
+    params = {key: dict(value) if isinstance(value, dict) else value for key, value in cached.items()}
+    params["messages"] = messages
+    params["response_format"] = response_format
+
+    # Add tools if provided
+    _add_tools_config(params, tools, tool_choice)
+    if _is_anthropic(model_name):
+        _apply_anthropic_caching(messages)
+
+    return params
+
 async def make_llm_api_call(
     messages: List[Dict[str, Any]],
     model_name: str,
@@ -351,6 +338,9 @@ async def make_llm_api_call(
     """
     Make an API call to a language model using LiteLLM.
 
+    The call goes through services.llm_router, which sends it to the model's
+    fallback while the model's provider is failing, and can hedge slow calls.
+
     Args:
         messages: List of message dictionaries for the conversation
         model_name: Name of the model to use (e.g., "gpt-4", "claude-3", "openrouter/openai/gpt-4", "bedrock/anthropic.claude-3-sonnet-20240229-v1:0")
@@ -371,8 +361,7 @@ async def make_llm_api_call(
         Union[Dict[str, Any], AsyncGenerator]: API response or stream
 
     Raises:
-        LLMRetryError: If API call fails after retries
-        LLMError: For other API-related errors
+        LLMError: If the API call fails, on the model and on its fallback
     """
     # Resolve model alias to full model name
     from utils.constants import MODEL_NAME_ALIASES
@@ -384,32 +373,36 @@ async def make_llm_api_call(
     
     # debug <timestamp>.json messages
     logger.debug(f"Making LLM API call to model: {resolved_model_name} (Thinking: {enable_thinking}, Effort: {reasoning_effort})")
-    logger.debug(f"📡 API Call: Using model {resolved_model_name}")
-    params = prepare_params(
-        messages=messages,
-        model_name=resolved_model_name,
-        temperature=temperature,
-        max_tokens=max_tokens,
-        response_format=response_format,
-        tools=tools,
-        tool_choice=tool_choice,
-        api_key=api_key,
-        api_base=api_base,
-        stream=stream,
-        top_p=top_p,
-        model_id=model_id,
-        enable_thinking=enable_thinking,
-        reasoning_effort=reasoning_effort
-    )
+
+    def prepare(model: str) -> Dict[str, Any]:
+        # The API key and base override the model's provider; the fallback uses its own
+        is_primary = model == resolved_model_name
+        return prepare_params(
+            messages=messages,
+            model_name=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            response_format=response_format,
+            tools=tools,
+            tool_choice=tool_choice,
+            api_key=api_key if is_primary else None,
+            api_base=api_base if is_primary else None,
+            stream=stream,
+            top_p=top_p,
+            model_id=model_id if is_primary else None,
+            enable_thinking=enable_thinking,
+            reasoning_effort=reasoning_effort
+        )
+
     try:
-        response = await litellm.acompletion(**params)
+        response = await llm_router.acompletion(resolved_model_name, prepare)
         logger.debug(f"Successfully received API response from {model_name}")
         # logger.debug(f"Response: {response}")
         return response
 
     except Exception as e:
         logger.error(f"Unexpected error during API call: {str(e)}", exc_info=True)
-        raise LLMError(f"API call failed: {str(e)}")
+        raise LLMError(f"API call failed: {str(e)}") from e
 
 # Initialize API keys on module import
 setup_api_keys()
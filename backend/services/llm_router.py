@@ -0,0 +1,401 @@
+"""
+Provider-aware routing of LLM calls.
+
+Every call goes to its model's provider unless that provider's circuit breaker
+is open, in which case it goes to the model's fallback. Breakers are fed by
+the calls' outcomes: provider errors (overload, rate limits, 5xx, timeouts)
+and streamed first tokens slower than LLM_SLOW_FIRST_TOKEN_MS. An overloaded response
+opens the breaker at once. After LLM_BREAKER_COOLDOWN_SECONDS an open breaker
+lets a single probe call through; the provider is used again as soon as a
+probe succeeds.
+
+With a fallback available, a provider error fails the call over to it, and
+with LLM_HEDGE_AFTER_MS set the fallback is also started when the first token
+is late; whichever produces the first token is used and the other is
+cancelled.
+
+Requests to a provider share one pooled HTTP client per event loop.
+"""
+
+import asyncio
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+import httpx
+import litellm
+from litellm.llms.custom_httpx.http_handler import AsyncHTTPHandler
+from openai import AsyncOpenAI
+
+from utils.config import config
+from utils.logger import logger
+
+# Models to fall back to when a model's provider fails
+FALLBACK_MODELS: Dict[str, str] = {
+    "anthropic/claude-3-7-sonnet-latest": "openrouter/anthropic/claude-3.7-sonnet",
+    "anthropic/claude-sonnet-4-20250514": "openrouter/anthropic/claude-sonnet-4",
+    "xai/grok-4": "openrouter/x-ai/grok-4",
+    "gemini/gemini-2.5-flash": "openrouter/google/gemini-2.5-flash",
+    "gemini/gemini-2.5-pro": "openrouter/google/gemini-2.5-pro",
+}
+
+# Status codes meaning the provider, not the request, failed
+PROVIDER_ERROR_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+OVERLOADED_STATUS_CODES = {503, 529}
+
+# Providers whose litellm handlers take a shared AsyncHTTPHandler as `client`
+HTTP_HANDLER_PROVIDERS = {"anthropic", "openrouter", "xai", "groq", "gemini", "vertex_ai"}
+
+# Circuit breaker window: the last BREAKER_WINDOW outcomes, judged once there are BREAKER_MIN_CALLS
+BREAKER_WINDOW = 20
+BREAKER_MIN_CALLS = 5
+BREAKER_FAILURE_RATE = 0.5
+BREAKER_CONSECUTIVE_FAILURES = 3
+
+
+def fallback_model(model_name: str) -> Optional[str]:
+    """Model to fall back to for a model, if any."""
+    # Skip if already using OpenRouter
+    if model_name.startswith("openrouter/"):
+        return None
+
+    # Check for exact match first
+    if model_name in FALLBACK_MODELS:
+        return FALLBACK_MODELS[model_name]
+
+    # Check for partial matches (e.g., bedrock models)
+    for key, value in FALLBACK_MODELS.items():
+        if key in model_name:
+            return value
+
+    # Default fallbacks by provider
+    if "claude" in model_name.lower() or "anthropic" in model_name.lower():
+        return "openrouter/anthropic/claude-sonnet-4"
+    elif "xai" in model_name.lower() or "grok" in model_name.lower():
+        return "openrouter/x-ai/grok-4"
+
+    return None
+
+
+def provider_of(model_name: str, api_base: Optional[str] = None) -> str:
+    """Breaker and client pool key: the litellm provider prefix, plus the API base when one is set."""
+    provider = model_name.split("/", 1)[0] if "/" in model_name else "openai"
+    return f"{provider}@{api_base}" if api_base else provider
+
+
+def _error_chain(e: BaseException) -> Iterator[BaseException]:
+    seen = set()
+    while e is not None and id(e) not in seen:
+        seen.add(id(e))
+        yield e
+        e = e.__cause__ or e.__context__
+
+
+def is_overloaded(e: BaseException) -> bool:
+    """Whether an error says the provider is overloaded."""
+    return any(
+        getattr(exc, "status_code", None) in OVERLOADED_STATUS_CODES or "overloaded" in str(exc).lower()
+        for exc in _error_chain(e)
+    )
+
+
+def is_provider_error(e: BaseException) -> bool:
+    """Whether an error comes from the provider failing rather than from the request itself."""
+    for exc in _error_chain(e):
+        if getattr(exc, "status_code", None) in PROVIDER_ERROR_STATUS_CODES:
+            return True
+        if isinstance(exc, (asyncio.TimeoutError, httpx.TransportError)):
+            return True
+        if "overloaded" in str(exc).lower():
+            return True
+    return False
+
+
+class CircuitBreaker:
+    """Tracks the health of one provider.
+
+    Closed: calls go through. Open: calls are routed elsewhere until the
+    cooldown has passed. Half-open: one probe call goes through; its success
+    closes the breaker, its failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, cooldown: float, slow_call_seconds: float):
+        self.name = name
+        self.cooldown = cooldown
+        self.slow_call_seconds = slow_call_seconds
+        self.state = self.CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=BREAKER_WINDOW)
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """Whether a call may go to this provider now. In half-open state only one probe is let through."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+            logger.info(f"LLM provider {self.name}: circuit half-open, probing")
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def record_success(self, first_token_seconds: Optional[float] = None) -> None:
+        """Record a successful call; a stream whose first token was slow counts as a failure.
+
+        Non-streaming calls pass no first-token time, as their latency covers the whole completion.
+        """
+        if first_token_seconds is not None and first_token_seconds > self.slow_call_seconds:
+            logger.warning(f"LLM provider {self.name}: first token after {first_token_seconds:.1f}s")
+            self._record(ok=False)
+            return
+        if self.state == self.HALF_OPEN:
+            logger.info(f"LLM provider {self.name}: probe succeeded, circuit closed")
+            self.state = self.CLOSED
+            self._outcomes.clear()
+        self._probe_in_flight = False
+        self._consecutive_failures = 0
+        self._outcomes.append(True)
+
+    def record_failure(self, trip: bool = False) -> None:
+        """Record a provider error; `trip` opens the breaker at once."""
+        self._record(ok=False, trip=trip)
+
+    def release(self) -> None:
+        """Record a call that says nothing about the provider (cancelled, or rejected as a bad request)."""
+        self._probe_in_flight = False
+
+    def _record(self, ok: bool, trip: bool = False) -> None:
+        self._probe_in_flight = False
+        self._outcomes.append(ok)
+        self._consecutive_failures += 1
+        failures = self._outcomes.count(False)
+        if (
+            trip
+            or self.state == self.HALF_OPEN
+            or self._consecutive_failures >= BREAKER_CONSECUTIVE_FAILURES
+            or (len(self._outcomes) >= BREAKER_MIN_CALLS and failures / len(self._outcomes) >= BREAKER_FAILURE_RATE)
+        ):
+            self._open()
+
+    def _open(self) -> None:
+        if self.state != self.OPEN:
+            logger.warning(f"LLM provider {self.name}: circuit open for {self.cooldown:g}s")
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+
+
+@dataclass
+class _Attempt:
+    model: str
+    breaker: CircuitBreaker
+    response: Any
+    first_chunk: Any = None
+    stream_iterator: Any = None
+
+
+# Pooled clients per event loop and provider
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, Optional[str]], Any]]" = weakref.WeakKeyDictionary()
+
+
+def _pooled_client(params: Dict[str, Any]) -> Any:
+    """Shared client for the provider of a call, or None to let litellm pick its own."""
+    provider = params["model"].split("/", 1)[0] if "/" in params["model"] else "openai"
+    api_base = params.get("api_base")
+    if provider not in HTTP_HANDLER_PROVIDERS and provider != "openai":
+        return None
+    if provider == "openai" and not (params.get("api_key") or config.OPENAI_API_KEY):
+        return None
+
+    loop = asyncio.get_running_loop()
+    clients = _clients.setdefault(loop, {})
+    key = (provider_of(params["model"], api_base), params.get("api_key"))
+    client = clients.get(key)
+    if client is None:
+        timeout = httpx.Timeout(600.0, connect=10.0)
+        if provider == "openai":
+            client = AsyncOpenAI(
+                api_key=params.get("api_key") or config.OPENAI_API_KEY,
+                base_url=api_base,
+                # Retries are litellm's num_retries, or a failover to the fallback model
+                max_retries=0,
+                http_client=httpx.AsyncClient(
+                    timeout=timeout,
+                    limits=httpx.Limits(max_connections=config.LLM_POOL_CONNECTIONS, keepalive_expiry=60.0)
+                ),
+            )
+        else:
+            client = AsyncHTTPHandler(timeout=timeout, concurrent_limit=config.LLM_POOL_CONNECTIONS)
+        clients[key] = client
+    return client
+
+
+class LLMRouter:
+    """Routes LLM calls between a model and its fallback by provider health."""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        if provider not in self._breakers:
+            self._breakers[provider] = CircuitBreaker(
+                provider,
+                cooldown=config.LLM_BREAKER_COOLDOWN_SECONDS,
+                slow_call_seconds=config.LLM_SLOW_FIRST_TOKEN_MS / 1000,
+            )
+        return self._breakers[provider]
+
+    async def acompletion(
+        self,
+        model_name: str,
+        prepare: Callable[[str], Dict[str, Any]],
+        fallback: Optional[str] = None,
+        hedge_after: Optional[float] = None
+    ) -> Any:
+        """Call a model, or its fallback, through litellm.
+
+        Args:
+            model_name: Model to call
+            prepare: Builds the litellm parameters for a model name
+            fallback: Fallback model (defaults to fallback_model(model_name))
+            hedge_after: Seconds to wait for the first token before also starting the
+                fallback (defaults to LLM_HEDGE_AFTER_MS; 0 disables hedging)
+
+        Returns:
+            The litellm response, or an async generator of chunks for streaming calls
+        """
+        fallback = fallback or fallback_model(model_name)
+        if hedge_after is None:
+            hedge_after = config.LLM_HEDGE_AFTER_MS / 1000
+
+        primary_params = prepare(model_name)
+        primary_breaker = self.breaker(provider_of(model_name, primary_params.get("api_base")))
+        if not fallback:
+            return self._result(await self._attempt(model_name, primary_params, primary_breaker))
+
+        fallback_params = prepare(fallback)
+        fallback_breaker = self.breaker(provider_of(fallback, fallback_params.get("api_base")))
+
+        if not primary_breaker.allow():
+            if fallback_breaker.allow():
+                logger.warning(f"LLM provider {primary_breaker.name} is unavailable, routing {model_name} to {fallback}")
+                return self._result(await self._attempt(fallback, fallback_params, fallback_breaker))
+            logger.warning(f"LLM providers {primary_breaker.name} and {fallback_breaker.name} are both unavailable, trying {model_name}")
+            return self._result(await self._attempt(model_name, primary_params, primary_breaker))
+
+        # Fail over instead of retrying an unhealthy provider
+        primary_params["num_retries"] = 0
+        return self._result(await self._race(
+            (model_name, primary_params, primary_breaker),
+            (fallback, fallback_params, fallback_breaker),
+            hedge_after
+        ))
+
+    async def _race(self, primary: Tuple, fallback: Tuple, hedge_after: float) -> _Attempt:
+        pending = {asyncio.create_task(self._attempt(*primary))}
+        fallback_started = False
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                hedging = not fallback_started and hedge_after > 0
+                done, pending = await asyncio.wait(
+                    pending, timeout=hedge_after if hedging else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+
+                if not fallback_started and (not done or is_provider_error(error)):
+                    fallback_started = True
+                    model, params, breaker = fallback
+                    if breaker.allow():
+                        if done:
+                            logger.warning(f"LLM call to {primary[0]} failed, failing over to {model}: {error}")
+                        else:
+                            logger.info(f"No first token from {primary[0]} after {hedge_after:g}s, hedging with {model}")
+                        pending.add(asyncio.create_task(self._attempt(model, params, breaker)))
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _attempt(self, model: str, params: Dict[str, Any], breaker: CircuitBreaker) -> _Attempt:
+        client = _pooled_client(params)
+        if client is not None:
+            params = {**params, "client": client}
+
+        start = time.monotonic()
+        first_token_seconds = None
+        response = None
+        try:
+            response = await litellm.acompletion(**params)
+            attempt = _Attempt(model=model, breaker=breaker, response=response)
+            if params.get("stream"):
+                attempt.stream_iterator = response.__aiter__()
+                try:
+                    attempt.first_chunk = await attempt.stream_iterator.__anext__()
+                except StopAsyncIteration:
+                    attempt.stream_iterator = None
+                first_token_seconds = time.monotonic() - start
+        except asyncio.CancelledError:
+            breaker.release()
+            await _close(response)
+            raise
+        except Exception as e:
+            if is_provider_error(e):
+                breaker.record_failure(trip=is_overloaded(e))
+            else:
+                breaker.release()
+            raise
+
+        breaker.record_success(first_token_seconds)
+        return attempt
+
+    def _result(self, attempt: _Attempt) -> Any:
+        if attempt.stream_iterator is None and attempt.first_chunk is None and not hasattr(attempt.response, "__aiter__"):
+            return attempt.response
+        return self._stream(attempt)
+
+    async def _stream(self, attempt: _Attempt) -> AsyncGenerator[Any, None]:
+        if attempt.first_chunk is not None:
+            yield attempt.first_chunk
+        if attempt.stream_iterator is None:
+            return
+        try:
+            async for chunk in attempt.stream_iterator:
+                yield chunk
+        except Exception as e:
+            if is_provider_error(e):
+                attempt.breaker.record_failure(trip=is_overloaded(e))
+            raise
+
+
+async def _close(response: Any) -> None:
+    """Close the HTTP stream of a response that won't be read."""
+    if response is None:
+        return
+    for target in (response, getattr(response, "completion_stream", None)):
+        close = getattr(target, "aclose", None) or getattr(target, "close", None)
+        if close is None:
+            continue
+        try:
+            result = close()
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception:
+            pass
+        return
+
+
+llm_router = LLMRouter()
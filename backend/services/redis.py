@@ -166,6 +166,31 @@ async def lrange(key: str, start: int, end: int) -> List[str]:
     return await redis_client.lrange(key, start, end)
 
 
+async def lpop(key: str):
+    """Remove and return the first element of a list."""
+    redis_client = await get_client()
+    return await redis_client.lpop(key)
+
+
+async def llen(key: str) -> int:
+    """Get the length of a list."""
+    redis_client = await get_client()
+    return await redis_client.llen(key)
+
+
+# Hash operations
+async def hset(key: str, mapping: dict):
+    """Set one or more fields of a hash."""
+    redis_client = await get_client()
+    return await redis_client.hset(key, mapping=mapping)
+
+
+async def hgetall(key: str) -> dict:
+    """Get all fields of a hash."""
+    redis_client = await get_client()
+    return await redis_client.hgetall(key)
+
+
 # Key management
 
 
@@ -0,0 +1,295 @@
+"""
+Sampled, size-capped tracing on top of the Langfuse client in services.langfuse.
+
+Traces, spans, generations and events are used like the Langfuse stateful
+clients they replace, but:
+
+- Agent runs are traced at TRACE_SAMPLE_PERCENT. DEFAULT/DEBUG level events
+  are recorded at TRACE_EVENT_SAMPLE_PERCENT, or at the rate listed for them
+  in EVENT_SAMPLE_RATES. WARNING and ERROR events are always recorded.
+- Payloads are copied when they are recorded, keeping at most TRACE_MAX_ITEMS
+  items per list. Strings longer than TRACE_MAX_FIELD_CHARS are cut and
+  replaced by their head, length and SHA-256.
+- Spans and generations are sent once, when they end, with all their fields.
+- The Langfuse client is called from a background thread fed by a bounded
+  queue, so building and serializing observations stays off the event loop.
+  Observations are dropped, not queued, while the queue is full.
+- With tracing disabled or Langfuse not configured every call is a no-op.
+"""
+
+import dataclasses
+import hashlib
+import queue
+import random
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from services.langfuse import langfuse, enabled as langfuse_enabled
+from utils.config import config
+from utils.logger import logger
+
+# Sampling rates of DEFAULT/DEBUG level events that should be kept more (or less) often than the rest
+EVENT_SAMPLE_RATES: Dict[str, float] = {
+    "agent_termination_requested": 1.0,
+    "terminating_tool_executed": 1.0,
+    "terminating_tool_completed_during_streaming": 1.0,
+    "xml_tool_call_limit_reached": 1.0,
+    "non_streaming_finish_reason": 1.0,
+}
+
+ALWAYS_RECORDED_LEVELS = ("WARNING", "ERROR", "CRITICAL")
+
+# Nesting below this depth is replaced by a marker
+MAX_PAYLOAD_DEPTH = 8
+EXPORT_QUEUE_SIZE = 10_000
+EXPORT_BATCH_SIZE = 200
+
+
+def _freeze(value: Any, max_items: int, depth: int = 0) -> Any:
+    """Copy the containers of a payload, dropping the middle of long lists.
+
+    Strings are immutable and are kept as they are; they are cut in the export
+    thread. Other objects are turned into dicts (dataclasses) or strings here,
+    since they may change after this call.
+    """
+    if value is None or isinstance(value, (str, int, float, bool, datetime)):
+        return value
+    if depth >= MAX_PAYLOAD_DEPTH:
+        return "<nested too deep>"
+    if isinstance(value, dict):
+        items = list(value.items())
+        frozen = {str(k): _freeze(v, max_items, depth + 1) for k, v in items[:max_items]}
+        if len(items) > max_items:
+            frozen["<omitted keys>"] = len(items) - max_items
+        return frozen
+    if isinstance(value, (list, tuple)):
+        if len(value) <= max_items:
+            return [_freeze(v, max_items, depth + 1) for v in value]
+        head = max_items // 2
+        tail = max_items - head
+        return (
+            [_freeze(v, max_items, depth + 1) for v in value[:head]]
+            + [f"<{len(value) - max_items} items omitted>"]
+            + [_freeze(v, max_items, depth + 1) for v in value[len(value) - tail:]]
+        )
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {f.name: _freeze(getattr(value, f.name), max_items, depth + 1) for f in dataclasses.fields(value)}
+    return str(value)
+
+
+def _cap_strings(value: Any, max_chars: int) -> Any:
+    """Cut long strings of a frozen payload to their head, length and SHA-256."""
+    if isinstance(value, str):
+        if len(value) <= max_chars:
+            return value
+        digest = hashlib.sha256(value.encode("utf-8", errors="replace")).hexdigest()
+        return f"{value[:max_chars]}... [truncated, {len(value)} chars, sha256 {digest}]"
+    if isinstance(value, dict):
+        return {k: _cap_strings(v, max_chars) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_cap_strings(v, max_chars) for v in value]
+    return value
+
+
+class _Exporter:
+    """Calls the Langfuse client from a daemon thread, in batches taken from a bounded queue."""
+
+    def __init__(self, client, max_chars: int, queue_size: int = EXPORT_QUEUE_SIZE):
+        self.client = client
+        self.max_chars = max_chars
+        self.dropped = 0
+        self._queue: "queue.Queue[Tuple[str, Dict[str, Any]]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+
+    def submit(self, method: str, fields: Dict[str, Any]) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._start()
+        try:
+            self._queue.put_nowait((method, fields))
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Trace export queue is full, dropped {self.dropped} observations so far")
+
+    def flush(self) -> None:
+        """Block until every queued observation was handed to Langfuse, then flush Langfuse."""
+        if self._thread is not None:
+            self._queue.join()
+        self.client.flush()
+
+    def _start(self) -> None:
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < EXPORT_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for method, fields in batch:
+                try:
+                    getattr(self.client, method)(**_cap_strings(fields, self.max_chars))
+                except Exception as e:
+                    logger.warning(f"Failed to export trace {method}: {e}")
+                finally:
+                    self._queue.task_done()
+
+
+class Span:
+    """A span or generation, sent with all its fields when it ends."""
+
+    def __init__(self, tracer: "Tracer", kind: str, trace_id: str, name: str, fields: Dict[str, Any]):
+        self.tracer = tracer
+        self.kind = kind
+        self.id = str(uuid.uuid4())
+        self.trace_id = trace_id
+        self.name = name
+        self.fields: Dict[str, Any] = {"start_time": datetime.now(timezone.utc)}
+        self.update(**fields)
+        self.ended = False
+
+    def update(self, **fields) -> "Span":
+        self.fields.update(self.tracer.freeze(fields))
+        return self
+
+    def end(self, **fields) -> "Span":
+        if self.ended:
+            return self
+        self.ended = True
+        self.update(**fields)
+        self.fields.setdefault("end_time", datetime.now(timezone.utc))
+        self.tracer.export(self.kind, {"id": self.id, "trace_id": self.trace_id, "name": self.name, **self.fields})
+        return self
+
+
+class _NoopSpan(Span):
+    def __init__(self):
+        pass
+
+    def update(self, **fields) -> "Span":
+        return self
+
+    def end(self, **fields) -> "Span":
+        return self
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """Handle on one Langfuse trace, used like StatefulTraceClient."""
+
+    def __init__(self, tracer: "Tracer", id: str):
+        self.tracer = tracer
+        self.id = id
+
+    def update(self, **fields) -> "Trace":
+        self.tracer.export("trace", {"id": self.id, **self.tracer.freeze(fields)})
+        return self
+
+    def event(self, *, name: str, level: str = "DEFAULT", **fields) -> None:
+        if not self.tracer.event_sampled(name, level):
+            return
+        self.tracer.export("event", {
+            "trace_id": self.id, "name": name, "level": level,
+            "start_time": datetime.now(timezone.utc), **self.tracer.freeze(fields)
+        })
+
+    def span(self, *, name: str, **fields) -> Span:
+        return Span(self.tracer, "span", self.id, name, fields)
+
+    def generation(self, *, name: str, **fields) -> Span:
+        return Span(self.tracer, "generation", self.id, name, fields)
+
+
+class _NoopTrace(Trace):
+    def __init__(self):
+        self.id = None
+
+    def update(self, **fields) -> "Trace":
+        return self
+
+    def event(self, *, name: str, level: str = "DEFAULT", **fields) -> None:
+        return None
+
+    def span(self, *, name: str, **fields) -> Span:
+        return NOOP_SPAN
+
+    def generation(self, *, name: str, **fields) -> Span:
+        return NOOP_SPAN
+
+
+NOOP_TRACE = _NoopTrace()
+
+
+class Tracer:
+    """Creates traces and applies the sampling and payload limits."""
+
+    def __init__(
+        self,
+        client=None,
+        enabled: bool = True,
+        sample_rate: float = 1.0,
+        event_sample_rate: float = 1.0,
+        event_sample_rates: Optional[Dict[str, float]] = None,
+        max_chars: int = 4000,
+        max_items: int = 50
+    ):
+        self.enabled = enabled and client is not None
+        self.sample_rate = sample_rate
+        self.event_sample_rate = event_sample_rate
+        self.event_sample_rates = event_sample_rates or {}
+        self.max_items = max_items
+        self.exporter = _Exporter(client, max_chars) if self.enabled else None
+
+    def trace(self, *, name: str, id: Optional[str] = None, **fields) -> Trace:
+        """Start a trace; returns the no-op trace when disabled or not sampled."""
+        if not self.enabled or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            return NOOP_TRACE
+        trace = Trace(self, id or str(uuid.uuid4()))
+        trace.update(name=name, **fields)
+        return trace
+
+    def event_sampled(self, name: str, level: str) -> bool:
+        if level in ALWAYS_RECORDED_LEVELS:
+            return True
+        rate = self.event_sample_rates.get(name, self.event_sample_rate)
+        return rate >= 1.0 or random.random() < rate
+
+    def freeze(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: _freeze(value, self.max_items) for key, value in fields.items() if value is not None}
+
+    def export(self, method: str, fields: Dict[str, Any]) -> None:
+        self.exporter.submit(method, fields)
+
+    def flush(self) -> None:
+        """Send everything recorded so far. Blocks; call it from a thread in async code."""
+        if self.exporter:
+            self.exporter.flush()
+
+
+tracer = Tracer(
+    langfuse,
+    enabled=config.TRACING_ENABLED and langfuse_enabled,
+    sample_rate=config.TRACE_SAMPLE_PERCENT / 100,
+    event_sample_rate=config.TRACE_EVENT_SAMPLE_PERCENT / 100,
+    event_sample_rates=EVENT_SAMPLE_RATES,
+    max_chars=config.TRACE_MAX_FIELD_CHARS,
+    max_items=config.TRACE_MAX_ITEMS,
+)
+
+
+def trace(*, name: str, id: Optional[str] = None, **fields) -> Trace:
+    return tracer.trace(name=name, id=id, **fields)
+
+
+def flush() -> None:
+    tracer.flush()
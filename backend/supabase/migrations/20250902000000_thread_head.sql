@@ -0,0 +1,41 @@
+BEGIN;
+
+-- Latest per-type state of a thread in a single round trip. Replaces the separate
+-- "order by created_at desc limit 1" lookups the agent loop runs every iteration
+-- for browser_state, image_context and the last conversation message.
+CREATE OR REPLACE FUNCTION get_thread_head(
+    p_thread_id UUID
+)
+RETURNS JSONB
+SECURITY DEFINER
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT jsonb_build_object(
+        'browser_state', (
+            SELECT jsonb_build_object('message_id', m.message_id, 'type', m.type, 'content', m.content)
+            FROM messages m
+            WHERE m.thread_id = p_thread_id AND m.type = 'browser_state'
+            ORDER BY m.created_at DESC
+            LIMIT 1
+        ),
+        'image_context', (
+            SELECT jsonb_build_object('message_id', m.message_id, 'type', m.type, 'content', m.content)
+            FROM messages m
+            WHERE m.thread_id = p_thread_id AND m.type = 'image_context'
+            ORDER BY m.created_at DESC
+            LIMIT 1
+        ),
+        'conversation', (
+            SELECT jsonb_build_object('message_id', m.message_id, 'type', m.type)
+            FROM messages m
+            WHERE m.thread_id = p_thread_id AND m.type IN ('assistant', 'tool', 'user')
+            ORDER BY m.created_at DESC
+            LIMIT 1
+        )
+    );
+$$;
+
+COMMENT ON FUNCTION get_thread_head IS 'Returns the latest browser_state, image_context and conversation (assistant/tool/user) message of a thread';
+
+COMMIT;
@@ -0,0 +1,30 @@
+BEGIN;
+
+-- Almost every hot read on messages filters on thread_id plus type and orders by
+-- created_at: the task list and latest user message lookups, the thread head
+-- (browser_state, image_context, last conversation message) and the usage log
+-- scan over assistant_response_end. With only idx_messages_thread_id the planner
+-- has to fetch every row of the thread and sort it, which grows with thread length.
+
+-- thread_id = ? AND type = ? ORDER BY created_at [DESC] LIMIT n
+CREATE INDEX IF NOT EXISTS idx_messages_thread_type_created
+    ON messages(thread_id, type, created_at);
+
+-- get_llm_messages pages through user/assistant/tool messages in created_at order;
+-- a partial index returns them already ordered, without sorting the whole thread
+-- for every page. Also serves the thread head's latest conversation message.
+CREATE INDEX IF NOT EXISTS idx_messages_thread_conversation_created
+    ON messages(thread_id, created_at)
+    WHERE type IN ('user', 'assistant', 'tool');
+
+-- Usage logs: thread_id IN (...) AND type = 'assistant_response_end' AND created_at >= ?
+CREATE INDEX IF NOT EXISTS idx_messages_thread_usage_created
+    ON messages(thread_id, created_at)
+    WHERE type = 'assistant_response_end';
+
+-- Leading column of idx_messages_thread_type_created; keeping it only costs writes
+DROP INDEX IF EXISTS idx_messages_thread_id;
+
+ANALYZE messages;
+
+COMMIT;
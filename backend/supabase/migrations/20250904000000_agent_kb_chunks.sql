@@ -0,0 +1,157 @@
+BEGIN;
+
+-- Knowledge base entries are split into chunks at ingest so runs can pull the
+-- parts of a large knowledge base that are relevant to the current request
+-- instead of whole entries in recency order.
+CREATE TABLE IF NOT EXISTS agent_knowledge_base_chunks (
+    chunk_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    entry_id UUID NOT NULL REFERENCES agent_knowledge_base_entries(entry_id) ON DELETE CASCADE,
+    agent_id UUID NOT NULL REFERENCES agents(agent_id) ON DELETE CASCADE,
+    chunk_index INTEGER NOT NULL,
+    heading TEXT, -- Entry name and description, weighted above the chunk text
+    content TEXT NOT NULL,
+    content_tokens INTEGER NOT NULL,
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', COALESCE(heading, '')), 'A') ||
+        setweight(to_tsvector('english', content), 'B')
+    ) STORED,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+
+    CONSTRAINT agent_kb_chunks_entry_chunk_unique UNIQUE (entry_id, chunk_index)
+);
+
+CREATE INDEX IF NOT EXISTS idx_agent_kb_chunks_agent_id ON agent_knowledge_base_chunks(agent_id);
+CREATE INDEX IF NOT EXISTS idx_agent_kb_chunks_search_vector ON agent_knowledge_base_chunks USING GIN(search_vector);
+
+ALTER TABLE agent_knowledge_base_chunks ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY agent_kb_chunks_user_access ON agent_knowledge_base_chunks
+    FOR ALL
+    USING (
+        EXISTS (
+            SELECT 1 FROM agents a
+            WHERE a.agent_id = agent_knowledge_base_chunks.agent_id
+            AND basejump.has_role_on_account(a.account_id) = true
+        )
+    );
+
+-- Backfill existing entries with fixed-size chunks; entries are re-chunked on
+-- paragraph boundaries by the backend the next time they are written.
+INSERT INTO agent_knowledge_base_chunks (entry_id, agent_id, chunk_index, heading, content, content_tokens)
+SELECT
+    e.entry_id,
+    e.agent_id,
+    g.chunk_offset / 1600,
+    CONCAT_WS(E'\n', e.name, NULLIF(e.description, '')),
+    SUBSTR(e.content, g.chunk_offset + 1, 1600),
+    LENGTH(SUBSTR(e.content, g.chunk_offset + 1, 1600)) / 4
+FROM agent_knowledge_base_entries e
+CROSS JOIN LATERAL generate_series(0, LENGTH(e.content) - 1, 1600) AS g(chunk_offset)
+ON CONFLICT (entry_id, chunk_index) DO NOTHING;
+
+-- The old context function concatenated whole entries and logged usage row by
+-- row on every run start; context is now assembled from search results.
+DROP FUNCTION IF EXISTS get_agent_knowledge_base_context(UUID);
+
+-- Chunks to put into an agent's prompt for a request.
+-- If all active chunks fit into p_max_tokens they are all returned, so small
+-- knowledge bases produce the same context on every run. Otherwise up to
+-- p_max_chunks chunks matching any term of p_query are picked by rank within
+-- the budget, falling back to the most recent entries when nothing matches.
+-- Results are ordered by entry and chunk position, not rank, which keeps the
+-- prompt text stable when the same chunks are selected again.
+CREATE OR REPLACE FUNCTION search_agent_knowledge_base(
+    p_agent_id UUID,
+    p_query TEXT DEFAULT NULL,
+    p_max_tokens INTEGER DEFAULT 4000,
+    p_max_chunks INTEGER DEFAULT 40
+)
+RETURNS TABLE (
+    entry_id UUID,
+    entry_name VARCHAR(255),
+    entry_description TEXT,
+    chunk_index INTEGER,
+    content TEXT,
+    content_tokens INTEGER,
+    rank REAL
+)
+SECURITY DEFINER
+LANGUAGE plpgsql
+STABLE
+AS $$
+#variable_conflict use_column
+DECLARE
+    query_ts TSQUERY;
+    total_tokens BIGINT;
+BEGIN
+    SELECT COALESCE(SUM(c.content_tokens), 0) INTO total_tokens
+    FROM agent_knowledge_base_chunks c
+    JOIN agent_knowledge_base_entries e ON e.entry_id = c.entry_id
+    WHERE c.agent_id = p_agent_id
+    AND e.is_active = TRUE
+    AND e.usage_context IN ('always', 'contextual');
+
+    IF p_query IS NOT NULL AND BTRIM(p_query) != '' THEN
+        -- OR the query terms together; ranking favours chunks matching more of them
+        query_ts := NULLIF(REPLACE(plainto_tsquery('english', LEFT(p_query, 2000))::TEXT, ' & ', ' | '), '')::TSQUERY;
+    END IF;
+
+    IF query_ts IS NOT NULL AND total_tokens > p_max_tokens THEN
+        RETURN QUERY
+        WITH matches AS (
+            SELECT
+                c.entry_id, e.name, e.description, e.created_at AS entry_created_at,
+                c.chunk_index, c.content, c.content_tokens,
+                ts_rank_cd(c.search_vector, query_ts) AS chunk_rank
+            FROM agent_knowledge_base_chunks c
+            JOIN agent_knowledge_base_entries e ON e.entry_id = c.entry_id
+            WHERE c.agent_id = p_agent_id
+            AND c.search_vector @@ query_ts
+            AND e.is_active = TRUE
+            AND e.usage_context IN ('always', 'contextual')
+        ), ranked AS (
+            SELECT m.*,
+                SUM(m.content_tokens) OVER w AS running_tokens,
+                ROW_NUMBER() OVER w AS chunk_position
+            FROM matches m
+            WINDOW w AS (ORDER BY m.chunk_rank DESC, m.entry_created_at DESC, m.entry_id, m.chunk_index ROWS UNBOUNDED PRECEDING)
+        )
+        SELECT r.entry_id, r.name, r.description, r.chunk_index, r.content, r.content_tokens, r.chunk_rank
+        FROM ranked r
+        WHERE r.running_tokens <= p_max_tokens
+        AND r.chunk_position <= p_max_chunks
+        ORDER BY r.entry_created_at DESC, r.entry_id, r.chunk_index;
+
+        IF FOUND THEN
+            RETURN;
+        END IF;
+    END IF;
+
+    RETURN QUERY
+    WITH ordered AS (
+        SELECT
+            c.entry_id, e.name, e.description, e.created_at AS entry_created_at,
+            c.chunk_index, c.content, c.content_tokens,
+            SUM(c.content_tokens) OVER (
+                ORDER BY e.created_at DESC, c.entry_id, c.chunk_index ROWS UNBOUNDED PRECEDING
+            ) AS running_tokens
+        FROM agent_knowledge_base_chunks c
+        JOIN agent_knowledge_base_entries e ON e.entry_id = c.entry_id
+        WHERE c.agent_id = p_agent_id
+        AND e.is_active = TRUE
+        AND e.usage_context IN ('always', 'contextual')
+    )
+    SELECT o.entry_id, o.name, o.description, o.chunk_index, o.content, o.content_tokens, 0::REAL
+    FROM ordered o
+    WHERE o.running_tokens <= p_max_tokens
+    ORDER BY o.entry_created_at DESC, o.entry_id, o.chunk_index;
+END;
+$$;
+
+GRANT ALL PRIVILEGES ON TABLE agent_knowledge_base_chunks TO authenticated, service_role;
+GRANT EXECUTE ON FUNCTION search_agent_knowledge_base TO authenticated, service_role;
+
+COMMENT ON TABLE agent_knowledge_base_chunks IS 'Full-text indexed chunks of agent knowledge base entries used for prompt retrieval';
+COMMENT ON FUNCTION search_agent_knowledge_base IS 'Selects the knowledge base chunks most relevant to a query within a token budget';
+
+COMMIT;
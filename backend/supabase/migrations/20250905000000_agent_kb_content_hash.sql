@@ -0,0 +1,16 @@
+BEGIN;
+
+-- SHA-256 of the source file an entry was extracted from. Re-ingesting a ZIP
+-- archive or repository skips files whose hash matches the entry stored for
+-- the same path (file_path) under the same container entry.
+ALTER TABLE agent_knowledge_base_entries
+ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- Children of a container are looked up and diffed by path on every ingestion
+CREATE INDEX IF NOT EXISTS idx_agent_kb_entries_container_path
+    ON agent_knowledge_base_entries(extracted_from_zip_id, file_path)
+    WHERE extracted_from_zip_id IS NOT NULL;
+
+COMMENT ON COLUMN agent_knowledge_base_entries.content_hash IS 'SHA-256 of the source file, used to skip unchanged files on re-ingestion';
+
+COMMIT;
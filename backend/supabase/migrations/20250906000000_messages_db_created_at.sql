@@ -0,0 +1,52 @@
+BEGIN;
+
+-- The agent's write buffer inserts messages in batches with created_at set to
+-- NULL and leaves the timestamp to the database, so ordering never depends on
+-- a worker's clock. Such rows get the database clock, but never a timestamp at
+-- or before the newest message of their thread, so a thread read by
+-- created_at returns buffered messages in the order they were inserted and
+-- after everything already stored. Rows inserted with a created_at (or with
+-- the column's default) are left as they are.
+
+-- Latest message of a thread, whatever its type
+CREATE INDEX IF NOT EXISTS idx_messages_thread_created
+    ON messages(thread_id, created_at);
+
+CREATE OR REPLACE FUNCTION assign_message_created_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    latest TIMESTAMPTZ;
+    previous TEXT;
+BEGIN
+    IF NEW.created_at IS NOT NULL THEN
+        RETURN NEW;
+    END IF;
+
+    SELECT created_at INTO latest
+    FROM messages
+    WHERE thread_id = NEW.thread_id
+    ORDER BY created_at DESC
+    LIMIT 1;
+
+    -- Rows inserted earlier by the same statement are not visible to the query above
+    previous := current_setting('messages.last_created_at', true);
+    IF previous IS NOT NULL AND previous <> '' THEN
+        latest := GREATEST(latest, previous::TIMESTAMPTZ);
+    END IF;
+
+    NEW.created_at := GREATEST(clock_timestamp(), latest + INTERVAL '1 microsecond');
+    NEW.updated_at := NEW.created_at;
+    PERFORM set_config('messages.last_created_at', NEW.created_at::TEXT, true);
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS assign_message_created_at ON messages;
+CREATE TRIGGER assign_message_created_at
+    BEFORE INSERT ON messages
+    FOR EACH ROW
+    EXECUTE FUNCTION assign_message_created_at();
+
+COMMIT;
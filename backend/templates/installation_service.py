@@ -473,6 +473,8 @@ class InstallationService:
             config['workflows'] = workflows
             
             await client.table('agent_versions').update({'config': config}).eq('version_id', current_version_id).execute()
+            from agent.config_cache import invalidate_agent_config
+            await invalidate_agent_config(agent_id)
             logger.debug(f"Synced {len(workflows)} workflows to version config for agent {agent_id}")
             
         except Exception as e:
@@ -637,6 +639,8 @@ class InstallationService:
             config['triggers'] = triggers
             
             await client.table('agent_versions').update({'config': config}).eq('version_id', current_version_id).execute()
+            from agent.config_cache import invalidate_agent_config
+            await invalidate_agent_config(agent_id)
             
             logger.debug(f"Synced {len(triggers)} triggers to version config for agent {agent_id}")
             
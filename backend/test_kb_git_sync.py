@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Test incremental re-syncs of git repositories into an agent's knowledge base.
+
+A local repository is synced three times through FileProcessor.process_git_repository
+against an in-memory stand-in for the knowledge base tables: a first full sync,
+a second sync with nothing new, and a third one after files were modified,
+added and deleted.
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import uuid
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from knowledge_base.file_processor import FileProcessor
+from utils.config import config
+
+
+class FakeQuery:
+    """The subset of the PostgREST query builder used by FileProcessor."""
+
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.action = 'select'
+        self.payload = None
+        self.filters = []
+        self.limit_count = None
+        self.offset = 0
+
+    def select(self, columns):
+        return self
+
+    def insert(self, data):
+        self.action, self.payload = 'insert', data
+        return self
+
+    def upsert(self, data):
+        self.action, self.payload = 'upsert', data
+        return self
+
+    def update(self, data):
+        self.action, self.payload = 'update', data
+        return self
+
+    def delete(self):
+        self.action = 'delete'
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: self._get(row, column) == value)
+        return self
+
+    def is_(self, column, value):
+        self.filters.append(lambda row: row.get(column) is None)
+        return self
+
+    def in_(self, column, values):
+        values = list(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column, desc=False):
+        return self
+
+    def limit(self, count):
+        self.limit_count = count
+        return self
+
+    def range(self, start, end):
+        self.offset, self.limit_count = start, end - start + 1
+        return self
+
+    @staticmethod
+    def _get(row, column):
+        if '->>' in column:
+            column, key = column.split('->>')
+            value = (row.get(column) or {}).get(key)
+            return None if value is None else str(value)
+        return row.get(column)
+
+    async def execute(self):
+        rows = self.db.tables.setdefault(self.table, [])
+        if self.action in ('insert', 'upsert'):
+            data = self.payload if isinstance(self.payload, list) else [self.payload]
+            result = []
+            for item in data:
+                row = next((r for r in rows if item.get('entry_id') and r.get('entry_id') == item['entry_id']), None)
+                if row is None:
+                    row = {'entry_id': str(uuid.uuid4())}
+                    rows.append(row)
+                row.update(item)
+                result.append(dict(row))
+            return type('Result', (), {'data': result})()
+
+        matched = [row for row in rows if all(f(row) for f in self.filters)]
+        if self.action == 'update':
+            for row in matched:
+                row.update(self.payload)
+        elif self.action == 'delete':
+            self.db.tables[self.table] = [row for row in rows if row not in matched]
+        else:
+            matched = matched[self.offset:]
+            if self.limit_count is not None:
+                matched = matched[:self.limit_count]
+        return type('Result', (), {'data': [dict(row) for row in matched]})()
+
+
+class FakeClient:
+    def __init__(self):
+        self.tables = {}
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+class FakeDB:
+    def __init__(self):
+        self._client = FakeClient()
+
+    @property
+    async def client(self):
+        return self._client
+
+
+def git(cwd, *args):
+    subprocess.run(
+        ['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com', *args],
+        cwd=cwd, check=True, capture_output=True
+    )
+
+
+def write(repo, path, text):
+    with open(os.path.join(repo, path), 'w') as f:
+        f.write(text)
+
+
+def children(db, container_id):
+    rows = db._client.tables['agent_knowledge_base_entries']
+    return {row['file_path']: row['content'] for row in rows if row.get('extracted_from_zip_id') == container_id}
+
+
+def test_git_resync(tmp_path, monkeypatch):
+    """Repeated syncs of a repository only process what changed since the previous one."""
+    monkeypatch.setattr(config, 'KB_GIT_CACHE_DIR', str(tmp_path / 'cache'))
+    repo = tmp_path / 'repo'
+    repo.mkdir()
+    git(repo, 'init', '--initial-branch=main')
+    write(repo, 'a.txt', 'first version of a')
+    write(repo, 'b.txt', 'contents of b')
+    write(repo, 'notes.md', 'not included')
+    git(repo, 'add', '.')
+    git(repo, 'commit', '-m', 'initial')
+
+    processor = FileProcessor()
+    processor.db = FakeDB()
+    git_url = f"file://{repo}"
+
+    async def sync():
+        return await processor.process_git_repository('agent', 'account', git_url, 'main')
+
+    first = asyncio.run(sync())
+    assert first['success'], first
+    assert first['total_processed'] == 2
+    container_id = first['repo_entry_id']
+    assert children(processor.db, container_id) == {'a.txt': 'first version of a', 'b.txt': 'contents of b'}
+
+    # Second sync without new commits: nothing is fetched into the knowledge base
+    second = asyncio.run(sync())
+    assert second['success'], second
+    assert second['repo_entry_id'] == container_id
+    assert second['commit'] == first['commit']
+    assert second['previous_commit'] == first['commit']
+    assert second['total_processed'] == 0 and second['total_removed'] == 0
+
+    write(repo, 'a.txt', 'second version of a')
+    write(repo, 'c.txt', 'contents of c')
+    git(repo, 'rm', '-q', 'b.txt')
+    git(repo, 'add', '.')
+    git(repo, 'commit', '-m', 'update')
+
+    third = asyncio.run(sync())
+    assert third['success'], third
+    assert third['previous_commit'] == first['commit'] != third['commit']
+    assert sorted(f['relative_path'] for f in third['processed_files']) == ['a.txt', 'c.txt']
+    assert third['total_removed'] == 1
+    assert children(processor.db, container_id) == {'a.txt': 'second version of a', 'c.txt': 'contents of c'}
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Test the warm sandbox pool against a fake Daytona client and an in-memory Redis.
+
+Covers refilling the pool, claiming a member for a project (including
+restarting a stopped member and skipping a broken one) and the readiness
+probe used before a sandbox is handed out.
+"""
+
+import asyncio
+import functools
+import os
+import sys
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from daytona_sdk import SandboxState
+
+import sandbox.pool as pool_module
+import sandbox.sandbox as sandbox_module
+from sandbox.pool import SandboxPool
+
+
+class FakeProcess:
+    def __init__(self, sandbox):
+        self.sandbox = sandbox
+        self.sessions = []
+        self.probes = 0
+
+    async def create_session(self, session_id):
+        self.sessions.append(session_id)
+
+    async def execute_session_command(self, session_id, req):
+        return SimpleNamespace(cmd_id='cmd', exit_code=None)
+
+    async def exec(self, command, timeout=None):
+        # Readiness probe: the HTTP server answers once the sandbox's services are up
+        self.probes += 1
+        up = self.sandbox.ready_after is not None and self.probes > self.sandbox.ready_after
+        return SimpleNamespace(exit_code=0, result='200' if up else '000')
+
+
+class FakeSandbox:
+    def __init__(self, sandbox_id, params, ready_after=0):
+        self.id = sandbox_id
+        self.params = params
+        self.state = SandboxState.STARTED
+        self.labels = dict(params.labels or {})
+        self.auto_stop_interval = params.auto_stop_interval
+        self.auto_archive_interval = params.auto_archive_interval
+        self.ready_after = ready_after
+        self.process = FakeProcess(self)
+
+    async def set_labels(self, labels):
+        self.labels = dict(labels)
+
+    async def set_autostop_interval(self, interval):
+        self.auto_stop_interval = interval
+
+    async def set_auto_archive_interval(self, interval):
+        self.auto_archive_interval = interval
+
+
+class FakeDaytona:
+    """Stands in for AsyncDaytona: create/get/start/delete on in-memory sandboxes."""
+
+    def __init__(self, ready_after=0):
+        self.sandboxes = {}
+        self.deleted = []
+        self.started = []
+        self.ready_after = ready_after
+
+    async def create(self, params):
+        sandbox = FakeSandbox(f"sandbox-{len(self.sandboxes) + len(self.deleted)}", params, self.ready_after)
+        self.sandboxes[sandbox.id] = sandbox
+        return sandbox
+
+    async def get(self, sandbox_id):
+        if sandbox_id not in self.sandboxes:
+            raise Exception(f"Sandbox {sandbox_id} not found")
+        return self.sandboxes[sandbox_id]
+
+    async def start(self, sandbox):
+        self.started.append(sandbox.id)
+        sandbox.state = SandboxState.STARTED
+
+    async def delete(self, sandbox):
+        self.deleted.append(sandbox.id)
+        self.sandboxes.pop(sandbox.id, None)
+
+
+class FakeRedis:
+    """The services.redis functions used by the pool."""
+
+    def __init__(self):
+        self.values = {}
+        self.lists = {}
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    async def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    async def delete(self, key):
+        self.values.pop(key, None)
+
+    async def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+
+    async def lpop(self, key):
+        items = self.lists.get(key)
+        return items.pop(0) if items else None
+
+    async def llen(self, key):
+        return len(self.lists.get(key, []))
+
+
+def make_pool(monkeypatch, size=2, ready_after=0):
+    monkeypatch.setattr(pool_module, 'redis', FakeRedis())
+    # Short readiness timeout so unready sandboxes fail fast
+    monkeypatch.setattr(
+        pool_module, 'wait_for_sandbox_ready',
+        functools.partial(sandbox_module.wait_for_sandbox_ready, timeout=0.5)
+    )
+    return SandboxPool(daytona_client=FakeDaytona(ready_after), snapshot='test-snapshot', size=size)
+
+
+def test_refill_creates_warm_members(monkeypatch):
+    pool = make_pool(monkeypatch)
+
+    assert asyncio.run(pool.refill()) == 2
+    assert len(pool_module.redis.lists[pool.pool_key]) == 2
+    for sandbox in pool.daytona.sandboxes.values():
+        assert sandbox.params.snapshot == 'test-snapshot'
+        assert sandbox.labels == {'pool': 'test-snapshot'}
+        # Pool members must not stop while they wait to be claimed
+        assert sandbox.auto_stop_interval == 0
+        assert 'supervisord-session' in sandbox.process.sessions
+
+    # A full pool is not topped up again
+    assert asyncio.run(pool.refill()) == 0
+
+
+def test_refill_discards_members_that_never_become_ready(monkeypatch):
+    pool = make_pool(monkeypatch, ready_after=None)
+
+    assert asyncio.run(pool.refill()) == 0
+    assert pool_module.redis.lists.get(pool.pool_key, []) == []
+    assert len(pool.daytona.deleted) == 2
+
+
+def test_claim_assigns_member_and_refills(monkeypatch):
+    pool = make_pool(monkeypatch)
+
+    async def claim():
+        await pool.refill()
+        claimed = await pool.acquire('project-1')
+        await pool._refill_task
+        return claimed
+
+    sandbox, password = asyncio.run(claim())
+    assert sandbox.labels == {'id': 'project-1'}
+    assert sandbox.auto_stop_interval == sandbox_module.SANDBOX_AUTO_STOP_INTERVAL
+    assert sandbox.auto_archive_interval == sandbox_module.SANDBOX_AUTO_ARCHIVE_INTERVAL
+    assert password == sandbox.params.env_vars['VNC_PASSWORD']
+    # The claim triggered a refill back to full size
+    assert len(pool_module.redis.lists[pool.pool_key]) == 2
+    assert len(pool.daytona.sandboxes) == 3
+
+
+def test_claim_restarts_stopped_member(monkeypatch):
+    pool = make_pool(monkeypatch, size=1)
+
+    async def claim():
+        await pool.refill()
+        member = next(iter(pool.daytona.sandboxes.values()))
+        member.state = SandboxState.STOPPED
+        return member, await pool.acquire('project-1')
+
+    member, (sandbox, _) = asyncio.run(claim())
+    assert sandbox is member
+    assert pool.daytona.started == [member.id]
+    assert sandbox.state == SandboxState.STARTED
+    assert sandbox.labels == {'id': 'project-1'}
+
+
+def test_claim_skips_broken_member(monkeypatch):
+    pool = make_pool(monkeypatch)
+
+    async def claim():
+        await pool.refill()
+        broken, healthy = list(pool.daytona.sandboxes)
+        pool.daytona.sandboxes.pop(broken)
+        return healthy, await pool.acquire('project-1')
+
+    healthy, (sandbox, _) = asyncio.run(claim())
+    assert sandbox.id == healthy
+
+
+def test_claim_from_empty_or_disabled_pool(monkeypatch):
+    assert asyncio.run(make_pool(monkeypatch).acquire('project-1')) is None
+    assert asyncio.run(make_pool(monkeypatch, size=0).acquire('project-1')) is None
+
+
+def test_readiness_probe(monkeypatch):
+    params = SimpleNamespace(labels=None, auto_stop_interval=0, auto_archive_interval=0)
+
+    slow = FakeSandbox('slow', params, ready_after=2)
+    assert asyncio.run(sandbox_module.wait_for_sandbox_ready(slow, timeout=5))
+    assert slow.process.probes == 3
+
+    dead = FakeSandbox('dead', params, ready_after=None)
+    assert not asyncio.run(sandbox_module.wait_for_sandbox_ready(dead, timeout=0.5))
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, '-q']))
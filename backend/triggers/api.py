@@ -163,6 +163,8 @@ async def sync_workflows_to_version_config(agent_id: str):
         config['workflows'] = workflows
         
         await client.table('agent_versions').update({'config': config}).eq('version_id', current_version_id).execute()
+        from agent.config_cache import invalidate_agent_config
+        await invalidate_agent_config(agent_id)
         
         logger.debug(f"Synced {len(workflows)} workflows to version config for agent {agent_id}")
         
@@ -205,6 +207,8 @@ async def sync_triggers_to_version_config(agent_id: str):
         config['triggers'] = triggers
         
         await client.table('agent_versions').update({'config': config}).eq('version_id', current_version_id).execute()
+        from agent.config_cache import invalidate_agent_config
+        await invalidate_agent_config(agent_id)
         
         logger.debug(f"Synced {len(triggers)} triggers to version config for agent {agent_id}")
         
@@ -8,6 +8,7 @@ from services import redis
 from utils.logger import logger, structlog
 from utils.config import config
 from run_agent_background import run_agent_background
+from agent.config_cache import get_agent_head, set_agent_head, get_cached_config, set_cached_config
 from .trigger_service import TriggerEvent, TriggerResult
 from .utils import format_workflow_for_llm
 
@@ -129,10 +130,10 @@ class SessionManager:
         client = await self._db.client
         
         try:
-            from sandbox.sandbox import create_sandbox, delete_sandbox
+            from sandbox.sandbox import delete_sandbox
+            from sandbox.pool import provision_project_sandbox
             
-            sandbox_pass = str(uuid.uuid4())
-            sandbox = await create_sandbox(sandbox_pass, project_id)
+            sandbox, sandbox_pass = await provision_project_sandbox(project_id)
             sandbox_id = sandbox.id
             
             vnc_link = await sandbox.get_preview_link(6080)
@@ -222,6 +223,13 @@ class AgentExecutor:
     async def _get_agent_config(self, agent_id: str) -> Dict[str, Any]:
         try:
             logger.debug(f"Getting agent config for agent_id: {agent_id}")
+
+            head = await get_agent_head(agent_id)
+            if head and head.get('version_id'):
+                cached_config = await get_cached_config(agent_id, head['version_id'], variant="trigger")
+                if cached_config:
+                    logger.debug(f"Agent config cache hit for agent {agent_id}, version {head['version_id']}")
+                    return cached_config
             
             client = await self._db.client
             agent_result = await client.table('agents').select('account_id, name, current_version_id').eq('agent_id', agent_id).execute()
@@ -256,7 +264,7 @@ class AgentExecutor:
                 version = await version_service.get_version(agent_id, current_version_id, user_id_for_version)
                 logger.debug(f"Successfully retrieved version {current_version_id} for agent {agent_id}: {version.version_name}")
                 
-                return {
+                return await self._cache_agent_config(agent_id, account_id, {
                     'agent_id': agent_id,
                     'account_id': agent_data.get('account_id'),
                     'name': agent_data.get('name', 'Unknown Agent'),
@@ -267,14 +275,14 @@ class AgentExecutor:
                     'agentpress_tools': version.agentpress_tools if isinstance(version.agentpress_tools, dict) else {},
                     'current_version_id': version.version_id,
                     'version_name': version.version_name
-                }
+                })
                 
             except Exception as version_error:
                 logger.error(f"Failed to get version {current_version_id} for agent {agent_id}: {type(version_error).__name__}: {version_error}")
                 if user_id_for_version != "system":
                     try:
                         version = await version_service.get_version(agent_id, current_version_id, "system")
-                        return {
+                        return await self._cache_agent_config(agent_id, account_id, {
                             'agent_id': agent_id,
                             'account_id': agent_data.get('account_id'),
                             'name': agent_data.get('name', 'Unknown Agent'),
@@ -285,7 +293,7 @@ class AgentExecutor:
                             'agentpress_tools': version.agentpress_tools if isinstance(version.agentpress_tools, dict) else {},
                             'current_version_id': version.version_id,
                             'version_name': version.version_name
-                        }
+                        })
                         
                     except Exception as system_version_error:
                         logger.error(f"Failed to get version {current_version_id} with system user for agent {agent_id}: {type(system_version_error).__name__}: {system_version_error}")
@@ -305,6 +313,12 @@ class AgentExecutor:
             logger.error(f"Failed to get agent config using versioning system for agent {agent_id}: {e}", exc_info=True)
             return None
     
+    async def _cache_agent_config(self, agent_id: str, account_id: Optional[str], agent_config: Dict[str, Any]) -> Dict[str, Any]:
+        version_id = agent_config['current_version_id']
+        await set_cached_config(agent_id, version_id, agent_config, variant="trigger")
+        await set_agent_head(agent_id, version_id, account_id)
+        return agent_config
+    
     async def _create_initial_message(
         self, 
         thread_id: str, 
@@ -557,7 +571,7 @@ class WorkflowExecutor:
         
         tool_mapping = {
             'sb_shell_tool': ['execute_command'],
-            'sb_files_tool': ['create_file', 'str_replace', 'full_file_rewrite', 'delete_file'],
+            'sb_files_tool': ['create_file', 'str_replace', 'full_file_rewrite', 'delete_file', 'batch_file_operations'],
             'browser_tool': ['browser_navigate_to', 'browser_screenshot'],
             'sb_vision_tool': ['see_image'],
             'sb_deploy_tool': ['deploy'],
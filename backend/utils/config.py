@@ -272,6 +272,11 @@ class Configuration:
     CLOUDFLARE_API_TOKEN: Optional[str] = None
     FIRECRAWL_API_KEY: str
     FIRECRAWL_URL: Optional[str] = "https://api.firecrawl.dev"
+    # Web search and scrape caching (seconds, shared across runs through Redis)
+    WEB_SEARCH_CACHE_TTL: int = 60 * 60
+    WEB_SCRAPE_CACHE_TTL: int = 6 * 60 * 60
+    # Concurrent Firecrawl requests per worker
+    WEB_SCRAPE_CONCURRENCY: int = 8
     
     # Billing configuration
     BILLING_ENABLED: bool = False
@@ -293,11 +298,51 @@ class Configuration:
     SANDBOX_IMAGE_NAME = "kortix/suna:0.1.3.4"
     SANDBOX_SNAPSHOT_NAME = "kortix/suna:0.1.3.4"
     SANDBOX_ENTRYPOINT = "/usr/bin/supervisord -n -c /etc/supervisor/conf.d/supervisord.conf"
+    # Warm sandbox pool (0 disables pooling)
+    SANDBOX_POOL_SIZE: int = 0
+    SANDBOX_POOL_REFILL_INTERVAL: int = 60
+
+    # Browser screenshot processing
+    SCREENSHOT_FORMAT: str = "webp"
+    SCREENSHOT_QUALITY: int = 75
+    SCREENSHOT_MAX_WIDTH: int = 1280
+    IMAGE_PROCESSING_WORKERS: int = 4
+
+    # Seconds before a tool call without its own timeout is stopped
+    TOOL_DEFAULT_TIMEOUT: int = 600
+
+    # Milliseconds a thread message may wait in the write buffer before it is inserted
+    MESSAGE_FLUSH_INTERVAL_MS: int = 250
+
+    # Knowledge base ingestion: processes extracting PDF/DOCX/text content
+    KB_EXTRACTION_WORKERS: int = 2
+    # Directory for the clones kept between git source syncs (defaults to a kb_git_cache temp dir)
+    KB_GIT_CACHE_DIR: Optional[str] = None
 
     # LangFuse configuration
     LANGFUSE_PUBLIC_KEY: Optional[str] = None
     LANGFUSE_SECRET_KEY: Optional[str] = None
     LANGFUSE_HOST: str = "https://cloud.langfuse.com"
+    # Tracing (services/tracing.py): set TRACING_ENABLED=false to make every trace a no-op
+    TRACING_ENABLED: bool = True
+    # Percentage of agent runs that are traced
+    TRACE_SAMPLE_PERCENT: int = 100
+    # Percentage of DEFAULT/DEBUG level events recorded, unless listed in EVENT_SAMPLE_RATES
+    TRACE_EVENT_SAMPLE_PERCENT: int = 10
+    # Longer strings in trace payloads are cut to this many characters plus a SHA-256
+    TRACE_MAX_FIELD_CHARS: int = 4000
+    # Longer lists in trace payloads keep their first and last items only
+    TRACE_MAX_ITEMS: int = 50
+
+    # LLM routing (services/llm_router.py)
+    # Start the fallback model too when the first token takes longer than this (0 disables hedging)
+    LLM_HEDGE_AFTER_MS: int = 0
+    # Slower first tokens count as failures of the provider
+    LLM_SLOW_FIRST_TOKEN_MS: int = 60000
+    # How long a provider's circuit stays open before a probe call is let through
+    LLM_BREAKER_COOLDOWN_SECONDS: int = 30
+    # Connections per provider in the shared HTTP client pools
+    LLM_POOL_CONNECTIONS: int = 100
 
     # Admin API key for server-side operations
     KORTIX_ADMIN_API_KEY: Optional[str] = None
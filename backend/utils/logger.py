@@ -1,40 +1,239 @@
-import structlog, logging, os
+import structlog, logging, os, sys, json, time, queue, threading, atexit
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 ENV_MODE = os.getenv("ENV_MODE", "LOCAL")
 
+# "performance" keeps per-call work low: callsite lookups only for WARNING and
+# above, orjson rendering, writes from a background thread and a per-module
+# rate limit for DEBUG/INFO. "default" is the full chain with synchronous writes.
+LOG_PROFILE = os.getenv("LOG_PROFILE", "performance" if ENV_MODE.upper() == "PRODUCTION" else "default").lower()
+
 # Set default logging level based on environment
 if ENV_MODE.upper() == "PRODUCTION":
-    default_level = "DEBUG"
+    default_level = "INFO" if LOG_PROFILE == "performance" else "DEBUG"
 else:
     default_level = "INFO"
 
 LOGGING_LEVEL = logging.getLevelNamesMapping().get(
-    os.getenv("LOGGING_LEVEL", default_level).upper(), 
+    os.getenv("LOGGING_LEVEL", default_level).upper(),
     logging.DEBUG if ENV_MODE.upper() == "PRODUCTION" else logging.INFO
 )
 
-renderer = [structlog.processors.JSONRenderer()]
-# if ENV_MODE.lower() == "local".lower() or ENV_MODE.lower() == "staging".lower():
-#     renderer = [structlog.dev.ConsoleRenderer()]
-
-structlog.configure(
-    processors=[
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.dict_tracebacks,
-        structlog.processors.CallsiteParameterAdder(
-            {
-                structlog.processors.CallsiteParameter.FILENAME,
-                structlog.processors.CallsiteParameter.FUNC_NAME,
-                structlog.processors.CallsiteParameter.LINENO,
-            }
-        ),
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.contextvars.merge_contextvars,
-        *renderer,
-    ],
-    cache_logger_on_first_use=True,
-    wrapper_class=structlog.make_filtering_bound_logger(LOGGING_LEVEL),
-)
+# DEBUG/INFO events per second and module in the performance profile (0 disables the limit)
+LOG_RATE_LIMIT = int(os.getenv("LOG_RATE_LIMIT", "200"))
+
+_METHOD_LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "msg": logging.INFO,
+    "warn": logging.WARNING,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+    "exception": logging.ERROR,
+    "critical": logging.CRITICAL,
+    "fatal": logging.CRITICAL,
+}
+
+_CALLSITE_PARAMETERS = {
+    structlog.processors.CallsiteParameter.FILENAME,
+    structlog.processors.CallsiteParameter.FUNC_NAME,
+    structlog.processors.CallsiteParameter.LINENO,
+}
+
+_warning_callsite_adder = structlog.processors.CallsiteParameterAdder(_CALLSITE_PARAMETERS, additional_ignores=[__name__])
+
+
+def add_callsite_for_warnings(logger, method_name, event_dict):
+    """Add filename, function and line number to WARNING and above; finding them walks the stack."""
+    if _METHOD_LEVELS.get(method_name, logging.INFO) >= logging.WARNING:
+        return _warning_callsite_adder(logger, method_name, event_dict)
+    return event_dict
+
+
+def _caller_module() -> str:
+    frame = sys._getframe(1)
+    while frame is not None:
+        name = frame.f_globals.get("__name__", "")
+        if not (name.startswith("structlog") or name == __name__):
+            return name
+        frame = frame.f_back
+    return "unknown"
+
+
+class ModuleRateLimiter:
+    """Drop DEBUG/INFO events of modules that log more than `rate` of them per second.
+
+    Each module has a token bucket holding up to one second worth of events.
+    The next event a module gets through carries the number it had dropped as
+    `suppressed`.
+    """
+
+    def __init__(self, rate: int):
+        self.rate = rate
+        self._buckets = {}
+
+    def __call__(self, logger, method_name, event_dict):
+        if _METHOD_LEVELS.get(method_name, logging.INFO) >= logging.WARNING:
+            return event_dict
+
+        module = _caller_module()
+        now = time.monotonic()
+        bucket = self._buckets.get(module)
+        if bucket is None:
+            # [tokens, last refill, dropped since the last event]
+            bucket = self._buckets[module] = [float(self.rate), now, 0]
+
+        tokens = min(float(self.rate), bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            bucket[2] += 1
+            raise structlog.DropEvent
+
+        bucket[0] = tokens - 1
+        if bucket[2]:
+            event_dict["suppressed"] = bucket[2]
+            bucket[2] = 0
+        return event_dict
+
+
+class QueuedWriter:
+    """Write rendered log lines from a daemon thread so logging never blocks on the output stream."""
+
+    BATCH_SIZE = 512
+
+    def __init__(self, file):
+        self.file = file
+        self._init()
+        os.register_at_fork(after_in_child=self._init)
+        atexit.register(self.drain)
+
+    def _init(self):
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def write(self, line: bytes):
+        if self._thread is None or not self._thread.is_alive():
+            self._start()
+        self._queue.put(line)
+
+    def drain(self):
+        """Write whatever is still queued and wait for the batch being written; runs at exit."""
+        lines = []
+        while True:
+            try:
+                lines.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if lines:
+            self._write(lines)
+        with self._lock:
+            pass
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            lines = [self._queue.get()]
+            while len(lines) < self.BATCH_SIZE:
+                try:
+                    lines.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(lines)
+
+    def _write(self, lines):
+        data = b"\n".join(line if isinstance(line, bytes) else line.encode() for line in lines) + b"\n"
+        with self._lock:
+            try:
+                out = getattr(self.file, "buffer", None)
+                if out is not None:
+                    out.write(data)
+                else:
+                    self.file.write(data.decode())
+                self.file.flush()
+            except Exception:
+                pass
+
+
+class QueuedLogger:
+    """structlog output logger handing lines to a QueuedWriter."""
+
+    def __init__(self, writer: QueuedWriter):
+        self._writer = writer
+
+    def msg(self, message):
+        self._writer.write(message)
+
+    log = debug = info = warn = warning = err = error = critical = exception = fatal = msg
+
+
+def _json_bytes(obj, **kwargs) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), **kwargs).encode()
+
+
+def fast_json_renderer():
+    """JSON renderer producing bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return structlog.processors.JSONRenderer(serializer=orjson.dumps, option=orjson.OPT_NON_STR_KEYS)
+    return structlog.processors.JSONRenderer(serializer=_json_bytes)
+
+
+def configure_logging(profile: str = LOG_PROFILE, level: int = LOGGING_LEVEL, file=None):
+    """Configure structlog for a profile ("performance" or "default"), writing to `file` (stdout).
+
+    Returns the QueuedWriter of the performance profile, None for the default one.
+    """
+    file = file or sys.stdout
+    writer = None
+
+    if profile == "performance":
+        processors = [
+            # First, so rate limited events skip the rest of the chain
+            *([ModuleRateLimiter(LOG_RATE_LIMIT)] if LOG_RATE_LIMIT > 0 else []),
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            structlog.processors.dict_tracebacks,
+            add_callsite_for_warnings,
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.contextvars.merge_contextvars,
+            fast_json_renderer(),
+        ]
+        writer = QueuedWriter(file)
+        logger_factory = lambda *args: QueuedLogger(writer)
+    else:
+        renderer = [structlog.processors.JSONRenderer()]
+        # if ENV_MODE.lower() == "local".lower() or ENV_MODE.lower() == "staging".lower():
+        #     renderer = [structlog.dev.ConsoleRenderer()]
+        processors = [
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            structlog.processors.dict_tracebacks,
+            structlog.processors.CallsiteParameterAdder(_CALLSITE_PARAMETERS),
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.contextvars.merge_contextvars,
+            *renderer,
+        ]
+        logger_factory = structlog.PrintLoggerFactory(file)
+
+    structlog.configure(
+        processors=processors,
+        logger_factory=logger_factory,
+        cache_logger_on_first_use=True,
+        wrapper_class=structlog.make_filtering_bound_logger(level),
+    )
+    return writer
+
+
+configure_logging()
 
 logger: structlog.stdlib.BoundLogger = structlog.get_logger()
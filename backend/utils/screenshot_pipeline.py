@@ -0,0 +1,154 @@
+"""
+Screenshot pipeline for the browser tools.
+
+Browser actions return full-size PNG screenshots as base64. The pipeline
+decodes each screenshot once in the shared image processing pool, skips
+frames whose pixels are identical to the previous one's (SHA-256 of the
+decoded pixels), downscales and re-encodes the rest to WebP or JPEG, and
+uploads them. When an upload fails the re-encoded frame is returned inline
+instead of a URL.
+"""
+
+import base64
+import hashlib
+import io
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from PIL import Image
+
+from services.image_processing import get_image_processing_service
+from services.supabase import DBConnection
+from utils.config import config
+from utils.logger import logger
+
+MAX_SCREENSHOT_BYTES = 10 * 1024 * 1024
+SUPPORTED_FORMATS = {'JPEG', 'PNG', 'GIF', 'BMP', 'WEBP', 'TIFF'}
+ENCODINGS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+
+@dataclass
+class PreparedScreenshot:
+    frame_hash: str
+    data: Optional[bytes] = None
+    mime_type: Optional[str] = None
+
+
+@dataclass
+class Screenshot:
+    image_url: Optional[str]
+    mime_type: str
+    deduplicated: bool = False
+    # Base64 of the re-encoded frame, set instead of image_url when the upload failed
+    base64_data: Optional[str] = None
+
+
+def pixel_hash(img: Image.Image) -> str:
+    """SHA-256 of the decoded pixels, size and mode; equal only for identical frames."""
+    digest = hashlib.sha256(f"{img.mode}:{img.width}x{img.height}:".encode())
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+
+def prepare_screenshot(
+    base64_data: str,
+    previous_hash: Optional[str] = None,
+    max_width: int = 1280,
+    image_format: str = 'webp',
+    quality: int = 75,
+) -> PreparedScreenshot:
+    """Decode, hash and re-encode a base64 screenshot. CPU bound; run it in the image processing pool.
+
+    Returns a screenshot without data when it matches ``previous_hash``.
+    Raises ValueError when the data is not a valid image.
+    """
+    if not base64_data or len(base64_data) < 10:
+        raise ValueError("Base64 string is empty or too short")
+    if base64_data.startswith('data:'):
+        base64_data = base64_data.split(',', 1)[-1]
+
+    try:
+        raw = base64.b64decode(base64_data, validate=True)
+    except Exception as e:
+        raise ValueError(f"Base64 decoding failed: {e}")
+    if not raw:
+        raise ValueError("Decoded image data is empty")
+    if len(raw) > MAX_SCREENSHOT_BYTES:
+        raise ValueError(f"Image size ({len(raw)} bytes) exceeds limit ({MAX_SCREENSHOT_BYTES} bytes)")
+
+    try:
+        img = Image.open(io.BytesIO(raw))
+        if img.format not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported image format: {img.format}")
+        img.load()
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Image validation failed: {e}")
+
+    frame_hash = pixel_hash(img)
+    if frame_hash == previous_hash:
+        return PreparedScreenshot(frame_hash=frame_hash)
+
+    pil_format, mime_type = ENCODINGS.get(image_format.lower(), ENCODINGS['webp'])
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    if img.width > max_width:
+        img = img.resize((max_width, round(img.height * max_width / img.width)), Image.Resampling.LANCZOS)
+
+    output = io.BytesIO()
+    img.save(output, format=pil_format, quality=quality)
+    return PreparedScreenshot(frame_hash=frame_hash, data=output.getvalue(), mime_type=mime_type)
+
+
+class ScreenshotPipeline:
+    """Per-tool screenshot processing; remembers the last uploaded frame for deduplication."""
+
+    def __init__(self, bucket_name: str = "browser-screenshots"):
+        self.bucket_name = bucket_name
+        self._last_hash: Optional[str] = None
+        self._last_screenshot: Optional[Screenshot] = None
+
+    async def process(self, base64_data: str) -> Screenshot:
+        """Return the URL for a screenshot, uploading it if it is new.
+
+        When the upload fails the screenshot carries the re-encoded frame as
+        base64 instead of a URL. Raises ValueError when the screenshot is not
+        a valid image.
+        """
+        prepared = await get_image_processing_service().run(
+            prepare_screenshot,
+            base64_data,
+            self._last_hash if self._last_screenshot else None,
+            config.SCREENSHOT_MAX_WIDTH,
+            config.SCREENSHOT_FORMAT,
+            config.SCREENSHOT_QUALITY,
+        )
+
+        if prepared.data is None:
+            logger.debug(f"Screenshot unchanged, reusing {self._last_screenshot.image_url}")
+            return Screenshot(self._last_screenshot.image_url, self._last_screenshot.mime_type, deduplicated=True)
+
+        extension = prepared.mime_type.split('/')[-1]
+        filename = f"image_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{str(uuid.uuid4())[:8]}.{extension}"
+        try:
+            client = await DBConnection().client
+            bucket = client.storage.from_(self.bucket_name)
+            await bucket.upload(filename, prepared.data, {"content-type": prepared.mime_type})
+            image_url = await bucket.get_public_url(filename)
+            logger.debug(f"Uploaded screenshot {filename} ({len(prepared.data)} bytes)")
+        except Exception as e:
+            logger.error(f"Failed to upload screenshot {filename}, returning it inline: {e}")
+            # A later identical frame has no URL to reuse
+            self._last_hash = None
+            self._last_screenshot = None
+            return Screenshot(None, prepared.mime_type, base64_data=base64.b64encode(prepared.data).decode())
+
+        self._last_hash = prepared.frame_hash
+        self._last_screenshot = Screenshot(image_url, prepared.mime_type)
+        return self._last_screenshot
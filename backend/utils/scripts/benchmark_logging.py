@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-token logging overhead of the utils.logger profiles.
+
+Replays the logging of a streamed LLM response. Every token logs one DEBUG
+line interpolating the chunk. Every 20th token logs a DEBUG line with a
+larger payload, like a tool registry lookup. Every 200th logs an INFO line,
+and every 1000th a WARNING. Output goes to /dev/null.
+
+Setups:
+1. before:  "default" profile at DEBUG (the previous production setup), f-strings
+2. after:   "performance" profile at INFO (the new production default), positional args
+3. after, DEBUG enabled: "performance" profile at DEBUG, positional args
+
+"caller" is the time spent in the logging calls. "total" also waits for the
+performance profile's writer thread to finish the queued lines.
+
+Usage:
+    python benchmark_logging.py [--tokens N] [--runs N]
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import structlog
+
+from utils import logger as logger_module
+
+PAYLOAD = {"function_name": "create_file", "arguments": {"file_path": "src/app.py", "file_contents": "x" * 2000}}
+
+
+def tokens_eager(log, tokens):
+    for i in range(tokens):
+        chunk = f"tok{i} "
+        log.debug(f"Received chunk {i}: {chunk!r}")
+        if i % 20 == 0:
+            log.debug(f"Retrieved tool call: {PAYLOAD}")
+        if i % 200 == 0:
+            log.info(f"Streamed {i} tokens")
+        if i % 1000 == 0:
+            log.warning(f"Slow chunk {i}")
+
+
+def tokens_lazy(log, tokens):
+    for i in range(tokens):
+        chunk = f"tok{i} "
+        log.debug("Received chunk %s: %r", i, chunk)
+        if i % 20 == 0:
+            log.debug("Retrieved tool call: %s", PAYLOAD)
+        if i % 200 == 0:
+            log.info("Streamed %s tokens", i)
+        if i % 1000 == 0:
+            log.warning("Slow chunk %s", i)
+
+
+def measure(name, profile, level, replay, args, devnull):
+    writer = logger_module.configure_logging(profile=profile, level=level, file=devnull)
+    caller, total = [], []
+    for _ in range(args.runs):
+        log = structlog.get_logger()
+        start = time.perf_counter()
+        replay(log, args.tokens)
+        caller.append((time.perf_counter() - start) * 1e9 / args.tokens)
+        if writer:
+            writer.drain()
+        total.append((time.perf_counter() - start) * 1e9 / args.tokens)
+    print(f"{name:<34} caller {statistics.median(caller):8.0f} ns/token   total {statistics.median(total):8.0f} ns/token")
+    return statistics.median(caller)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=20_000, help="Tokens per run")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per setup")
+    args = parser.parse_args()
+
+    # The benchmark logs far beyond the production rate limit on purpose; measure with it disabled
+    # unless LOG_RATE_LIMIT is set explicitly.
+    if "LOG_RATE_LIMIT" not in os.environ:
+        logger_module.LOG_RATE_LIMIT = 0
+
+    print(f"{args.tokens} tokens per run, orjson {'installed' if logger_module.orjson else 'not installed'}, "
+          f"rate limit {logger_module.LOG_RATE_LIMIT or 'off'}\n")
+    with open(os.devnull, "w") as devnull:
+        before = measure("before (default, DEBUG, f-strings)", "default", logging.DEBUG, tokens_eager, args, devnull)
+        after = measure("after (performance, INFO)", "performance", logging.INFO, tokens_lazy, args, devnull)
+        measure("after (performance, DEBUG)", "performance", logging.DEBUG, tokens_lazy, args, devnull)
+    print(f"\nper-token overhead in the caller: {before / after:.0f}x lower at the production default level")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the tracing overhead paid on the agent's hot path.
+
+Replays the observations of one agent turn and times the calls made by the
+worker, not the network export:
+- one generation with the prepared messages and tool names as input
+- tool spans with their arguments and results
+- per-chunk DEFAULT level events plus an ERROR event
+
+It runs three setups:
+1. the Langfuse stateful clients, called directly (the behavior before
+   services/tracing.py)
+2. the services.tracing facade with the configured sampling and size limits
+3. the facade with tracing disabled (no-op)
+
+The Langfuse client points at an unused local port and its own export
+interval is longer than the benchmark, so no request leaves the process.
+
+Usage:
+    python benchmark_tracing.py [--messages N] [--message-chars N] [--tools N] [--tools-per-turn N]
+                                [--events N] [--turns N]
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from langfuse import Langfuse
+
+from services.tracing import EVENT_SAMPLE_RATES, Tracer
+from utils.config import config
+
+EVENT_NAMES = ["executing_tool", "formatted_tool_result_content", "linking_tool_result_to_assistant_message"]
+
+
+def build_turn(args):
+    messages = [
+        {"role": "user" if i % 2 else "assistant", "content": f"message {i} " + "x" * args.message_chars}
+        for i in range(args.messages)
+    ]
+    tools = [f"tool_{i}" for i in range(args.tools)]
+    tool_calls = [
+        ({"file_path": f"src/file_{i}.py", "file_contents": "y" * 20_000}, {"success": True, "output": "z" * 50_000})
+        for i in range(args.tools_per_turn)
+    ]
+    return messages, tools, tool_calls
+
+
+def run_turn(trace, messages, tools, tool_calls, events):
+    generation = trace.generation(name="thread_manager.run_thread")
+    generation.update(
+        input=messages,
+        start_time=datetime.now(timezone.utc),
+        model="benchmark-model",
+        model_parameters={"max_tokens": 1000, "temperature": 0, "tools": tools},
+    )
+    for i in range(events):
+        trace.event(name=EVENT_NAMES[i % len(EVENT_NAMES)], level="DEFAULT", status_message=f"chunk {i}")
+    for arguments, result in tool_calls:
+        span = trace.span(name="execute_tool.create_file", input=arguments)
+        span.end(status_message="tool_executed", output=result)
+    trace.event(name="error_processing_stream", level="ERROR", status_message="benchmark error")
+    generation.end(output=messages[-1]["content"])
+
+
+def measure(name, make_trace, args, turn):
+    timings = []
+    for _ in range(args.turns):
+        trace = make_trace()
+        start = time.perf_counter()
+        run_turn(trace, *turn, args.events)
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"{name:<28} median {statistics.median(timings):9.3f} ms/turn   p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:9.3f} ms/turn")
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200, help="Prepared messages per LLM call")
+    parser.add_argument("--message-chars", type=int, default=5_000, help="Characters per message")
+    parser.add_argument("--tools", type=int, default=40, help="Tool names per LLM call")
+    parser.add_argument("--tools-per-turn", type=int, default=3, help="Tool calls per turn")
+    parser.add_argument("--events", type=int, default=200, help="DEFAULT level events per turn")
+    parser.add_argument("--turns", type=int, default=50, help="Turns per setup")
+    args = parser.parse_args()
+
+    logging.getLogger("langfuse").setLevel(logging.CRITICAL)
+    client = Langfuse(
+        public_key="pk-benchmark", secret_key="sk-benchmark", host="http://127.0.0.1:9",
+        flush_at=1_000_000, flush_interval=3600, enabled=True,
+    )
+    turn = build_turn(args)
+    print(f"{args.messages} messages x {args.message_chars} chars, {args.tools} tool schemas, "
+          f"{args.tools_per_turn} tool calls and {args.events} events per turn\n")
+
+    direct = measure("langfuse client (direct)", lambda: client.trace(name="benchmark"), args, turn)
+
+    tracer = Tracer(
+        client,
+        event_sample_rate=config.TRACE_EVENT_SAMPLE_PERCENT / 100,
+        event_sample_rates=EVENT_SAMPLE_RATES,
+        max_chars=config.TRACE_MAX_FIELD_CHARS,
+        max_items=config.TRACE_MAX_ITEMS,
+    )
+    facade = measure("tracing facade", lambda: tracer.trace(name="benchmark"), args, turn)
+
+    noop_tracer = Tracer(client, enabled=False)
+    noop = measure("tracing facade (no-op)", lambda: noop_tracer.trace(name="benchmark"), args, turn)
+
+    export_start = time.perf_counter()
+    tracer.exporter._queue.join()
+    print(f"\nbackground export of the facade's observations took {(time.perf_counter() - export_start) * 1000:.1f} ms after the last turn")
+    print(f"facade: {direct / facade:.1f}x less hot path time than direct, no-op: {direct / max(noop, 1e-6):.0f}x")
+    # Skip the Langfuse atexit flush, which would retry against the unused port
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Check services.llm_router against two local fake OpenAI-compatible servers.
+
+Both servers answer /v1/chat/completions, streamed or not. Each one can be
+switched to answer 529 (overloaded), 500, or to wait before its first token.
+The primary model is served by one, its fallback by the other, and the
+scenarios check that:
+
+1. a healthy primary answers
+2. an overloaded primary fails over to the fallback and opens its circuit
+3. while the circuit is open calls go straight to the fallback
+4. after the cooldown a probe goes to the primary and, once it succeeds,
+   calls are back on the primary
+5. a primary with a slow first token is hedged by the fallback
+6. slow non-streaming calls are not counted against the primary
+7. errors of a provider without fallback are raised
+
+Usage:
+    python check_llm_router.py [--cooldown SECONDS]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import litellm
+
+from services.llm_router import CircuitBreaker, LLMRouter
+
+PRIMARY = "openai/primary-model"
+FALLBACK = "openai/fallback-model"
+
+
+class FakeServer:
+    """Minimal OpenAI-compatible chat completions server."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.mode = "ok"
+        self.first_token_delay = 0.0
+        self.requests = 0
+        self.port = None
+        self._server = None
+
+    @property
+    def api_base(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode().strip()
+                    if not line:
+                        break
+                    key, _, value = line.partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = json.loads(await reader.readexactly(int(headers.get("content-length", 0))) or b"{}")
+                self.requests += 1
+                await self._respond(writer, body)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, body: dict):
+        if self.mode in ("overloaded", "error"):
+            status = "529 Overloaded" if self.mode == "overloaded" else "500 Internal Server Error"
+            message = "Overloaded" if self.mode == "overloaded" else "Internal error"
+            payload = json.dumps({"error": {"message": message, "type": "server_error"}}).encode()
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n".encode()
+                + payload
+            )
+            await writer.drain()
+            return
+
+        await asyncio.sleep(self.first_token_delay)
+        text = f"hello from {self.name}"
+        base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": body.get("model")}
+        if not body.get("stream"):
+            payload = json.dumps({
+                **base, "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 5, "completion_tokens": 4, "total_tokens": 9},
+            }).encode()
+            writer.write(
+                f"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n".encode()
+                + payload
+            )
+            await writer.drain()
+            return
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+        deltas = [{"role": "assistant", "content": word + " "} for word in text.split()]
+        for i, delta in enumerate(deltas):
+            chunk = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": "stop" if i == len(deltas) - 1 else None}]}
+            self._write_chunk(writer, f"data: {json.dumps(chunk)}\n\n".encode())
+            await writer.drain()
+        self._write_chunk(writer, b"data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _write_chunk(writer: asyncio.StreamWriter, data: bytes):
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+
+async def answer(router: LLMRouter, prepare, stream: bool = True, **kwargs) -> str:
+    response = await router.acompletion(PRIMARY, prepare, fallback=FALLBACK, **kwargs)
+    if not stream:
+        return response.choices[0].message.content.strip()
+    parts = []
+    async for chunk in response:
+        parts.append(chunk.choices[0].delta.content or "")
+    return "".join(parts).strip()
+
+
+def check(name: str, condition: bool, detail: str = ""):
+    print(f"{'ok  ' if condition else 'FAIL'} {name}{f' ({detail})' if detail else ''}")
+    if not condition:
+        check.failed += 1
+
+
+check.failed = 0
+
+
+async def main(args):
+    litellm.suppress_debug_info = True
+    primary, fallback = FakeServer("primary"), FakeServer("fallback")
+    await primary.start()
+    await fallback.start()
+    servers = {PRIMARY: primary, FALLBACK: fallback}
+
+    router = LLMRouter()
+    breaker = router.breaker(f"openai@{primary.api_base}")
+    breaker.cooldown = args.cooldown
+
+    def prepare(model: str, stream: bool = True):
+        return {
+            "model": model, "api_base": servers[model].api_base, "api_key": "sk-fake",
+            "messages": [{"role": "user", "content": "hi"}], "stream": stream, "num_retries": 2,
+        }
+
+    try:
+        result = await answer(router, prepare)
+        check("healthy primary answers", result == "hello from primary", result)
+        result = await answer(router, lambda model: prepare(model, stream=False), stream=False)
+        check("non-streaming call answers", result == "hello from primary", result)
+
+        primary.mode = "overloaded"
+        result = await answer(router, prepare)
+        check("overloaded primary fails over", result == "hello from fallback", result)
+        check("overload opens the circuit", breaker.state == CircuitBreaker.OPEN, breaker.state)
+
+        requests = primary.requests
+        result = await answer(router, prepare)
+        check("open circuit routes to the fallback", result == "hello from fallback" and primary.requests == requests,
+              f"{result}, {primary.requests - requests} requests to the primary")
+
+        primary.mode = "ok"
+        await asyncio.sleep(args.cooldown + 0.1)
+        result = await answer(router, prepare)
+        check("probe after the cooldown goes to the primary", result == "hello from primary", result)
+        check("successful probe closes the circuit", breaker.state == CircuitBreaker.CLOSED, breaker.state)
+
+        primary.first_token_delay = 2.0
+        start = time.monotonic()
+        result = await answer(router, prepare, hedge_after=0.2)
+        elapsed = time.monotonic() - start
+        check("slow primary is hedged by the fallback", result == "hello from fallback" and elapsed < 1.5,
+              f"{result} after {elapsed:.2f}s")
+        primary.first_token_delay = 0.0
+
+        slow_call_seconds, breaker.slow_call_seconds = breaker.slow_call_seconds, 0.1
+        primary.first_token_delay = 0.3
+        for _ in range(5):
+            await answer(router, lambda model: prepare(model, stream=False), stream=False)
+        check("slow non-streaming calls don't count as slow first tokens", breaker.state == CircuitBreaker.CLOSED,
+              breaker.state)
+        breaker.slow_call_seconds = slow_call_seconds
+        primary.first_token_delay = 0.0
+
+        fallback.mode = "error"
+        try:
+            await router.acompletion(FALLBACK, prepare, fallback=None)
+            check("provider error without fallback is raised", False)
+        except Exception as e:
+            check("provider error without fallback is raised", True, type(e).__name__)
+    finally:
+        await primary.stop()
+        await fallback.stop()
+
+    print(f"\n{'all checks passed' if not check.failed else f'{check.failed} checks failed'}")
+    return 1 if check.failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cooldown", type=float, default=1.0, help="Circuit breaker cooldown in seconds")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -210,6 +210,8 @@ class SunaDefaultAgentService:
             
             # Delete agent
             result = await client.table('agents').delete().eq('agent_id', agent_id).execute()
+            from agent.config_cache import invalidate_agent_config
+            await invalidate_agent_config(agent_id)
             return bool(result.data)
             
         except Exception as e: